@@ -10,35 +10,134 @@ import os
 import subprocess
 import time
 import datetime
-import requests
 import socket
 import re
 import logging
 import sys
 import json
-import yaml
-from typing import List, Dict, Any, Optional, Tuple
-from concurrent.futures import ThreadPoolExecutor
+import functools
+import importlib
+import threading
+import selectors
+import codecs
+import collections
+import contextlib
+import dataclasses
+import signal
+import errno
+import stat
+import random
+import struct
+import mmap
+import bisect
+import ipaddress
+from typing import List, Dict, Any, Optional, Tuple, Callable
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait as wait_futures
 import platform
-import psutil  # Nova biblioteca para monitoramento avançado
 
-# Bibliotecas de terceiros
-try:
-    from rich.console import Console
-    from rich.theme import Theme
-    from rich.progress import Progress, BarColumn, TextColumn, TimeRemainingColumn
-    from rich.table import Table
-    from rich.panel import Panel
-    from rich.live import Live
-    from pytube import YouTube, Playlist
-    from pytube.exceptions import PytubeError
-except ImportError as e:
-    is_termux = 'com.termux' in os.environ.get('PREFIX', '')
-    if is_termux:
-        print("Erro de importação. No Termux, instale com: pkg install python-pip && pip install rich requests pytube pyyaml psutil")
-    else:
-        print("Erro de importação. Instale com: pip install rich requests pytube pyyaml psutil")
-    sys.exit(1)
+IS_TERMUX = 'com.termux' in os.environ.get('PREFIX', '')
+
+
+def install_hint(packages: List[str]) -> str:
+    """Retorna a instrução de instalação adequada à plataforma para os pacotes informados."""
+    pip_cmd = f"pip install {' '.join(packages)}"
+    if IS_TERMUX:
+        return f"No Termux, instale com: pkg install python-pip && {pip_cmd}"
+    return f"Instale com: {pip_cmd}"
+
+
+# --- Importação Preguiçosa ---
+
+
+class LazyModule:
+    """
+    Proxy que adia a importação de um módulo até o primeiro acesso a um atributo.
+    Mantém o custo de inicialização do script restrito ao necessário para o menu.
+    """
+
+    def __init__(self, name: str, package: Optional[str] = None) -> None:
+        self._name = name
+        self._package = package or name.split('.')[0]
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            try:
+                self._module = importlib.import_module(self._name)
+            except ImportError as e:
+                raise ImportError(f"Módulo '{self._name}' ausente. {install_hint([self._package])}") from e
+        return self._module
+
+    def available(self) -> bool:
+        """Importa o módulo (se ainda não importado) e informa se está disponível."""
+        try:
+            self._load()
+            return True
+        except ImportError:
+            return False
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = "carregado" if self.loaded else "pendente"
+        return f"<LazyModule {self._name} ({state})>"
+
+
+# Interface (Rich): necessária para o menu, mas dispensada nos subcomandos com --json
+rich_console = LazyModule('rich.console', 'rich')
+rich_theme = LazyModule('rich.theme', 'rich')
+rich_table = LazyModule('rich.table', 'rich')
+rich_panel = LazyModule('rich.panel', 'rich')
+rich_markup = LazyModule('rich.markup', 'rich')
+
+# Bibliotecas de terceiros carregadas apenas pelas ações que as utilizam
+requests = LazyModule('requests')
+yaml = LazyModule('yaml', 'pyyaml')
+psutil = LazyModule('psutil')  # Monitoramento avançado
+rich_progress = LazyModule('rich.progress', 'rich')
+rich_live = LazyModule('rich.live', 'rich')
+pytube = LazyModule('pytube')
+pytube_exceptions = LazyModule('pytube.exceptions', 'pytube')
+# Biblioteca padrão, mas só necessária para o cache de geolocalização
+sqlite3 = LazyModule('sqlite3')
+
+LAZY_MODULES: Dict[str, LazyModule] = {
+    'requests': requests,
+    'yaml': yaml,
+    'psutil': psutil,
+    'rich.progress': rich_progress,
+    'rich.live': rich_live,
+    'pytube': pytube,
+    'pytube.exceptions': pytube_exceptions,
+    'sqlite3': sqlite3,
+}
+
+
+def requires(*modules: str) -> Callable:
+    """
+    Decorador que declara os módulos pesados usados por uma ação do menu.
+    Os módulos são importados apenas na primeira execução da ação; se algum
+    estiver ausente, exibe a instrução de instalação em vez de quebrar o menu.
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            missing = [LAZY_MODULES[name]._package for name in modules if not LAZY_MODULES[name].available()]
+            if missing:
+                print_panel(f"Dependência ausente para esta ação. {install_hint(sorted(set(missing)))}",
+                            "Erro de Importação", "error")
+                logging.error(f"Dependências ausentes para {func.__name__}: {', '.join(missing)}")
+                input("\nPressione Enter para continuar...")
+                return None
+            return func(*args, **kwargs)
+        wrapper.required_modules = modules
+        return wrapper
+    return decorator
 
 # --- Configuração e Constantes ---
 
@@ -55,7 +154,83 @@ def load_config() -> Dict[str, Any]:
         'audio_download_dir': os.path.join(os.getcwd(), 'AudiosDownloads'),
         'log_file': 'pytools.log',
         'theme': 'dark',
-        'max_download_threads': 3
+        'max_download_threads': 3,
+        # Socket do daemon: fora do /tmp (limpo pelo clean-temp), em um diretório só do usuário
+        'daemon_socket': os.path.join(os.environ.get('XDG_RUNTIME_DIR') or
+                                      os.path.join(os.path.expanduser('~'), '.cache', 'pytools'),
+                                      f"pytools-{os.getuid() if hasattr(os, 'getuid') else 'user'}.sock"),
+        # Captura de saída de comandos: início + fim limitados, com descarte contabilizado
+        'capture_head_lines': 200,
+        'capture_tail_lines': 500,
+        'capture_max_bytes': 1024 * 1024,  # Por fluxo (stdout/stderr)
+        'capture_spill_dir': None,         # Se definido, grava a saída completa em .log.gz
+        # Tempo limite padrão (s) de cada comando externo; None = sem limite
+        'command_timeout': None,
+        # Espera (s) entre SIGTERM e SIGKILL ao encerrar o grupo de processos
+        'command_kill_grace': 3.0,
+        # Atualização do sistema: etapas simultâneas e estado das entradas já processadas
+        'update_max_workers': 4,
+        'update_state_file': 'update_state.json',
+        # Listas do APT mais novas que isto (s) não são baixadas de novo
+        'apt_lists_ttl': 3600,
+        # Cache de geolocalização (SQLite): validade das entradas (s) e limite de entradas (LRU)
+        'ip_cache_db': 'ip_cache.sqlite3',
+        'ip_cache_ttl': 7 * 24 * 3600,
+        'ip_cache_max_entries': 10000,
+        # Cache por prefixo de rede: usa o campo network/route/range da resposta ou, na falta dele,
+        # o prefixo abaixo; IPs vizinhos passam a acertar o cache (maior prefixo vence)
+        'geo_prefix_cache': False,
+        'geo_prefix_v4': 24,
+        'geo_prefix_v6': 48,
+        # API de geolocalização ({ip} é substituído) e limites das consultas em massa
+        'geo_api_url': 'https://ipinfo.io/{ip}/json',
+        'geo_concurrency': 16,
+        'geo_rate_limit': 20,   # requisições por segundo (0 = sem limite)
+        'geo_retries': 3,
+        'geo_backoff': 0.5,     # espera inicial (s) entre tentativas, dobrada a cada falha
+        # Cache negativo: validade (s) de erros definitivos (4xx) e de falhas transitórias (rede, 429, 5xx)
+        'geo_negative_ttl': 600,
+        'geo_error_ttl': 30,
+        # Base offline de intervalos de IP (ver geo-import) e quando usá-la:
+        # 'online' (só a API), 'offline' (só a base) ou 'auto' (base primeiro, API se não achar)
+        'geo_offline_db': 'geo_ranges.bin',
+        'geo_mode': 'online',
+        # Ping nativo: 'auto' (ICMP se permitido, senão TCP), 'icmp' ou 'tcp'; porta do modo TCP,
+        # espera (s) por resposta e conexões TCP simultâneas
+        'ping_method': 'auto',
+        'ping_tcp_port': 80,
+        'ping_timeout': 1.0,
+        'ping_concurrency': 256,
+        # DNS: servidores ("ip" ou "ip:porta"; vazio = os do /etc/resolv.conf), espera (s) por
+        # resposta, tentativas por servidor e consultas simultâneas
+        'dns_servers': [],
+        'dns_timeout': 2.0,
+        'dns_attempts': 2,
+        'dns_concurrency': 64,
+        # Validade (s) das respostas sem TTL (resolvedor do sistema, /etc/hosts), das negativas sem
+        # SOA (NXDOMAIN/sem registros) e teto para qualquer TTL; dns_disk_cache grava no ip_cache_db
+        'dns_fallback_ttl': 300,
+        'dns_negative_ttl': 60,
+        'dns_max_ttl': 86400,
+        'dns_disk_cache': True,
+        # Traceroute: 'auto' (UDP nativo no Linux, senão o comando traceroute), 'udp', 'tcp' ou 'system';
+        # saltos máximos, sondas por salto e espera (s) pelas respostas
+        'traceroute_method': 'auto',
+        'traceroute_max_hops': 30,
+        'traceroute_queries': 3,
+        'traceroute_timeout': 2.0,
+        # Análise de diretórios: cache do conteúdo de cada diretório (SQLite) e threads da varredura
+        'dir_cache_db': 'dir_cache.sqlite3',
+        'dirscan_workers': 16,
+        # Duplicatas: algoritmo do hash, processos do hash completo (None = núcleos) e threads do hash parcial
+        'dupes_hash': 'sha256',
+        'dupes_workers': None,
+        'dupes_io_workers': 8,
+        # Monitor de E/S de disco: intervalo (s) entre amostras dos contadores
+        'diskio_interval': 1.0,
+        # Monitor de memória: intervalo (s) entre amostras e amostras guardadas por métrica
+        'mem_interval': 1.0,
+        'mem_history': 120,
     }
     try:
         with open('pytools_config.yaml', 'r') as f:
@@ -72,26 +247,44 @@ MAX_DOWNLOAD_THREADS = CONFIG['max_download_threads']
 
 # Temas personalizados para o Rich
 THEMES = {
-    'dark': Theme({
+    'dark': {
         'success': 'bold green',
         'error': 'bold red',
         'info': 'bold cyan',
         'warning': 'bold yellow',
         'header': 'bold magenta',
         'highlight': 'bold blue'
-    }),
-    'light': Theme({
+    },
+    'light': {
         'success': 'green',
         'error': 'red',
         'info': 'cyan',
         'warning': 'yellow',
         'header': 'magenta',
         'highlight': 'blue'
-    })
+    }
 }
 
-# Configuração do Console Rich
-console = Console(theme=THEMES.get(CONFIG['theme'], THEMES['dark']))
+# Configuração do Console Rich (criado no primeiro uso)
+_console = None
+
+def get_console():
+    """Retorna o Console do Rich, criando-o na primeira chamada."""
+    global _console
+    if _console is None:
+        theme = rich_theme.Theme(THEMES.get(CONFIG['theme'], THEMES['dark']))
+        _console = rich_console.Console(theme=theme)
+    return _console
+
+
+class _ConsoleProxy:
+    """Encaminha os acessos ao Console real, adiando a importação do Rich."""
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(get_console(), attr)
+
+
+console = _ConsoleProxy()
 
 # Configuração de Logging
 logging.basicConfig(
@@ -101,7 +294,7 @@ logging.basicConfig(
     datefmt='%Y-%m-%d %H:%M:%S'
 )
 
-# Cache para geolocalização
+# Cache legado de geolocalização (JSON), migrado uma única vez para o SQLite
 IP_CACHE_FILE = 'ip_cache.json'
 
 # --- Funções Auxiliares e de UI ---
@@ -110,58 +303,520 @@ def clear_console() -> None:
     """Limpa o console, compatível com Linux, Windows e Termux."""
     os.system('cls' if os.name == 'nt' else 'clear')
 
+def rich_markup_escape(text: str) -> str:
+    """Escapa texto externo (saída de comandos) para não ser interpretado como markup do Rich."""
+    return rich_markup.escape(text)
+
 def print_panel(content: str, title: str, style: str = "info") -> None:
     """Exibe um painel formatado com Rich."""
-    console.print(Panel(content, title=f"[bold]{title}[/bold]", border_style=style, expand=False))
+    console.print(rich_panel.Panel(content, title=f"[bold]{title}[/bold]", border_style=style, expand=False))
+
+def is_safe_command(command: List[str]) -> bool:
+    """Rejeita argumentos com metacaracteres de shell (defesa em profundidade)."""
+    return not any(';' in arg or '|' in arg or '&' in arg for arg in command)
+
+# Limites de memória da leitura em streaming
+STREAM_CHUNK_SIZE = 65536
+MAX_PARTIAL_LINE = 64 * 1024   # Linhas maiores são quebradas à força
+STDERR_TAIL_LINES = 50         # Linhas de stderr exibidas no painel de erro
+
+
+class LineSplitter:
+    """
+    Divide um fluxo de bytes em linhas de texto de forma incremental.
+    Trata '\r' como retorno de carro (mantém só o último segmento, como um
+    terminal faria) e limita o tamanho da linha parcial em memória.
+    """
+
+    def __init__(self) -> None:
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self._partial = ""
+
+    def feed(self, data: bytes) -> List[str]:
+        """Recebe um bloco de bytes e retorna as linhas completas encontradas."""
+        text = self._partial + self._decoder.decode(data)
+        *lines, self._partial = text.split('\n')
+        lines = [line.rstrip('\r').rsplit('\r', 1)[-1] for line in lines]
+        if '\r' in self._partial:
+            self._partial = self._partial.rsplit('\r', 1)[-1]
+        if len(self._partial) > MAX_PARTIAL_LINE:
+            lines.append(self._partial)
+            self._partial = ""
+        return lines
+
+    def flush(self) -> List[str]:
+        """Retorna o restante (linha sem quebra final) ao fim do fluxo."""
+        rest = (self._partial + self._decoder.decode(b"", final=True)).rsplit('\r', 1)[-1]
+        self._partial = ""
+        return [rest] if rest else []
+
+
+class OutputCapture:
+    """
+    Captura limitada de um fluxo de saída: guarda as primeiras linhas (head) e
+    um buffer circular com as últimas (tail), contando o que foi descartado.
+    A memória ocupada nunca passa de max_bytes (metade para cada parte),
+    medidos em bytes UTF-8 das linhas, não em caracteres. Opcionalmente grava
+    o fluxo completo em um arquivo .gz no disco.
+    """
+
+    def __init__(self, head_lines: int = 200, tail_lines: int = 500, max_bytes: int = 1024 * 1024,
+                 spill_path: Optional[str] = None) -> None:
+        self.head_lines = head_lines
+        self.tail_lines = tail_lines
+        self.half_budget = max_bytes // 2
+        self.head: List[str] = []
+        self.tail: collections.deque = collections.deque()
+        self._tail_sizes: collections.deque = collections.deque()
+        self.head_bytes = 0
+        self.tail_bytes = 0
+        self.total_lines = 0
+        self.total_bytes = 0
+        self.dropped_lines = 0
+        self.dropped_bytes = 0
+        self.spill_path = spill_path
+        self._spill = None
+        if spill_path:
+            import gzip
+            os.makedirs(os.path.dirname(spill_path) or '.', exist_ok=True)
+            self._spill = gzip.open(spill_path, 'wt', encoding='utf-8', compresslevel=6)
+
+    def add_lines(self, lines: List[str]) -> None:
+        """Acrescenta linhas ao buffer, descartando as mais antigas do tail quando necessário."""
+        if not lines:
+            return
+        if self._spill is not None:
+            self._spill.write("\n".join(lines) + "\n")
+        for line in lines:
+            encoded = line.encode('utf-8')
+            size = len(encoded) + 1
+            self.total_lines += 1
+            self.total_bytes += size
+            if size > self.half_budget:
+                # O trecho cortado da linha conta como descartado
+                line = encoded[:self.half_budget - 1].decode('utf-8', 'ignore')
+                truncated = len(line.encode('utf-8')) + 1
+                self.dropped_bytes += size - truncated
+                size = truncated
+            if len(self.head) < self.head_lines and self.head_bytes + size <= self.half_budget:
+                self.head.append(line)
+                self.head_bytes += size
+                continue
+            self.tail.append(line)
+            self._tail_sizes.append(size)
+            self.tail_bytes += size
+            while len(self.tail) > self.tail_lines or self.tail_bytes > self.half_budget:
+                self.tail.popleft()
+                evicted = self._tail_sizes.popleft()
+                self.tail_bytes -= evicted
+                self.dropped_lines += 1
+                self.dropped_bytes += evicted
+
+    def close(self) -> None:
+        """Finaliza o arquivo de despejo, se houver (fluxos vazios não deixam arquivo)."""
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+            if self.total_lines == 0:
+                os.remove(self.spill_path)
+                self.spill_path = None
+
+    def lines(self) -> List[str]:
+        """Retorna head + marcador de linhas omitidas + tail."""
+        marker = [f"[... {self.dropped_lines} linhas ({format_bytes(self.dropped_bytes)}) omitidas ...]"]
+        return self.head + (marker if self.dropped_lines else []) + list(self.tail)
+
+    def text(self) -> str:
+        """Retorna a saída capturada como texto."""
+        text = "\n".join(self.lines())
+        return text + "\n" if text else ""
+
+    def stats(self) -> Dict[str, Any]:
+        """Retorna os contadores da captura (serializáveis em JSON)."""
+        return {"total_lines": self.total_lines, "total_bytes": self.total_bytes,
+                "dropped_lines": self.dropped_lines, "dropped_bytes": self.dropped_bytes,
+                "spill_file": self.spill_path}
+
+
+def make_capture(command: List[str], stream: str) -> OutputCapture:
+    """Cria uma OutputCapture com os limites da configuração para um fluxo de um comando."""
+    spill_path = None
+    if CONFIG['capture_spill_dir']:
+        stamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        name = slugify(os.path.basename(command[0])) or 'comando'
+        spill_path = os.path.join(CONFIG['capture_spill_dir'], f"{stamp}-{name}-{stream}.log.gz")
+    return OutputCapture(CONFIG['capture_head_lines'], CONFIG['capture_tail_lines'],
+                         CONFIG['capture_max_bytes'], spill_path)
+
+
+def stream_process(process: subprocess.Popen, on_lines: Callable[[str, List[str]], None],
+                   timeout: Optional[float] = None) -> bool:
+    """
+    Lê stdout e stderr de um processo à medida que os dados chegam, chamando
+    on_lines(nome_do_fluxo, linhas) com as linhas completas de cada leitura.
+    Retorna True quando ambos os fluxos chegam ao fim, sem espera ativa, ou
+    False se o tempo limite (em segundos) expirar antes disso.
+    """
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    pipes = {'stdout': process.stdout, 'stderr': process.stderr}
+    pipes = {name: pipe for name, pipe in pipes.items() if pipe is not None}
+
+    if os.name == 'nt':
+        # No Windows o selectors não suporta pipes: uma thread leitora por fluxo
+        lock = threading.Lock()
+
+        def pump(name: str, pipe) -> None:
+            splitter = LineSplitter()
+            for chunk in iter(lambda: pipe.read1(STREAM_CHUNK_SIZE), b""):
+                lines = splitter.feed(chunk)
+                if lines:
+                    with lock:
+                        on_lines(name, lines)
+            lines = splitter.flush()
+            if lines:
+                with lock:
+                    on_lines(name, lines)
+
+        threads = [threading.Thread(target=pump, args=item, daemon=True) for item in pipes.items()]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        return not any(thread.is_alive() for thread in threads)
 
-def run_command(command: List[str], message: str) -> bool:
+    splitters = {name: LineSplitter() for name in pipes}
+    with selectors.DefaultSelector() as selector:
+        for name, pipe in pipes.items():
+            selector.register(pipe, selectors.EVENT_READ, name)
+        while selector.get_map():
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            for key, _ in selector.select(remaining):
+                name = key.data
+                chunk = os.read(key.fd, STREAM_CHUNK_SIZE)
+                if chunk:
+                    lines = splitters[name].feed(chunk)
+                else:
+                    selector.unregister(key.fileobj)
+                    lines = splitters[name].flush()
+                if lines:
+                    on_lines(name, lines)
+    return True
+
+
+@dataclasses.dataclass
+class CommandResult:
+    """
+    Resultado de um comando externo com o motivo do término:
+    'exit' (código de saída), 'signal', 'timeout', 'cancelled',
+    'not_found', 'blocked' ou 'error'. É verdadeiro apenas em caso de sucesso.
+    """
+    command: List[str]
+    reason: str
+    returncode: Optional[int] = None
+    signal: Optional[str] = None
+    timeout: Optional[float] = None
+    duration_s: float = 0.0
+    error: Optional[str] = None
+
+    def __bool__(self) -> bool:
+        return self.reason == 'exit' and self.returncode == 0
+
+    def describe(self) -> str:
+        """Descreve o motivo do término em português."""
+        if self.reason == 'exit':
+            return "Comando concluído com sucesso." if self else f"Comando falhou com código {self.returncode}."
+        if self.reason == 'signal':
+            return f"Comando encerrado pelo sinal {self.signal}."
+        if self.reason == 'timeout':
+            return f"Comando excedeu o tempo limite de {self.timeout:.1f} s; o grupo de processos foi encerrado."
+        if self.reason == 'cancelled':
+            return "Comando cancelado; o grupo de processos foi encerrado."
+        if self.reason == 'not_found':
+            return f"Comando '{self.command[0]}' não encontrado. Verifique se está instalado e no PATH."
+        if self.reason == 'blocked':
+            return "Comando inválido: contém caracteres não permitidos."
+        return f"Erro ao executar o comando: {self.error}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Campos serializáveis em JSON."""
+        return {"success": bool(self), "exit_reason": self.reason, "returncode": self.returncode,
+                "signal": self.signal, "duration_s": round(self.duration_s, 3)}
+
+
+# Orçamento de tempo da ação corrente (por thread), ver command_budget()
+_budget = threading.local()
+
+@contextlib.contextmanager
+def command_budget(seconds: Optional[float]):
+    """
+    Limita o tempo total de todos os comandos executados dentro do bloco.
+    Cada comando recebe como tempo limite o menor entre o seu próprio, o
+    padrão da configuração e o que resta do orçamento.
+    """
+    previous = getattr(_budget, 'deadline', None)
+    deadline = previous
+    if seconds is not None:
+        deadline = time.monotonic() + seconds
+        if previous is not None:
+            deadline = min(previous, deadline)
+    _budget.deadline = deadline
+    try:
+        yield
+    finally:
+        _budget.deadline = previous
+
+def effective_timeout(timeout: Optional[float] = None) -> Optional[float]:
+    """Combina o tempo limite do comando, o padrão global e o orçamento restante."""
+    if timeout is None:
+        timeout = CONFIG['command_timeout']
+    deadline = getattr(_budget, 'deadline', None)
+    if deadline is not None:
+        remaining = max(0.0, deadline - time.monotonic())
+        timeout = remaining if timeout is None else min(timeout, remaining)
+    return timeout
+
+def kill_process_tree(process: subprocess.Popen, grace: Optional[float] = None) -> None:
+    """
+    Encerra o processo e todos os seus descendentes: SIGTERM ao grupo de
+    processos, espera `grace` segundos e então SIGKILL nos que restarem.
+    """
+    if grace is None:
+        grace = CONFIG['command_kill_grace']
+    if os.name == 'nt':
+        subprocess.run(['taskkill', '/F', '/T', '/PID', str(process.pid)],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+        return
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+    except ProcessLookupError:
+        return
+    try:
+        process.wait(timeout=grace)
+    except subprocess.TimeoutExpired:
+        pass
+    try:
+        os.killpg(process.pid, signal.SIGKILL)  # Descendentes que ignoraram o SIGTERM
+    except (ProcessLookupError, PermissionError):
+        pass
+
+class ProcessTracker:
+    """
+    Processos em execução de um conjunto de tarefas em threads (ex.: as
+    etapas do DAG), para que um cancelamento encerre todos de uma vez: o
+    Ctrl+C só chega à thread principal e os filhos estão em sessões próprias.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.processes: set = set()
+        self.cancelled = threading.Event()
+
+    def add(self, process: subprocess.Popen) -> bool:
+        """Registra o processo; False se o conjunto já foi cancelado (o chamador deve encerrá-lo)."""
+        with self.lock:
+            if self.cancelled.is_set():
+                return False
+            self.processes.add(process)
+            return True
+
+    def discard(self, process: subprocess.Popen) -> None:
+        with self.lock:
+            self.processes.discard(process)
+
+    def cancel(self) -> None:
+        """Impede novos processos e encerra as árvores dos que estão rodando."""
+        with self.lock:
+            self.cancelled.set()
+            processes = list(self.processes)
+        # SIGTERM a todos antes: a espera de cada kill_process_tree corre em paralelo, não em fila
+        if os.name != 'nt':
+            for process in processes:
+                with contextlib.suppress(OSError):
+                    os.killpg(process.pid, signal.SIGTERM)
+        for process in processes:
+            kill_process_tree(process)
+
+
+# Rastreador de processos da tarefa corrente (por thread), ver ProcessTracker
+_process_context = threading.local()
+
+def execute_process(command: List[str], on_lines: Callable[[str, List[str]], None],
+                    timeout: Optional[float] = None, stdin: Optional[int] = None) -> CommandResult:
+    """
+    Executa um comando em um novo grupo de processos, transmitindo a saída
+    para on_lines. Em tempo limite, o grupo inteiro é encerrado. Em caso de
+    interrupção (Ctrl+C, SIGTERM) os filhos são encerrados e a exceção é repassada.
+    """
+    timeout = effective_timeout(timeout)
+    start = time.monotonic()
+    # Grupo próprio: o cancelamento alcança netos (ex.: sudo -> apt -> dpkg)
+    group_kwargs = ({'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP} if os.name == 'nt'
+                    else {'start_new_session': True})
+    try:
+        process = subprocess.Popen(command, stdin=stdin, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                   **group_kwargs)
+    except FileNotFoundError:
+        return CommandResult(command, 'not_found')
+    tracker: Optional[ProcessTracker] = getattr(_process_context, 'tracker', None)
+    if tracker is not None and not tracker.add(process):
+        kill_process_tree(process)
+        process.wait()
+        return CommandResult(command, 'cancelled', duration_s=time.monotonic() - start)
+
+    try:
+        finished = stream_process(process, on_lines, timeout)
+        if finished:
+            remaining = None if timeout is None else max(0.0, timeout - (time.monotonic() - start))
+            try:
+                returncode = process.wait(timeout=remaining)
+            except subprocess.TimeoutExpired:
+                finished = False
+    except BaseException:
+        kill_process_tree(process)
+        process.wait()
+        raise
+    finally:
+        if tracker is not None:
+            tracker.discard(process)
+
+    if tracker is not None and tracker.cancelled.is_set():
+        return CommandResult(command, 'cancelled', returncode=process.returncode,
+                             duration_s=time.monotonic() - start)
+    if not finished:
+        kill_process_tree(process)
+        process.wait()
+        logging.error(f"Comando {' '.join(command)} excedeu o tempo limite de {timeout} s")
+        return CommandResult(command, 'timeout', returncode=process.returncode, timeout=timeout,
+                             duration_s=time.monotonic() - start)
+    if returncode < 0:
+        try:
+            signal_name = signal.Signals(-returncode).name
+        except ValueError:
+            signal_name = str(-returncode)
+        return CommandResult(command, 'signal', returncode=returncode, signal=signal_name,
+                             duration_s=time.monotonic() - start)
+    return CommandResult(command, 'exit', returncode=returncode, duration_s=time.monotonic() - start)
+
+def run_command(command: List[str], message: str, timeout: Optional[float] = None) -> CommandResult:
     """
-    Executa um comando de sistema com uma barra de progresso e captura o resultado.
-    Retorna True se bem-sucedido, False caso contrário.
+    Executa um comando de sistema exibindo a saída linha a linha, em tempo real,
+    enquanto uma barra de progresso indica atividade. Ctrl+C cancela apenas o
+    comando (e seus filhos). Retorna um CommandResult, verdadeiro se bem-sucedido.
     """
-    if any(';' in arg or '|' in arg or '&' in arg for arg in command):
+    if not is_safe_command(command):
         print_panel("Comando inválido: contém caracteres não permitidos.", "Erro", "error")
         logging.error(f"Comando bloqueado por segurança: {' '.join(command)}")
-        return False
+        return CommandResult(command, 'blocked')
 
     print_panel(message, "Executando Comando", "info")
     try:
-        with Progress(
-            TextColumn("[progress.description]{task.description}"),
-            BarColumn(),
-            TimeRemainingColumn(),
+        with rich_progress.Progress(
+            rich_progress.TextColumn("[progress.description]{task.description}"),
+            rich_progress.BarColumn(),
+            rich_progress.TimeElapsedColumn(),
             transient=True,
-            console=console
+            console=get_console()
         ) as progress:
             task = progress.add_task("[highlight]Processando...", total=None)
-            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            
-            while process.poll() is None:
-                time.sleep(0.1)
-                progress.update(task, advance=1)
+            captures = {'stdout': make_capture(command, 'stdout'), 'stderr': make_capture(command, 'stderr')}
+            line_count = 0
 
-            stdout, stderr = process.communicate()
-            
-            if process.returncode != 0:
-                error_msg = f"Comando falhou com código {process.returncode}.\n[error]Erro:[/error]\n{stderr}"
-                print_panel(error_msg, "Erro", "error")
-                logging.error(f"Comando {' '.join(command)} falhou: {stderr.strip()}")
-                return False
-            
-            if stdout:
-                console.print(f"[success]Saída:[/success]\n{stdout}")
+            def on_lines(stream: str, lines: List[str]) -> None:
+                nonlocal line_count
+                line_count += len(lines)
+                captures[stream].add_lines(lines)
+                # Um único print por leitura mantém o custo de renderização baixo em saídas volumosas
+                if stream == 'stderr':
+                    progress.console.print("\n".join(lines), style="warning", markup=False, highlight=False, soft_wrap=True)
+                else:
+                    progress.console.print("\n".join(lines), markup=False, highlight=False, soft_wrap=True)
+                progress.update(task, description=f"[highlight]Processando... ({line_count} linhas)")
 
-        return True
+            started = time.monotonic()
+            try:
+                result = execute_process(command, on_lines, timeout)
+            except KeyboardInterrupt:
+                result = CommandResult(command, 'cancelled', duration_s=time.monotonic() - started)
+            finally:
+                for capture in captures.values():
+                    capture.close()
+
+        spilled = [c.spill_path for c in captures.values() if c.spill_path]
+        if spilled:
+            console.print(f"[info]Saída completa salva em:[/info] {', '.join(spilled)}")
+
+        if not result:
+            stderr = "\n".join(captures['stderr'].lines()[-STDERR_TAIL_LINES:])
+            error_msg = result.describe()
+            if stderr:
+                error_msg += f"\n[error]Erro:[/error]\n{rich_markup_escape(stderr)}"
+            print_panel(error_msg, "Erro", "error")
+            logging.error(f"Comando {' '.join(command)} falhou ({result.reason}): {stderr.strip()}")
+        return result
 
-    except FileNotFoundError:
-        error_msg = f"Comando '{command[0]}' não encontrado. Verifique se está instalado e no PATH."
-        print_panel(error_msg, "Erro", "error")
-        logging.error(error_msg)
-        return False
     except Exception as e:
         print_panel(str(e), "Erro Inesperado", "error")
         logging.error(f"Erro ao executar comando {' '.join(command)}: {e}")
-        return False
+        return CommandResult(command, 'error', error=str(e))
+
+def run_capture(command: List[str], timeout: Optional[float] = None,
+                line_filter: Optional[Callable[[str, List[str]], List[str]]] = None) -> Dict[str, Any]:
+    """
+    Executa um comando sem nenhuma interface (modo não interativo) e retorna
+    um dicionário serializável com o motivo do término, stdout e stderr.
+    A saída é capturada com limite de memória (início + fim, ver OutputCapture);
+    as linhas descartadas são contabilizadas em "capture". `line_filter(stream, linhas)`
+    pode consumir linhas à medida que chegam, retornando as que devem ser capturadas.
+    """
+    result = {"command": command, "stdout": "", "stderr": ""}
+    if not is_safe_command(command):
+        outcome = CommandResult(command, 'blocked')
+        logging.error(f"Comando bloqueado por segurança: {' '.join(command)}")
+        result.update(outcome.to_dict(), stderr=outcome.describe())
+        return result
+
+    captures = {'stdout': make_capture(command, 'stdout'), 'stderr': make_capture(command, 'stderr')}
+
+    def on_lines(stream: str, lines: List[str]) -> None:
+        captures[stream].add_lines(line_filter(stream, lines) if line_filter else lines)
+    try:
+        outcome = execute_process(command, on_lines, timeout, stdin=subprocess.DEVNULL)
+    finally:
+        for capture in captures.values():
+            capture.close()
+
+    result.update(outcome.to_dict(), stdout=captures['stdout'].text(), stderr=captures['stderr'].text(),
+                  capture={name: capture.stats() for name, capture in captures.items()})
+    if not outcome:
+        if outcome.reason != 'exit':
+            result["stderr"] += outcome.describe() + "\n"
+        logging.error(f"Comando {' '.join(command)} falhou ({outcome.reason}): {result['stderr'].strip()[-500:]}")
+    return result
+
+def format_bytes(num: float) -> str:
+    """Formata um número de bytes em unidade legível (B, KB, MB, GB, TB)."""
+    for unit in ('B', 'KB', 'MB', 'GB', 'TB'):
+        if abs(num) < 1024 or unit == 'TB':
+            break
+        num /= 1024
+    return f"{num:.0f} {unit}" if unit == 'B' else f"{num:.2f} {unit}"
+
+def format_bytes_compact(num: float) -> str:
+    """Como format_bytes, mas com 3 algarismos significativos (ex.: 591 MB, 5.29 GB), para colunas estreitas."""
+    for unit in ('B', 'KB', 'MB', 'GB', 'TB'):
+        if abs(num) < 1000 or unit == 'TB':
+            break
+        num /= 1024
+    return f"{num:.3g} {unit}" if abs(num) < 1000 else f"{num:.0f} {unit}"
+
+def parse_size(text: str) -> int:
+    """Converte um tamanho como "500", "10K", "1.5G" ou "2GB" (base 1024) em bytes."""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMGT]?)B?\s*', text, re.IGNORECASE)
+    if not match:
+        raise ValueError(f"Tamanho inválido: {text!r}")
+    return int(float(match.group(1)) * 1024 ** ' KMGT'.index(match.group(2).upper() or ' '))
 
 def slugify(text: str) -> str:
     """Converte um texto em um formato seguro para nome de arquivo (slug)."""
@@ -170,17 +825,29 @@ def slugify(text: str) -> str:
     return text[:100]  # Limita o tamanho para evitar nomes de arquivo muito longos
 
 def validate_ip(ip: str) -> bool:
-    """Valida se uma string é um endereço IP válido."""
+    """Valida se uma string é um endereço IP (v4 ou v6) válido."""
     try:
-        socket.inet_aton(ip)
+        ipaddress.ip_address(ip)
         return True
-    except socket.error:
+    except ValueError:
         return False
 
+DOMAIN_LABEL_RE = re.compile(r'^(?!-)[A-Za-z0-9-]{1,63}(?<!-)$')
+DOMAIN_TLD_RE = re.compile(r'^([A-Za-z]{2,63}|xn--[A-Za-z0-9-]{1,59})$')
+
 def validate_domain(domain: str) -> bool:
-    """Valida se uma string é um domínio válido."""
-    pattern = r'^[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return bool(re.match(pattern, domain))
+    """
+    Valida se uma string é um domínio válido: rótulos de 1 a 63 caracteres sem
+    hífen nas pontas, até 253 no total e TLD alfabético (nomes IDN são aceitos).
+    """
+    try:
+        name = domain[:-1] if domain.endswith('.') else domain
+        name = name.encode('idna').decode('ascii')
+    except UnicodeError:
+        return False
+    labels = name.split('.')
+    return (len(name) <= 253 and len(labels) > 1 and all(DOMAIN_LABEL_RE.match(label) for label in labels)
+            and bool(DOMAIN_TLD_RE.match(labels[-1])))
 
 def check_directory_writable(path: str) -> bool:
     """Verifica se o diretório é gravável."""
@@ -195,378 +862,6383 @@ def check_directory_writable(path: str) -> bool:
         logging.error(f"Erro ao verificar diretório {path}: {e}")
         return False
 
-# --- Funções de Cache ---
+_http_session = None
+_http_session_lock = threading.Lock()
 
-def load_ip_cache() -> Dict[str, Any]:
-    """Carrega o cache de geolocalização de IPs."""
-    try:
-        with open(IP_CACHE_FILE, 'r') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return {}
+def get_http_session():
+    """
+    Retorna uma sessão HTTP compartilhada (keep-alive), criada no primeiro uso.
+    No daemon, a sessão permanece aquecida entre as requisições.
+    """
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            _http_session = requests.Session()
+            _http_session.headers['User-Agent'] = f"PyTools/{SCRIPT_VERSION}"
+            # Uma conexão keep-alive por thread das consultas concorrentes
+            adapter = requests.adapters.HTTPAdapter(pool_maxsize=max(10, CONFIG['geo_concurrency']))
+            _http_session.mount('https://', adapter)
+            _http_session.mount('http://', adapter)
+        return _http_session
+
+class SingleFlight:
+    """
+    Agrupa chamadas simultâneas com a mesma chave: a primeira executa a
+    função e as demais esperam e recebem o mesmo resultado (ou exceção).
+    """
 
-def save_ip_cache(cache: Dict[str, Any]) -> None:
-    """Salva o cache de geolocalização de IPs."""
-    with open(IP_CACHE_FILE, 'w') as f:
-        json.dump(cache, f, indent=2)
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Any] = {}
+        self.shared = 0  # Chamadas atendidas por uma execução já em andamento
 
-# --- Funcionalidades do Menu ---
+    def do(self, key: str, func: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Retorna (resultado, compartilhado)."""
+        from concurrent.futures import Future
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+            else:
+                self.shared += 1
+        if not leader:
+            return future.result(), True
+        try:
+            result = func()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                del self._calls[key]
 
-def update_system() -> None:
-    """Atualiza os pacotes do sistema (APT ou PKG)."""
-    clear_console()
-    console.print("[warning]Iniciando atualização do sistema...[/warning]")
-    
-    is_termux = 'com.termux' in os.environ.get('PREFIX', '')
-    
-    if is_termux:
-        commands = [
-            (['pkg', 'update', '-y'], "Atualizando listas de pacotes..."),
-            (['pkg', 'upgrade', '-y'], "Atualizando pacotes instalados..."),
-        ]
-    else:
-        if os.name != 'nt' and os.geteuid() != 0:
-            print_panel("Este comando requer privilégios de administrador. Execute com sudo.", "Erro", "error")
+class RateLimiter:
+    """Limitador de taxa (balde de fichas) compartilhado entre threads. rate=0 desativa o limite."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None) -> None:
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Bloqueia até haver uma ficha disponível."""
+        if not self.rate:
             return
-        commands = [
-            (['sudo', 'apt', 'update', '-y'], "Atualizando listas de pacotes..."),
-            (['sudo', 'apt', 'upgrade', '-y'], "Atualizando pacotes instalados..."),
-            (['sudo', 'apt', 'autoremove', '-y'], "Removendo pacotes não utilizados..."),
-            (['sudo', 'apt', 'autoclean', '-y'], "Limpando cache de pacotes..."),
-        ]
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
 
-    all_successful = all(run_command(cmd, msg) for cmd, msg in commands)
-    
-    if all_successful:
-        print_panel("O sistema foi atualizado com sucesso!", "Concluído", "success")
-    else:
-        print_panel("A atualização do sistema encontrou erros.", "Falha", "error")
-    input("\nPressione Enter para continuar...")
+# --- Funções de Cache ---
 
-def ping_host() -> None:
-    """Pinga um host (website ou IP) e exibe o resultado."""
-    clear_console()
-    host = console.input("[info]Digite o website ou IP para pingar: [/info]").strip()
-    if not host:
-        console.print("[error]Nenhum host fornecido.[/error]")
-        return
-    if not (validate_ip(host) or validate_domain(host)):
-        console.print("[error]Host inválido. Insira um IP ou domínio válido.[/error]")
-        return
-        
-    console.print(f"\n[warning]Pingando {host}...[/warning]")
-    run_command(['ping', '-c', '4', host], f"Pingando {host}")
-    input("\nPressione Enter para continuar...")
+class IPCache:
+    """
+    Cache de geolocalização em SQLite (modo WAL): consultas indexadas por IP,
+    validade por entrada e descarte das entradas menos usadas (LRU) acima de
+    `max_entries`. Vários processos podem ler e escrever ao mesmo tempo; cada
+    escrita é uma transação atômica. Cada thread usa a própria conexão.
+    Também guarda as respostas DNS (tabela dns_cache), com a validade do TTL.
+    """
 
-def geolocate_ip() -> None:
-    """Busca informações de geolocalização de um endereço IP."""
-    clear_console()
-    ip = console.input("[info]Digite o IP para geolocalizar: [/info]").strip()
-    if not validate_ip(ip):
-        console.print("[error]IP inválido. Insira um endereço IP válido.[/error]")
-        return
+    # Granularidade (s) da atualização do último acesso, para não gravar a cada leitura
+    TOUCH_INTERVAL = 60
+    # Intervalo máximo (s) entre passagens de descarte; entre elas só a estimativa de linhas é atualizada
+    EVICT_INTERVAL = 300
+    # Fração de `max_entries` liberada a cada descarte por excesso, para que não ocorra a cada escrita
+    EVICT_SLACK = 0.1
 
-    ip_cache = load_ip_cache()
-    if ip in ip_cache:
-        data = ip_cache[ip]
-        table = Table(title=f"Geolocalização para [bold]{ip}[/bold] (Cache)", show_header=False)
-    else:
+    def __init__(self, path: str, ttl: Optional[float], max_entries: int,
+                 legacy_json: Optional[str] = None) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.legacy_json = legacy_json
+        self._local = threading.local()
+        # Estimativa do número de linhas por tabela e instante da última passagem de descarte
+        self._counts: Dict[str, int] = {}
+        self._evicted: Dict[str, float] = {}
+        self._counts_lock = threading.Lock()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS ip_cache (
+                                ip TEXT PRIMARY KEY, data TEXT NOT NULL, created REAL NOT NULL,
+                                expires REAL, accessed REAL NOT NULL) WITHOUT ROWID""")
+            conn.execute("CREATE INDEX IF NOT EXISTS ip_cache_accessed ON ip_cache (accessed)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ip_cache_expires ON ip_cache (expires)")
+            conn.execute("""CREATE TABLE IF NOT EXISTS ip_prefix_cache (
+                                prefix TEXT PRIMARY KEY, network TEXT NOT NULL, plen INTEGER NOT NULL,
+                                data TEXT NOT NULL, created REAL NOT NULL, expires REAL,
+                                accessed REAL NOT NULL) WITHOUT ROWID""")
+            conn.execute("CREATE INDEX IF NOT EXISTS ip_prefix_cache_accessed ON ip_prefix_cache (accessed)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ip_prefix_cache_expires ON ip_prefix_cache (expires)")
+            conn.execute("""CREATE TABLE IF NOT EXISTS dns_cache (
+                                key TEXT PRIMARY KEY, data TEXT NOT NULL, created REAL NOT NULL,
+                                expires REAL NOT NULL, accessed REAL NOT NULL) WITHOUT ROWID""")
+            conn.execute("CREATE INDEX IF NOT EXISTS dns_cache_accessed ON dns_cache (accessed)")
+            conn.execute("CREATE INDEX IF NOT EXISTS dns_cache_expires ON dns_cache (expires)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            self._local.conn = conn
+            self._migrate(conn)
+        return conn
+
+    def _migrate(self, conn) -> None:
+        """Importa o antigo ip_cache.json uma única vez (o arquivo é mantido intacto)."""
+        if not self.legacy_json or not os.path.exists(self.legacy_json):
+            return
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'migrated_json'").fetchone():
+            return
         try:
-            response = requests.get(f"https://ipinfo.io/{ip}/json")
-            response.raise_for_status()
-            data = response.json()
-            ip_cache[ip] = data
-            save_ip_cache(ip_cache)
-            table = alltid(title=f"Geolocalização para [bold]{ip}[/bold]", show_header=False)
-        except requests.RequestException as e:
-            print_panel(f"Erro ao contatar o serviço de geolocalização: {e}", "Erro de Rede", "error")
-            logging.error(f"Erro de geolocalização para o IP {ip}: {e}")
+            with open(self.legacy_json, 'r') as f:
+                legacy = json.load(f)
+            created = os.stat(self.legacy_json).st_mtime
+        except (OSError, ValueError) as e:
+            logging.error(f"Não foi possível migrar {self.legacy_json}: {e}")
             return
+        now = time.time()
+        expires = now + self.ttl if self.ttl else None
+        with self._transaction(conn):
+            # Outro processo pode ter migrado enquanto esperávamos pelo bloqueio
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'migrated_json'").fetchone():
+                return
+            conn.executemany("INSERT OR IGNORE INTO ip_cache VALUES (?, ?, ?, ?, ?)",
+                             [(ip, json.dumps(data), created, expires, created)
+                              for ip, data in legacy.items() if isinstance(data, dict)])
+            conn.execute("INSERT INTO meta VALUES ('migrated_json', ?)", (str(now),))
+            self._evict(conn, now, len(legacy))
+        logging.info(f"{len(legacy)} entradas migradas de {self.legacy_json} para {self.path}")
 
-    table.add_column("Campo", style="warning")
-    table.add_column("Valor")
-    for key, value in data.items():
-        table.add_row(key.capitalize(), str(value))
-    
-    console.print(table)
-    logging.info(f"Geolocalização bem-sucedida para o IP: {ip}")
-    input("\nPressione Enter para continuar...")
+    @contextlib.contextmanager
+    def _transaction(self, conn):
+        # IMMEDIATE reserva a escrita no início, evitando impasses entre processos
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
 
-def show_disk_usage() -> None:
-    """Exibe o uso de disco do sistema em uma tabela."""
-    clear_console()
-    try:
-        result = subprocess.run(['df', '-h'], capture_output=True, text=True, check=True)
-        lines = result.stdout.strip().split('\n')
-        
-        table = Table(title="Uso de Disco", header_style="header")
-        headers = lines[0].split()
-        for header in headers:
-            table.add_column(header, style="highlight")
-            
-        for line in lines[1:]:
-            table.add_row(*line.split())
-            
-        console.print(table)
-    except (subprocess.CalledProcessError, FileNotFoundError) as e:
-        print_panel(f"Não foi possível obter o uso de disco: {e}", "Erro", "error")
-    input("\nPressione Enter para continuar...")
+    def _evict(self, conn, now: float, added: int, table: str = 'ip_cache', key: str = 'ip') -> None:
+        """
+        Descarta expiradas e as menos usadas acima de `max_entries`. A contagem
+        real (COUNT(*)) só é feita quando a estimativa local passa do limite ou
+        a cada EVICT_INTERVAL, o que também corrige as escritas de outros
+        processos; o excesso é descartado em lote, com folga de EVICT_SLACK.
+        """
+        with self._counts_lock:
+            estimate = self._counts.get(table)
+            if (estimate is not None and estimate + added <= self.max_entries
+                    and now - self._evicted.get(table, 0) < self.EVICT_INTERVAL):
+                self._counts[table] = estimate + added
+                return
+        conn.execute(f"DELETE FROM {table} WHERE expires <= ?", (now,))
+        count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        if count > self.max_entries:
+            excess = count - int(self.max_entries * (1 - self.EVICT_SLACK))
+            count -= conn.execute(f"DELETE FROM {table} WHERE {key} IN "
+                                  f"(SELECT {key} FROM {table} ORDER BY accessed LIMIT ?)", (excess,)).rowcount
+        with self._counts_lock:
+            self._counts[table] = count
+            self._evicted[table] = now
 
-def show_memory_usage() -> None:
-    """Exibe o uso de memória e swap do sistema."""
-    clear_console()
-    try:
-        mem = psutil.virtual_memory()
-        swap = psutil.swap_memory()
-        
-        table = Table(title="Uso de Memória e Swap", header_style="header")
-        table.add_column("Tipo", style="highlight")
-        table.add_column("Total")
-        table.add_column("Usado")
-        table.add_column("Livre")
-        table.add_column("Percentual", style="warning")
-        
-        table.add_row("Memória", f"{mem.total / (1024**3):.2f} GB", f"{mem.used / (1024**3):.2f} GB",
-                      f"{mem.available / (1024**3):.2f} GB", f"{mem.percent}%", style="cyan")
-        table.add_row("Swap", f"{swap.total / (1024**3):.2f} GB", f"{swap.used / (1024**3):.2f} GB",
-                      f"{swap.free / (1024**3):.2f} GB", f"{swap.percent}%", style="yellow")
-        
-        console.print(table)
-    except Exception as e:
-        print_panel(f"Não foi possível obter o uso de memória: {e}", "Erro", "error")
-    input("\nPressione Enter para continuar...")
+    def get(self, ip: str) -> Optional[Dict[str, Any]]:
+        """Retorna os dados em cache do IP, ou None se ausentes ou expirados."""
+        conn = self._connect()
+        row = conn.execute("SELECT data, expires, accessed FROM ip_cache WHERE ip = ?", (ip,)).fetchone()
+        if row is None:
+            return None
+        data, expires, accessed = row
+        now = time.time()
+        if expires is not None and expires <= now:
+            return None
+        if now - accessed > self.TOUCH_INTERVAL:
+            conn.execute("UPDATE ip_cache SET accessed = ? WHERE ip = ?", (now, ip))
+        return json.loads(data)
 
-def _download_stream(stream, title: str, path: str, p_bar: Progress) -> None:
-    """Função auxiliar para baixar um stream do YouTube com barra de progresso."""
-    task = p_bar.add_task(f"[info]Baixando '{title}'...", total=stream.filesize)
-    
-    def on_progress(stream, chunk, bytes_remaining):
-        p_bar.update(task, completed=stream.filesize - bytes_remaining)
-    
-    try:
-        yt = stream._monostate
-        yt.register_on_progress_callback(on_progress)
-        temp_path = path + ".temp"
-        stream.download(output_path=os.path.dirname(path), filename=os.path.basename(temp_path))
-        if path.endswith('.mp3'):
-            if not run_command(['ffmpeg', '-i', temp_path, '-vn', '-acodec', 'mp3', path], "Convertendo para MP3..."):
-                raise RuntimeError("Falha na conversão para MP3")
-            os.remove(temp_path)
-        else:
-            os.rename(temp_path, path)
-        p_bar.update(task, completed=stream.filesize)
-    except Exception as e:
-        logging.error(f"Falha no download de '{title}': {e}")
-        p_bar.print(f"[error]Erro ao baixar '{title}': {e}[/error]")
+    def put(self, ip: str, data: Dict[str, Any], ttl: Optional[float] = None) -> None:
+        """Grava os dados do IP com validade `ttl` (padrão: a do cache) e aplica o limite de entradas."""
+        conn = self._connect()
+        now = time.time()
+        ttl = self.ttl if ttl is None else ttl
+        with self._transaction(conn):
+            conn.execute("INSERT OR REPLACE INTO ip_cache VALUES (?, ?, ?, ?, ?)",
+                         (ip, json.dumps(data), now, now + ttl if ttl else None, now))
+            self._evict(conn, now, 1)
 
-def handle_youtube_download() -> None:
-    """Gerencia o download de vídeos ou áudios do YouTube."""
-    clear_console()
-    if not (check_directory_writable(VIDEO_DOWNLOAD_DIR) and check_directory_writable(AUDIO_DOWNLOAD_DIR)):
-        print_panel("Erro: Diretórios de download não são graváveis.", "Erro", "error")
-        return
+    @staticmethod
+    def _prefix_keys(address) -> List[str]:
+        """Chaves de todos os prefixos que contêm o endereço, do mais longo ao mais curto."""
+        bits = address.max_prefixlen
+        value = int(address)
+        return [f"{address.version}:{value >> (bits - plen) << (bits - plen):x}/{plen}"
+                for plen in range(bits, -1, -1)]
 
-    url = console.input("[info]Insira a URL do vídeo ou playlist do YouTube: [/info]").strip()
-    if not url:
-        return
+    def get_prefix(self, ip: str) -> Optional[Dict[str, Any]]:
+        """
+        Busca o maior prefixo em cache que contém o IP (uma consulta indexada
+        com as chaves de todos os comprimentos). Os dados voltam com o IP
+        consultado e o prefixo usado ("prefix"), sem o hostname do IP original.
+        """
+        conn = self._connect()
+        keys = self._prefix_keys(ipaddress.ip_address(ip))
+        now = time.time()
+        rows = conn.execute(f"SELECT prefix, network, data, expires, accessed FROM ip_prefix_cache "
+                            f"WHERE prefix IN ({','.join('?' * len(keys))}) ORDER BY plen DESC", keys).fetchall()
+        for prefix, network, data, expires, accessed in rows:
+            if expires is not None and expires <= now:
+                continue
+            if now - accessed > self.TOUCH_INTERVAL:
+                conn.execute("UPDATE ip_prefix_cache SET accessed = ? WHERE prefix = ?", (now, prefix))
+            data = json.loads(data)
+            data.pop("hostname", None)
+            data.update(ip=ip, prefix=network)
+            return data
+        return None
 
-    try:
-        if 'playlist' in url:
-            playlist = Playlist(url)
-            console.print(f"[warning]Playlist encontrada:[/] [bold]{playlist.title}[/]")
-            urls = playlist.video_urls
-        else:
-            urls = [url]
-            
-        choice = console.input("[bold]O que deseja baixar? (1) [success]Vídeo[/success] (2) [header]Áudio (MP3)[/header]: [/bold]").strip()
-        if choice not in ('1', '2'):
-            console.print("[error]Opção inválida.[/error]")
-            return
+    def put_prefix(self, network, data: Dict[str, Any], ttl: Optional[float] = None) -> None:
+        """Grava os dados para toda a rede (ipaddress.ip_network) e aplica o limite de entradas."""
+        conn = self._connect()
+        now = time.time()
+        ttl = self.ttl if ttl is None else ttl
+        key = self._prefix_keys(network.network_address)[network.max_prefixlen - network.prefixlen]
+        with self._transaction(conn):
+            conn.execute("INSERT OR REPLACE INTO ip_prefix_cache VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         (key, str(network), network.prefixlen, json.dumps(data), now,
+                          now + ttl if ttl else None, now))
+            self._evict(conn, now, 1, 'ip_prefix_cache', 'prefix')
 
-        with Progress(
-            TextColumn("[progress.description]{task.description}"),
-            BarColumn(),
-            "[progress.percentage]{task.percentage:>3.0f}%",
-            TimeRemainingColumn(),
-            console=console
-        ) as progress:
-            with ThreadPoolExecutor(max_workers=MAX_DOWNLOAD_THREADS) as executor:
-                futures = []
-                for video_url in urls:
-                    yt = YouTube(video_url)
-                    safe_title = slugify(yt.title)
-                    stream = (yt.streams.filter(progressive=True, file_extension='mp4').get_highest_resolution()
-                              if choice == '1' else
-                              yt.streams.filter(only_audio=True).first())
-                    path = os.path.join(VIDEO_DOWNLOAD_DIR if choice == '1' else AUDIO_DOWNLOAD_DIR,
-                                        f"{safe_title}.{'mp4' if choice == '1' else 'mp3'}")
-                    futures.append(executor.submit(_download_stream, stream, yt.title, path, progress))
-                for future in futures:
-                    future.result()
+    def get_dns(self, key: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        """Retorna (resposta DNS, expiração) da chave "TIPO:nome", ou None se ausente ou expirada."""
+        conn = self._connect()
+        row = conn.execute("SELECT data, expires FROM dns_cache WHERE key = ? AND expires > ?",
+                           (key, time.time())).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
 
-        print_panel("Downloads concluídos!", "Sucesso", "success")
-    except PytubeError as e:
-        print_panel(f"Erro do Pytube: {e}", "Erro", "error")
-    except Exception as e:
-        print_panel(f"Ocorreu um erro inesperado: {e}", "Erro", "error")
+    def put_dns_many(self, entries: List[Tuple[str, Dict[str, Any], float]]) -> None:
+        """Grava respostas DNS [(chave, dados, expiração)] em uma única transação."""
+        conn = self._connect()
+        now = time.time()
+        with self._transaction(conn):
+            conn.executemany("INSERT OR REPLACE INTO dns_cache VALUES (?, ?, ?, ?, ?)",
+                             [(key, json.dumps(data), now, expires, now) for key, data, expires in entries])
+            self._evict(conn, now, len(entries), 'dns_cache', 'key')
 
-    input("\nPressione Enter para continuar...")
+    def stats(self) -> Dict[str, Any]:
+        """Número de entradas (válidas e expiradas) e tamanho do banco."""
+        conn = self._connect()
+        now = time.time()
+        total, expired = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(expires IS NOT NULL AND expires <= ?), 0) FROM ip_cache",
+            (now,)).fetchone()
+        prefixes = conn.execute("SELECT COUNT(*) FROM ip_prefix_cache").fetchone()[0]
+        size = sum(os.path.getsize(path) for path in (self.path, self.path + '-wal') if os.path.exists(path))
+        return {"path": self.path, "entries": total, "expired": expired, "prefix_entries": prefixes, "bytes": size,
+                "max_entries": self.max_entries, "ttl_s": self.ttl}
 
-def temporary_email() -> None:
-    """Gera um e-mail temporário e verifica a caixa de entrada."""
-    clear_console()
-    console.print("[warning]Aviso: E-mails temporários são públicos e não devem ser usados para dados sensíveis.[/warning]")
-    try:
-        api_url = "https://www.1secmail.com/api/v1/"
-        response = requests.get(f"{api_url}?action=genRandomMailbox&count=1")
-        response.raise_for_status()
-        email = response.json()[0]
-        login, domain = email.split('@')
+_ip_cache: Optional[IPCache] = None
+_ip_cache_lock = threading.Lock()
+
+def get_ip_cache() -> IPCache:
+    """Retorna o cache de geolocalização compartilhado, criado no primeiro uso."""
+    global _ip_cache
+    with _ip_cache_lock:
+        if _ip_cache is None:
+            _ip_cache = IPCache(CONFIG['ip_cache_db'], CONFIG['ip_cache_ttl'], CONFIG['ip_cache_max_entries'],
+                                legacy_json=IP_CACHE_FILE)
+        return _ip_cache
+
+# --- Resolução DNS ---
+
+DNS_TYPES = {'A': 1, 'AAAA': 28}
+DNS_FAMILIES = {'A': socket.AF_INET, 'AAAA': socket.AF_INET6}
+
+
+class DNSLookupError(OSError):
+    """O nome não pôde ser resolvido (NXDOMAIN, sem registros ou falha dos servidores)."""
+
+
+def read_resolv_conf() -> List[str]:
+    """Servidores DNS do /etc/resolv.conf (ou do $PREFIX/etc/resolv.conf no Termux)."""
+    path = os.path.join(os.environ['PREFIX'], 'etc', 'resolv.conf') if IS_TERMUX else '/etc/resolv.conf'
+    servers = []
+    try:
+        with open(path, 'r') as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 2 and fields[0] == 'nameserver':
+                    servers.append(fields[1])
+    except OSError:
+        pass
+    return servers
+
+def _dns_server_address(server: str) -> Tuple[str, int]:
+    """Converte "ip", "ip:porta" ou "[ipv6]:porta" em (ip, porta)."""
+    if server.startswith('['):
+        host, _, port = server[1:].partition(']:')
+        return host.rstrip(']'), int(port or 53)
+    if server.count(':') == 1:
+        host, port = server.split(':')
+        return host, int(port)
+    return server, 53
+
+def hosts_file_path() -> str:
+    """Caminho do arquivo hosts do sistema."""
+    return (os.path.join(os.environ.get('SystemRoot', r'C:\Windows'), 'System32', 'drivers', 'etc', 'hosts')
+            if platform.system() == 'Windows' else '/etc/hosts')
+
+def read_hosts_file() -> Dict[Tuple[str, str], List[str]]:
+    """
+    Entradas do arquivo hosts do sistema, indexadas por (tipo, nome). A
+    leitura é reaproveitada enquanto o arquivo tiver o mesmo mtime, para que
+    um processo longo (o daemon) veja as edições.
+    """
+    path = hosts_file_path()
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        mtime = None
+    return _parse_hosts_file(path, mtime)
+
+@functools.lru_cache(maxsize=1)
+def _parse_hosts_file(path: str, mtime: Optional[int]) -> Dict[Tuple[str, str], List[str]]:
+    """Lê o arquivo hosts; `mtime` só participa da chave do cache."""
+    entries: Dict[Tuple[str, str], List[str]] = {}
+    try:
+        with open(path, 'r', errors='replace') as f:
+            for line in f:
+                fields = line.split('#', 1)[0].split()
+                if len(fields) < 2 or not validate_ip(fields[0]):
+                    continue
+                kind = 'AAAA' if ':' in fields[0] else 'A'
+                for name in fields[1:]:
+                    entries.setdefault((kind, name.lower().rstrip('.')), []).append(fields[0])
+    except OSError:
+        pass
+    return entries
+
+def dns_question(name: str, rrtype: str) -> bytes:
+    """Seção de pergunta (nome, tipo, classe IN) de uma consulta, em formato de rede."""
+    qname = b''.join(bytes([len(label)]) + label for label in name.encode('idna').split(b'.')) + b'\0'
+    return qname + struct.pack('!HH', DNS_TYPES[rrtype], 1)
+
+def build_dns_query(qid: int, name: str, rrtype: str) -> bytes:
+    """Monta uma consulta recursiva (RD) com EDNS0, para respostas UDP de até 1232 bytes."""
+    opt = b'\0' + struct.pack('!HHIH', 41, 1232, 0, 0)
+    return struct.pack('!HHHHHH', qid, 0x0100, 1, 0, 0, 1) + dns_question(name, rrtype) + opt
+
+def dns_reply_matches(data: bytes, qid: int, question: bytes) -> bool:
+    """
+    Confere se a mensagem é a resposta à consulta: mesmo ID, bit QR, uma única
+    pergunta e nome/tipo/classe ecoados (o nome sem distinção de caixa).
+    """
+    if len(data) < 12 + len(question):
+        return False
+    rid, flags, questions = struct.unpack_from('!HHH', data)
+    return (rid == qid and flags & 0x8000 and questions == 1
+            and data[12:12 + len(question)].lower() == question.lower())
+
+def _skip_dns_name(data: bytes, offset: int) -> int:
+    """Posição logo após um nome (com ou sem compressão) de uma mensagem DNS."""
+    while True:
+        length = data[offset]
+        if length & 0xc0 == 0xc0:
+            return offset + 2
+        offset += length + 1
+        if not length:
+            return offset
+
+def parse_dns_response(data: bytes, rrtype: str) -> Dict[str, Any]:
+    """
+    Interpreta uma resposta DNS: rcode, truncamento, endereços do tipo pedido
+    (seguindo a cadeia de CNAMEs da seção de respostas), o menor TTL da cadeia e,
+    nas respostas negativas, o TTL do SOA da seção de autoridade (RFC 2308).
+    """
+    qid, flags, questions, answers, authority, _ = struct.unpack_from('!HHHHHH', data)
+    offset = 12
+    for _ in range(questions):
+        offset = _skip_dns_name(data, offset) + 4
+    addresses, ttls, negative_ttl = [], [], None
+    for section, count in (('answer', answers), ('authority', authority)):
+        for _ in range(count):
+            offset = _skip_dns_name(data, offset)
+            kind, _, ttl, length = struct.unpack_from('!HHIH', data, offset)
+            offset += 10
+            rdata = data[offset:offset + length]
+            offset += length
+            if section == 'answer' and kind == DNS_TYPES[rrtype] and length in (4, 16):
+                addresses.append(socket.inet_ntop(DNS_FAMILIES[rrtype], rdata))
+                ttls.append(ttl)
+            elif section == 'answer' and kind == 5:  # CNAME: a cadeia expira com o elo mais curto
+                ttls.append(ttl)
+            elif section == 'authority' and kind == 6 and length >= 20:
+                negative_ttl = min(ttl, struct.unpack('!I', rdata[-4:])[0])
+    return {"id": qid, "rcode": flags & 0x0f, "truncated": bool(flags & 0x0200), "addresses": addresses,
+            "ttl": min(ttls) if ttls else None, "negative_ttl": negative_ttl}
+
+# Respostas em memória: (tipo, nome) -> (expiração, resposta); compartilhadas pelas consultas do processo
+_dns_memory: Dict[Tuple[str, str], Tuple[float, Dict[str, Any]]] = {}
+_dns_memory_lock = threading.Lock()
+DNS_MEMORY_MAX = 50000
+
+def dns_cache_get(name: str, rrtype: str, disk: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    Resposta em cache com o TTL restante, ou None: primeiro a memória e,
+    com `disk`, o SQLite (que bloqueia: no loop asyncio, use disk=False e
+    consulte o disco em uma thread).
+    """
+    now = time.time()
+    with _dns_memory_lock:
+        entry = _dns_memory.get((rrtype, name))
+    if entry is None and disk and CONFIG['dns_disk_cache']:
+        stored = _dns_disk_get(f"{rrtype}:{name}")
+        if stored:
+            entry = (stored[1], stored[0])
+            with _dns_memory_lock:
+                _dns_memory[(rrtype, name)] = entry
+    if entry is None or entry[0] <= now:
+        return None
+    return {**entry[1], "ttl": int(entry[0] - now), "source": 'cache'}
+
+def _dns_disk_get(key: str) -> Optional[Tuple[Dict[str, Any], float]]:
+    """Lê uma resposta do cache DNS em disco; erros do SQLite contam como ausência."""
+    try:
+        from sqlite3 import Error as SQLiteError
+    except ImportError:
+        return None
+    try:
+        return get_ip_cache().get_dns(key)
+    except SQLiteError as e:
+        logging.error(f"Erro ao ler o cache DNS: {e}")
+        return None
+
+def dns_cache_put(results: List[Dict[str, Any]], disk: bool = True) -> List[Tuple[Dict[str, Any], float]]:
+    """
+    Guarda respostas (positivas e negativas) em memória e, com `disk`, em
+    uma transação no disco (ver dns_disk_put). Retorna as entradas
+    (resposta, expiração) guardadas.
+    """
+    now = time.time()
+    entries = [(result, now + result["ttl"]) for result in results if result["status"] != 'error' and result["ttl"]]
+    if not entries:
+        return entries
+    with _dns_memory_lock:
+        for result, expires in entries:
+            _dns_memory[(result["type"], result["name"])] = (expires, result)
+        if len(_dns_memory) > DNS_MEMORY_MAX:
+            for key in [key for key, (expires, _) in _dns_memory.items() if expires <= now]:
+                del _dns_memory[key]
+            for key in list(_dns_memory)[:len(_dns_memory) - DNS_MEMORY_MAX]:
+                del _dns_memory[key]
+    if disk:
+        dns_disk_put(entries)
+    return entries
+
+def dns_disk_put(entries: List[Tuple[Dict[str, Any], float]]) -> None:
+    """Grava entradas (resposta, expiração) no cache DNS em disco, em uma única transação."""
+    if not entries or not CONFIG['dns_disk_cache']:
+        return
+    try:
+        from sqlite3 import Error as SQLiteError
+    except ImportError:
+        return
+    try:
+        get_ip_cache().put_dns_many([(f"{result['type']}:{result['name']}", result, expires)
+                                     for result, expires in entries])
+    except SQLiteError as e:
+        logging.error(f"Erro ao gravar o cache DNS: {e}")
+
+
+class DNSResolver:
+    """
+    Resolvedor DNS assíncrono: consultas UDP diretas aos servidores do
+    resolv.conf, para obter o TTL de cada resposta. Cada consulta usa um
+    socket próprio conectado ao servidor (porta de origem aleatória, escolhida
+    pelo kernel) e só aceita a resposta com o mesmo ID e a mesma pergunta.
+    Consulta primeiro o arquivo hosts e o cache; se não houver servidores, se
+    a resposta vier truncada ou se nenhum servidor responder, recorre ao
+    resolvedor do sistema (getaddrinfo). Consultas simultâneas ao mesmo nome
+    são unificadas. Deve ser criado dentro do loop.
+    """
+
+    def __init__(self, servers: Optional[List[str]] = None, timeout: Optional[float] = None,
+                 attempts: Optional[int] = None, concurrency: Optional[int] = None) -> None:
+        import asyncio
+        self.servers = [_dns_server_address(server)
+                        for server in (servers or CONFIG['dns_servers'] or read_resolv_conf())]
+        self.timeout = timeout or CONFIG['dns_timeout']
+        self.attempts = attempts or CONFIG['dns_attempts']
+        self.loop = asyncio.get_running_loop()
+        self.slots = asyncio.Semaphore(concurrency or CONFIG['dns_concurrency'])
+        self.inflight: Dict[Tuple[str, str], Any] = {}
+        self.to_store: List[Dict[str, Any]] = []
+        self.stats = {"queries": 0, "hosts_file": 0, "cache_hits": 0, "system": 0, "timeouts": 0}
+
+    @staticmethod
+    def _on_readable(sock: socket.socket, qid: int, question: bytes, future) -> None:
+        # O socket conectado só recebe datagramas do servidor consultado
+        while True:
+            try:
+                data = sock.recv(65535)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                continue
+            if not future.done() and dns_reply_matches(data, qid, question):
+                future.set_result(data)
+
+    def close(self) -> None:
+        """
+        Grava no cache as respostas obtidas: em memória na hora e no disco em
+        uma thread, fora do loop (o asyncio.run espera a gravação terminar).
+        """
+        stored, self.to_store = self.to_store, []
+        entries = dns_cache_put(stored, disk=False)
+        if entries and CONFIG['dns_disk_cache']:
+            if self.loop.is_closed():
+                dns_disk_put(entries)
+            else:
+                self.loop.run_in_executor(None, dns_disk_put, entries)
+
+    async def _exchange(self, name: str, rrtype: str) -> Optional[Dict[str, Any]]:
+        """Consulta os servidores em rodízio; None se nenhum der uma resposta utilizável."""
+        import asyncio
+        question = dns_question(name, rrtype)
+        for _ in range(self.attempts):
+            for server in self.servers:
+                qid = random.getrandbits(16)
+                future = self.loop.create_future()
+                self.stats["queries"] += 1
+                try:
+                    sock = socket.socket(socket.AF_INET6 if ':' in server[0] else socket.AF_INET, socket.SOCK_DGRAM)
+                except OSError:
+                    continue
+                try:
+                    sock.setblocking(False)
+                    sock.connect(server)
+                    self.loop.add_reader(sock.fileno(), self._on_readable, sock, qid, question, future)
+                    sock.send(build_dns_query(qid, name, rrtype))
+                    response = parse_dns_response(await asyncio.wait_for(future, self.timeout), rrtype)
+                except asyncio.TimeoutError:
+                    self.stats["timeouts"] += 1
+                    continue
+                except (OSError, struct.error, IndexError, ValueError):
+                    continue
+                finally:
+                    self.loop.remove_reader(sock.fileno())
+                    sock.close()
+                if response["truncated"]:
+                    return None
+                if response["rcode"] in (0, 3):  # NOERROR, NXDOMAIN
+                    return response
+                # SERVFAIL/REFUSED: tenta o próximo servidor
+        return None
+
+    async def _system(self, name: str, rrtype: str) -> Dict[str, Any]:
+        """Resolve pelo getaddrinfo do sistema (sem TTL: usa dns_fallback_ttl)."""
+        self.stats["system"] += 1
+        result = {"name": name, "type": rrtype, "status": 'ok', "addresses": [], "ttl": CONFIG['dns_fallback_ttl'],
+                  "source": 'system'}
+        try:
+            infos = await self.loop.getaddrinfo(name, None, family=DNS_FAMILIES[rrtype], type=socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            if e.errno in (socket.EAI_NONAME, getattr(socket, 'EAI_NODATA', socket.EAI_NONAME)):
+                result.update(status='nxdomain', ttl=CONFIG['dns_negative_ttl'])
+            else:
+                result.update(status='error', ttl=0, error=e.strerror or str(e))
+            return result
+        result["addresses"] = list(dict.fromkeys(info[4][0] for info in infos))
+        return result
+
+    async def resolve(self, name: str, rrtype: str = 'A') -> Dict[str, Any]:
+        """
+        Resolve um nome para um tipo (A ou AAAA). Retorna {"name", "type",
+        "status" (ok, nxdomain, nodata ou error), "addresses", "ttl", "source"
+        (hosts, cache, dns ou system)[, "error"]}.
+        """
+        import asyncio
+        name = name.rstrip('.').lower()
+        hosts = read_hosts_file().get((rrtype, name))
+        if hosts:
+            self.stats["hosts_file"] += 1
+            return {"name": name, "type": rrtype, "status": 'ok', "addresses": hosts,
+                    "ttl": CONFIG['dns_fallback_ttl'], "source": 'hosts'}
+        cached = dns_cache_get(name, rrtype, disk=False)
+        if cached:
+            self.stats["cache_hits"] += 1
+            return cached
+        key = (rrtype, name)
+        if key in self.inflight:
+            return await asyncio.shield(self.inflight[key])
+        self.inflight[key] = self.loop.create_future()
+        try:
+            if CONFIG['dns_disk_cache']:
+                # O SQLite bloqueia: a leitura do disco roda em uma thread, sem parar o loop
+                cached = await self.loop.run_in_executor(None, dns_cache_get, name, rrtype)
+                if cached:
+                    self.stats["cache_hits"] += 1
+                    self.inflight[key].set_result(cached)
+                    return cached
+            async with self.slots:
+                response = await self._exchange(name, rrtype) if self.servers else None
+            if response is None:
+                result = await self._system(name, rrtype)
+            else:
+                status = 'nxdomain' if response["rcode"] == 3 else 'ok' if response["addresses"] else 'nodata'
+                ttl = response["ttl"] if status == 'ok' else response["negative_ttl"]
+                result = {"name": name, "type": rrtype, "status": status, "addresses": response["addresses"],
+                          "ttl": min(CONFIG['dns_max_ttl'], CONFIG['dns_negative_ttl'] if ttl is None else ttl),
+                          "source": 'dns'}
+            self.to_store.append(result)
+            self.inflight[key].set_result(result)
+            return result
+        except BaseException as e:
+            self.inflight[key].set_exception(e)
+            self.inflight[key].exception()  # Evita o aviso de exceção não recuperada
+            raise
+        finally:
+            del self.inflight[key]
+
+    async def resolve_host(self, name: str) -> Tuple[int, str]:
+        """Família e primeiro endereço de um nome (IPv4 preferido); DNSLookupError se não houver."""
+        import asyncio
+        results = await asyncio.gather(self.resolve(name, 'A'), self.resolve(name, 'AAAA'))
+        for result in results:
+            if result["addresses"]:
+                return DNS_FAMILIES[result["type"]], result["addresses"][0]
+        errors = [result.get("error") for result in results if result["status"] == 'error']
+        raise DNSLookupError(errors[0] if errors else "nome não encontrado" if results[0]["status"] == 'nxdomain'
+                             else "nenhum endereço IPv4/IPv6")
+
+
+def resolve_names(names, rrtypes: Tuple[str, ...] = ('A', 'AAAA'),
+                  on_result: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Resolve muitos nomes ao mesmo tempo (cada tipo pedido) em um único loop
+    asyncio. Cada resposta é entregue a on_result assim que fica pronta.
+    Retorna as respostas na ordem de entrada e as estatísticas da execução.
+    """
+    import asyncio
+    names = list(dict.fromkeys(name.rstrip('.').lower() for name in names))
+    start = time.monotonic()
+
+    async def run() -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+        resolver = DNSResolver()
+        try:
+            async def one(name: str, rrtype: str) -> Dict[str, Any]:
+                if not validate_domain(name):
+                    result = {"name": name, "type": rrtype, "status": 'error', "addresses": [], "ttl": 0,
+                              "source": None, "error": "nome inválido"}
+                else:
+                    result = await resolver.resolve(name, rrtype)
+                if on_result:
+                    on_result(result)
+                return result
+
+            results = await asyncio.gather(*(one(name, rrtype) for name in names for rrtype in rrtypes))
+            return list(results), dict(resolver.stats)
+        finally:
+            resolver.close()
+
+    results, stats = asyncio.run(run())
+    elapsed = time.monotonic() - start
+    stats.update(names=len(names), lookups=len(results), errors=sum(r["status"] == 'error' for r in results),
+                 elapsed_s=round(elapsed, 3), lookups_per_s=round(len(results) / elapsed, 1) if elapsed > 0 else None)
+    return {"results": results, "stats": stats}
+
+def resolve_address(name: str) -> str:
+    """Primeiro endereço de um nome (IPv4 preferido), pelo cache e resolvedor DNS."""
+    import asyncio
+
+    async def run() -> str:
+        resolver = DNSResolver()
+        try:
+            return (await resolver.resolve_host(name))[1]
+        finally:
+            resolver.close()
+
+    return asyncio.run(run())
+
+def collect_dns(names: List[str], rrtypes: Tuple[str, ...] = ('A', 'AAAA')) -> Dict[str, Any]:
+    """Resolve nomes em massa (A/AAAA) e retorna as respostas e estatísticas."""
+    if not names:
+        raise ValueError("Nenhum nome informado.")
+    resolved = resolve_names(names, rrtypes)
+    return {"success": not resolved["stats"]["errors"], **resolved}
+
+# --- Base Offline de Geolocalização ---
+
+# Arquivo compilado: cabeçalho + colunas ordenadas por início do intervalo.
+#   IPv4: inícios (uint32 LE), fins (uint32 LE), índices de metadados (uint32 LE)
+#   IPv6: inícios (16 bytes BE), fins (16 bytes BE), índices de metadados (uint32 LE)
+#   Metadados: deslocamentos (uint32 LE, n+1) + textos UTF-8 "país\tasn\torganização"
+GEO_DB_MAGIC = b'PYTGEO1\0'
+GEO_DB_HEADER = struct.Struct('<8sIIII')  # magic, intervalos v4, intervalos v6, metadados, bytes de texto
+
+# Nomes de coluna aceitos no CSV (com cabeçalho); sem cabeçalho: início, fim, país, ASN, organização
+# (ou início, fim, ASN, país, descrição, a ordem do iptoasn, quando a 3ª coluna é numérica)
+GEO_CSV_COLUMNS = {
+    'start': ('start', 'range_start', 'start_ip', 'ip_start', 'network_start', 'first'),
+    'end': ('end', 'range_end', 'end_ip', 'ip_end', 'network_end', 'last'),
+    'country': ('country', 'country_code', 'cc', 'iso_code'),
+    'asn': ('asn', 'as_number', 'autonomous_system_number'),
+    'org': ('org', 'as_name', 'as_description', 'as_org', 'organization', 'name'),
+}
+
+def _parse_range_ip(value: str) -> Tuple[int, int]:
+    """Converte um IP (texto ou inteiro) em (versão, valor inteiro)."""
+    value = value.strip()
+    if value.isdigit():
+        number = int(value)
+        return (4 if number < 2 ** 32 else 6), number
+    address = ipaddress.ip_address(value)
+    return address.version, int(address)
+
+def flatten_ranges(ranges: List[Tuple[int, int, int]]) -> Tuple[List[Tuple[int, int, int]], int]:
+    """
+    Converte intervalos (início, fim, metadados), possivelmente sobrepostos ou
+    aninhados, em intervalos disjuntos e ordenados, como a busca binária exige.
+    Em cada ponto vale o intervalo iniciado por último (o mais interno, nos
+    aninhados; o mais estreito, com o mesmo início); um intervalo externo volta
+    a valer depois do fim do interno. Retorna (intervalos, sobreposições).
+    """
+    ranges.sort(key=lambda r: (r[0], -r[1]))
+    flat: List[Tuple[int, int, int]] = []
+    active: List[Tuple[int, int]] = []  # (fim, metadados); o topo é o intervalo em vigor
+    pos = 0
+    overlaps = 0
+
+    def emit(limit: int) -> None:
+        # Grava a cobertura dos intervalos ativos de `pos` até `limit` - 1
+        nonlocal pos
+        while active and pos < limit:
+            end, meta = active[-1]
+            if end < pos:
+                active.pop()
+                continue
+            stop = min(end, limit - 1)
+            if flat and flat[-1][2] == meta and flat[-1][1] + 1 == pos:
+                flat[-1] = (flat[-1][0], stop, meta)
+            else:
+                flat.append((pos, stop, meta))
+            pos = stop + 1
+            if stop == end:
+                active.pop()
+
+    for start, end, meta in ranges:
+        emit(start)
+        while active and active[-1][0] < start:
+            active.pop()
+        overlaps += bool(active)
+        pos = start
+        active.append((end, meta))
+    emit(float('inf'))
+    return flat, overlaps
+
+def compile_geo_database(source: str, target: str) -> Dict[str, Any]:
+    """
+    Compila um CSV/TSV de intervalos (início, fim, país, ASN, organização) no
+    arquivo binário ordenado usado pelas consultas offline. Intervalos
+    sobrepostos ou aninhados são divididos em trechos disjuntos (ver
+    flatten_ranges). A gravação é atômica: leitores com o arquivo antigo
+    mapeado não são afetados.
+    """
+    import csv
+    start_time = time.monotonic()
+    ranges = {4: [], 6: []}
+    meta_index: Dict[str, int] = {}
+    skipped = 0
+    with open(source, 'r', newline='', errors='replace') as f:
+        first = f.readline()
+        f.seek(0)
+        reader = csv.reader(f, delimiter='\t' if '\t' in first else ',')
+        columns = {'start': 0, 'end': 1, 'country': 2, 'asn': 3, 'org': 4}
+        for row in reader:
+            if not row or row[0].startswith('#'):
+                continue
+            if reader.line_num == 1:
+                try:
+                    _parse_range_ip(row[0])
+                    if len(row) > 3 and row[2].strip().isdigit():
+                        columns.update(asn=2, country=3)
+                except ValueError:
+                    # Cabeçalho: mapeia as colunas pelos nomes conhecidos
+                    names = [name.strip().lower() for name in row]
+                    columns = {key: next((names.index(a) for a in aliases if a in names), None)
+                               for key, aliases in GEO_CSV_COLUMNS.items()}
+                    if columns['start'] is None or columns['end'] is None:
+                        raise ValueError("CSV sem colunas de início e fim do intervalo.")
+                    continue
+            try:
+                version, start = _parse_range_ip(row[columns['start']])
+                end_version, end = _parse_range_ip(row[columns['end']])
+            except (ValueError, IndexError):
+                skipped += 1
+                continue
+            if version != end_version or end < start:
+                skipped += 1
+                continue
+            fields = [row[columns[key]].strip() if columns[key] is not None and columns[key] < len(row) else ''
+                      for key in ('country', 'asn', 'org')]
+            fields[1] = fields[1].upper().removeprefix('AS')
+            label = "\t".join(field.replace('\t', ' ') for field in fields)
+            ranges[version].append((start, end, meta_index.setdefault(label, len(meta_index))))
+
+    overlaps = 0
+    for version in ranges:
+        ranges[version], count = flatten_ranges(ranges[version])
+        overlaps += count
+    labels = [label.encode() for label in meta_index]
+    offsets = [0]
+    for label in labels:
+        offsets.append(offsets[-1] + len(label))
+
+    temp_path = target + ".tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(GEO_DB_HEADER.pack(GEO_DB_MAGIC, len(ranges[4]), len(ranges[6]), len(labels), offsets[-1]))
+        v4 = ranges[4]
+        f.write(struct.pack(f'<{len(v4)}I', *(r[0] for r in v4)))
+        f.write(struct.pack(f'<{len(v4)}I', *(r[1] for r in v4)))
+        f.write(struct.pack(f'<{len(v4)}I', *(r[2] for r in v4)))
+        v6 = ranges[6]
+        f.write(b''.join(r[0].to_bytes(16, 'big') for r in v6))
+        f.write(b''.join(r[1].to_bytes(16, 'big') for r in v6))
+        f.write(struct.pack(f'<{len(v6)}I', *(r[2] for r in v6)))
+        f.write(struct.pack(f'<{len(offsets)}I', *offsets))
+        f.write(b''.join(labels))
+    os.replace(temp_path, target)
+    return {"source": source, "database": target, "ipv4_ranges": len(ranges[4]), "ipv6_ranges": len(ranges[6]),
+            "labels": len(labels), "skipped_rows": skipped, "overlapping_rows": overlaps,
+            "bytes": os.path.getsize(target),
+            "elapsed_s": round(time.monotonic() - start_time, 3)}
+
+class _Keys16:
+    """Sequência de chaves de 16 bytes sobre o mmap, para o bisect (em C) comparar bytes diretamente."""
+
+    def __init__(self, view: memoryview, count: int) -> None:
+        self._view = view
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: int) -> bytes:
+        return self._view[index * 16:index * 16 + 16].tobytes()
+
+class OfflineGeoDB:
+    """
+    Consulta a base compilada por compile_geo_database via mmap: nada é lido
+    além das páginas tocadas pela busca binária (alguns microssegundos por IP).
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, 'rb') as f:
+            self.mtime = os.fstat(f.fileno()).st_mtime_ns
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mm)
+        magic, n4, n6, n_meta, blob_len = GEO_DB_HEADER.unpack_from(view)
+        if magic != GEO_DB_MAGIC:
+            raise ValueError(f"{path} não é uma base de geolocalização do PyTools.")
+        offset = GEO_DB_HEADER.size
+
+        def column(size: int, fmt: Optional[str]):
+            nonlocal offset
+            part = view[offset:offset + size]
+            offset += size
+            if fmt is None:
+                return part
+            if sys.byteorder != 'little':  # Colunas gravadas em little-endian
+                import array
+                values = array.array(fmt, part.tobytes())
+                values.byteswap()
+                return values
+            return part.cast(fmt)
+
+        self.v4_count, self.v6_count, self.label_count = n4, n6, n_meta
+        self._v4_starts, self._v4_ends, self._v4_meta = column(4 * n4, 'I'), column(4 * n4, 'I'), column(4 * n4, 'I')
+        self._v6_starts = _Keys16(column(16 * n6, None), n6)
+        self._v6_ends = _Keys16(column(16 * n6, None), n6)
+        self._v6_meta = column(4 * n6, 'I')
+        self._offsets = column(4 * (n_meta + 1), 'I')
+        self._blob = column(blob_len, None)
+
+    def _label(self, index: int) -> Dict[str, str]:
+        country, asn, org = bytes(self._blob[self._offsets[index]:self._offsets[index + 1]]).decode().split('\t')
+        return {"country": country, "asn": asn, "org": org}
+
+    def lookup(self, ip: str) -> Optional[Dict[str, Any]]:
+        """Retorna país, ASN e organização do intervalo que contém o IP, ou None."""
+        address = ipaddress.ip_address(ip)
+        if address.version == 4:
+            value = int(address)
+            i = bisect.bisect_right(self._v4_starts, value) - 1
+            if i < 0 or value > self._v4_ends[i]:
+                return None
+            meta = self._v4_meta[i]
+            network = f"{ipaddress.IPv4Address(self._v4_starts[i])}-{ipaddress.IPv4Address(self._v4_ends[i])}"
+        else:
+            key = address.packed
+            i = bisect.bisect_right(self._v6_starts, key) - 1
+            if i < 0 or key > self._v6_ends[i]:
+                return None
+            meta = self._v6_meta[i]
+            network = f"{ipaddress.IPv6Address(self._v6_starts[i])}-{ipaddress.IPv6Address(self._v6_ends[i])}"
+        label = self._label(meta)
+        org = " ".join(part for part in (f"AS{label['asn']}" if label['asn'] else "", label['org']) if part)
+        return {"ip": ip, "country": label["country"], "org": org, "range": network, "source": "offline"}
+
+    def stats(self) -> Dict[str, Any]:
+        return {"path": self.path, "ipv4_ranges": self.v4_count, "ipv6_ranges": self.v6_count,
+                "labels": self.label_count, "bytes": len(self._mm)}
+
+_offline_db: Optional[OfflineGeoDB] = None
+_offline_db_lock = threading.Lock()
+# Caminho e instante (monotônico) da última verificação do arquivo da base
+_offline_db_checked: Tuple[Optional[str], float] = (None, 0.0)
+OFFLINE_DB_CHECK_INTERVAL = 5.0
+
+def get_offline_db() -> Optional[OfflineGeoDB]:
+    """
+    Abre (uma vez) a base offline. O arquivo é verificado no máximo a cada
+    OFFLINE_DB_CHECK_INTERVAL s: a base é reaberta se for substituída por um
+    novo geo-import e deixa de ser usada se for removida.
+    """
+    global _offline_db, _offline_db_checked
+    path = CONFIG['geo_offline_db']
+    checked_path, checked_at = _offline_db_checked
+    now = time.monotonic()
+    if checked_path == path and now - checked_at < OFFLINE_DB_CHECK_INTERVAL:
+        return _offline_db
+    with _offline_db_lock:
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            _offline_db = None
+        else:
+            if _offline_db is None or _offline_db.path != path or _offline_db.mtime != mtime:
+                _offline_db = OfflineGeoDB(path)
+        _offline_db_checked = (path, now)
+        return _offline_db
+
+def lookup_offline(ip: str, mode: str) -> Optional[Dict[str, Any]]:
+    """
+    Consulta a base offline conforme o modo ('online', 'offline', 'auto').
+    No modo 'offline', lança LookupError se a base não existir ou não tiver o IP.
+    """
+    if mode == 'online':
+        return None
+    db = get_offline_db()
+    if db is None:
+        if mode == 'offline':
+            raise LookupError(f"Base offline {CONFIG['geo_offline_db']} não encontrada. Importe com 'geo-import'.")
+        return None
+    data = db.lookup(ip)
+    if data is None and mode == 'offline':
+        raise LookupError(f"O IP {ip} não está em nenhum intervalo da base offline.")
+    return data
+
+# --- Agendador de Etapas (DAG) ---
+
+@dataclasses.dataclass
+class Step:
+    """
+    Etapa de um grafo de execução. Executa um comando (`command`) ou uma
+    função Python (`func`, que retorna um dicionário de detalhes).
+    `deps` são etapas que precisam terminar antes; `locks` são recursos de
+    uso exclusivo (ex.: 'dpkg'); `inputs` devolve uma impressão digital das
+    entradas da etapa: se for igual à da última execução bem-sucedida, a
+    etapa é pulada. `skip` é consultado quando a etapa já pode rodar e
+    devolve o motivo para pulá-la (ou None para executá-la).
+    """
+    name: str
+    message: str
+    command: Optional[List[str]] = None
+    func: Optional[Callable[[], Dict[str, Any]]] = None
+    deps: Tuple[str, ...] = ()
+    locks: Tuple[str, ...] = ()
+    inputs: Optional[Callable[[], Optional[str]]] = None
+    skip: Optional[Callable[[], Optional[str]]] = None
+    timeout: Optional[float] = None
+
+
+def load_step_state(path: str) -> Dict[str, str]:
+    """Carrega as impressões digitais das etapas concluídas em execuções anteriores."""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def save_step_state(path: str, state: Dict[str, str]) -> None:
+    """Salva as impressões digitais das etapas de forma atômica."""
+    temp_path = path + ".tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(temp_path, path)
+
+def run_step_graph(steps: List[Step], run_step: Callable[[Step], Tuple[bool, Dict[str, Any]]],
+                   state_file: Optional[str] = None, max_workers: int = 4,
+                   on_event: Optional[Callable[[Step, str], None]] = None) -> List[Dict[str, Any]]:
+    """
+    Executa as etapas respeitando dependências e recursos exclusivos: etapas
+    prontas que não disputam um mesmo recurso rodam em paralelo. Etapas cujas
+    entradas não mudaram, ou sem trabalho a fazer segundo `skip`, são puladas.
+    Retorna, na ordem declarada, o resultado de cada etapa com status ('ok',
+    'failed', 'skipped', 'blocked') e tempos. on_event(etapa, status) é
+    chamado quando uma etapa começa ('running') ou termina.
+    """
+    by_name = {step.name: step for step in steps}
+    for step in steps:
+        unknown = [dep for dep in step.deps if dep not in by_name]
+        if unknown:
+            raise ValueError(f"Etapa '{step.name}' depende de etapas inexistentes: {', '.join(unknown)}")
+
+    state = load_step_state(state_file) if state_file else {}
+    origin = time.monotonic()
+    outcomes: Dict[str, Dict[str, Any]] = {}
+    pending = list(steps)
+    held: set = set()
+    running: Dict[Any, Tuple[Step, float]] = {}
+    # Ctrl+C/SIGTERM só chegam à thread principal: ela encerra por aqui os processos das etapas
+    tracker = ProcessTracker()
+    # O orçamento de command_budget() é por thread: os workers herdam o da chamadora
+    deadline = getattr(_budget, 'deadline', None)
+
+    def attempt(step: Step) -> Tuple[str, Dict[str, Any]]:
+        if tracker.cancelled.is_set():
+            return 'failed', {"exit_reason": 'cancelled', "error": "Cancelado."}
+        _process_context.tracker = tracker
+        _budget.deadline = deadline
+        try:
+            # A verificação de `skip` roda no worker: pode ser lenta (ex.: simulação do apt)
+            reason = step.skip() if step.skip else None
+            if reason:
+                return 'skipped', {"reason": reason}
+            ok, detail = run_step(step)
+            return ('ok' if ok else 'failed'), detail
+        finally:
+            _process_context.tracker = None
+            _budget.deadline = None
+
+    def finish(step: Step, status: str, start: Optional[float] = None, detail: Optional[Dict] = None) -> None:
+        now = time.monotonic()
+        outcomes[step.name] = {
+            "name": step.name, "status": status,
+            "start_s": round((start if start is not None else now) - origin, 3),
+            "duration_s": round(now - start, 3) if start is not None else 0.0,
+            **(detail or {}),
+        }
+        if on_event:
+            on_event(step, status)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        try:
+            while pending or running:
+                progressed = True
+                while progressed:
+                    progressed = False
+                    for step in list(pending):
+                        dep_status = [outcomes.get(dep, {}).get("status") for dep in step.deps]
+                        if any(st in ('failed', 'blocked') for st in dep_status):
+                            pending.remove(step)
+                            finish(step, 'blocked')
+                            progressed = True
+                            continue
+                        if not all(st in ('ok', 'skipped') for st in dep_status) or held & set(step.locks):
+                            continue
+                        pending.remove(step)
+                        progressed = True
+                        fingerprint = step.inputs() if step.inputs else None
+                        if fingerprint is not None and state.get(step.name) == fingerprint:
+                            finish(step, 'skipped', detail={"reason": "entradas inalteradas"})
+                            continue
+                        held.update(step.locks)
+                        if on_event:
+                            on_event(step, 'running')
+                        running[pool.submit(attempt, step)] = (step, time.monotonic())
+
+                if not running:
+                    for step in pending:  # Ciclo de dependências: nada mais pode progredir
+                        finish(step, 'blocked', detail={"reason": "dependência circular"})
+                    break
+
+                done, _ = wait_futures(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    step, start = running.pop(future)
+                    held.difference_update(step.locks)
+                    try:
+                        status, detail = future.result()
+                    except Exception as e:
+                        status, detail = 'failed', {"error": str(e)}
+                    if status == 'ok' and step.inputs:
+                        fingerprint = step.inputs()  # Estado após a execução
+                        if fingerprint is not None:
+                            state[step.name] = fingerprint
+                    finish(step, status, start, detail)
+        except BaseException:
+            # Encerra as árvores de processos em execução e descarta as etapas ainda na fila
+            # antes que a saída do pool espere por elas
+            tracker.cancel()
+            pool.shutdown(wait=True, cancel_futures=True)
+            raise
+
+    if state_file:
+        try:
+            save_step_state(state_file, state)
+        except OSError as e:
+            logging.error(f"Não foi possível salvar o estado das etapas em {state_file}: {e}")
+    return [outcomes[step.name] for step in steps]
+
+# --- Coleta de Dados (compartilhada entre o menu e a linha de comando) ---
+
+# Raiz dos arquivos do APT/dpkg (no Termux ficam sob $PREFIX)
+APT_ROOT = os.environ.get('PREFIX', '') if IS_TERMUX else ''
+APT_LISTS_DIR = f"{APT_ROOT}/var/lib/apt/lists"
+APT_ARCHIVES_DIR = f"{APT_ROOT}/var/cache/apt/archives"
+DPKG_STATUS_FILE = f"{APT_ROOT}/var/lib/dpkg/status"
+
+def path_fingerprint(*paths: str) -> str:
+    """Impressão digital barata (mtime + tamanho) de arquivos ou diretórios."""
+    parts = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            parts.append(f"{path}:{st.st_mtime_ns}:{st.st_size}")
+        except OSError:
+            parts.append(f"{path}:-")
+    return "|".join(parts)
+
+# Status de máquina do apt (-o APT::Status-Fd): "tipo:pacote:porcentagem:mensagem".
+# O nome do pacote pode conter ':' (arquitetura), então o primeiro campo numérico delimita.
+APT_STATUS_RE = re.compile(r'^(dlstatus|pmstatus|pmerror|pmconffile|media-change):(.*?):(\d+(?:\.\d+)?):(.*)$')
+DPKG_PROGRESS_RE = re.compile(r'Progress: \[\s*(\d+)%\]')
+# Mensagens do pmstatus que marcam um pacote como concluído
+APT_DONE_ACTIONS = ('Installed ', 'Removed ', 'Completely removed ')
+# O descritor 1 é usado porque o sudo fecha os descritores extras do processo
+APT_STATUS_OPTIONS = ['-o', 'APT::Status-Fd=1']
+
+class AptProgress:
+    """
+    Interpreta, incrementalmente, o status de máquina do apt (APT::Status-Fd) e
+    as linhas "Progress: [ 45%]" do dpkg que chegam pelo stdout. feed() consome
+    essas linhas e retorna as demais; o estado (fase, porcentagem, pacotes
+    concluídos) fica disponível após cada lote.
+    """
+
+    PHASES = {'dlstatus': "baixando", 'pmstatus': "instalando", 'dpkg': "instalando"}
+
+    def __init__(self) -> None:
+        self.phase: Optional[str] = None
+        self.percent: Optional[float] = None
+        self.message = ""
+        self.done: set = set()
+        self.errors: List[str] = []
+        self.conffiles: List[str] = []
+        self._install_start: Optional[float] = None
+        self._install_end: Optional[float] = None
+
+    def feed(self, stream: str, lines: List[str]) -> List[str]:
+        if stream != 'stdout':
+            return lines
+        rest = []
+        for line in lines:
+            match = APT_STATUS_RE.match(line)
+            if match:
+                self._status(*match.groups())
+                continue
+            match = DPKG_PROGRESS_RE.search(line)
+            if match:
+                self._set_phase('dpkg', float(match.group(1)), "")
+                continue
+            rest.append(line)
+        return rest
+
+    def _set_phase(self, kind: str, percent: float, message: str) -> None:
+        self.phase = self.PHASES[kind]
+        self.percent = min(100.0, percent)
+        self.message = message
+        if kind != 'dlstatus':
+            now = time.monotonic()
+            if self._install_start is None:
+                self._install_start = now
+            self._install_end = now
+
+    def _status(self, kind: str, package: str, percent: str, message: str) -> None:
+        if kind == 'pmerror':
+            self.errors.append(f"{package}: {message}")
+        elif kind == 'pmconffile':
+            self.conffiles.append(package)
+        elif kind in self.PHASES:
+            self._set_phase(kind, float(percent), message)
+            if kind == 'pmstatus' and message.startswith(APT_DONE_ACTIONS):
+                self.done.add(package)
+
+    def rate(self) -> Optional[float]:
+        """Pacotes concluídos por segundo na fase de instalação."""
+        if not self.done or self._install_start is None:
+            return None
+        elapsed = self._install_end - self._install_start
+        return len(self.done) / elapsed if elapsed > 0 else None
+
+    def summary(self) -> Dict[str, Any]:
+        rate = self.rate()
+        return {"packages": len(self.done), "packages_per_s": round(rate, 2) if rate else None,
+                "errors": self.errors, "conffiles": self.conffiles}
+
+def check_apt_mirrors() -> Dict[str, Any]:
+    """Lista os espelhos configurados nas fontes do APT (Termux ou Debian/Ubuntu)."""
+    sources_dir = f"{APT_ROOT}/etc/apt"
+    files = [os.path.join(sources_dir, 'sources.list')]
+    try:
+        files += sorted(os.path.join(sources_dir, 'sources.list.d', name)
+                        for name in os.listdir(os.path.join(sources_dir, 'sources.list.d'))
+                        if name.endswith(('.list', '.sources')))
+    except OSError:
+        pass
+    mirrors = []
+    for path in files:
+        try:
+            with open(path, 'r', errors='replace') as f:
+                for line in f:
+                    line = line.split('#', 1)[0].strip()
+                    # Formato de uma linha ("deb URL ...") ou deb822 ("URIs: URL ...")
+                    if line.startswith(('deb ', 'deb-src ')):
+                        urls = [word for word in line.split()[1:] if '://' in word][:1]
+                    elif line.lower().startswith('uris:'):
+                        urls = line.split(':', 1)[1].split()
+                    else:
+                        continue
+                    for url in urls:
+                        host = url.split('://', 1)[-1].split('/', 1)[0]
+                        if host and host not in mirrors:
+                            mirrors.append(host)
+        except OSError:
+            continue
+    return {"platform": "termux" if IS_TERMUX else "apt", "mirrors": mirrors}
+
+def estimate_apt_cache() -> Dict[str, Any]:
+    """Estima o espaço ocupado pelos pacotes baixados no cache do APT."""
+    total = 0
+    count = 0
+    try:
+        with os.scandir(APT_ARCHIVES_DIR) as entries:
+            for entry in entries:
+                if entry.name.endswith('.deb') and entry.is_file(follow_symlinks=False):
+                    total += entry.stat(follow_symlinks=False).st_size
+                    count += 1
+    except OSError:
+        pass
+    return {"cache_bytes": total, "cached_packages": count}
+
+def apt_lists_age() -> Optional[float]:
+    """Idade (s) da lista de pacotes mais recente, ou None se não houver listas."""
+    newest = None
+    try:
+        with os.scandir(APT_LISTS_DIR) as entries:
+            for entry in entries:
+                if entry.name.endswith(('_Packages', '_Release', '_InRelease', '.lz4', '.gz', '.xz')) \
+                        and entry.is_file(follow_symlinks=False):
+                    mtime = entry.stat(follow_symlinks=False).st_mtime
+                    newest = mtime if newest is None else max(newest, mtime)
+    except OSError:
+        return None
+    return None if newest is None else max(0.0, time.time() - newest)
+
+def skip_fresh_lists(ttl: Optional[float]) -> Optional[str]:
+    """Pula o download das listas se elas forem mais novas que o TTL configurado."""
+    age = apt_lists_age()
+    if not ttl or age is None or age > ttl:
+        return None
+    return f"listas atualizadas há {int(age // 60)} min (TTL de {int(ttl // 60)} min)"
+
+# Opções que dão ao apt-get -s a mesma semântica do `apt <ação>` executado de fato: o
+# `apt upgrade` instala dependências novas, que o `apt-get upgrade` deixaria retidas
+APT_SIMULATION_OPTIONS = {'upgrade': ['-o', 'APT::Get::Upgrade-Allow-New=true']}
+
+def count_apt_changes(output: str) -> int:
+    """Conta os pacotes que seriam instalados/removidos na saída de uma simulação do apt-get."""
+    return sum(1 for line in output.splitlines() if line.startswith(('Inst ', 'Remv ')))
+
+def simulate_apt(action: str) -> Optional[int]:
+    """
+    Simula uma ação do apt (sem privilégios e sem alterar nada) e retorna
+    quantos pacotes seriam instalados/removidos, ou None se a simulação falhar.
+    """
+    result = run_capture(['apt-get', '-s', '-q', *APT_SIMULATION_OPTIONS.get(action, []), action], timeout=120)
+    if not result["success"]:
+        return None
+    return count_apt_changes(result["stdout"])
+
+def skip_without_changes(action: str) -> Optional[str]:
+    """Pula a ação do apt quando a simulação mostra que não há pacotes a processar."""
+    changes = simulate_apt(action)
+    if changes == 0:
+        return f"simulação: nenhum pacote para {action}"
+    return None
+
+def skip_empty_archives() -> Optional[str]:
+    """Pula o autoclean quando não há pacotes baixados no cache."""
+    if estimate_apt_cache()["cached_packages"] == 0:
+        return "cache de pacotes vazio"
+    return None
+
+def system_update_steps(force: bool = False) -> List[Step]:
+    """
+    Retorna o grafo de etapas da atualização do sistema (APT ou PKG). Sem
+    `force`, etapas sem trabalho a fazer (listas recentes, simulação sem
+    pacotes pendentes, cache vazio) são puladas.
+    Lança PermissionError quando o APT é usado sem privilégios de administrador.
+    """
+    ttl = CONFIG['apt_lists_ttl']
+
+    def unless_forced(check: Callable[[], Optional[str]]) -> Optional[Callable[[], Optional[str]]]:
+        return None if force else check
+
+    mirrors = Step('espelhos', "Verificando espelhos configurados...", func=check_apt_mirrors)
+    if IS_TERMUX:
+        return [
+            mirrors,
+            Step('update', "Atualizando listas de pacotes...", ['pkg', 'update', '-y'], locks=('apt-lists',),
+                 skip=unless_forced(lambda: skip_fresh_lists(ttl))),
+            Step('upgrade', "Atualizando pacotes instalados...", ['pkg', 'upgrade', '-y'], deps=('update',),
+                 locks=('dpkg', 'apt-lists', 'apt-archives'),
+                 skip=unless_forced(lambda: skip_without_changes('upgrade'))),
+        ]
+    if os.name != 'nt' and os.geteuid() != 0:
+        raise PermissionError("Este comando requer privilégios de administrador. Execute com sudo.")
+    return [
+        mirrors,
+        Step('cache', "Estimando o tamanho do cache de pacotes...", func=estimate_apt_cache),
+        Step('update', "Atualizando listas de pacotes...", ['sudo', 'apt', 'update', '-y', *APT_STATUS_OPTIONS],
+             locks=('apt-lists',), skip=unless_forced(lambda: skip_fresh_lists(ttl))),
+        # Sem listas novas e sem mudanças no dpkg desde o último upgrade, não há o que atualizar;
+        # caso contrário, a simulação decide se há pacotes pendentes
+        Step('upgrade', "Atualizando pacotes instalados...", ['sudo', 'apt', 'upgrade', '-y', *APT_STATUS_OPTIONS],
+             deps=('update',), locks=('dpkg', 'apt-lists', 'apt-archives'),
+             inputs=unless_forced(lambda: path_fingerprint(APT_LISTS_DIR, DPKG_STATUS_FILE)),
+             skip=unless_forced(lambda: skip_without_changes('upgrade'))),
+        Step('autoremove', "Removendo pacotes não utilizados...",
+             ['sudo', 'apt', 'autoremove', '-y', *APT_STATUS_OPTIONS],
+             deps=('upgrade',), locks=('dpkg', 'apt-archives'),
+             inputs=unless_forced(lambda: path_fingerprint(DPKG_STATUS_FILE)),
+             skip=unless_forced(lambda: skip_without_changes('autoremove'))),
+        # O autoclean não usa o dpkg, mas disputa o lock de /var/cache/apt/archives com o autoremove
+        Step('autoclean', "Limpando cache de pacotes...", ['sudo', 'apt', 'autoclean', '-y', *APT_STATUS_OPTIONS],
+             deps=('update', 'cache'), locks=('apt-archives', 'apt-lists'),
+             inputs=unless_forced(lambda: path_fingerprint(APT_LISTS_DIR, APT_ARCHIVES_DIR)),
+             skip=unless_forced(skip_empty_archives)),
+    ]
+
+def _run_python_step(step: Step) -> Tuple[bool, Dict[str, Any]]:
+    """Executa uma etapa baseada em função Python."""
+    return True, step.func()
+
+def collect_system_update(force: bool = False) -> Dict[str, Any]:
+    """Executa a atualização do sistema sem interface e retorna o resultado e o tempo de cada etapa."""
+    def run_step(step: Step) -> Tuple[bool, Dict[str, Any]]:
+        if step.func is not None:
+            return _run_python_step(step)
+        parser = AptProgress()
+        result = run_capture(step.command, timeout=step.timeout, line_filter=parser.feed)
+        if parser.phase is not None:
+            result["progress"] = parser.summary()
+        return result["success"], result
+
+    steps = run_step_graph(system_update_steps(force), run_step, CONFIG['update_state_file'],
+                           CONFIG['update_max_workers'])
+    return {"success": all(step["status"] in ('ok', 'skipped') for step in steps), "steps": steps}
+
+def parse_ping_output(output: str) -> Dict[str, Any]:
+    """Extrai pacotes enviados/recebidos, perda e RTTs da saída do comando ping."""
+    stats: Dict[str, Any] = {"transmitted": None, "received": None, "loss_percent": None,
+                             "rtt_min_ms": None, "rtt_avg_ms": None, "rtt_max_ms": None}
+    packets = re.search(r'(\d+) packets transmitted, (\d+) (?:packets )?received', output)
+    if packets:
+        stats["transmitted"], stats["received"] = int(packets.group(1)), int(packets.group(2))
+        if stats["transmitted"]:
+            stats["loss_percent"] = round(100 * (1 - stats["received"] / stats["transmitted"]), 1)
+    rtt = re.search(r'min/avg/max(?:/m?dev)? = ([\d.]+)/([\d.]+)/([\d.]+)', output)
+    if rtt:
+        stats["rtt_min_ms"], stats["rtt_avg_ms"], stats["rtt_max_ms"] = (float(v) for v in rtt.groups())
+    return stats
+
+# --- Ping Nativo (asyncio) ---
+
+PING_METHODS = ('auto', 'icmp', 'tcp')
+ICMP_ECHO_REQUEST = {socket.AF_INET: 8, socket.AF_INET6: 128}
+ICMP_ECHO_REPLY = {socket.AF_INET: 0, socket.AF_INET6: 129}
+ICMP_PAYLOAD = b'pytools'.ljust(56, b'\0')  # 56 bytes, como o ping do sistema
+
+def icmp_checksum(data: bytes) -> int:
+    """Soma de verificação da internet (RFC 1071) de um pacote ICMP."""
+    if len(data) % 2:
+        data += b'\0'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    total = (total >> 16) + (total & 0xffff)
+    total += total >> 16
+    return ~total & 0xffff
+
+def open_icmp_socket(family: int) -> Optional[Tuple[socket.socket, bool]]:
+    """
+    Abre um socket ICMP não bloqueante: DGRAM (sem privilégios, se o
+    net.ipv4.ping_group_range permitir) ou RAW (root/CAP_NET_RAW).
+    Retorna (socket, raw) ou None se nenhum for permitido.
+    """
+    proto = socket.IPPROTO_ICMP if family == socket.AF_INET else socket.IPPROTO_ICMPV6
+    for kind in (socket.SOCK_DGRAM, socket.SOCK_RAW):
+        try:
+            sock = socket.socket(family, kind, proto)
+        except OSError:
+            continue
+        sock.setblocking(False)
+        with contextlib.suppress(OSError):
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+        return sock, kind == socket.SOCK_RAW
+    return None
+
+
+class PingEngine:
+    """
+    Pinga muitos hosts em um único loop asyncio, sem um processo por alvo.
+    Usa um socket ICMP por família de endereços (as respostas são casadas pelo
+    número de sequência e pelo endereço de origem) ou, sem permissão para
+    ICMP, mede o tempo de conexão TCP (um RST também prova que o host
+    respondeu).
+    """
+
+    def __init__(self, method: str = 'auto', port: int = 80, timeout: float = 1.0, concurrency: int = 256) -> None:
+        import asyncio
+        self.method = method
+        self.port = port
+        self.timeout = timeout
+        self.ident = os.getpid() & 0xffff
+        self.loop = asyncio.get_running_loop()
+        self.tcp_slots = asyncio.Semaphore(max(1, concurrency))
+        self.sockets: Dict[int, Optional[Tuple[socket.socket, bool]]] = {}
+        self.pending: Dict[Tuple[int, int], Tuple[Any, str]] = {}
+        self.sequence = {socket.AF_INET: 0, socket.AF_INET6: 0}
+        self.resolver = DNSResolver()
+
+    def icmp_socket(self, family: int) -> Optional[Tuple[socket.socket, bool]]:
+        """Socket ICMP da família (aberto e registrado no loop na primeira vez)."""
+        if family not in self.sockets:
+            opened = open_icmp_socket(family)
+            if opened:
+                self.loop.add_reader(opened[0].fileno(), self._on_readable, family)
+            self.sockets[family] = opened
+        return self.sockets[family]
+
+    def close(self) -> None:
+        for opened in self.sockets.values():
+            if opened:
+                self.loop.remove_reader(opened[0].fileno())
+                opened[0].close()
+        self.sockets.clear()
+        self.resolver.close()
+
+    def _on_readable(self, family: int) -> None:
+        """Entrega as respostas de eco pendentes às sondas que as aguardam."""
+        sock, raw = self.sockets[family]
+        received = time.perf_counter()
+        while True:
+            try:
+                data, source = sock.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                continue
+            if raw and family == socket.AF_INET:
+                data = data[(data[0] & 0x0f) * 4:]  # Sockets RAW IPv4 entregam o cabeçalho IP
+            if len(data) < 8:
+                continue
+            kind, _, _, ident, seq = struct.unpack('!BBHHH', data[:8])
+            # Em sockets DGRAM o kernel troca o identificador pelo da "porta" do socket;
+            # em RAW chegam também as respostas de outros processos
+            if kind != ICMP_ECHO_REPLY[family] or (raw and ident != self.ident):
+                continue
+            # Um eco de outro host com a mesma sequência (atrasado ou forjado) não conta
+            waiting = self.pending.get((family, seq))
+            if waiting is None or source[0].split('%', 1)[0] != waiting[1]:
+                continue
+            future = self.pending.pop((family, seq))[0]
+            if not future.done():
+                future.set_result(received)
+
+    async def probe_icmp(self, family: int, address: str) -> Optional[float]:
+        """Envia um eco ICMP e retorna o RTT (ms) ou None se não houver resposta a tempo."""
+        import asyncio
+        sock, _ = self.sockets[family]
+        seq = self.sequence[family] = (self.sequence[family] + 1) & 0xffff
+        header = struct.pack('!BBHHH', ICMP_ECHO_REQUEST[family], 0, 0, self.ident, seq)
+        # No ICMPv6 o kernel calcula a soma (ela inclui o pseudocabeçalho IPv6)
+        checksum = icmp_checksum(header + ICMP_PAYLOAD) if family == socket.AF_INET else 0
+        packet = struct.pack('!BBHHH', ICMP_ECHO_REQUEST[family], 0, checksum, self.ident, seq) + ICMP_PAYLOAD
+        future = self.loop.create_future()
+        # Forma canônica, a mesma que o recvfrom devolve
+        self.pending[(family, seq)] = future, str(ipaddress.ip_address(address))
+        start = time.perf_counter()
+        try:
+            sock.sendto(packet, (address, 0))
+            received = await asyncio.wait_for(future, self.timeout)
+        except (asyncio.TimeoutError, OSError):
+            return None
+        finally:
+            self.pending.pop((family, seq), None)
+        return (received - start) * 1000
+
+    async def probe_tcp(self, family: int, address: str) -> Optional[float]:
+        """Mede o tempo do handshake TCP (ms); conexão recusada também conta como resposta."""
+        import asyncio
+        async with self.tcp_slots:
+            start = time.perf_counter()
+            try:
+                transport, _ = await asyncio.wait_for(
+                    self.loop.create_connection(asyncio.Protocol, address, self.port, family=family), self.timeout)
+                transport.abort()  # RST em vez de FIN: nada fica em TIME_WAIT
+            except ConnectionRefusedError:
+                pass
+            except (asyncio.TimeoutError, OSError):
+                return None
+            return (time.perf_counter() - start) * 1000
+
+    async def resolve(self, host: str) -> Tuple[int, str]:
+        """Família e endereço do host (IPs literais não passam pelo resolvedor)."""
+        if validate_ip(host):
+            return (socket.AF_INET6 if ':' in host else socket.AF_INET), host
+        return await self.resolver.resolve_host(host)
+
+    async def prepare(self, host: str) -> Tuple[Dict[str, Any], Optional[Callable]]:
+        """
+        Resolve o host e escolhe a sonda (ICMP ou TCP). Retorna
+        ({"host", "address", "method"[, "error"]}, sonda sem argumentos ou None).
+        """
+        target: Dict[str, Any] = {"host": host, "address": None, "method": None}
+        try:
+            family, address = await self.resolve(host)
+        except (OSError, UnicodeError) as e:
+            reason = "nome inválido" if isinstance(e, UnicodeError) else getattr(e, 'strerror', None) or e
+            target["error"] = f"Falha ao resolver o nome: {reason}"
+            return target, None
+        target["address"] = address
+        if self.method != 'tcp' and self.icmp_socket(family):
+            target["method"] = 'icmp'
+            return target, functools.partial(self.probe_icmp, family, address)
+        if self.method == 'icmp':
+            target["error"] = "Sem permissão para ICMP (requer root, CAP_NET_RAW ou net.ipv4.ping_group_range)."
+            return target, None
+        target["method"] = 'tcp'
+        return target, functools.partial(self.probe_tcp, family, address)
+
+    async def ping(self, host: str, count: int, interval: float, delay: float = 0.0) -> Dict[str, Any]:
+        """Envia `count` sondas a um host, uma a cada `interval` s, e resume os RTTs."""
+        import asyncio
+        import statistics
+        target, probe = await self.prepare(host)
+        result: Dict[str, Any] = {**target, "transmitted": 0, "received": 0, "loss_percent": None,
+                                  "rtt_min_ms": None, "rtt_avg_ms": None, "rtt_max_ms": None, "rtt_stddev_ms": None}
+        if probe is None:
+            return result
+        # Espalha o início dos hosts ao longo de um intervalo para não enviar tudo em rajada
+        await asyncio.sleep(delay)
+        probes = []
+        for index in range(count):
+            if index:
+                await asyncio.sleep(interval)
+            probes.append(asyncio.ensure_future(probe()))
+        rtts = [rtt for rtt in await asyncio.gather(*probes) if rtt is not None]
+        result["transmitted"], result["received"] = count, len(rtts)
+        result["loss_percent"] = round(100 * (1 - len(rtts) / count), 1) if count else None
+        if rtts:
+            result.update(rtt_min_ms=round(min(rtts), 3), rtt_avg_ms=round(statistics.fmean(rtts), 3),
+                          rtt_max_ms=round(max(rtts), 3), rtt_stddev_ms=round(statistics.pstdev(rtts), 3))
+        return result
+
+    async def run(self, hosts: List[str], count: int, interval: float) -> List[Dict[str, Any]]:
+        import asyncio
+        try:
+            return list(await asyncio.gather(*(self.ping(host, count, interval, interval * index / len(hosts))
+                                               for index, host in enumerate(hosts))))
+        finally:
+            self.close()
+
+
+# --- Monitor de Latência (histogramas contínuos) ---
+
+# Histograma log-linear no estilo HDR, em microssegundos: valores até 2*HIST_SUB têm um bucket
+# cada; acima disso, cada potência de 2 é dividida em HIST_SUB faixas lineares (erro < 1/64)
+HIST_SUB_BITS = 6
+HIST_SUB = 1 << HIST_SUB_BITS
+HIST_MAX_US = 60 * 1000000
+
+def hist_index(us: int) -> int:
+    """Bucket de um valor em microssegundos (limitado a HIST_MAX_US)."""
+    us = min(max(us, 0), HIST_MAX_US)
+    if us < 2 * HIST_SUB:
+        return us
+    shift = us.bit_length() - HIST_SUB_BITS - 1
+    return HIST_SUB * shift + (us >> shift)
+
+def hist_value(index: int) -> float:
+    """Valor representativo (meio da faixa, em µs) de um bucket."""
+    if index < 2 * HIST_SUB:
+        return float(index)
+    shift = index // HIST_SUB - 1
+    return ((index - HIST_SUB * shift) << shift) + (1 << shift) / 2
+
+HIST_BUCKETS = hist_index(HIST_MAX_US) + 1
+
+
+class LatencyHistogram:
+    """
+    Contadores fixos por bucket (HIST_BUCKETS posições, ~11 KB): a memória não
+    cresce com as amostras e um percentil custa uma passada pelos buckets entre
+    o menor e o maior já usados.
+    """
+
+    def __init__(self) -> None:
+        import array
+        self.counts = array.array('Q', bytes(8 * HIST_BUCKETS))
+        self.total = 0
+        self.low = HIST_BUCKETS
+        self.high = -1
+
+    def add(self, index: int, count: int = 1) -> None:
+        self.counts[index] += count
+        self.total += count
+        if index < self.low:
+            self.low = index
+        if index > self.high:
+            self.high = index
+
+    def remove(self, index: int, count: int) -> None:
+        self.counts[index] -= count
+        self.total -= count
+
+    def percentiles(self, fractions: Tuple[float, ...]) -> List[Optional[float]]:
+        """Percentis (em ms) para frações crescentes, ex.: (0.5, 0.9, 0.99)."""
+        if not self.total:
+            return [None] * len(fractions)
+        results: List[Optional[float]] = []
+        ranks = [max(1, -(-fraction * self.total // 1)) for fraction in fractions]
+        seen = 0
+        counts = self.counts
+        for index in range(self.low, self.high + 1):
+            seen += counts[index]
+            while ranks[len(results):] and seen >= ranks[len(results)]:
+                results.append(round(hist_value(index) / 1000, 3))
+            if len(results) == len(fractions):
+                break
+        return results
+
+
+class LatencyTracker:
+    """
+    Estatísticas de um alvo monitorado: histograma desde o início e outro da
+    janela recente, mantido somando as amostras novas e subtraindo as fatias
+    que expiram (fatias esparsas de window/slots s, alinhadas ao relógio; uma
+    fatia sai quando termina antes do início da janela, mesmo com sondas
+    espaçadas ou após uma pausa). Memória constante por alvo.
+    """
+
+    def __init__(self, target: Dict[str, Any], window: float = 60.0, slots: int = 6) -> None:
+        self.target = target
+        self.overall = LatencyHistogram()
+        self.recent = LatencyHistogram()
+        self.slot_seconds = window / slots
+        self.window = window
+        self.slots: collections.deque = collections.deque()
+        self.sent = self.lost = self.recent_sent = self.recent_lost = 0
+        self.sum_us = 0
+        self.min_us: Optional[int] = None
+        self.max_us: Optional[int] = None
+        self.last_ms: Optional[float] = None
+
+    def _expire(self, now: float) -> None:
+        """Subtrai da janela recente as fatias que terminaram antes de now - window."""
+        while self.slots and self.slots[0]["end"] <= now - self.window:
+            expired = self.slots.popleft()
+            for index, count in expired["counts"].items():
+                self.recent.remove(index, count)
+            self.recent_sent -= expired["sent"]
+            self.recent_lost -= expired["lost"]
+
+    def _slot(self, now: float) -> Dict[str, Any]:
+        if not self.slots or now >= self.slots[-1]["end"]:
+            self._expire(now)
+            start = now // self.slot_seconds * self.slot_seconds
+            self.slots.append({"end": start + self.slot_seconds, "counts": {}, "sent": 0, "lost": 0})
+        return self.slots[-1]
+
+    def record(self, rtt_ms: Optional[float], now: Optional[float] = None) -> None:
+        """Registra uma sonda: RTT em ms ou None (perdida)."""
+        slot = self._slot(time.monotonic() if now is None else now)
+        self.sent += 1
+        self.recent_sent += 1
+        slot["sent"] += 1
+        self.last_ms = rtt_ms
+        if rtt_ms is None:
+            self.lost += 1
+            self.recent_lost += 1
+            slot["lost"] += 1
+            return
+        us = int(rtt_ms * 1000)
+        index = hist_index(us)
+        self.overall.add(index)
+        self.recent.add(index)
+        slot["counts"][index] = slot["counts"].get(index, 0) + 1
+        self.sum_us += us
+        self.min_us = us if self.min_us is None else min(self.min_us, us)
+        self.max_us = us if self.max_us is None else max(self.max_us, us)
+
+    def snapshot(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """Resumo atual do alvo (percentis da janela recente e desde o início)."""
+        self._expire(time.monotonic() if now is None else now)
+        recent = self.recent.percentiles((0.5, 0.9, 0.99))
+        overall = self.overall.percentiles((0.5, 0.9, 0.99))
+        received = self.sent - self.lost
+        return {**self.target, "sent": self.sent, "received": received,
+                "loss_percent": round(100 * self.lost / self.sent, 2) if self.sent else None,
+                "last_ms": None if self.last_ms is None else round(self.last_ms, 3),
+                "min_ms": None if self.min_us is None else self.min_us / 1000,
+                "avg_ms": round(self.sum_us / received / 1000, 3) if received else None,
+                "max_ms": None if self.max_us is None else self.max_us / 1000,
+                "p50_ms": overall[0], "p90_ms": overall[1], "p99_ms": overall[2],
+                "window_s": self.window,
+                "window_loss_percent": round(100 * self.recent_lost / self.recent_sent, 2) if self.recent_sent else None,
+                "window_p50_ms": recent[0], "window_p90_ms": recent[1], "window_p99_ms": recent[2]}
+
+
+def monitor_latency(hosts: List[str], on_update: Callable[[List[Dict[str, Any]]], None], interval: float = 1.0,
+                    refresh: float = 1.0, duration: Optional[float] = None, window: float = 60.0,
+                    method: Optional[str] = None, port: Optional[int] = None,
+                    timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    Sonda os hosts continuamente (uma sonda a cada `interval` s por host) e
+    chama on_update com os resumos a cada `refresh` s. Termina após `duration`
+    s (None = até Ctrl+C) e retorna os resumos finais.
+    """
+    import asyncio
+    invalid = [host for host in hosts if not (validate_ip(host) or validate_domain(host))]
+    if invalid or not hosts:
+        raise ValueError(f"Host inválido: {', '.join(invalid) or '(nenhum)'}. Insira IPs ou domínios válidos.")
+    hosts = list(dict.fromkeys(hosts))
+    trackers: List[LatencyTracker] = []
+
+    async def run() -> None:
+        loop = asyncio.get_running_loop()
+        engine = PingEngine(method or CONFIG['ping_method'], port or CONFIG['ping_tcp_port'],
+                            timeout or CONFIG['ping_timeout'], CONFIG['ping_concurrency'])
+        prepared = await asyncio.gather(*(engine.prepare(host) for host in hosts))
+        for target, _ in prepared:
+            trackers.append(LatencyTracker(target, window))
+
+        probes: set = set()
+
+        def probe_done(tracker: LatencyTracker, done: "asyncio.Future") -> None:
+            probes.discard(done)
+            # Sondas canceladas no encerramento não foram respondidas nem perdidas: não contam
+            if done.cancelled():
+                return
+            if done.exception() is not None:
+                logging.error(f"Falha na sonda para {tracker.target.get('host')}: {done.exception()}")
+                tracker.record(None)
+                return
+            tracker.record(done.result())
+
+        async def probe_loop(tracker: LatencyTracker, probe: Callable, delay: float) -> None:
+            await asyncio.sleep(delay)
+            next_at = loop.time()
+            while True:
+                # Sondas não esperam umas pelas outras: um timeout não atrasa o ritmo de envio
+                task = asyncio.ensure_future(probe())
+                probes.add(task)
+                task.add_done_callback(functools.partial(probe_done, tracker))
+                next_at += interval
+                await asyncio.sleep(max(0.0, next_at - loop.time()))
+
+        async def report_loop() -> None:
+            while True:
+                await asyncio.sleep(refresh)
+                on_update([tracker.snapshot() for tracker in trackers])
+
+        tasks = [asyncio.ensure_future(probe_loop(tracker, probe, interval * index / len(hosts)))
+                 for index, (tracker, (_, probe)) in enumerate(zip(trackers, prepared)) if probe is not None]
+        tasks.append(asyncio.ensure_future(report_loop()))
+        try:
+            await asyncio.wait(tasks, timeout=duration)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            # As sondas em voo usam os sockets do motor: encerrá-las antes de fechá-los
+            pending = list(probes)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            engine.close()
+
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(run())
+    return [tracker.snapshot() for tracker in trackers]
+
+def collect_ping(hosts: List[str], count: int = 4, interval: float = 1.0, timeout: Optional[float] = None,
+                 method: Optional[str] = None, port: Optional[int] = None) -> Dict[str, Any]:
+    """Pinga um ou mais hosts ao mesmo tempo e retorna as estatísticas de RTT de cada um."""
+    import asyncio
+    invalid = [host for host in hosts if not (validate_ip(host) or validate_domain(host))]
+    if invalid or not hosts:
+        raise ValueError(f"Host inválido: {', '.join(invalid) or '(nenhum)'}. Insira IPs ou domínios válidos.")
+    hosts = list(dict.fromkeys(hosts))
+    options = dict(method=method or CONFIG['ping_method'], port=port or CONFIG['ping_tcp_port'],
+                   timeout=timeout or CONFIG['ping_timeout'], concurrency=CONFIG['ping_concurrency'])
+
+    async def run() -> List[Dict[str, Any]]:
+        return await PingEngine(**options).run(hosts, count, interval)
+
+    start = time.perf_counter()
+    results = asyncio.run(run())
+    return {"success": all(result["received"] for result in results), "hosts": results,
+            "elapsed_s": round(time.perf_counter() - start, 3)}
+
+# --- Traceroute ---
+
+TRACEROUTE_METHODS = ('auto', 'udp', 'tcp', 'system')
+TRACE_BASE_PORT = 33434
+# Constantes do Linux ausentes do módulo socket
+IP_RECVERR = getattr(socket, 'IP_RECVERR', 11)
+IPV6_RECVERR = getattr(socket, 'IPV6_RECVERR', 25)
+SO_TIMESTAMPNS = getattr(socket, 'SO_TIMESTAMPNS', 35)
+ICMP_TIME_EXCEEDED = {socket.AF_INET: 11, socket.AF_INET6: 3}
+ICMP_UNREACHABLE = {socket.AF_INET: 3, socket.AF_INET6: 1}
+# "Porta inalcançável" vem do próprio destino; os demais códigos viram anotações, como no traceroute
+ICMP_PORT_UNREACHABLE = {socket.AF_INET: 3, socket.AF_INET6: 4}
+TRACE_NOTES = {socket.AF_INET: {0: '!N', 1: '!H', 2: '!P', 9: '!X', 10: '!X', 13: '!X'},
+               socket.AF_INET6: {0: '!N', 1: '!X', 3: '!H'}}
+
+def _set_ttl(sock: socket.socket, family: int, ttl: int) -> None:
+    if family == socket.AF_INET:
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_TTL, ttl)
+    else:
+        sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_UNICAST_HOPS, ttl)
+
+def _kernel_timestamp(ancdata: List[Tuple[int, int, bytes]]) -> Optional[float]:
+    """Extrai o carimbo SO_TIMESTAMPNS (tempo de parede, em segundos) das mensagens auxiliares."""
+    for level, kind, data in ancdata:
+        if level == socket.SOL_SOCKET and kind == SO_TIMESTAMPNS and len(data) >= 16:
+            seconds, nanoseconds = struct.unpack_from('=qq', data)
+            return seconds + nanoseconds / 1e9
+    return None
+
+
+class Traceroute:
+    """
+    Traceroute que envia as sondas de todos os TTLs de uma vez (um socket por
+    sonda) em um loop asyncio: o caminho volta em cerca de um timeout, em vez
+    de saltos x timeout. UDP usa IP_RECVERR (Linux, sem privilégios): o kernel
+    entrega o ICMP "tempo excedido"/"porta inalcançável" e quem o enviou na
+    fila de erros do próprio socket da sonda. TCP (SYN para `port`) reconhece o
+    destino pelo connect e os saltos intermediários por um socket ICMP RAW
+    (root/CAP_NET_RAW), casando a porta de origem citada no ICMP.
+    """
+
+    def __init__(self, method: str = 'udp', max_hops: int = 30, queries: int = 3, timeout: float = 2.0,
+                 port: Optional[int] = None) -> None:
+        import asyncio
+        self.method = method
+        self.max_hops = max_hops
+        self.queries = queries
+        self.timeout = timeout
+        self.port = port or (TRACE_BASE_PORT if method == 'udp' else CONFIG['ping_tcp_port'])
+        self.loop = asyncio.get_running_loop()
+        self.by_port: Dict[int, Tuple[Any, float]] = {}
+
+    def _answer(self, future, start: float, family: int, address: str, icmp_type: Optional[int],
+                icmp_code: Optional[int], received: Optional[float] = None) -> None:
+        """Resolve a sonda: salto intermediário, destino alcançado ou inalcançável (com anotação).
+
+        `received` é o carimbo de chegada dado pelo kernel (SO_TIMESTAMPNS), que
+        não sofre com o atraso até o loop atender o socket.
+        """
+        if future.done():
+            return
+        answer = {"address": address, "rtt_ms": round(max((received or time.time()) - start, 0) * 1000, 3)}
+        if icmp_type == ICMP_TIME_EXCEEDED[family]:
+            answer["kind"] = 'hop'
+        elif icmp_type is None or (icmp_type == ICMP_UNREACHABLE[family]
+                                   and icmp_code == ICMP_PORT_UNREACHABLE[family]):
+            answer["kind"] = 'reached'
+        else:
+            answer.update(kind='unreachable', note=TRACE_NOTES[family].get(icmp_code, f"!{icmp_code}")
+                          if icmp_type == ICMP_UNREACHABLE[family] else f"!T{icmp_type}")
+        future.set_result(answer)
+
+    def _on_udp_error(self, sock: socket.socket, family: int, target: str, future, start: float) -> None:
+        level, option = ((socket.IPPROTO_IP, IP_RECVERR) if family == socket.AF_INET
+                         else (socket.IPPROTO_IPV6, IPV6_RECVERR))
+        try:
+            _, ancdata, _, _ = sock.recvmsg(512, 1024, socket.MSG_ERRQUEUE)
+        except (BlockingIOError, InterruptedError):
+            # Sem erro na fila: um serviço UDP respondeu, então o destino foi alcançado
+            with contextlib.suppress(OSError):
+                sock.recv(512)
+                self._answer(future, start, family, target, None, None)
+            return
+        except OSError:
+            return
+        received = _kernel_timestamp(ancdata)
+        for cmsg_level, cmsg_type, data in ancdata:
+            if (cmsg_level, cmsg_type) != (level, option) or len(data) < 16:
+                continue
+            # struct sock_extended_err (16 bytes) seguida do sockaddr de quem enviou o ICMP
+            _, origin, icmp_type, icmp_code = struct.unpack_from('=IBBB', data)
+            if origin not in (2, 3):  # SO_EE_ORIGIN_ICMP, SO_EE_ORIGIN_ICMP6
+                continue
+            offender = data[16:]
+            sender = (socket.inet_ntop(socket.AF_INET, offender[4:8]) if family == socket.AF_INET
+                      else socket.inet_ntop(socket.AF_INET6, offender[8:24]))
+            self._answer(future, start, family, sender, icmp_type, icmp_code, received)
+
+    def _on_icmp(self, sock: socket.socket, family: int, target: str) -> None:
+        """Lê o socket ICMP RAW e casa erros que citam um SYN nosso (pela porta de origem)."""
+        while True:
+            try:
+                data, ancdata, _, source = sock.recvmsg(2048, 64)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                continue
+            try:
+                if family == socket.AF_INET:
+                    data = data[(data[0] & 0x0f) * 4:]
+                    inner = data[8:]
+                    inner_ihl = (inner[0] & 0x0f) * 4
+                    protocol, destination = inner[9], socket.inet_ntop(socket.AF_INET, inner[16:20])
+                    sport = struct.unpack_from('!H', inner, inner_ihl)[0]
+                else:
+                    inner = data[8:]
+                    protocol, destination = inner[6], socket.inet_ntop(socket.AF_INET6, inner[24:40])
+                    sport = struct.unpack_from('!H', inner, 40)[0]
+            except (IndexError, struct.error, ValueError):
+                continue
+            waiting = self.by_port.get(sport)
+            if protocol == socket.IPPROTO_TCP and destination == target and waiting:
+                self._answer(waiting[0], waiting[1], family, source[0], data[0], data[1],
+                             _kernel_timestamp(ancdata))
+
+    def _on_connect(self, sock: socket.socket, family: int, target: str, future, start: float) -> None:
+        self.loop.remove_writer(sock.fileno())
+        error = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        # Conexão aceita ou recusada (RST): foi o destino que respondeu
+        if error in (0, errno.ECONNREFUSED):
+            self._answer(future, start, family, target, None, None)
+
+    async def trace(self, family: int, address: str) -> List[Dict[str, Any]]:
+        """Envia todas as sondas e retorna os saltos até o destino (ou até o último que respondeu)."""
+        import asyncio
+        raw = None
+        if self.method == 'tcp':
+            with contextlib.suppress(OSError):
+                raw = socket.socket(family, socket.SOCK_RAW,
+                                    socket.IPPROTO_ICMP if family == socket.AF_INET else socket.IPPROTO_ICMPV6)
+                raw.setblocking(False)
+                raw.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMPNS, 1)
+                self.loop.add_reader(raw.fileno(), self._on_icmp, raw, family, address)
+        probes = []
+        try:
+            # Em ordem crescente de TTL: se o destino limitar os ICMPs, os primeiros a chegar são os que contam
+            for ttl in range(1, self.max_hops + 1):
+                for _ in range(self.queries):
+                    future = self.loop.create_future()
+                    if self.method == 'udp':
+                        sock = socket.socket(family, socket.SOCK_DGRAM)
+                        sock.setsockopt(*((socket.IPPROTO_IP, IP_RECVERR) if family == socket.AF_INET
+                                          else (socket.IPPROTO_IPV6, IPV6_RECVERR)), 1)
+                    else:
+                        sock = socket.socket(family, socket.SOCK_STREAM)
+                    probes.append((ttl, sock, future))
+                    sock.setblocking(False)
+                    sock.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMPNS, 1)
+                    _set_ttl(sock, family, ttl)
+            # Sockets prontos antes do primeiro envio: a rajada sai em sequência, sem criação no meio
+            for index, (ttl, sock, future) in enumerate(probes):
+                start = time.time()
+                try:
+                    if self.method == 'udp':
+                        self.loop.add_reader(sock.fileno(), self._on_udp_error, sock, family, address, future, start)
+                        with contextlib.suppress(BlockingIOError):
+                            sock.sendto(b'\0' * 32, (address, self.port + index))
+                    else:
+                        sock.connect_ex((address, self.port))
+                        self.by_port[sock.getsockname()[1]] = (future, start)
+                        self.loop.add_writer(sock.fileno(), self._on_connect, sock, family, address, future, start)
+                except OSError as e:
+                    # Envio recusado (ex.: ENOBUFS, EPERM de firewall): a sonda conta como perdida
+                    logging.debug(f"Sonda TTL {ttl} não enviada: {e}")
+                    self.loop.remove_reader(sock.fileno())
+                    future.cancel()
+
+            # Termina quando todas as sondas até o primeiro TTL que alcançou o destino tiverem resposta
+            deadline = self.loop.time() + self.timeout
+            while True:
+                final = [ttl for ttl, _, future in probes if future.done() and not future.cancelled()
+                         and future.result()["kind"] in ('reached', 'unreachable')]
+                limit = min(final) if final else self.max_hops
+                waiting = [future for ttl, _, future in probes if ttl <= limit and not future.done()]
+                remaining = deadline - self.loop.time()
+                if not waiting or remaining <= 0:
+                    break
+                await asyncio.wait(waiting, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for _, sock, _ in probes:
+                self.loop.remove_reader(sock.fileno())
+                self.loop.remove_writer(sock.fileno())
+                sock.close()
+            if raw is not None:
+                self.loop.remove_reader(raw.fileno())
+                raw.close()
+
+        hops = []
+        for ttl in range(1, limit + 1):
+            answers = [future.result() if future.done() and not future.cancelled() else None
+                       for probe_ttl, _, future in probes if probe_ttl == ttl]
+            hops.append({"ttl": ttl, "probes": [answer and {key: value for key, value in answer.items() if key != 'kind'}
+                                                for answer in answers]})
+        # Sem chegar ao destino, os saltos finais sem nenhuma resposta não dizem nada
+        while not final and hops and not any(hops[-1]["probes"]):
+            hops.pop()
+        return hops
+
+
+TRACE_HOP_RE = re.compile(r'^\s*(\d+)\s+(.*)$')
+
+def parse_traceroute_line(line: str) -> Optional[Dict[str, Any]]:
+    """Interpreta uma linha de salto do traceroute do sistema (-n), ex.: " 3  10.0.0.1  1.2 ms !H  * ...". """
+    match = TRACE_HOP_RE.match(line)
+    if not match:
+        return None
+    probes: List[Optional[Dict[str, Any]]] = []
+    address = None
+    tokens = match.group(2).split()
+    for index, token in enumerate(tokens):
+        if token == '*':
+            probes.append(None)
+        elif validate_ip(token.strip('()')):
+            address = token.strip('()')
+        elif token.startswith('!') and probes and probes[-1]:
+            probes[-1]["note"] = token
+        elif index + 1 < len(tokens) and tokens[index + 1] == 'ms' and address:
+            with contextlib.suppress(ValueError):
+                probes.append({"address": address, "rtt_ms": float(token)})
+    return {"ttl": int(match.group(1)), "probes": probes}
+
+def collect_traceroute(host: str, max_hops: Optional[int] = None, queries: Optional[int] = None,
+                       timeout: Optional[float] = None, method: Optional[str] = None, port: Optional[int] = None,
+                       on_hop: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Traça a rota até um host. O método nativo (UDP ou TCP) envia todas as
+    sondas de uma vez; 'system' executa o traceroute do sistema, interpretando
+    cada salto assim que ele é impresso (entregue a on_hop). 'auto' usa UDP no
+    Linux e recorre ao comando do sistema se o nativo não estiver disponível.
+    """
+    import asyncio
+    if not (validate_ip(host) or validate_domain(host)):
+        raise ValueError("Host inválido. Insira um IP ou domínio válido.")
+    max_hops = max_hops or CONFIG['traceroute_max_hops']
+    queries = queries or CONFIG['traceroute_queries']
+    timeout = timeout or CONFIG['traceroute_timeout']
+    requested = method or CONFIG['traceroute_method']
+    method = ('udp' if platform.system() == 'Linux' else 'system') if requested == 'auto' else requested
+    start = time.perf_counter()
+    result: Dict[str, Any] = {"host": host, "address": None, "method": method, "success": False, "hops": []}
+
+    if method != 'system':
+        async def run() -> Tuple[str, List[Dict[str, Any]]]:
+            resolver = DNSResolver()
+            try:
+                family, address = ((socket.AF_INET6 if ':' in host else socket.AF_INET), host) if validate_ip(host) \
+                    else await resolver.resolve_host(host)
+            finally:
+                resolver.close()
+            tracer = Traceroute(method, max_hops, queries, timeout, port)
+            return address, await tracer.trace(family, address)
+        try:
+            result["address"], result["hops"] = asyncio.run(run())
+        except DNSLookupError as e:
+            raise ValueError(f"Falha ao resolver o nome: {e}") from e
+        except OSError as e:
+            if requested != 'auto':
+                raise
+            logging.warning(f"Traceroute nativo indisponível ({e}); usando o comando do sistema")
+            method = result["method"] = 'system'
+        else:
+            for hop in result["hops"]:
+                if on_hop:
+                    on_hop(hop)
+
+    if method == 'system':
+        def line_filter(stream: str, lines: List[str]) -> List[str]:
+            if stream == 'stdout':
+                for line in lines:
+                    hop = parse_traceroute_line(line)
+                    if hop:
+                        result["hops"].append(hop)
+                        if on_hop:
+                            on_hop(hop)
+            return lines
+        command = ['traceroute', '-n', '-q', str(queries), '-m', str(max_hops), '-w', str(timeout), host]
+        if port:
+            command[1:1] = ['-p', str(port)]
+        outcome = run_capture(command, timeout=max_hops * queries * timeout + 10, line_filter=line_filter)
+        if not outcome["success"] and not result["hops"]:
+            raise OSError(outcome["stderr"].strip() or "O comando traceroute falhou.")
+        first = outcome["stdout"].split('\n', 1)[0]
+        found = re.search(r'\(([0-9a-fA-F.:]+)\)', first)
+        result["address"] = found.group(1) if found else host
+
+    last = next((probe for probe in (result["hops"][-1]["probes"] if result["hops"] else []) if probe), None)
+    result["success"] = bool(last and last["address"] == result["address"] and not last.get("note"))
+    result["elapsed_s"] = round(time.perf_counter() - start, 3)
+    return result
+
+# Respostas HTTP transitórias: vale tentar de novo após uma espera
+GEO_RETRY_STATUS = {429, 500, 502, 503, 504}
+
+def request_geolocation(ip: str, limiter: Optional[RateLimiter] = None) -> Dict[str, Any]:
+    """
+    Consulta a API de geolocalização (sem cache). Erros transitórios (conexão,
+    tempo esgotado, 429/5xx) são repetidos com espera exponencial, respeitando
+    o cabeçalho Retry-After. Lança requests.RequestException quando desiste.
+    """
+    retries, backoff = CONFIG['geo_retries'], CONFIG['geo_backoff']
+    url = CONFIG['geo_api_url'].format(ip=ip)
+    for attempt in range(retries + 1):
+        if limiter:
+            limiter.acquire()
+        delay = backoff * 2 ** attempt + random.uniform(0, backoff)
+        try:
+            response = get_http_session().get(url, timeout=10)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == retries:
+                raise
+            time.sleep(delay)
+            continue
+        if response.status_code in GEO_RETRY_STATUS and attempt < retries:
+            retry_after = response.headers.get('Retry-After', '')
+            time.sleep(min(float(retry_after), 60.0) if retry_after.isdigit() else delay)
+            continue
+        response.raise_for_status()
+        return response.json()
+
+class GeoLookupError(LookupError):
+    """Falha de geolocalização já conhecida (erro recente guardado no cache negativo)."""
+
+def bogon_info(ip: str) -> Optional[Dict[str, Any]]:
+    """Dados de um IP privado/reservado (sem localização pública, como o ipinfo responde), ou None."""
+    address = ipaddress.ip_address(ip)
+    if address.is_global and not (address.is_multicast or address.is_reserved):
+        return None
+    if address.is_loopback:
+        scope = "loopback"
+    elif address.is_link_local:
+        scope = "link-local"
+    elif address.is_multicast:
+        scope = "multicast"
+    elif address.is_private:
+        scope = "privado"
+    else:
+        scope = "reservado"
+    return {"ip": ip, "bogon": True, "scope": scope}
+
+# Prefixos mais curtos que estes, vindos da API, são largos demais para representar um único local
+GEO_MIN_PREFIX = {4: 8, 6: 16}
+
+def cache_prefix(ip: str, data: Dict[str, Any]):
+    """
+    Rede sob a qual a resposta de um IP pode ser reaproveitada: o campo
+    network, asn.route ou range (início-fim) da resposta, se contiver o IP,
+    ou o prefixo configurado (geo_prefix_v4/v6).
+    """
+    address = ipaddress.ip_address(ip)
+    asn = data.get("asn")
+    for value in (data.get("network"), asn.get("route") if isinstance(asn, dict) else None, data.get("range")):
+        if not isinstance(value, str) or not value:
+            continue
+        try:
+            if '-' in value:
+                first, last = (ipaddress.ip_address(part.strip()) for part in value.split('-', 1))
+                networks = ipaddress.summarize_address_range(first, last)
+            else:
+                networks = [ipaddress.ip_network(value, strict=False)]
+            for network in networks:
+                if address in network and network.prefixlen >= GEO_MIN_PREFIX[address.version]:
+                    return network
+        except (ValueError, TypeError):
+            continue
+    plen = CONFIG['geo_prefix_v4'] if address.version == 4 else CONFIG['geo_prefix_v6']
+    return ipaddress.ip_network(f"{ip}/{plen}", strict=False)
+
+def lookup_local(ip: str, mode: str) -> Optional[Tuple[Dict[str, Any], str]]:
+    """
+    Resolve um IP sem rede: endereços privados/reservados, base offline e
+    cache (exato e, se ativado, por prefixo). Retorna (dados, origem) com
+    origem 'bogon', 'offline', 'cache' ou 'prefix', ou None se for preciso
+    consultar a API. Lança LookupError no modo 'offline' sem resultado e
+    GeoLookupError para erros em cache negativo.
+    """
+    data = bogon_info(ip)
+    if data is not None:
+        return data, 'bogon'
+    data = lookup_offline(ip, mode)
+    if data is not None:
+        return data, 'offline'
+    cache = get_ip_cache()
+    data = cache.get(ip)
+    if data is None:
+        if CONFIG['geo_prefix_cache']:
+            data = cache.get_prefix(ip)
+            if data is not None:
+                return data, 'prefix'
+        return None
+    if "_error" in data:
+        raise GeoLookupError(f"{data['_error']} (erro recente, em cache)")
+    return data, 'cache'
+
+def store_geolocation(ip: str, data: Dict[str, Any]) -> None:
+    """Grava uma resposta da API no cache do IP e, se ativado, no da rede que o contém."""
+    cache = get_ip_cache()
+    cache.put(ip, data)
+    if CONFIG['geo_prefix_cache']:
+        cache.put_prefix(cache_prefix(ip, data), data)
+
+# Consultas simultâneas ao mesmo IP compartilham uma única requisição
+_geo_flight = SingleFlight()
+
+def _request_and_cache(ip: str, limiter: Optional[RateLimiter]) -> Dict[str, Any]:
+    """Consulta a API e grava o resultado no cache; erros entram no cache negativo."""
+    cache = get_ip_cache()
+    try:
+        data = request_geolocation(ip, limiter)
+    except requests.RequestException as e:
+        status = e.response.status_code if getattr(e, 'response', None) is not None else None
+        # Um 4xx (exceto 429) não muda tentando de novo; falhas transitórias expiram logo
+        definitive = status is not None and 400 <= status < 500 and status != 429
+        ttl = CONFIG['geo_negative_ttl'] if definitive else CONFIG['geo_error_ttl']
+        if ttl and ttl > 0:
+            cache.put(ip, {"_error": str(e)}, ttl)
+        raise
+    store_geolocation(ip, data)
+    return data
+
+def fetch_geolocation(ip: str, limiter: Optional[RateLimiter] = None,
+                      mode: Optional[str] = None) -> Tuple[Dict[str, Any], bool]:
+    """
+    Busca a geolocalização de um IP, resolvendo localmente quando possível
+    (ver lookup_local). Retorna (dados, veio_do_cache). Lança
+    requests.RequestException em falhas de rede e LookupError quando o IP não
+    pode ser resolvido (modo 'offline' ou erro recente em cache negativo).
+    """
+    local = lookup_local(ip, mode or CONFIG['geo_mode'])
+    if local is not None:
+        data, source = local
+        return data, source in ('cache', 'prefix')
+    if not CONFIG['geo_prefix_cache']:
+        data, _ = _geo_flight.do(ip, lambda: _request_and_cache(ip, limiter))
+        return data, False
+    # Com o cache por prefixo, IPs da mesma rede também compartilham a requisição em andamento
+    plen = CONFIG['geo_prefix_v4'] if ':' not in ip else CONFIG['geo_prefix_v6']
+    key = str(ipaddress.ip_network(f"{ip}/{plen}", strict=False))
+
+    def lead() -> Tuple[str, Optional[Dict[str, Any]], Optional[Exception]]:
+        # O erro volta como valor: a falha de um IP não deve ser lançada nos vizinhos que esperam
+        try:
+            return ip, _request_and_cache(ip, limiter), None
+        except Exception as e:
+            return ip, None, e
+
+    (leader_ip, data, error), shared = _geo_flight.do(key, lead)
+    if not shared or leader_ip == ip:
+        if error is not None:
+            raise error
+        return data, False
+    # A resposta só vale para a rede que ela declara (a mesma regra do cache por prefixo);
+    # fora dela, ou se a requisição do líder falhou, este IP precisa da própria requisição
+    network = cache_prefix(leader_ip, data) if error is None else None
+    if network is None or ipaddress.ip_address(ip) not in network:
+        data, _ = _geo_flight.do(ip, lambda: _request_and_cache(ip, limiter))
+        return data, False
+    data = {field: value for field, value in data.items() if field != "hostname"}
+    data.update(ip=ip, prefix=str(network))
+    return data, False
+
+def collect_geolocation(ip: str, mode: Optional[str] = None) -> Dict[str, Any]:
+    """Geolocaliza um IP (ou o endereço de um nome, via cache DNS) e retorna um dicionário serializável."""
+    host = None
+    if not validate_ip(ip):
+        if not validate_domain(ip):
+            raise ValueError("IP inválido. Insira um endereço IP ou domínio válido.")
+        host, ip = ip, resolve_address(ip)
+    data, cached = fetch_geolocation(ip, mode=mode)
+    logging.info(f"Geolocalização bem-sucedida para o IP: {ip}")
+    return {"ip": ip, **({"host": host} if host else {}), "cached": cached, "data": data}
+
+def read_ip_list(paths: List[str]):
+    """Lê IPs (primeira palavra de cada linha) de arquivos ou da entrada padrão ('-'), sob demanda."""
+    for path in paths or ['-']:
+        with (contextlib.nullcontext(sys.stdin) if path == '-' else open(path, 'r', errors='replace')) as f:
+            for line in f:
+                fields = line.split(None, 1)
+                if fields and not fields[0].startswith('#'):
+                    yield fields[0]
+
+def geolocate_bulk(ips, on_result: Callable[[Dict[str, Any]], None], concurrency: Optional[int] = None,
+                   rate: Optional[float] = None, mode: Optional[str] = None, limiter: Optional[RateLimiter] = None,
+                   pool: Optional[ThreadPoolExecutor] = None) -> Dict[str, Any]:
+    """
+    Geolocaliza uma lista de IPs: remove duplicatas, entrega primeiro as
+    respostas locais (base offline e cache) e consulta o restante em paralelo
+    (sessão keep-alive compartilhada, limite de taxa e novas tentativas). Nomes
+    de domínio na lista são resolvidos juntos, em paralelo, pelo cache DNS; os
+    resultados deles trazem também "host". Cada resultado ({"ip", "cached",
+    "data"} ou {"ip", "error"}) é entregue a on_result assim que fica pronto.
+    `limiter` e `pool` permitem que chamadas sucessivas compartilhem o limite
+    de taxa e as threads (o pool recebido não é encerrado aqui).
+    Retorna as estatísticas da execução.
+    """
+    start = time.monotonic()
+    mode = mode or CONFIG['geo_mode']
+    stats = {"total": 0, "unique": 0, "invalid": 0, "names": 0, "bogons": 0, "offline": 0, "cache_hits": 0,
+             "prefix_hits": 0, "fetched": 0, "errors": 0}
+    seen = set()
+    names = []
+    misses = []
+
+    def handle(ip: str, host: Optional[str] = None) -> None:
+        tag = {"host": host} if host else {}
+        try:
+            local = lookup_local(ip, mode)
+        except LookupError as e:
+            stats["errors"] += 1
+            on_result({"ip": ip, **tag, "cached": isinstance(e, GeoLookupError), "error": str(e)})
+            return
+        if local is None:
+            misses.append((ip, tag))
+            return
+        data, source = local
+        stats[{'bogon': "bogons", 'offline': "offline", 'cache': "cache_hits", 'prefix': "prefix_hits"}[source]] += 1
+        on_result({"ip": ip, **tag, "cached": source in ('cache', 'prefix'), "data": data})
+
+    for ip in ips:
+        stats["total"] += 1
+        if ip in seen:
+            continue
+        seen.add(ip)
+        stats["unique"] += 1
+        if validate_ip(ip):
+            handle(ip)
+        elif validate_domain(ip):
+            names.append(ip)
+        else:
+            stats["invalid"] += 1
+            on_result({"ip": ip, "cached": False, "error": "IP inválido"})
+    if names:
+        stats["names"] = len(names)
+        for answer in resolve_names(names, ('A',))["results"]:
+            if answer["addresses"]:
+                handle(answer["addresses"][0], answer["name"])
+            else:
+                stats["errors"] += 1
+                on_result({"ip": None, "host": answer["name"], "cached": answer["source"] == 'cache',
+                           "error": f"Falha ao resolver o nome: {answer.get('error', answer['status'])}"})
+
+    if limiter is None:
+        limiter = RateLimiter(CONFIG['geo_rate_limit'] if rate is None else rate)
+    own_pool = pool is None
+    if own_pool:
+        pool = ThreadPoolExecutor(max_workers=concurrency or CONFIG['geo_concurrency'])
+    try:
+        futures = {pool.submit(fetch_geolocation, ip, limiter, 'online'): (ip, tag) for ip, tag in misses}
+        for future in as_completed(futures):
+            ip, tag = futures[future]
+            try:
+                data, cached = future.result()
+                stats["fetched"] += 1
+                on_result({"ip": ip, **tag, "cached": cached, "data": data})
+            except (requests.RequestException, LookupError, ValueError) as e:
+                stats["errors"] += 1
+                logging.error(f"Erro de geolocalização para o IP {ip}: {e}")
+                on_result({"ip": ip, **tag, "cached": False, "error": str(e)})
+    finally:
+        # Em caso de interrupção, descarta as consultas ainda não iniciadas
+        if own_pool:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    elapsed = time.monotonic() - start
+    stats.update(elapsed_s=round(elapsed, 3), ips_per_s=round(stats["unique"] / elapsed, 1) if elapsed > 0 else None)
+    return stats
+
+# Colunas da saída CSV da geolocalização em massa
+GEO_CSV_FIELDS = ['ip', 'host', 'cached', 'city', 'region', 'country', 'loc', 'org', 'postal', 'timezone', 'range', 'prefix',
+                  'bogon', 'error']
+GEO_MODES = ('online', 'offline', 'auto')
+
+def geo_result_writer(stream, fmt: str) -> Callable[[Dict[str, Any]], None]:
+    """Retorna uma função que grava cada resultado em JSONL ou CSV assim que ele chega."""
+    if fmt == 'csv':
+        import csv
+        writer = csv.DictWriter(stream, fieldnames=GEO_CSV_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+
+        def write(result: Dict[str, Any]) -> None:
+            writer.writerow({**result.get("data", {}), "ip": result["ip"], "host": result.get("host", ""),
+                             "cached": result["cached"], "error": result.get("error", "")})
+            stream.flush()
+    else:
+        def write(result: Dict[str, Any]) -> None:
+            stream.write(json.dumps(result, ensure_ascii=False) + "\n")
+            stream.flush()
+    return write
+
+# Extração de IPs em logs (sobre bytes, sem decodificar a linha). O IPv6 exige "::" ou 8 grupos,
+# o que descarta horários como 12:34:56; os candidatos ainda são validados com ipaddress.
+IPV4_RE = re.compile(rb'(?<![\d.])(?:(?:25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)\.){3}(?:25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)'
+                     rb'(?!\d|\.\d)')
+IPV6_RE = re.compile(rb'(?<![0-9A-Fa-f:])(?:(?:[0-9A-Fa-f]{1,4}:){7}[0-9A-Fa-f]{1,4}|'
+                     rb'(?:[0-9A-Fa-f]{1,4}:)*[0-9A-Fa-f]{0,4}::(?:[0-9A-Fa-f]{1,4}(?::[0-9A-Fa-f]{1,4})*)?)'
+                     rb'(?![0-9A-Fa-f:])')
+ENRICH_BLOCK_SIZE = 4 << 20      # Bytes lidos (e linhas resolvidas em lote) por vez
+ENRICH_MEMO_MAX = 200000         # IPs resolvidos mantidos em memória (o restante volta do cache SQLite)
+ENRICH_FIELDS = ('country', 'city', 'org')
+
+def iter_line_blocks(path: str):
+    """
+    Lê um arquivo (ou a entrada padrão, '-') em blocos de ~ENRICH_BLOCK_SIZE
+    terminados em fim de linha; a linha incompleta do fim de um bloco segue
+    para o próximo. Leitura com readinto, sem mmap: um log truncado durante a
+    leitura (logrotate com copytruncate) só termina antes, sem SIGBUS.
+    """
+    source = contextlib.nullcontext(sys.stdin.buffer) if path == '-' else open(path, 'rb', buffering=0)
+    buffer = bytearray(ENRICH_BLOCK_SIZE)
+    view = memoryview(buffer)
+    carry = b''
+    with source as f:
+        if path != '-' and hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        while True:
+            count = f.readinto(buffer)
+            if not count:
+                if carry:
+                    yield carry
+                return
+            cut = buffer.rfind(b'\n', 0, count) + 1
+            if cut:
+                yield carry + view[:cut]
+                carry = bytes(view[cut:count])
+            else:
+                carry += view[:count]
+
+def split_line_endings(block: bytes) -> List[Tuple[bytes, bytes]]:
+    """
+    Divide um bloco em (linha, terminador) apenas no LF, preservando o
+    terminador original (LF, CRLF ou nenhum, na última linha): a saída sem
+    anotações reproduz a entrada byte a byte.
+    """
+    pieces = block.split(b'\n')
+    last = pieces.pop()
+    lines = [(piece[:-1], b'\r\n') if piece.endswith(b'\r') else (piece, b'\n') for piece in pieces]
+    if last:
+        lines.append((last, b''))
+    return lines
+
+def extract_ips(line: bytes) -> List[str]:
+    """Endereços IPv4/IPv6 candidatos de uma linha, na ordem em que aparecem."""
+    found = [match.decode() for match in IPV4_RE.findall(line)]
+    if b'::' in line or line.count(b':') >= 7:
+        found += [match.decode() for match in IPV6_RE.findall(line)]
+    return found
+
+def _geo_annotation(result: Dict[str, Any], fields: Tuple[str, ...]) -> Dict[str, Any]:
+    """Campos de geolocalização anexados a um IP (ou o motivo de não haver)."""
+    if "error" in result:
+        return {"error": result["error"]}
+    data = result["data"]
+    if data.get("bogon"):
+        return {"bogon": data.get("scope", True)}
+    return {field: data[field] for field in fields if data.get(field)}
+
+def enrich_log(paths: List[str], out, fmt: str = 'text', fields: Tuple[str, ...] = ENRICH_FIELDS,
+               mode: Optional[str] = None, concurrency: Optional[int] = None, rate: Optional[float] = None,
+               on_progress: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+    """
+    Anexa a geolocalização dos IPs de cada linha de logs (auth.log, nginx...)
+    e grava em `out` (binário): texto com " [geo IP país, cidade, org]" ao fim
+    da linha, ou JSONL {"line", "geo"}. Processa um bloco por vez: extrai os
+    IPs com regex pré-compiladas, resolve em lote os ainda desconhecidos
+    (cache, base offline, API) e grava o bloco, com memória constante.
+    on_progress(bytes_lidos) é chamado a cada bloco.
+    """
+    start = time.monotonic()
+    stats = {"lines": 0, "bytes": 0, "lines_with_ips": 0, "addresses": 0, "unique_resolved": 0, "errors": 0}
+    # IPs já resolvidos, do menos ao mais recentemente visto (LRU)
+    memo: "collections.OrderedDict[str, Optional[Dict[str, Any]]]" = collections.OrderedDict()
+
+    def remember(ip: str, value: Optional[Dict[str, Any]]) -> None:
+        memo[ip] = value
+        if len(memo) > ENRICH_MEMO_MAX:
+            memo.popitem(last=False)
+
+    def on_result(result: Dict[str, Any]) -> None:
+        stats["unique_resolved"] += 1
+        stats["errors"] += "error" in result
+        remember(result["ip"], _geo_annotation(result, fields))
+
+    # Um limitador e um pool para a chamada inteira: a taxa não recomeça a cada bloco
+    limiter = RateLimiter(CONFIG['geo_rate_limit'] if rate is None else rate)
+    pool = ThreadPoolExecutor(max_workers=concurrency or CONFIG['geo_concurrency'])
+    try:
+        for path in paths or ['-']:
+            for block in iter_line_blocks(path):
+                lines = split_line_endings(block)
+                found = [extract_ips(line) for line, _ in lines]
+                pending = set()
+                for ips in found:
+                    for ip in ips:
+                        if ip in memo:
+                            memo.move_to_end(ip)
+                        else:
+                            pending.add(ip)
+                valid = []
+                for ip in pending:
+                    if validate_ip(ip):
+                        valid.append(ip)
+                    else:
+                        remember(ip, None)  # Parece um IP, mas não é (ex.: 999.1.1.1 já filtrado, "::" solto)
+                if valid:
+                    geolocate_bulk(valid, on_result, concurrency, rate, mode, limiter, pool)
+
+                output = []
+                for (line, ending), ips in zip(lines, found):
+                    geo = {ip: memo[ip] for ip in ips if memo.get(ip) is not None}
+                    stats["lines_with_ips"] += bool(geo)
+                    stats["addresses"] += len(geo)
+                    if fmt == 'jsonl':
+                        output.append(json.dumps({"line": line.decode('utf-8', 'replace'), "geo": geo},
+                                                 ensure_ascii=False).encode() + b'\n')
+                    elif geo:
+                        notes = "".join(f" [geo {ip} " + (", ".join(str(v) for v in info.values()) or "?") + "]"
+                                        for ip, info in geo.items())
+                        output.append(line + notes.encode() + ending)
+                    else:
+                        output.append(line + ending)
+                out.write(b''.join(output))
+                stats["lines"] += len(lines)
+                stats["bytes"] += len(block)
+                if on_progress:
+                    on_progress(len(block))
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    elapsed = time.monotonic() - start
+    stats.update(elapsed_s=round(elapsed, 3),
+                 lines_per_s=round(stats["lines"] / elapsed) if elapsed > 0 else None,
+                 mb_per_s=round(stats["bytes"] / elapsed / 1e6, 1) if elapsed > 0 else None)
+    return stats
+
+MOUNT_ESCAPE_RE = re.compile(r'\\([0-7]{3})')
+PROC_MOUNTS = '/proc/self/mounts'
+
+def read_mount_table() -> Optional[List[Tuple[str, str, str, str]]]:
+    """
+    Retorna (dispositivo, ponto de montagem, tipo, opções) de cada montagem.
+    No Linux lê /proc/self/mounts, a mesma fonte do psutil.disk_partitions,
+    sem pagar a importação do psutil (~25 ms) num comando avulso; nos demais
+    sistemas usa o psutil. None se nenhuma das fontes estiver disponível.
+    """
+    try:
+        with open(PROC_MOUNTS, encoding='utf-8', errors='surrogateescape') as f:
+            lines = f.read().splitlines()
+    except OSError:
+        if not psutil.available():
+            return None
+        return [(part.device, part.mountpoint, part.fstype, part.opts) for part in psutil.disk_partitions(all=True)]
+    mounts = []
+    for line in lines:
+        fields = line.split(' ')
+        if len(fields) >= 4:
+            # O kernel escapa espaço, tab, quebra de linha e barra invertida como \ooo
+            device, mountpoint, fstype, options = (MOUNT_ESCAPE_RE.sub(lambda m: chr(int(m.group(1), 8)), field)
+                                                   for field in fields[:4])
+            mounts.append((device, mountpoint, fstype, options))
+    return mounts
+
+def _ceil_percent(used: int, available: int) -> Optional[float]:
+    """Percentual de uso arredondado para cima, como o df (sobre usado + disponível ao usuário)."""
+    return float(-(-used * 100 // (used + available))) if used + available > 0 else None
+
+def collect_disk_usage(all_filesystems: bool = False,
+                       mounts: Optional[List[Tuple[str, str, str, str]]] = None) -> List[Dict[str, Any]]:
+    """
+    Retorna o uso de disco (bytes e inodes) de cada sistema de arquivos,
+    chamando os.statvfs em cada montagem, sem processo externo. Como o df,
+    omite sistemas sem blocos (proc, sysfs, cgroup...) e montagens bind
+    repetidas, a não ser com `all_filesystems`. `mounts` substitui a tabela
+    de read_mount_table(); sem tabela legível, recorre ao df. Sem os.statvfs
+    (Windows), usa o psutil (ver collect_disk_usage_psutil).
+    """
+    if not hasattr(os, 'statvfs'):
+        return collect_disk_usage_psutil(all_filesystems) if psutil.available() else collect_disk_usage_df()
+    if mounts is None:
+        mounts = read_mount_table()
+    if mounts is None:
+        return collect_disk_usage_df()
+    records: Dict[Any, Dict[str, Any]] = {}
+    for index, (device, mountpoint, fstype, options) in enumerate(mounts):
+        try:
+            stats = os.statvfs(mountpoint)
+        except OSError as e:
+            logging.debug(f"statvfs falhou em {mountpoint}: {e}")
+            continue
+        if stats.f_blocks == 0 and not all_filesystems:
+            continue
+        used = (stats.f_blocks - stats.f_bfree) * stats.f_frsize
+        available = stats.f_bavail * stats.f_frsize
+        inodes_used = stats.f_files - stats.f_ffree
+        record = {
+            "filesystem": device,
+            "fstype": fstype,
+            "total_bytes": stats.f_blocks * stats.f_frsize,
+            "used_bytes": used,
+            "available_bytes": available,
+            "percent": _ceil_percent(used, available),
+            "inodes_total": stats.f_files,
+            "inodes_used": inodes_used,
+            "inodes_free": stats.f_favail,
+            "inodes_percent": _ceil_percent(inodes_used, stats.f_favail) if stats.f_files else None,
+            "read_only": bool(stats.f_flag & getattr(os, 'ST_RDONLY', 1)),
+            "mountpoint": mountpoint,
+        }
+        # Montagens bind compartilham o fsid: fica o ponto de montagem mais curto, como no df
+        key = index if all_filesystems else (device, stats.f_fsid)
+        previous = records.get(key)
+        if previous is None or len(mountpoint) < len(previous["mountpoint"]):
+            records[key] = record
+    return list(records.values())
+
+def collect_disk_usage_psutil(all_filesystems: bool = False) -> List[Dict[str, Any]]:
+    """Retorna o uso de disco de cada partição via psutil.disk_usage (sem inodes), onde não há os.statvfs."""
+    records = []
+    for part in psutil.disk_partitions(all=all_filesystems):
+        try:
+            usage = psutil.disk_usage(part.mountpoint)
+        except OSError as e:  # Ex.: unidade de CD sem mídia
+            logging.debug(f"disk_usage falhou em {part.mountpoint}: {e}")
+            continue
+        records.append({
+            "filesystem": part.device,
+            "fstype": part.fstype or None,
+            "total_bytes": usage.total,
+            "used_bytes": usage.used,
+            "available_bytes": usage.free,
+            "percent": _ceil_percent(usage.used, usage.free),
+            "inodes_total": None,
+            "inodes_used": None,
+            "inodes_free": None,
+            "inodes_percent": None,
+            "read_only": 'ro' in part.opts.split(','),
+            "mountpoint": part.mountpoint,
+        })
+    return records
+
+def collect_disk_usage_df() -> List[Dict[str, Any]]:
+    """Retorna o uso de disco de cada sistema de arquivos via df -kP (sem tipo nem inodes)."""
+    result = subprocess.run(['df', '-kP'], capture_output=True, text=True, check=True)
+    records = []
+    for line in result.stdout.strip().split('\n')[1:]:
+        # O ponto de montagem é o último campo e pode conter espaços
+        fields = line.split(None, 5)
+        if len(fields) < 6:
+            continue
+        filesystem, blocks, used, available, percent, mountpoint = fields
+        records.append({
+            "filesystem": filesystem,
+            "fstype": None,
+            "total_bytes": int(blocks) * 1024,
+            "used_bytes": int(used) * 1024,
+            "available_bytes": int(available) * 1024,
+            "percent": float(percent.rstrip('%')) if percent.rstrip('%').isdigit() else None,
+            "inodes_total": None,
+            "inodes_used": None,
+            "inodes_free": None,
+            "inodes_percent": None,
+            "read_only": None,
+            "mountpoint": mountpoint,
+        })
+    return records
+
+def collect_memory_usage() -> Dict[str, Any]:
+    """Retorna o uso de memória e swap em bytes."""
+    mem = psutil.virtual_memory()
+    swap = psutil.swap_memory()
+    return {
+        "memory": {"total_bytes": mem.total, "used_bytes": mem.used,
+                   "available_bytes": mem.available, "percent": mem.percent},
+        "swap": {"total_bytes": swap.total, "used_bytes": swap.used,
+                 "free_bytes": swap.free, "percent": swap.percent},
+    }
+
+def resolve_youtube_urls(url: str) -> Tuple[Optional[str], List[str]]:
+    """Retorna (título da playlist ou None, lista de URLs de vídeos) para uma URL do YouTube."""
+    if 'playlist' in url:
+        playlist = pytube.Playlist(url)
+        return playlist.title, list(playlist.video_urls)
+    return None, [url]
+
+def download_youtube(urls: List[str], audio: bool,
+                     progress: Optional["rich_progress.Progress"] = None) -> List[Dict[str, Any]]:
+    """Baixa vídeos (MP4) ou áudios (MP3) em paralelo e retorna o resultado de cada item."""
+    with ThreadPoolExecutor(max_workers=MAX_DOWNLOAD_THREADS) as executor:
+        futures = []
+        for video_url in urls:
+            yt = pytube.YouTube(video_url)
+            safe_title = slugify(yt.title)
+            stream = (yt.streams.filter(only_audio=True).first()
+                      if audio else
+                      yt.streams.filter(progressive=True, file_extension='mp4').get_highest_resolution())
+            path = os.path.join(AUDIO_DOWNLOAD_DIR if audio else VIDEO_DOWNLOAD_DIR,
+                                f"{safe_title}.{'mp3' if audio else 'mp4'}")
+            futures.append(executor.submit(_download_stream, stream, yt.title, path, progress))
+        return [future.result() for future in futures]
+
+def collect_youtube_download(url: str, audio: bool) -> Dict[str, Any]:
+    """Baixa uma URL (vídeo ou playlist) do YouTube sem interface."""
+    if not (check_directory_writable(VIDEO_DOWNLOAD_DIR) and check_directory_writable(AUDIO_DOWNLOAD_DIR)):
+        raise PermissionError("Diretórios de download não são graváveis.")
+    playlist_title, urls = resolve_youtube_urls(url)
+    downloads = download_youtube(urls, audio)
+    return {"playlist": playlist_title, "success": all(d["success"] for d in downloads), "downloads": downloads}
+
+TEMP_EMAIL_API_URL = "https://www.1secmail.com/api/v1/"
+
+def generate_temp_email() -> str:
+    """Gera um endereço de e-mail temporário."""
+    response = get_http_session().get(f"{TEMP_EMAIL_API_URL}?action=genRandomMailbox&count=1", timeout=10)
+    response.raise_for_status()
+    return response.json()[0]
+
+def fetch_inbox(email: str) -> List[Dict[str, Any]]:
+    """Retorna as mensagens da caixa de entrada de um e-mail temporário."""
+    login, domain = email.split('@')
+    response = get_http_session().get(f"{TEMP_EMAIL_API_URL}?action=getMessages&login={login}&domain={domain}", timeout=10)
+    response.raise_for_status()
+    return response.json()
+
+def collect_temp_email(email: Optional[str] = None) -> Dict[str, Any]:
+    """Gera um e-mail temporário ou, se informado, lista a caixa de entrada dele."""
+    if email is None:
+        return {"email": generate_temp_email()}
+    return {"email": email, "messages": fetch_inbox(email)}
+
+def get_current_branch() -> Optional[str]:
+    """Retorna o branch Git atual do script, ou None fora de um repositório."""
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--abbrev-ref', 'HEAD'], capture_output=True, text=True, check=True)
+        return result.stdout.strip()
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return None
+
+def script_update_commands(branch: str) -> List[Tuple[List[str], str]]:
+    """Retorna os comandos Git que atualizam o script para a versão remota."""
+    return [
+        (['git', 'fetch', 'origin'], "Buscando atualizações remotas..."),
+        (['git', 'reset', '--hard', f'origin/{branch}'], f"Resetando para a versão remota ({branch})..."),
+    ]
+
+def collect_script_update() -> Dict[str, Any]:
+    """Atualiza o script via Git sem interface."""
+    branch = get_current_branch() or 'main'
+    steps = []
+    for command, _ in script_update_commands(branch):
+        steps.append(run_capture(command))
+        if not steps[-1]["success"]:
+            break
+    return {"branch": branch, "success": all(step["success"] for step in steps), "steps": steps}
+
+def collect_system_info() -> Dict[str, Any]:
+    """Retorna informações gerais do sistema e do script."""
+    return {
+        "script_version": SCRIPT_VERSION,
+        "os": platform.system(),
+        "os_release": platform.release(),
+        "python_version": sys.version.split()[0],
+        "cwd": os.getcwd(),
+        "theme": CONFIG['theme'],
+        "memory_total_bytes": psutil.virtual_memory().total,
+    }
+
+def collect_network_status() -> Dict[str, Any]:
+    """Verifica a conectividade e lista as interfaces de rede IPv4."""
+    try:
+        # Tenta conectar a um servidor confiável
+        socket.create_connection(("8.8.8.8", 53), timeout=5).close()
+        online = True
+    except OSError:
+        online = False
+
+    stats = psutil.net_if_stats()
+    interfaces = []
+    for interface, addrs in psutil.net_if_addrs().items():
+        for addr in addrs:
+            if addr.family == socket.AF_INET:
+                is_up = interface in stats and stats[interface].isup
+                interfaces.append({"interface": interface, "address": addr.address, "up": is_up})
+    return {"online": online, "interfaces": interfaces}
+
+def remove_temp_files(dry_run: bool = False) -> Dict[str, Any]:
+    """Remove (ou apenas contabiliza, em dry_run) os arquivos temporários do sistema."""
+    temp_dirs = [os.path.join(os.getenv('TEMP', '/tmp') if os.name == 'nt' else '/tmp')]
+    # O socket de um daemon ativo nunca é removido, mesmo se configurado dentro do /tmp
+    keep = os.path.realpath(CONFIG['daemon_socket'])
+    total_size = 0
+    file_count = 0
+    errors = 0
+    for temp_dir in temp_dirs:
+        for root, _, files in os.walk(temp_dir):
+            for file in files:
+                file_path = os.path.join(root, file)
+                if os.path.realpath(file_path) == keep:
+                    continue
+                try:
+                    size = os.path.getsize(file_path)
+                    if not dry_run:
+                        os.remove(file_path)
+                    total_size += size
+                    file_count += 1
+                except (OSError, PermissionError):
+                    errors += 1
+    return {"directories": temp_dirs, "dry_run": dry_run, "files": file_count,
+            "bytes": total_size, "errors": errors}
+
+# --- Uso de Diretórios (varredura paralela) ---
+
+class DirSizeCache:
+    """
+    Cache persistente (SQLite, modo WAL) do conteúdo próprio de cada
+    diretório: bytes e arquivos diretos e os nomes dos subdiretórios. Uma
+    entrada vale enquanto o diretório tiver o mesmo (dispositivo, inode,
+    mtime): criar, remover ou renomear algo nele muda o mtime. Arquivos que
+    só mudam de tamanho não mudam o mtime do diretório e ficam com o valor
+    antigo até uma varredura sem cache. Caminhos são gravados como bytes,
+    para aceitar nomes que não são UTF-8 válido.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=10, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS dir_cache (
+                                path BLOB PRIMARY KEY, dev INTEGER NOT NULL, ino INTEGER NOT NULL,
+                                mtime_ns INTEGER NOT NULL, own_bytes INTEGER NOT NULL, own_disk INTEGER NOT NULL,
+                                own_files INTEGER NOT NULL, subdirs BLOB NOT NULL) WITHOUT ROWID""")
+
+    def load(self, root: str) -> Dict[str, Tuple]:
+        """Retorna {caminho: (dev, ino, mtime_ns, bytes, disco, arquivos, [subdiretórios])} de root para baixo."""
+        key = os.fsencode(root)
+        prefix = key.rstrip(b'/') + b'/'
+        rows = self.conn.execute("SELECT * FROM dir_cache WHERE path = ? OR (path >= ? AND path < ?)",
+                                 (key, prefix, prefix[:-1] + b'0'))
+        return {os.fsdecode(path): (dev, ino, mtime_ns, own_bytes, own_disk, own_files,
+                                    [os.fsdecode(name) for name in subdirs.split(b'\0') if name])
+                for path, dev, ino, mtime_ns, own_bytes, own_disk, own_files, subdirs in rows}
+
+    def save(self, entries: List[Tuple], stale: List[str]) -> None:
+        """Grava as entradas [(caminho, dev, ino, mtime_ns, bytes, disco, arquivos, [subdiretórios])]
+        e apaga as de diretórios que deixaram de existir, em uma única transação."""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.executemany("INSERT OR REPLACE INTO dir_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                  [(os.fsencode(path), *values, b'\0'.join(os.fsencode(name) for name in subdirs))
+                                   for path, *values, subdirs in entries])
+            self.conn.executemany("DELETE FROM dir_cache WHERE path = ?", [(os.fsencode(path),) for path in stale])
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+@dataclasses.dataclass
+class DirNode:
+    """Um diretório da árvore: totais (com os subdiretórios) e o conteúdo próprio."""
+    path: str
+    parent: Optional[str]
+    own_bytes: int = 0
+    own_disk_bytes: int = 0
+    own_files: int = 0
+    bytes: int = 0
+    disk_bytes: int = 0
+    files: int = 0
+    dirs: int = 0
+    children: List[str] = dataclasses.field(default_factory=list)
+    skipped_mounts: int = 0
+    cached: bool = False
+    # Algum diretório da subárvore veio do cache: arquivos alterados no lugar podem estar com o tamanho antigo
+    approximate: bool = False
+    error: Optional[str] = None
+
+
+class DirectoryScanner:
+    """
+    Calcula o tamanho de uma árvore de diretórios como o du, mas com um
+    os.scandir por diretório distribuído entre `workers` threads (as chamadas
+    ao sistema liberam o GIL; em disco frio, várias leituras ficam em voo ao
+    mesmo tempo). Cada diretório lido agenda os subdiretórios assim que os
+    encontra. Com `cache`, diretórios com (dispositivo, inode, mtime)
+    inalterados não são relidos: basta um lstat por subdiretório para
+    descer a árvore. Links simbólicos não são seguidos; links físicos contam
+    em cada diretório (como du -l); com `one_filesystem`, pontos de montagem
+    ficam de fora (como du -x).
+    """
+
+    def __init__(self, workers: Optional[int] = None, cache: Optional[DirSizeCache] = None,
+                 one_filesystem: bool = True) -> None:
+        self.workers = workers or CONFIG['dirscan_workers']
+        self.cache = cache
+        self.one_filesystem = one_filesystem
+        self.lock = threading.Lock()
+
+    def _read(self, node: DirNode, key: Tuple[int, int, int], own: Tuple[int, int]) -> List[Tuple[str, Any]]:
+        """Preenche o conteúdo próprio do diretório e retorna os subdiretórios (caminho, lstat)."""
+        row = self.cached.get(node.path)
+        subdirs = []
+        if row is not None and tuple(row[:3]) == key:
+            node.own_bytes, node.own_disk_bytes, node.own_files = row[3:6]
+            node.cached = True
+            for name in row[6]:
+                path = os.path.join(node.path, name)
+                with contextlib.suppress(OSError):
+                    info = os.lstat(path)
+                    if stat.S_ISDIR(info.st_mode):
+                        subdirs.append((path, info))
+            return subdirs
+        # O próprio diretório também ocupa espaço, como no du
+        node.own_bytes, node.own_disk_bytes = own
+        with os.scandir(node.path) as entries:
+            for entry in entries:
+                try:
+                    info = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                if stat.S_ISDIR(info.st_mode):
+                    subdirs.append((entry.path, info))
+                else:
+                    node.own_bytes += info.st_size
+                    node.own_disk_bytes += info.st_blocks * 512
+                    node.own_files += 1
+        self.scanned.append((node.path, *key, node.own_bytes, node.own_disk_bytes, node.own_files,
+                             [os.path.basename(path) for path, _ in subdirs]))
+        return subdirs
+
+    def _visit(self, path: str, parent: Optional[str], info) -> None:
+        """
+        Lê o diretório e desce pelos subdiretórios. Um subdiretório só vira
+        tarefa nova quando há thread ociosa; senão é lido por esta mesma
+        thread, o que evita trocas de contexto quando o pool está ocupado.
+        Se threads ficarem ociosas depois, recebem os itens mais rasos (as
+        maiores subárvores) da pilha local.
+        """
+        stack = collections.deque([(path, parent, info)])
+        try:
+            self._walk(stack)
+        finally:
+            with self.lock:
+                self.pending -= 1
+                if self.pending == 0:
+                    self.done.set()
+
+    def _walk(self, stack) -> None:
+        while stack:
+            while len(stack) > 1 and self.pending < self.workers:
+                self._submit(*stack.popleft())
+            path, parent, info = stack.pop()
+            node = DirNode(path, parent)
+            self.nodes[path] = node
+            self.order.append(node)
+            try:
+                subdirs = [] if self.cancelled else self._read(
+                    node, (info.st_dev, info.st_ino, info.st_mtime_ns), (info.st_size, info.st_blocks * 512))
+                for child, child_info in subdirs:
+                    if self.one_filesystem and child_info.st_dev != self.root_dev:
+                        node.skipped_mounts += 1
+                        continue
+                    node.children.append(child)
+                    if self.pending < self.workers:
+                        self._submit(child, path, child_info)
+                    else:
+                        stack.append((child, path, child_info))
+            except OSError as e:
+                node.error = e.strerror or str(e)
+            with self.lock:
+                self.stats["dirs_cached" if node.cached else "dirs_scanned"] += 1
+                self.stats["skipped_mounts"] += node.skipped_mounts
+                self.stats["errors"] += node.error is not None
+
+    def _submit(self, path: str, parent: Optional[str], info) -> None:
+        with self.lock:
+            self.pending += 1
+        self.executor.submit(self._visit, path, parent, info)
+
+    def scan(self, root: str, on_progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Varre `root` e retorna {"root", "nodes" (caminho -> DirNode), "stats"}.
+        `on_progress` recebe as estatísticas parciais a cada ~0,2 s.
+        """
+        root = os.path.abspath(root)
+        info = os.stat(root)
+        if not stat.S_ISDIR(info.st_mode):
+            raise NotADirectoryError(errno.ENOTDIR, "Não é um diretório", root)
+        self.root_dev = info.st_dev
+        self.cached = self.cache.load(root) if self.cache else {}
+        self.nodes: Dict[str, DirNode] = {}
+        self.order: List[DirNode] = []
+        self.scanned: List[Tuple] = []
+        self.stats = {"dirs_scanned": 0, "dirs_cached": 0, "skipped_mounts": 0, "errors": 0}
+        self.pending = 0
+        self.cancelled = False
+        self.done = threading.Event()
+        start = time.perf_counter()
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='dirscan')
+        try:
+            self._submit(root, None, info)
+            while not self.done.wait(0.2):
+                if on_progress:
+                    on_progress(dict(self.stats))
+        except BaseException:
+            # Ctrl+C: as tarefas restantes retornam sem ler nada
+            self.cancelled = True
+            raise
+        finally:
+            self.executor.shutdown(wait=True)
+
+        # Filhos entram na lista depois dos pais: percorrê-la ao contrário soma de baixo para cima
+        for node in reversed(self.order):
+            node.bytes += node.own_bytes
+            node.disk_bytes += node.own_disk_bytes
+            node.files += node.own_files
+            node.approximate |= node.cached
+            if node.parent is not None:
+                parent = self.nodes[node.parent]
+                parent.bytes += node.bytes
+                parent.disk_bytes += node.disk_bytes
+                parent.files += node.files
+                parent.dirs += node.dirs + 1
+                parent.approximate |= node.approximate
+        if self.cache:
+            self.cache.save(self.scanned, [path for path in self.cached if path not in self.nodes])
+        self.stats.update(files=self.nodes[root].files, workers=self.workers,
+                          elapsed_s=round(time.perf_counter() - start, 3))
+        return {"root": root, "nodes": self.nodes, "stats": self.stats}
+
+def scan_directory_tree(root: str, workers: Optional[int] = None, use_cache: bool = True,
+                        one_filesystem: bool = True,
+                        on_progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """Varre `root` com o DirectoryScanner, usando o cache em dir_cache_db se `use_cache`."""
+    cache = DirSizeCache(CONFIG['dir_cache_db']) if use_cache else None
+    try:
+        return DirectoryScanner(workers, cache, one_filesystem).scan(root, on_progress)
+    finally:
+        if cache:
+            cache.close()
+
+def directory_summary(tree: Dict[str, Any], path: str, top: int = 20) -> Dict[str, Any]:
+    """
+    Resumo de um diretório da árvore varrida, com os `top` subdiretórios que
+    mais ocupam espaço. "approximate" indica totais que incluem diretórios do
+    cache (arquivos que só mudaram de tamanho não são detectados).
+    """
+    node = tree["nodes"][path]
+    children = sorted((tree["nodes"][child] for child in node.children), key=lambda n: n.disk_bytes, reverse=True)
+    return {
+        "path": path, "bytes": node.bytes, "disk_bytes": node.disk_bytes, "files": node.files, "dirs": node.dirs,
+        "own_bytes": node.own_bytes, "own_disk_bytes": node.own_disk_bytes, "own_files": node.own_files,
+        "approximate": node.approximate, "own_approximate": node.cached, "error": node.error,
+        "children": [{"name": os.path.basename(child.path), "path": child.path, "bytes": child.bytes,
+                      "disk_bytes": child.disk_bytes, "files": child.files, "dirs": child.dirs,
+                      "approximate": child.approximate, "error": child.error} for child in children[:top]],
+        "more": max(0, len(children) - top),
+        "scan": tree["stats"],
+    }
+
+def collect_directory_sizes(path: str, top: int = 20, workers: Optional[int] = None, use_cache: bool = True,
+                            cross_mounts: bool = False,
+                            on_progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """Varre `path` e retorna o seu resumo (tamanho total e maiores subdiretórios)."""
+    tree = scan_directory_tree(path, workers, use_cache, not cross_mounts, on_progress)
+    return directory_summary(tree, tree["root"], top)
+
+# --- Maiores Arquivos (top-K) ---
+
+# Sistemas de arquivos do kernel, sem arquivos de usuário (somam-se aos sem blocos, ver statvfs)
+PSEUDO_FILESYSTEMS = frozenset({
+    'proc', 'sysfs', 'devtmpfs', 'devpts', 'cgroup', 'cgroup2', 'securityfs', 'debugfs', 'tracefs', 'pstore',
+    'bpf', 'mqueue', 'hugetlbfs', 'configfs', 'fusectl', 'autofs', 'binfmt_misc', 'efivarfs', 'nsfs',
+    'rpc_pipefs', 'selinuxfs', 'ramfs'})
+
+def pseudo_mountpoints() -> Tuple[List[str], set]:
+    """
+    Retorna (pontos de montagem reais, pontos de montagem de pseudo-sistemas
+    de arquivos). Os reais vêm de collect_disk_usage, sem montagens bind
+    repetidas; pseudo são os de PSEUDO_FILESYSTEMS e os sem blocos.
+    """
+    pseudo = set()
+    for _, mountpoint, fstype, _ in read_mount_table() or []:
+        with contextlib.suppress(OSError):
+            if fstype in PSEUDO_FILESYSTEMS or (hasattr(os, 'statvfs') and os.statvfs(mountpoint).f_blocks == 0):
+                pseudo.add(mountpoint)
+    real = [record["mountpoint"] for record in collect_disk_usage() if record["mountpoint"] not in pseudo]
+    return real, pseudo
+
+def walk_files(roots: List[str], stats: Dict[str, Any], one_filesystem: bool = True,
+               on_progress: Optional[Callable[[Dict[str, Any]], None]] = None):
+    """
+    Percorre `roots` com os.scandir e gera (raiz, DirEntry) de cada arquivo
+    regular, sem seguir links simbólicos nem entrar em pseudo-sistemas de
+    arquivos ou em outras raízes (percorridas à parte). Com `one_filesystem`,
+    cada raiz fica no próprio sistema de arquivos. Atualiza "files", "dirs",
+    "errors" e "skipped_mounts" em `stats` e chama `on_progress` a cada
+    ~0,2 s. Todas as raízes são validadas antes do primeiro arquivo.
+    """
+    _, pseudo = pseudo_mountpoints()
+    devices = {}
+    for root in roots:
+        info = os.stat(root)
+        if not stat.S_ISDIR(info.st_mode):
+            raise NotADirectoryError(errno.ENOTDIR, "Não é um diretório", root)
+        devices[root] = info.st_dev
+    for key in ("files", "dirs", "errors", "skipped_mounts"):
+        stats.setdefault(key, 0)
+    last_progress = time.perf_counter()
+    for root in roots:
+        if root in pseudo:
+            stats["skipped_mounts"] += 1
+            continue
+        stack = [root]
+        while stack:
+            directory = stack.pop()
+            stats["dirs"] += 1
+            try:
+                entries = os.scandir(directory)
+            except OSError:
+                stats["errors"] += 1
+                continue
+            with entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            path = entry.path
+                            if path in pseudo or path in devices:
+                                stats["skipped_mounts"] += 1
+                            elif one_filesystem and entry.stat(follow_symlinks=False).st_dev != devices[root]:
+                                stats["skipped_mounts"] += 1
+                            else:
+                                stack.append(path)
+                            continue
+                        if not entry.is_file(follow_symlinks=False):
+                            continue
+                    except OSError:
+                        stats["errors"] += 1
+                        continue
+                    stats["files"] += 1
+                    yield root, entry
+            if on_progress and time.perf_counter() - last_progress >= 0.2:
+                last_progress = time.perf_counter()
+                on_progress(dict(stats, root=root))
+
+def find_largest_files(roots: Optional[List[str]] = None, count: int = 20, one_filesystem: bool = True,
+                       extensions: Optional[List[str]] = None, older_than_days: Optional[float] = None,
+                       newer_than_days: Optional[float] = None, min_size: int = 0,
+                       on_progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Percorre `roots` (padrão: todos os pontos de montagem reais) e retorna os
+    `count` maiores arquivos, guardando só um heap mínimo de `count` entradas:
+    a memória não cresce com a árvore. Pseudo-sistemas de arquivos (proc,
+    sysfs...) ficam de fora; com `one_filesystem`, cada raiz fica no próprio
+    sistema de arquivos. O filtro de extensão é aplicado antes do stat.
+    Links simbólicos não são seguidos; um arquivo com vários links físicos
+    aparece uma vez.
+    """
+    import heapq
+    roots = [os.path.abspath(root) for root in (roots or pseudo_mountpoints()[0])]
+    suffixes = tuple(ext.lower() if ext.startswith('.') else f".{ext.lower()}" for ext in extensions or ())
+    now = time.time()
+    newest = now - older_than_days * 86400 if older_than_days is not None else None
+    oldest = now - newer_than_days * 86400 if newer_than_days is not None else None
+    heap: List[Tuple[int, int, str, float, int, Tuple[int, int]]] = []
+    in_heap: set = set()
+    stats = {"files": 0, "dirs": 0, "matched": 0, "errors": 0, "skipped_mounts": 0}
+    start = time.perf_counter()
+    sequence = 0
+    for _, entry in walk_files(roots, stats, one_filesystem, on_progress):
+        if suffixes and not entry.name.lower().endswith(suffixes):
+            continue
+        try:
+            info = entry.stat(follow_symlinks=False)
+        except OSError:
+            stats["errors"] += 1
+            continue
+        size = info.st_size
+        if size < min_size or (newest is not None and info.st_mtime > newest) \
+                or (oldest is not None and info.st_mtime < oldest):
+            continue
+        stats["matched"] += 1
+        if len(heap) >= count and size <= heap[0][0]:
+            continue
+        key = (info.st_dev, info.st_ino)
+        if key in in_heap:
+            continue
+        sequence += 1
+        item = (size, sequence, entry.path, info.st_mtime, info.st_blocks * 512, key)
+        if len(heap) < count:
+            heapq.heappush(heap, item)
+        else:
+            in_heap.discard(heapq.heappushpop(heap, item)[5])
+        in_heap.add(key)
+    stats["elapsed_s"] = round(time.perf_counter() - start, 3)
+    files = [{"path": path, "size_bytes": size, "disk_bytes": disk,
+              "modified": datetime.datetime.fromtimestamp(mtime).isoformat(timespec='seconds')}
+             for size, _, path, mtime, disk, _ in sorted(heap, reverse=True)]
+    return {"roots": roots, "count": count, "largest": files, **stats}
+
+# --- Arquivos Duplicados ---
+
+DUPLICATE_ACTIONS = ('report', 'hardlink', 'delete')
+DUPLICATE_KEEP = ('oldest', 'newest', 'first')
+# Bytes lidos do início e do fim de cada candidato no hash parcial; arquivos até o dobro disso
+# são lidos inteiros nessa etapa e não precisam do hash completo
+PARTIAL_HASH_BLOCK = 16 * 1024
+# Abaixo deste total o hash completo usa threads (o hashlib libera o GIL): iniciar processos custaria mais
+PROCESS_POOL_MIN_BYTES = 64 * 1024 * 1024
+# Bloco de leitura do hash completo (um buffer reaproveitado por arquivo)
+FULL_HASH_CHUNK = 1024 * 1024
+
+def partial_file_hash(path: str, size: int, algorithm: str) -> str:
+    """Hash do primeiro e do último bloco do arquivo (do arquivo inteiro, se for pequeno)."""
+    import hashlib
+    digest = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        digest.update(f.read(PARTIAL_HASH_BLOCK))
+        if size > PARTIAL_HASH_BLOCK:
+            f.seek(max(PARTIAL_HASH_BLOCK, size - PARTIAL_HASH_BLOCK))
+            digest.update(f.read(PARTIAL_HASH_BLOCK))
+    return digest.hexdigest()
+
+def full_file_hash(path: str, algorithm: str) -> Tuple[str, Optional[str], Optional[str]]:
+    """
+    Hash do arquivo inteiro lido em blocos com readinto (um único buffer).
+    Sem mmap: um arquivo truncado durante a leitura só termina antes, em vez
+    de derrubar o processo com SIGBUS. Retorna (caminho, hash, erro); roda
+    em processos do pool, por isso não lança.
+    """
+    import hashlib
+    digest = hashlib.new(algorithm)
+    buffer = bytearray(FULL_HASH_CHUNK)
+    view = memoryview(buffer)
+    try:
+        with open(path, 'rb', buffering=0) as f:
+            if hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            while True:
+                count = f.readinto(buffer)
+                if not count:
+                    break
+                digest.update(view[:count])
+    except (OSError, ValueError) as e:
+        return path, None, str(e)
+    return path, digest.hexdigest(), None
+
+def find_duplicates(roots: Optional[List[str]] = None, min_size: int = 1, one_filesystem: bool = True,
+                    keep: str = 'oldest', workers: Optional[int] = None,
+                    on_progress: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+    """
+    Encontra arquivos duplicados em etapas, cada uma lendo só o que a
+    anterior não descartou: (1) agrupa por tamanho, sem ler nada; (2) hash
+    do primeiro e do último bloco dos tamanhos repetidos, em threads (leituras
+    curtas, limitadas pela latência do disco); (3) hash completo, em blocos e
+    em um pool de processos, apenas dos grupos que ainda coincidem. Links físicos
+    para o mesmo inode contam como um arquivo só (com todos os caminhos em
+    "paths"). `keep` escolhe o arquivo mantido em cada grupo: o mais antigo,
+    o mais novo ou o primeiro por caminho. Padrão: os diretórios de download.
+    """
+    if keep not in DUPLICATE_KEEP:
+        raise ValueError(f"Critério inválido: {keep}. Use {', '.join(DUPLICATE_KEEP)}.")
+    if not roots:
+        roots = [path for path in (VIDEO_DOWNLOAD_DIR, AUDIO_DOWNLOAD_DIR) if os.path.isdir(path)]
+        if not roots:
+            raise ValueError("Nenhum diretório informado e os diretórios de download não existem.")
+    roots = [os.path.abspath(root) for root in roots]
+    algorithm = CONFIG['dupes_hash']
+    workers = workers or CONFIG['dupes_workers'] or os.cpu_count() or 1
+    stats: Dict[str, Any] = {"files": 0, "dirs": 0, "errors": 0, "skipped_mounts": 0, "already_linked": 0}
+    timings = {}
+
+    # Etapa 1: tamanho (um stat por arquivo, nenhum byte lido); cada inode vira ((mtime_ns, inode), [caminhos])
+    start = time.perf_counter()
+    by_size: Dict[int, Dict[Tuple[int, int], Tuple[Tuple[int, int], List[str]]]] = collections.defaultdict(dict)
+    walk_progress = None
+    if on_progress:
+        walk_progress = lambda progress: on_progress(
+            f"Listando arquivos... {progress['files']:,} em {progress['dirs']:,} diretórios")
+    for _, entry in walk_files(roots, stats, one_filesystem, walk_progress):
+        try:
+            info = entry.stat(follow_symlinks=False)
+        except OSError:
+            stats["errors"] += 1
+            continue
+        if info.st_size < min_size:
+            continue
+        inodes = by_size[info.st_size]
+        known = inodes.get((info.st_dev, info.st_ino))
+        if known:
+            known[1].append(entry.path)
+            stats["already_linked"] += 1
+        else:
+            inodes[(info.st_dev, info.st_ino)] = ((info.st_mtime_ns, info.st_ino), [entry.path])
+    jobs = [(size, stamp, paths) for size, inodes in by_size.items() if len(inodes) > 1
+            for stamp, paths in inodes.values()]
+    del by_size
+    stats["size_candidates"] = len(jobs)
+    timings["size_s"] = time.perf_counter() - start
+
+    # Etapa 2: primeiro e último bloco
+    start = time.perf_counter()
+    by_partial: Dict[Tuple[int, str], List[Tuple[Tuple[int, int], List[str]]]] = collections.defaultdict(list)
+    with ThreadPoolExecutor(max_workers=CONFIG['dupes_io_workers']) as pool:
+        futures = {pool.submit(partial_file_hash, paths[0], size, algorithm): (size, stamp, paths)
+                   for size, stamp, paths in jobs}
+        for done, future in enumerate(as_completed(futures), 1):
+            size, stamp, paths = futures[future]
+            try:
+                by_partial[(size, future.result())].append((stamp, paths))
+            except OSError:
+                stats["errors"] += 1
+            if on_progress and done % 256 == 0:
+                on_progress(f"Hash parcial... {done:,}/{len(jobs):,} candidatos")
+    stats["partial_bytes"] = sum(min(size, 2 * PARTIAL_HASH_BLOCK) for size, _, _ in jobs)
+    del futures, jobs
+    groups = {key: files for key, files in by_partial.items() if len(files) > 1}
+    stats["partial_candidates"] = sum(len(files) for files in groups.values())
+    timings["partial_s"] = time.perf_counter() - start
+
+    # Etapa 3: hash completo só de quem não foi lido inteiro na etapa 2
+    start = time.perf_counter()
+    final: Dict[Tuple[int, str], List[Tuple[Tuple[int, int], List[str]]]] = {}
+    pending = []
+    for (size, partial), files in groups.items():
+        if size <= 2 * PARTIAL_HASH_BLOCK:
+            final[(size, partial)] = files
+        else:
+            pending.extend((size, stamp, paths) for stamp, paths in files)
+    # Maiores primeiro: os processos terminam juntos em vez de um arquivo grande ficar para o fim
+    pending.sort(key=lambda job: job[0], reverse=True)
+    stats["full_hashed"] = len(pending)
+    stats["full_bytes"] = sum(size for size, _, _ in pending)
+    if pending:
+        from concurrent.futures import ProcessPoolExecutor
+        from concurrent.futures.process import BrokenProcessPool
+        executor = (ProcessPoolExecutor if stats["full_bytes"] >= PROCESS_POOL_MIN_BYTES and workers > 1
+                    else ThreadPoolExecutor)
+        try:
+            pool = executor(max_workers=workers)
+        except (OSError, NotImplementedError):
+            # Sem suporte a multiprocessing (ex.: sem /dev/shm): threads também paralelizam o hashlib
+            pool = ThreadPoolExecutor(max_workers=workers)
+        hashed_bytes, done = 0, 0
+        while done < len(pending):
+            jobs = pending[done:]
+            try:
+                with pool:
+                    results = pool.map(full_file_hash, [paths[0] for _, _, paths in jobs], [algorithm] * len(jobs),
+                                       chunksize=max(1, len(jobs) // (workers * 8)))
+                    for (size, stamp, paths), (_, digest, error) in zip(jobs, results):
+                        done += 1
+                        hashed_bytes += size
+                        if error:
+                            stats["errors"] += 1
+                        else:
+                            final.setdefault((size, digest), []).append((stamp, paths))
+                        if on_progress:
+                            on_progress(f"Hash completo... {format_bytes(hashed_bytes)} de "
+                                        f"{format_bytes(stats['full_bytes'])}")
+            except BrokenProcessPool:
+                # Um processo do pool morreu (ex.: falta de memória): o restante segue em threads
+                pool = ThreadPoolExecutor(max_workers=workers)
+    timings["full_s"] = time.perf_counter() - start
+    stats["full_mb_per_s"] = round(stats["full_bytes"] / timings["full_s"] / 1e6, 1) if stats["full_bytes"] else None
+
+    duplicates = []
+    for (size, digest), files in final.items():
+        if len(files) < 2:
+            continue
+        for _, paths in files:
+            paths.sort()
+        if keep == 'first':
+            files.sort(key=lambda file: file[1][0])
+        else:
+            files.sort(key=lambda file: (file[0][0], file[1][0]), reverse=keep == 'newest')
+        (keep_mtime_ns, keep_inode), keep_paths = files[0]
+        duplicates.append({"size_bytes": size, "hash": digest, "keep": keep_paths[0],
+                           "keep_mtime_ns": keep_mtime_ns, "keep_inode": keep_inode,
+                           "duplicates": [{"paths": paths, "mtime_ns": mtime_ns, "inode": inode}
+                                          for (mtime_ns, inode), paths in files[1:]]})
+    duplicates.sort(key=lambda group: group["size_bytes"] * len(group["duplicates"]), reverse=True)
+    stats.update(duplicate_groups=len(duplicates), duplicate_files=sum(len(group["duplicates"]) for group in duplicates),
+                 reclaimable_bytes=sum(group["size_bytes"] * len(group["duplicates"]) for group in duplicates),
+                 **{key: round(value, 3) for key, value in timings.items()})
+    return {"roots": roots, "algorithm": algorithm, "keep": keep, "groups": duplicates, **stats}
+
+def apply_duplicate_action(result: Dict[str, Any], action: str, dry_run: bool = True) -> List[Dict[str, Any]]:
+    """
+    Substitui cada duplicata (todos os seus links físicos) por um link para o
+    arquivo mantido ('hardlink') ou a remove ('delete'). Com `dry_run`, só
+    informa o que seria feito. Arquivos alterados desde o hash (tamanho, mtime
+    ou inode) são pulados; o link é criado ao lado e trocado com os.replace
+    (atômico). O espaço só é liberado se não houver links fora da busca.
+    """
+    if action not in ('hardlink', 'delete'):
+        raise ValueError(f"Ação inválida: {action}.")
+    outcomes = []
+    for group in result["groups"]:
+        keep, size = group["keep"], group["size_bytes"]
+        for duplicate in group["duplicates"]:
+            paths = duplicate["paths"]
+            outcome = {"paths": paths, "keep": keep, "action": action, "size_bytes": size, "freed_bytes": 0,
+                       "status": 'planned' if dry_run else 'done', "error": None}
+            outcomes.append(outcome)
+            try:
+                keep_info, infos = os.stat(keep), [os.stat(path) for path in paths]
+                if (keep_info.st_size, keep_info.st_mtime_ns, keep_info.st_ino) != (
+                        size, group["keep_mtime_ns"], group["keep_inode"]) or any(
+                        (info.st_size, info.st_mtime_ns, info.st_ino) != (size, duplicate["mtime_ns"], duplicate["inode"])
+                        for info in infos):
+                    outcome.update(status='skipped', error="alterado desde a verificação")
+                    continue
+                if (keep_info.st_dev, keep_info.st_ino) == (infos[0].st_dev, infos[0].st_ino):
+                    outcome.update(status='skipped', error="já é o mesmo arquivo")
+                    continue
+                if action == 'hardlink' and keep_info.st_dev != infos[0].st_dev:
+                    outcome.update(status='skipped', error="outro sistema de arquivos")
+                    continue
+                outcome["freed_bytes"] = size if infos[0].st_nlink == len(paths) else 0
+                if dry_run:
+                    continue
+                for path in paths:
+                    if action == 'delete':
+                        os.remove(path)
+                        continue
+                    temporary = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.pytools-{os.getpid()}")
+                    os.link(keep, temporary)
+                    try:
+                        os.replace(temporary, path)
+                    except OSError:
+                        with contextlib.suppress(OSError):
+                            os.remove(temporary)
+                        raise
+            except OSError as e:
+                outcome.update(status='error', error=str(e), freed_bytes=0)
+    return outcomes
+
+def collect_duplicates(roots: Optional[List[str]] = None, action: str = 'report', dry_run: bool = False,
+                       min_size: int = 1, keep: str = 'oldest', one_filesystem: bool = True,
+                       workers: Optional[int] = None,
+                       on_progress: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+    """Procura duplicatas e, se pedido, aplica a ação (hardlink/delete); o resultado inclui cada ação."""
+    if action not in DUPLICATE_ACTIONS:
+        raise ValueError(f"Ação inválida: {action}. Use {', '.join(DUPLICATE_ACTIONS)}.")
+    result = find_duplicates(roots, min_size, one_filesystem, keep, workers, on_progress)
+    result.update(action=action, dry_run=dry_run, actions=[])
+    if action != 'report':
+        result["actions"] = apply_duplicate_action(result, action, dry_run)
+        result["success"] = not any(outcome["status"] == 'error' for outcome in result["actions"])
+    return result
+
+# --- Monitor de E/S de Disco ---
+
+def whole_disk_names(names: List[str]) -> Optional[set]:
+    """
+    Nomes que são discos inteiros, e não partições (que repetiriam a E/S do
+    disco). No Linux, só discos inteiros aparecem em /sys/block; None em
+    outros sistemas, onde os contadores do psutil já são por disco.
+    """
+    if not os.path.isdir('/sys/block'):
+        return None
+    return {name for name in names if os.path.exists(os.path.join('/sys/block', name.replace('/', '!')))}
+
+# Contadores cumulativos usados nas taxas de disk_io_rates
+DISK_IO_FIELDS = ('read_count', 'write_count', 'read_bytes', 'write_bytes', 'read_time', 'write_time', 'busy_time')
+
+def disk_io_rates(previous: Dict[str, Any], current: Dict[str, Any], elapsed: float) -> List[Dict[str, Any]]:
+    """
+    Taxas por dispositivo entre duas leituras de psutil.disk_io_counters:
+    bytes e operações por segundo, tempo médio por operação (como o await
+    do iostat, com a fila incluída) e ocupação (% do intervalo com E/S em
+    andamento; None onde o sistema não informa busy_time). Dispositivos sem
+    leitura anterior, ou cujos contadores voltaram (reiniciados ao remontar ou
+    reconectar o disco), ficam de fora deste intervalo.
+    """
+    rates = []
+    for name, now in current.items():
+        before = previous.get(name)
+        # A volta de 32 bits o psutil já corrige (nowrap); um contador menor é um dispositivo reiniciado
+        if before is None or any(getattr(now, field) < getattr(before, field) for field in DISK_IO_FIELDS
+                                 if hasattr(now, field)):
+            continue
+        reads, writes = now.read_count - before.read_count, now.write_count - before.write_count
+        busy = getattr(now, 'busy_time', None)
+        rates.append({
+            "device": name,
+            "read_bytes_per_s": round((now.read_bytes - before.read_bytes) / elapsed, 1),
+            "write_bytes_per_s": round((now.write_bytes - before.write_bytes) / elapsed, 1),
+            "read_iops": round(reads / elapsed, 1),
+            "write_iops": round(writes / elapsed, 1),
+            "read_await_ms": round((now.read_time - before.read_time) / reads, 3) if reads else None,
+            "write_await_ms": round((now.write_time - before.write_time) / writes, 3) if writes else None,
+            "util_percent": (round(min(100.0, (busy - before.busy_time) / (elapsed * 10)), 1)
+                             if busy is not None else None),
+        })
+    return rates
+
+def monitor_disk_io(on_update: Callable[[Dict[str, Any]], None], interval: Optional[float] = None,
+                    duration: Optional[float] = None, devices: Optional[List[str]] = None,
+                    all_devices: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    Lê os contadores de E/S por disco a cada `interval` s e chama on_update
+    com as taxas do intervalo. Cada amostra é uma leitura de
+    /proc/diskstats (via psutil) e só a anterior é guardada: custo e memória
+    constantes, qualquer que seja a duração. Por padrão mostra só discos
+    inteiros que já tiveram E/S; `devices` escolhe os nomes e `all_devices`
+    inclui partições e dispositivos ociosos. Termina após `duration` s
+    (None = até Ctrl+C) e retorna a última atualização.
+    """
+    interval = interval or CONFIG['diskio_interval']
+    if interval <= 0:
+        raise ValueError("O intervalo deve ser maior que zero.")
+    previous = psutil.disk_io_counters(perdisk=True)
+    if not previous:
+        raise ValueError("O sistema não informa contadores de E/S por disco.")
+    if devices:
+        missing = sorted(set(devices) - set(previous))
+        if missing:
+            raise ValueError(f"Dispositivo desconhecido: {', '.join(missing)}. Disponíveis: {', '.join(sorted(previous))}.")
+    names: set = set()
+    disks: set = set()
+    last: Optional[Dict[str, Any]] = None
+    started = taken = time.monotonic()
+    started_at = round(time.time(), 3)
+    next_at = started + interval
+    with contextlib.suppress(KeyboardInterrupt):
+        while duration is None or next_at - started <= duration + 1e-9:
+            time.sleep(max(0.0, next_at - time.monotonic()))
+            # Intervalo fixo a partir do início: o tempo de desenhar não se acumula entre as amostras
+            next_at = max(next_at + interval, time.monotonic())
+            current = psutil.disk_io_counters(perdisk=True)
+            now = time.monotonic()
+            if not devices and not all_devices and set(current) != names:
+                # Partições só mudam quando um disco aparece ou some: /sys/block é consultado só nessas vezes
+                names = set(current)
+                disks = whole_disk_names(list(names)) or names
+            if devices:
+                selected = set(devices)
+            elif all_devices:
+                selected = set(current)
+            else:
+                selected = {name for name in disks if name in current
+                            and (current[name].read_count or current[name].write_count)}
+            rates = disk_io_rates(previous, {name: current[name] for name in selected if name in current}, now - taken)
+            previous, taken = current, now
+            last = {"time": round(time.time(), 3), "started": started_at, "interval_s": interval,
+                    "elapsed_s": round(now - started, 1),
+                    "devices": sorted(rates, key=lambda rate: rate["device"])}
+            on_update(last)
+    return last
+
+# --- Monitor de Memória (histórico em anel) ---
+
+# (chave, rótulo, unidade): 'bytes' é um valor instantâneo; 'bytes/s' e '/s' são taxas de contadores
+MEMORY_METRICS = (
+    ("used", "Usada", 'bytes'),
+    ("available", "Disponível", 'bytes'),
+    ("cached", "Cache", 'bytes'),
+    ("swap_in", "Swap entrada", 'bytes/s'),
+    ("swap_out", "Swap saída", 'bytes/s'),
+    ("page_faults", "Faltas pág.", '/s'),
+    ("major_faults", "Faltas maiores", '/s'),
+)
+
+
+class RingBuffer:
+    """
+    Histórico de tamanho fixo sobre um array de doubles: alocado uma vez,
+    cada amostra sobrescreve a mais antiga e a memória não cresce com o tempo.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        import array
+        self.values = array.array('d', bytes(8 * capacity))
+        self.capacity = capacity
+        self.count = 0
+        self.next = 0
+
+    def append(self, value: float) -> None:
+        self.values[self.next] = value
+        self.next = (self.next + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    def __len__(self) -> int:
+        return self.count
+
+    def last(self) -> float:
+        return self.values[(self.next - 1) % self.capacity]
+
+    def ordered(self) -> List[float]:
+        """Amostras da mais antiga para a mais recente."""
+        if self.count < self.capacity:
+            return self.values[:self.count].tolist()
+        return self.values[self.next:].tolist() + self.values[:self.next].tolist()
+
+    def stats(self) -> Tuple[float, float, float]:
+        """(mínimo, média, máximo) das amostras guardadas."""
+        window = self.values if self.count == self.capacity else self.values[:self.count]
+        return min(window), sum(window) / self.count, max(window)
+
+
+def read_vmstat(fields: Tuple[str, ...] = ('pgfault', 'pgmajfault')) -> Optional[Dict[str, int]]:
+    """Contadores de /proc/vmstat (Linux); None em outros sistemas."""
+    try:
+        with open('/proc/vmstat', 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    wanted = {field.encode() for field in fields}
+    counters = {}
+    for line in data.split(b'\n'):
+        name, _, value = line.partition(b' ')
+        if name in wanted:
+            counters[name.decode()] = int(value)
+    return counters
+
+
+class MemorySampler:
+    """
+    Amostra a memória (psutil), o swap e as faltas de página (/proc/vmstat)
+    e guarda o histórico de cada métrica em um RingBuffer de `history`
+    posições. Contadores cumulativos viram taxas por segundo entre amostras.
+    """
+
+    def __init__(self, history: int) -> None:
+        self.history = history
+        self.rings = {key: RingBuffer(history) for key, _, _ in MEMORY_METRICS}
+        self.total = psutil.virtual_memory().total
+        self.counters: Optional[Dict[str, int]] = None
+        self.taken = 0.0
+
+    def _counters(self) -> Dict[str, int]:
+        swap = psutil.swap_memory()
+        counters = {"swap_in": swap.sin, "swap_out": swap.sout}
+        vmstat = read_vmstat()
+        if vmstat:
+            counters.update(page_faults=vmstat.get('pgfault', 0), major_faults=vmstat.get('pgmajfault', 0))
+        return counters
+
+    def sample(self) -> None:
+        mem = psutil.virtual_memory()
+        counters, now = self._counters(), time.monotonic()
+        self.rings["used"].append(mem.used)
+        self.rings["available"].append(mem.available)
+        # cached só existe no Linux e no BSD
+        if hasattr(mem, 'cached'):
+            self.rings["cached"].append(mem.cached)
+        if self.counters is not None:
+            elapsed = now - self.taken
+            for key, value in counters.items():
+                # Contadores que recuam (ex.: estouro) contam como zero no intervalo
+                self.rings[key].append(max(0, value - self.counters[key]) / elapsed)
+        self.counters, self.taken = counters, now
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Valor atual e mínimo/média/máximo da janela de cada métrica (None se ainda sem amostras)."""
+        metrics = {}
+        for key, _, _ in MEMORY_METRICS:
+            ring = self.rings[key]
+            if not ring:
+                metrics[key] = None
+                continue
+            low, average, high = ring.stats()
+            metrics[key] = {"current": round(ring.last(), 1), "min": round(low, 1),
+                            "avg": round(average, 1), "max": round(high, 1)}
+        return {"time": round(time.time(), 3), "total_bytes": self.total, "history": self.history,
+                "samples": max(len(ring) for ring in self.rings.values()), "metrics": metrics}
+
+
+def monitor_memory(on_update: Callable[[MemorySampler], None], interval: Optional[float] = None,
+                   history: Optional[int] = None, duration: Optional[float] = None) -> Optional[MemorySampler]:
+    """
+    Amostra a memória a cada `interval` s em um MemorySampler e chama
+    on_update com ele após cada amostra. A memória usada é fixa (os anéis
+    são alocados no início). Termina após `duration` s (None = até Ctrl+C)
+    e retorna o amostrador.
+    """
+    interval = interval or CONFIG['mem_interval']
+    history = history or CONFIG['mem_history']
+    if interval <= 0 or history < 2:
+        raise ValueError("O intervalo deve ser maior que zero e o histórico ter ao menos 2 amostras.")
+    sampler = MemorySampler(history)
+    sampler.sample()
+    on_update(sampler)
+    started = time.monotonic()
+    next_at = started + interval
+    with contextlib.suppress(KeyboardInterrupt):
+        while duration is None or next_at - started <= duration + 1e-9:
+            time.sleep(max(0.0, next_at - time.monotonic()))
+            next_at = max(next_at + interval, time.monotonic())
+            sampler.sample()
+            on_update(sampler)
+    return sampler
+
+# --- Renderização (Rich) ---
+
+def render_steps(result: Dict[str, Any], success_msg: str, failure_msg: str) -> None:
+    """Exibe o resultado de uma sequência de comandos executada sem interface."""
+    for step in result["steps"]:
+        if step["success"]:
+            if step["stdout"]:
+                console.print(f"[success]Saída de {' '.join(step['command'])}:[/success]\n{step['stdout']}")
+        else:
+            print_panel(f"Comando falhou com código {step['returncode']}.\n[error]Erro:[/error]\n{step['stderr']}",
+                        "Erro", "error")
+    if result["success"]:
+        print_panel(success_msg, "Concluído", "success")
+    else:
+        print_panel(failure_msg, "Falha", "error")
+
+def render_update_steps(result: Dict[str, Any]) -> None:
+    """Exibe o status e o tempo de cada etapa da atualização do sistema."""
+    table = rich_table.Table(title="Etapas da Atualização", header_style="header")
+    table.add_column("Etapa", style="highlight")
+    table.add_column("Status")
+    table.add_column("Início", justify="right")
+    table.add_column("Duração", justify="right")
+    table.add_column("Detalhes")
+    labels = {'ok': "[success]ok[/success]", 'failed': "[error]falhou[/error]",
+              'skipped': "[info]pulada[/info]", 'blocked': "[warning]bloqueada[/warning]"}
+    for step in result["steps"]:
+        details = []
+        if "cache_bytes" in step:
+            details.append(f"{step['cached_packages']} pacotes, {format_bytes(step['cache_bytes'])}")
+        if "mirrors" in step:
+            details.append(", ".join(step["mirrors"]) or "nenhum espelho encontrado")
+        if step.get("reason"):
+            details.append(step["reason"])
+        if step.get("progress"):
+            stats = step["progress"]
+            rate = f", {stats['packages_per_s']:.1f} pac/s" if stats["packages_per_s"] else ""
+            details.append(f"{stats['packages']} pacotes{rate}")
+            if stats["errors"]:
+                details.append("erros do dpkg: " + "; ".join(stats["errors"]))
+            if stats["conffiles"]:
+                details.append(f"arquivos de configuração pendentes: {', '.join(stats['conffiles'])}")
+        if step["status"] == 'failed':
+            details.append(step.get("error") or step.get("exit_reason", ""))
+        table.add_row(step["name"], labels[step["status"]], f"+{step['start_s']:.1f} s",
+                      f"{step['duration_s']:.1f} s", "; ".join(d for d in details if d))
+    console.print(table)
+
+def render_system_update(result: Dict[str, Any]) -> None:
+    """Exibe o resultado da atualização executada sem interface."""
+    render_update_steps(result)
+    for step in result["steps"]:
+        if step["status"] == 'failed' and step.get("stderr"):
+            print_panel(rich_markup_escape(step["stderr"].strip()), f"Erro em '{step['name']}'", "error")
+    if result["success"]:
+        print_panel("O sistema foi atualizado com sucesso!", "Concluído", "success")
+    else:
+        print_panel("A atualização do sistema encontrou erros.", "Falha", "error")
+
+def render_ping(result: Dict[str, Any]) -> None:
+    """Exibe as estatísticas de ping de cada host em uma tabela."""
+    table = rich_table.Table(title=f"Ping: {len(result['hosts'])} host(s) em {result['elapsed_s']:.1f} s "
+                                   "(RTT em ms)", header_style="header")
+    table.add_column("Host", style="info")
+    table.add_column("Endereço")
+    table.add_column("Método")
+    for header in ("Env/Rec", "Perda", "Mín", "Méd", "Máx", "Desvio"):
+        table.add_column(header, justify="right")
+
+    def ms(value: Optional[float]) -> str:
+        return "-" if value is None else f"{value:.2f}"
+
+    errors = []
+    for host in result["hosts"]:
+        if "error" in host:
+            errors.append(f"[error]{rich_markup_escape(host['host'])}: {rich_markup_escape(host['error'])}[/error]")
+            table.add_row(host["host"], host["address"] or "-", host["method"] or "-", "-", "[error]erro[/error]",
+                          "-", "-", "-", "-")
+            continue
+        loss = host["loss_percent"]
+        style = "success" if loss == 0 else "warning" if loss < 100 else "error"
+        address = "" if host["address"] == host["host"] else host["address"]
+        table.add_row(host["host"], address, host["method"], f"{host['transmitted']}/{host['received']}",
+                      f"[{style}]{loss:g}%[/{style}]", ms(host["rtt_min_ms"]), ms(host["rtt_avg_ms"]),
+                      ms(host["rtt_max_ms"]), ms(host["rtt_stddev_ms"]))
+    console.print(table)
+    for line in errors:
+        console.print(line)
+
+def render_dns(result: Dict[str, Any]) -> None:
+    """Exibe as respostas DNS em uma tabela, com as estatísticas da consulta."""
+    stats = result["stats"]
+    table = rich_table.Table(title=f"DNS: {stats['names']} nome(s), {stats['lookups']} consultas em "
+                                   f"{stats['elapsed_s']:.2f} s",
+                             caption=f"Cache: {stats['cache_hits']} · hosts: {stats['hosts_file']} · "
+                                     f"pacotes enviados: {stats['queries']} · sistema: {stats['system']}",
+                             header_style="header")
+    table.add_column("Nome", style="info")
+    table.add_column("Tipo")
+    table.add_column("Endereços")
+    table.add_column("TTL", justify="right")
+    table.add_column("Origem")
+    labels = {'nxdomain': "[warning]não existe (NXDOMAIN)[/warning]", 'nodata': "[warning]sem registros[/warning]"}
+    for answer in result["results"]:
+        if answer["status"] == 'error':
+            addresses = f"[error]{rich_markup_escape(answer.get('error', 'erro'))}[/error]"
+        else:
+            addresses = labels.get(answer["status"]) or "\n".join(answer["addresses"])
+        table.add_row(answer["name"], answer["type"], addresses, str(answer["ttl"]) if answer["ttl"] else "-",
+                      answer["source"] or "-")
+    console.print(table)
+
+def format_trace_probe(probe: Optional[Dict[str, Any]]) -> str:
+    """RTT de uma sonda do traceroute (ou * se não houve resposta), com a anotação."""
+    if probe is None:
+        return "*"
+    return f"{probe['rtt_ms']:.2f}" + (f" {probe['note']}" if probe.get("note") else "")
+
+def render_traceroute(result: Dict[str, Any]) -> None:
+    """Exibe os saltos de um traceroute em uma tabela."""
+    target = result["host"] if result["address"] in (None, result["host"]) else f"{result['host']} ({result['address']})"
+    table = rich_table.Table(title=f"Traceroute para {target} · {result['method']} · {result['elapsed_s']:.2f} s",
+                             header_style="header")
+    table.add_column("Salto", justify="right")
+    table.add_column("Endereço", style="info")
+    table.add_column("RTT (ms)")
+    for hop in result["hops"]:
+        addresses = list(dict.fromkeys(probe["address"] for probe in hop["probes"] if probe))
+        table.add_row(str(hop["ttl"]), "\n".join(addresses) or "*",
+                      "  ".join(format_trace_probe(probe) for probe in hop["probes"]))
+    console.print(table)
+    if result["success"]:
+        console.print(f"[success]Destino alcançado em {len(result['hops'])} salto(s).[/success]")
+    else:
+        console.print("[warning]O destino não respondeu (filtro, limite de saltos ou rota inexistente).[/warning]")
+
+def format_scan_progress(path: str, stats: Dict[str, Any]) -> str:
+    """Linha de status de uma varredura de diretórios em andamento."""
+    return (f"[warning]Varrendo {rich_markup_escape(path)}... {stats['dirs_scanned'] + stats['dirs_cached']:,} "
+            f"diretórios ({stats['dirs_cached']:,} do cache)[/warning]")
+
+def format_search_progress(stats: Dict[str, Any]) -> str:
+    """Linha de status da busca pelos maiores arquivos."""
+    return (f"[warning]Procurando em {rich_markup_escape(stats['root'])}... {stats['files']:,} arquivos, "
+            f"{stats['dirs']:,} diretórios[/warning]")
+
+def render_directory_sizes(summary: Dict[str, Any]) -> None:
+    """Exibe os subdiretórios que mais ocupam espaço, com barras proporcionais (como o ncdu)."""
+    total = summary["disk_bytes"] or 1
+    scan = summary["scan"]
+    caption = [f"{scan['dirs_scanned']:,} diretórios lidos, {scan['dirs_cached']:,} do cache, "
+               f"{scan['elapsed_s']:.2f} s"]
+    if summary["more"]:
+        caption.append(f"+{summary['more']:,} subdiretórios menores")
+    if scan["errors"]:
+        caption.append(f"[error]{scan['errors']:,} diretórios ilegíveis[/error]")
+    if scan["skipped_mounts"]:
+        caption.append(f"{scan['skipped_mounts']:,} pontos de montagem ignorados")
+    if summary["approximate"]:
+        caption.append("[warning]≈ inclui diretórios do cache: use --no-cache para o valor exato[/warning]")
+    size = ("≈" if summary["approximate"] else "") + format_bytes(summary['disk_bytes'])
+    table = rich_table.Table(title=f"{rich_markup_escape(summary['path'])}: {size} "
+                                   f"em {summary['files']:,} arquivos e {summary['dirs']:,} diretórios",
+                             caption=" · ".join(caption), header_style="header")
+    table.add_column("#", justify="right", style="info")
+    table.add_column("Tamanho", justify="right", no_wrap=True)
+    table.add_column("%", justify="right")
+    table.add_column("", no_wrap=True)
+    table.add_column("Arquivos", justify="right")
+    table.add_column("Nome", style="highlight", overflow="fold")
+    rows = [(child["disk_bytes"], child["approximate"], str(number), child["files"],
+             rich_markup_escape(child["name"]) + "/" + (f" [error]({rich_markup_escape(child['error'])})[/error]"
+                                                        if child["error"] else ""))
+            for number, child in enumerate(summary["children"], 1)]
+    if summary["own_files"]:
+        rows.append((summary["own_disk_bytes"], summary["own_approximate"], "", summary["own_files"],
+                     "[dim](arquivos neste diretório)[/dim]"))
+    for size, approximate, number, files, name in sorted(rows, key=lambda row: row[0], reverse=True):
+        filled = round(size / total * 10)
+        table.add_row(number, ("≈" if approximate else "") + format_bytes(size), f"{size / total:.0%}",
+                      "█" * filled + "░" * (10 - filled), f"{files:,}", name)
+    console.print(table)
+
+def render_largest_files(result: Dict[str, Any]) -> None:
+    """Exibe os maiores arquivos encontrados."""
+    caption = [f"{result['files']:,} arquivos em {result['dirs']:,} diretórios, {result['matched']:,} nos filtros, "
+               f"{result['elapsed_s']:.1f} s"]
+    if result["errors"]:
+        caption.append(f"[error]{result['errors']:,} ilegíveis[/error]")
+    if result["skipped_mounts"]:
+        caption.append(f"{result['skipped_mounts']:,} montagens ignoradas")
+    table = rich_table.Table(title=f"{len(result['largest'])} Maiores Arquivos em "
+                                   f"{rich_markup_escape(', '.join(result['roots']))}",
+                             caption=" · ".join(caption), header_style="header")
+    table.add_column("#", justify="right", style="info")
+    table.add_column("Tamanho", justify="right", no_wrap=True)
+    table.add_column("Modificado", no_wrap=True)
+    table.add_column("Caminho", style="highlight", overflow="fold")
+    for number, entry in enumerate(result["largest"], 1):
+        table.add_row(str(number), format_bytes(entry["size_bytes"]), entry["modified"][:16].replace('T', ' '),
+                      rich_markup_escape(entry["path"]))
+    console.print(table)
+
+def format_duplicate_stages(result: Dict[str, Any]) -> str:
+    """Resumo das etapas da busca por duplicatas: quantos candidatos sobraram em cada uma e quanto foi lido."""
+    speed = f", {result['full_mb_per_s']:,.0f} MB/s" if result["full_mb_per_s"] else ""
+    return (f"{result['files']:,} arquivos → {result['size_candidates']:,} com tamanho repetido "
+            f"({result['size_s']:.1f} s) → {result['partial_candidates']:,} após o hash parcial "
+            f"({format_bytes(result['partial_bytes'])}, {result['partial_s']:.1f} s) → "
+            f"{result['full_hashed']:,} com hash completo ({format_bytes(result['full_bytes'])}, "
+            f"{result['full_s']:.1f} s{speed})")
+
+def render_duplicates(result: Dict[str, Any], limit: int = 20) -> None:
+    """Exibe os grupos de duplicatas (os que mais liberam espaço primeiro) e o resultado das ações."""
+    if not result["groups"]:
+        print_panel(f"Nenhuma duplicata em {', '.join(result['roots'])}.\n{format_duplicate_stages(result)}",
+                    "Duplicatas", "success")
+        return
+    caption = [format_duplicate_stages(result)]
+    if len(result["groups"]) > limit:
+        caption.append(f"+{len(result['groups']) - limit:,} grupos menores")
+    if result["already_linked"]:
+        caption.append(f"{result['already_linked']:,} links físicos já existentes")
+    if result["errors"]:
+        caption.append(f"[error]{result['errors']:,} ilegíveis[/error]")
+    if result["skipped_mounts"]:
+        caption.append(f"{result['skipped_mounts']:,} montagens ignoradas")
+    table = rich_table.Table(title=f"{len(result['groups']):,} Grupos de Duplicatas em "
+                                   f"{rich_markup_escape(', '.join(result['roots']))}: "
+                                   f"{format_bytes(result['reclaimable_bytes'])} recuperáveis",
+                             caption=" · ".join(caption), header_style="header")
+    table.add_column("#", justify="right", style="info")
+    table.add_column("Tamanho", justify="right", no_wrap=True)
+    table.add_column("Cópias", justify="right")
+    table.add_column("Recuperável", justify="right", no_wrap=True)
+    table.add_column(f"Mantido ({result['keep']}) / duplicatas", overflow="fold")
+    for number, group in enumerate(result["groups"][:limit], 1):
+        paths = [f"[highlight]{rich_markup_escape(group['keep'])}[/highlight]"]
+        for duplicate in group["duplicates"]:
+            paths.append(f"[dim]{rich_markup_escape(duplicate['paths'][0])}[/dim]")
+            paths.extend(f"[dim]  ↳ {rich_markup_escape(path)} (link)[/dim]" for path in duplicate["paths"][1:])
+        table.add_row(str(number), format_bytes(group["size_bytes"]), str(len(group["duplicates"]) + 1),
+                      format_bytes(group["size_bytes"] * len(group["duplicates"])), "\n".join(paths))
+    console.print(table)
+    if result["actions"]:
+        render_duplicate_actions(result["actions"], result["dry_run"])
+
+def render_duplicate_actions(actions: List[Dict[str, Any]], dry_run: bool) -> None:
+    """Resumo das ações sobre as duplicatas, com cada arquivo pulado ou com erro."""
+    verb = {'hardlink': "substituídos por links físicos", 'delete': "removidos"}[actions[0]["action"]]
+    counts = collections.Counter(outcome["status"] for outcome in actions)
+    freed = sum(outcome["freed_bytes"] for outcome in actions)
+    if dry_run:
+        message = f"Simulação: {counts['planned']:,} arquivos seriam {verb}, liberando {format_bytes(freed)}."
+    else:
+        message = f"{counts['done']:,} arquivos {verb}, {format_bytes(freed)} liberados."
+    problems = [f"[{'error' if outcome['status'] == 'error' else 'warning'}]{rich_markup_escape(outcome['paths'][0])}: "
+                f"{rich_markup_escape(outcome['error'])}[/]"
+                for outcome in actions if outcome["status"] in ('skipped', 'error')]
+    print_panel("\n".join([message] + problems), "Simulação" if dry_run else "Ações",
+                "error" if counts['error'] else "success")
+
+def render_latency_monitor(snapshots: List[Dict[str, Any]], started: float):
+    """Tabela do monitor de latência (custo proporcional ao número de alvos, não de amostras)."""
+    window = int(snapshots[0]["window_s"]) if snapshots else 0
+    errors = [f"[error]{rich_markup_escape(snap['host'])}: {rich_markup_escape(snap['error'])}[/error]"
+              for snap in snapshots if "error" in snap]
+    table = rich_table.Table(title=f"Monitor de Latência: {len(snapshots)} alvo(s), "
+                                   f"{datetime.timedelta(seconds=int(time.monotonic() - started))} "
+                                   f"(RTT em ms, janela de {window} s)",
+                             caption="\n".join(errors + ["* desde o início · Ctrl+C para sair"]),
+                             header_style="header")
+    table.add_column("Host", style="info")
+    for header in ("Último", "p50", "p90", "p99", "Perda", "p99*", "Perda*", "Sondas"):
+        table.add_column(header, justify="right")
+
+    def ms(value: Optional[float]) -> str:
+        return "-" if value is None else f"{value:.2f}"
+
+    def loss(value: Optional[float]) -> str:
+        if value is None:
+            return "-"
+        style = "success" if value == 0 else "warning" if value < 100 else "error"
+        return f"[{style}]{value:g}%[/{style}]"
+
+    for snap in snapshots:
+        if "error" in snap:
+            table.add_row(snap["host"], "[error]erro[/error]", *["-"] * 7)
+            continue
+        last = "[error]perdida[/error]" if snap["last_ms"] is None and snap["sent"] else ms(snap["last_ms"])
+        table.add_row(snap["host"], last, ms(snap["window_p50_ms"]), ms(snap["window_p90_ms"]),
+                      ms(snap["window_p99_ms"]), loss(snap["window_loss_percent"]), ms(snap["p99_ms"]),
+                      loss(snap["loss_percent"]), f"{snap['sent']:,}")
+    return table
+
+def render_disk_io(update: Optional[Dict[str, Any]]):
+    """Tabela do monitor de E/S de disco (taxas do último intervalo)."""
+    update = update or {"started": time.time(), "interval_s": CONFIG['diskio_interval'], "devices": []}
+    # Sem relógio corrente no título: com os discos ociosos, o quadro não muda e não precisa ser redesenhado
+    started = datetime.datetime.fromtimestamp(update["started"]).strftime('%H:%M:%S')
+    table = rich_table.Table(title=f"E/S de Disco: {len(update['devices'])} dispositivo(s) desde {started} "
+                                   f"(intervalo de {update['interval_s']:g} s)",
+                             caption="L/E: leitura/escrita · Espera: tempo médio por operação, com a fila · "
+                                     "Ctrl+C para sair",
+                             header_style="header")
+    table.add_column("Disco", style="info")
+    for header in ("Leitura/s", "Escrita/s", "IOPS L/E", "Espera L/E (ms)", "Ocupação"):
+        table.add_column(header, justify="right", no_wrap=True)
+
+    def ms(value: Optional[float]) -> str:
+        return "-" if value is None else f"{value:.2f}"
+
+    def util(value: Optional[float]) -> str:
+        if value is None:
+            return "-"
+        style = "success" if value < 50 else "warning" if value < 90 else "error"
+        filled = round(value / 20)
+        return f"[{style}]{'█' * filled}{'░' * (5 - filled)} {value:3.0f}%[/{style}]"
+
+    for device in update["devices"]:
+        table.add_row(device["device"], format_bytes(device["read_bytes_per_s"]),
+                      format_bytes(device["write_bytes_per_s"]),
+                      f"{device['read_iops']:,.0f}/{device['write_iops']:,.0f}",
+                      f"{ms(device['read_await_ms'])}/{ms(device['write_await_ms'])}", util(device["util_percent"]))
+    return table
+
+def live_redraw_on_change(live, render: Callable[[Any], Any], key: Callable[[Any], Any]) -> Callable[[Any], None]:
+    """
+    Callback de monitor ao vivo que só redesenha o Live quando key(update)
+    muda: desenhar uma tabela custa milissegundos, comparar o conteúdo não.
+    """
+    shown: List[Any] = [None]
+
+    def update(value: Any) -> None:
+        current = key(value)
+        if current != shown[0]:
+            shown[0] = current
+            live.update(render(value), refresh=True)
+    return update
+
+SPARK_BLOCKS = "▁▂▃▄▅▆▇█"
+
+def sparkline(values: List[float], width: int, high: float) -> str:
+    """As últimas `width` amostras (0 a `high`) em blocos de 8 alturas, alinhadas à direita."""
+    values = values[-width:]
+    padding = " " * (width - len(values))
+    if high <= 0:
+        return padding + SPARK_BLOCKS[0] * len(values)
+    top = len(SPARK_BLOCKS) - 1
+    scale = top / high
+    return padding + "".join([SPARK_BLOCKS[min(top, int(value * scale + 0.5))] for value in values])
+
+def memory_dashboard_rows(sampler: "MemorySampler", width: int) -> Tuple[Tuple[str, ...], ...]:
+    """
+    Linhas do painel de memória já formatadas: o Live compara estas tuplas e
+    só redesenha quando algo visível muda. Memória em escala fixa (o total de
+    RAM); taxas em escala do máximo da janela.
+    """
+    rows = []
+    for key, label, unit in MEMORY_METRICS:
+        ring = sampler.rings[key]
+        if not ring:
+            rows.append((label, "-", "-", "-", "-", ""))
+            continue
+        stats = ring.stats()
+        if unit == '/s':
+            shown = [f"{value:,.0f}" for value in (ring.last(), *stats)]
+        else:
+            shown = [format_bytes_compact(value) for value in (ring.last(), *stats)]
+        high = sampler.total if unit == 'bytes' else stats[2]
+        rows.append((label + ("" if unit == 'bytes' else "/s"), *shown, sparkline(ring.ordered(), width, high)))
+    return tuple(rows)
+
+def memory_sparkline_width(history: int) -> int:
+    """Largura do histórico que cabe no terminal ao lado das demais colunas."""
+    return max(8, min(history, get_console().width - 63))
+
+def render_memory_dashboard(sampler: "MemorySampler"):
+    """Tabela do monitor de memória, com o histórico de cada métrica em sparkline."""
+    table = rich_table.Table(title=f"Memória ao Vivo: {format_bytes(sampler.total)} de RAM, "
+                                   f"histórico de {sampler.history} amostras",
+                             caption="Mín/Média/Máx: janela do histórico · Ctrl+C para sair", header_style="header")
+    table.add_column("Métrica", style="info", no_wrap=True)
+    for header in ("Atual", "Mín", "Média", "Máx"):
+        table.add_column(header, justify="right", no_wrap=True)
+    table.add_column("Histórico", style="highlight", no_wrap=True)
+    for row in memory_dashboard_rows(sampler, memory_sparkline_width(sampler.history)):
+        table.add_row(*row)
+    return table
+
+def render_geolocation(result: Dict[str, Any]) -> None:
+    """Exibe a geolocalização de um IP em uma tabela."""
+    suffix = " (Cache)" if result["cached"] else ""
+    target = f"{result['host']} ({result['ip']})" if result.get("host") else result['ip']
+    table = rich_table.Table(title=f"Geolocalização para [bold]{target}[/bold]{suffix}", show_header=False)
+    table.add_column("Campo", style="warning")
+    table.add_column("Valor")
+    for key, value in result["data"].items():
+        table.add_row(key.capitalize(), str(value))
+    console.print(table)
+
+def render_geo_bulk_stats(stats: Dict[str, Any], output: str) -> None:
+    """Exibe o resumo de uma geolocalização em massa."""
+    style = "success" if not stats["errors"] else "warning"
+    print_panel(f"{stats['unique']} IPs únicos de {stats['total']} linhas: {stats['bogons']} privados/reservados, "
+                f"{stats['offline']} da base offline, {stats['cache_hits']} do cache, "
+                f"{stats['prefix_hits']} do cache por prefixo, "
+                f"{stats['fetched']} consultados, {stats['invalid']} inválidos, {stats['errors']} com erro.\n"
+                f"{stats['elapsed_s']:.1f} s ({stats['ips_per_s'] or 0:,.0f} IPs/s). Resultados em {output}.",
+                "Geolocalização em Massa", style)
+
+def render_enrich_stats(stats: Dict[str, Any], output: str) -> None:
+    """Exibe o resumo do enriquecimento de um log."""
+    style = "success" if not stats["errors"] else "warning"
+    print_panel(f"{stats['lines']:,} linhas ({format_bytes(stats['bytes'])}), {stats['lines_with_ips']:,} com IPs; "
+                f"{stats['unique_resolved']:,} IPs únicos resolvidos, {stats['errors']} com erro.\n"
+                f"{stats['elapsed_s']:.1f} s: {stats['lines_per_s'] or 0:,} linhas/s, {stats['mb_per_s'] or 0} MB/s. "
+                f"Resultado em {output}.", "Log Enriquecido", style)
+
+def render_disk_usage(records: List[Dict[str, Any]]) -> None:
+    """Exibe o uso de disco em uma tabela."""
+    table = rich_table.Table(title="Uso de Disco", header_style="header")
+    table.add_column("Sistema de Arquivos", style="highlight", overflow="fold")
+    for header in ("Tamanho", "Usado", "Disponível", "Uso%", "Inodes"):
+        table.add_column(header, justify="right", no_wrap=True)
+    table.add_column("Montado em", style="highlight", overflow="fold")
+    for record in records:
+        percent = f"{record['percent']:.0f}%" if record['percent'] is not None else "-"
+        inodes = f"{record['inodes_percent']:.0f}%" if record.get('inodes_percent') is not None else "-"
+        filesystem = record["filesystem"]
+        if record.get("fstype") and record["fstype"] != filesystem:
+            filesystem += f"\n[dim]{record['fstype']}[/dim]"
+        mountpoint = record["mountpoint"] + (" (ro)" if record.get("read_only") else "")
+        table.add_row(filesystem, format_bytes(record["total_bytes"]), format_bytes(record["used_bytes"]),
+                      format_bytes(record["available_bytes"]), percent, inodes, mountpoint)
+    console.print(table)
+
+def render_memory_usage(result: Dict[str, Any]) -> None:
+    """Exibe o uso de memória e swap em uma tabela."""
+    mem, swap = result["memory"], result["swap"]
+    table = rich_table.Table(title="Uso de Memória e Swap", header_style="header")
+    table.add_column("Tipo", style="highlight")
+    table.add_column("Total")
+    table.add_column("Usado")
+    table.add_column("Livre")
+    table.add_column("Percentual", style="warning")
+
+    table.add_row("Memória", f"{mem['total_bytes'] / (1024**3):.2f} GB", f"{mem['used_bytes'] / (1024**3):.2f} GB",
+                  f"{mem['available_bytes'] / (1024**3):.2f} GB", f"{mem['percent']}%", style="cyan")
+    table.add_row("Swap", f"{swap['total_bytes'] / (1024**3):.2f} GB", f"{swap['used_bytes'] / (1024**3):.2f} GB",
+                  f"{swap['free_bytes'] / (1024**3):.2f} GB", f"{swap['percent']}%", style="yellow")
+    console.print(table)
+
+def render_youtube_download(result: Dict[str, Any]) -> None:
+    """Exibe o resultado dos downloads do YouTube."""
+    for download in result["downloads"]:
+        if download["success"]:
+            console.print(f"[success]Baixado:[/success] {download['path']}")
+        else:
+            console.print(f"[error]Erro ao baixar '{download['title']}': {download['error']}[/error]")
+
+def render_inbox(email: str, inbox: List[Dict[str, Any]]) -> "rich_table.Table":
+    """Monta a tabela da caixa de entrada de um e-mail temporário."""
+    table = rich_table.Table(title=f"Caixa de Entrada de [bold]{email}[/bold]")
+    table.add_column("ID", style="dim")
+    table.add_column("De")
+    table.add_column("Assunto")
+    table.add_column("Data")
+    if not inbox:
+        table.add_row("-", "Caixa de entrada vazia", "-", "-")
+    for mail in inbox:
+        table.add_row(str(mail['id']), mail['from'], mail['subject'], mail['date'])
+    return table
+
+def render_temp_email(result: Dict[str, Any]) -> None:
+    """Exibe o e-mail temporário gerado ou a caixa de entrada consultada."""
+    if "messages" in result:
+        console.print(render_inbox(result["email"], result["messages"]))
+    else:
+        print_panel(f"Seu e-mail temporário é: [success]{result['email']}[/success]", "E-mail Temporário", "success")
+
+def render_system_info(info: Dict[str, Any]) -> None:
+    """Exibe as informações do sistema em uma tabela."""
+    table = rich_table.Table(title="Informações do Sistema", show_header=False)
+    table.add_column("Campo", style="warning")
+    table.add_column("Valor")
+    table.add_row("Versão do Script", info["script_version"])
+    table.add_row("Sistema Operacional", info["os"])
+    table.add_row("Versão do Sistema", info["os_release"])
+    table.add_row("Versão do Python", info["python_version"])
+    table.add_row("Diretório Atual", info["cwd"])
+    table.add_row("Tema Atual", info["theme"])
+    table.add_row("Memória Total", f"{info['memory_total_bytes'] / (1024**3):.2f} GB")
+    console.print(table)
+
+def render_network_status(status: Dict[str, Any]) -> None:
+    """Exibe o status da conexão e as interfaces de rede."""
+    if not status["online"]:
+        print_panel("Sem conexão de rede. Verifique sua internet.", "Erro de Rede", "error")
+        return
+    console.print("[success]Conexão de rede ativa![/success]")
+    table = rich_table.Table(title="Interfaces de Rede", header_style="header")
+    table.add_column("Interface", style="highlight")
+    table.add_column("Endereço IP")
+    table.add_column("Status")
+    for iface in status["interfaces"]:
+        table.add_row(iface["interface"], iface["address"], "Ativa" if iface["up"] else "Inativa",
+                      style="success" if iface["up"] else "error")
+    console.print(table)
+
+def render_temp_cleanup(result: Dict[str, Any]) -> None:
+    """Exibe o resumo da limpeza de arquivos temporários."""
+    verb = "Seriam removidos" if result["dry_run"] else "Removidos"
+    print_panel(f"{verb} {result['files']} arquivos, liberando {(result['bytes'] / (1024**2)):.2f} MB.",
+                "Limpeza Concluída", "success")
+
+# --- Funcionalidades do Menu ---
+
+@requires('rich.progress')
+def update_system() -> None:
+    """Atualiza os pacotes do sistema (APT ou PKG), rodando em paralelo as etapas independentes."""
+    clear_console()
+    console.print("[warning]Iniciando atualização do sistema...[/warning]")
+
+    try:
+        steps = system_update_steps()
+    except PermissionError as e:
+        print_panel(str(e), "Erro", "error")
+        return
+
+    status_labels = {'running': "[highlight]executando[/highlight]", 'ok': "[success]ok[/success]",
+                     'failed': "[error]falhou[/error]", 'skipped': "[info]pulada[/info]",
+                     'blocked': "[warning]bloqueada[/warning]"}
+    stderr_tails: Dict[str, OutputCapture] = {}
+
+    with rich_progress.Progress(
+        rich_progress.SpinnerColumn(),
+        rich_progress.TextColumn("{task.description}"),
+        rich_progress.BarColumn(bar_width=20),
+        rich_progress.TaskProgressColumn(),
+        rich_progress.TextColumn("{task.fields[status]}"),
+        rich_progress.TimeElapsedColumn(),
+        rich_progress.TimeRemainingColumn(),
+        rich_progress.TextColumn("[dim]{task.fields[detail]}[/dim]"),
+        console=get_console()
+    ) as progress:
+        tasks = {step.name: progress.add_task(step.message, total=1, start=False, status="[dim]aguardando[/dim]",
+                                              detail="")
+                 for step in steps}
+
+        def on_event(step: Step, status: str) -> None:
+            task = tasks[step.name]
+            if status == 'running':
+                # Barra indeterminada até o apt informar uma porcentagem
+                progress.update(task, total=None if step.command else 1)
+                progress.start_task(task)
+            else:
+                progress.update(task, total=1, completed=1)
+                progress.stop_task(task)
+            progress.update(task, status=status_labels[status])
+
+        def run_step(step: Step) -> Tuple[bool, Dict[str, Any]]:
+            if step.func is not None:
+                return _run_python_step(step)
+            stderr_tails[step.name] = make_capture(step.command, 'stderr')
+            parser = AptProgress()
+            task = tasks[step.name]
+            phase = [None]
+
+            def on_lines(stream: str, lines: List[str]) -> None:
+                if stream == 'stderr':
+                    stderr_tails[step.name].add_lines(lines)
+                lines = parser.feed(stream, lines)
+                if parser.phase is not None:
+                    if parser.phase != phase[0]:
+                        # Nova fase (download → instalação): recomeça a barra para o ETA valer para ela
+                        phase[0] = parser.phase
+                        progress.reset(task, total=100, completed=0)
+                    rate = parser.rate()
+                    detail = parser.phase + (f" · {len(parser.done)} pacotes" if parser.done else "")
+                    detail += f" · {rate:.1f} pac/s" if rate else ""
+                    progress.update(task, completed=parser.percent, detail=detail)
+                if not lines:
+                    return
+                prefix = f"[{step.name}] "
+                progress.console.print("\n".join(prefix + line for line in lines), markup=False,
+                                       highlight=False, soft_wrap=True,
+                                       style="warning" if stream == 'stderr' else "dim")
+            try:
+                result = execute_process(step.command, on_lines, step.timeout)
+            finally:
+                stderr_tails[step.name].close()
+            detail = result.to_dict() if result else {**result.to_dict(), "error": result.describe()}
+            if parser.phase is not None:
+                detail["progress"] = parser.summary()
+            return bool(result), detail
+
+        try:
+            outcomes = run_step_graph(steps, run_step, CONFIG['update_state_file'], CONFIG['update_max_workers'],
+                                      on_event)
+        except KeyboardInterrupt:
+            print_panel("Atualização cancelada; os comandos em execução foram encerrados.", "Cancelado", "warning")
+            input("\nPressione Enter para continuar...")
+            return
+
+    for outcome in outcomes:
+        if outcome["status"] == 'failed':
+            tail = stderr_tails.get(outcome["name"])
+            stderr = "\n".join(tail.lines()[-STDERR_TAIL_LINES:]) if tail else ""
+            message = outcome.get("error", "Falha na etapa.")
+            if stderr:
+                message += f"\n[error]Erro:[/error]\n{rich_markup_escape(stderr)}"
+            print_panel(message, f"Erro em '{outcome['name']}'", "error")
+            logging.error(f"Etapa '{outcome['name']}' da atualização falhou: {stderr.strip()}")
+
+    render_update_steps({"steps": outcomes})
+    if all(outcome["status"] in ('ok', 'skipped') for outcome in outcomes):
+        print_panel("O sistema foi atualizado com sucesso!", "Concluído", "success")
+    else:
+        print_panel("A atualização do sistema encontrou erros.", "Falha", "error")
+    input("\nPressione Enter para continuar...")
+
+def ping_host() -> None:
+    """Pinga um ou mais hosts (websites ou IPs) ao mesmo tempo e exibe as estatísticas."""
+    clear_console()
+    hosts = console.input("[info]Digite os websites ou IPs para pingar (separados por espaço ou vírgula): [/info]")
+    hosts = [host for host in re.split(r'[\s,]+', hosts) if host]
+    if not hosts:
+        console.print("[error]Nenhum host fornecido.[/error]")
+        return
+    invalid = [host for host in hosts if not (validate_ip(host) or validate_domain(host))]
+    if invalid:
+        console.print(f"[error]Host inválido: {rich_markup_escape(', '.join(invalid))}. "
+                      "Insira IPs ou domínios válidos.[/error]")
+        return
+
+    with console.status(f"[warning]Pingando {len(hosts)} host(s)...[/warning]"):
+        result = collect_ping(hosts)
+    render_ping(result)
+    input("\nPressione Enter para continuar...")
+
+@requires('rich.live')
+def monitor_latency_hosts() -> None:
+    """Monitora continuamente a latência de um ou mais hosts em um painel ao vivo."""
+    clear_console()
+    hosts = console.input("[info]Digite os websites ou IPs a monitorar (separados por espaço ou vírgula): [/info]")
+    hosts = [host for host in re.split(r'[\s,]+', hosts) if host]
+    started = time.monotonic()
+    try:
+        with rich_live.Live(render_latency_monitor([], started), console=get_console(), auto_refresh=False) as live:
+            final = monitor_latency(hosts, lambda snaps: live.update(render_latency_monitor(snaps, started),
+                                                                     refresh=True))
+            live.update(render_latency_monitor(final, started), refresh=True)
+    except ValueError as e:
+        console.print(f"[error]{rich_markup_escape(str(e))}[/error]")
+    input("\nPressione Enter para continuar...")
+
+@requires('psutil', 'rich.live')
+def monitor_disk_io_devices() -> None:
+    """Mostra ao vivo a vazão, as IOPS, a espera e a ocupação de cada disco."""
+    clear_console()
+    try:
+        with rich_live.Live(render_disk_io(None), console=get_console(), auto_refresh=False) as live:
+            monitor_disk_io(live_redraw_on_change(live, render_disk_io, lambda update: update["devices"]))
+    except ValueError as e:
+        console.print(f"[error]{rich_markup_escape(str(e))}[/error]")
+    input("\nPressione Enter para continuar...")
+
+def perform_traceroute() -> None:
+    """Traça a rota até um host, exibindo cada salto assim que ele é conhecido."""
+    clear_console()
+    host = console.input("[info]Digite o website ou IP de destino: [/info]").strip()
+    if not (validate_ip(host) or validate_domain(host)):
+        console.print("[error]Host inválido. Insira um IP ou domínio válido.[/error]")
+        time.sleep(1.5)
+        return
+    try:
+        with console.status(f"[warning]Traçando a rota até {host}...[/warning]") as status:
+            def on_hop(hop: Dict[str, Any]) -> None:
+                address = next((probe["address"] for probe in hop["probes"] if probe), "*")
+                status.update(f"[warning]Traçando a rota até {host}... salto {hop['ttl']}: {address}[/warning]")
+            result = collect_traceroute(host, on_hop=on_hop)
+        render_traceroute(result)
+    except (ValueError, OSError) as e:
+        print_panel(str(e), "Erro", "error")
+    input("\nPressione Enter para continuar...")
+
+def browse_directory_tree(tree: Dict[str, Any], top: int = 20) -> None:
+    """Navegação interativa pela árvore varrida: entra nos subdiretórios pelo número e volta com '..'."""
+    current = tree["root"]
+    while True:
+        clear_console()
+        summary = directory_summary(tree, current, top)
+        render_directory_sizes(summary)
+        choice = console.input("[info]Número para entrar, '..' para voltar, Enter para sair: [/info]").strip()
+        if not choice:
+            return
+        if choice == '..':
+            current = tree["nodes"][current].parent or current
+        elif choice.isdigit() and 1 <= int(choice) <= len(summary["children"]):
+            current = summary["children"][int(choice) - 1]["path"]
+
+@requires('sqlite3')
+def analyze_directory_usage() -> None:
+    """Varre um diretório em paralelo (com cache incremental) e navega pelos que mais ocupam espaço."""
+    clear_console()
+    path = os.path.expanduser(console.input("[info]Diretório a analisar (Enter: diretório atual): [/info]").strip()
+                              or os.getcwd())
+    try:
+        with console.status(format_scan_progress(path, {"dirs_scanned": 0, "dirs_cached": 0})) as status:
+            tree = scan_directory_tree(path, on_progress=lambda stats: status.update(format_scan_progress(path, stats)))
+    except OSError as e:
+        print_panel(f"Não foi possível analisar {path}: {e}", "Erro", "error")
+        input("\nPressione Enter para continuar...")
+        return
+    browse_directory_tree(tree)
+
+def show_largest_files() -> None:
+    """Procura os maiores arquivos em um diretório ou em todos os pontos de montagem."""
+    clear_console()
+    path = console.input("[info]Diretório (Enter: todos os pontos de montagem): [/info]").strip()
+    count = console.input("[info]Quantos arquivos listar? (Enter: 20): [/info]").strip() or "20"
+    extensions = console.input("[info]Extensões, ex.: .log .iso (Enter: todas): [/info]").strip()
+    if not count.isdigit() or int(count) < 1:
+        console.print("[error]Quantidade inválida.[/error]")
+        time.sleep(1.5)
+        return
+    try:
+        with console.status("[warning]Procurando os maiores arquivos...[/warning]") as status:
+            result = find_largest_files([os.path.expanduser(path)] if path else None, int(count),
+                                        extensions=re.split(r'[\s,]+', extensions) if extensions else None,
+                                        on_progress=lambda stats: status.update(format_search_progress(stats)))
+        render_largest_files(result)
+    except OSError as e:
+        print_panel(f"Não foi possível percorrer {path}: {e}", "Erro", "error")
+    input("\nPressione Enter para continuar...")
+
+def show_duplicate_files() -> None:
+    """Procura arquivos duplicados e oferece substituí-los por links físicos ou removê-los."""
+    clear_console()
+    path = console.input("[info]Diretórios (Enter: downloads de vídeo e áudio): [/info]").strip()
+    roots = [os.path.expanduser(root) for root in path.split()] if path else None
+    try:
+        with console.status("[warning]Procurando duplicatas...[/warning]") as status:
+            result = collect_duplicates(roots, on_progress=lambda text: status.update(f"[warning]{text}[/warning]"))
+    except (OSError, ValueError) as e:
+        print_panel(f"Não foi possível procurar duplicatas: {e}", "Erro", "error")
+        input("\nPressione Enter para continuar...")
+        return
+    render_duplicates(result)
+    if result["groups"]:
+        choice = console.input("[info]Ação: (h) links físicos, (d) remover, Enter: nenhuma: [/info]").strip().lower()
+        action = {'h': 'hardlink', 'd': 'delete'}.get(choice)
+        if action:
+            render_duplicate_actions(apply_duplicate_action(result, action, dry_run=True), dry_run=True)
+            if console.input("[warning]Aplicar? (s/N): [/warning]").strip().lower() == 's':
+                render_duplicate_actions(apply_duplicate_action(result, action, dry_run=False), dry_run=False)
+    input("\nPressione Enter para continuar...")
+
+@requires('sqlite3')
+def resolve_dns_names() -> None:
+    """Resolve nomes (A/AAAA) digitados ou de um arquivo, em paralelo e com cache."""
+    clear_console()
+    entry = console.input("[info]Nomes a resolver (separados por espaço/vírgula) ou arquivo com um por linha: "
+                          "[/info]").strip()
+    names = list(read_ip_list([entry])) if os.path.isfile(entry) else [name for name in re.split(r'[\s,]+', entry)
+                                                                        if name]
+    if not names:
+        console.print("[error]Nenhum nome fornecido.[/error]")
+        time.sleep(1.5)
+        return
+    with console.status(f"[warning]Resolvendo {len(names)} nome(s)...[/warning]"):
+        result = collect_dns(names)
+    render_dns(result)
+    input("\nPressione Enter para continuar...")
+
+@requires('requests', 'sqlite3')
+def geolocate_ip() -> None:
+    """Busca informações de geolocalização de um endereço IP."""
+    clear_console()
+    ip = console.input("[info]Digite o IP ou domínio para geolocalizar: [/info]").strip()
+    if not (validate_ip(ip) or validate_domain(ip)):
+        console.print("[error]IP inválido. Insira um endereço IP ou domínio válido.[/error]")
+        return
+
+    try:
+        result = collect_geolocation(ip)
+    except requests.RequestException as e:
+        print_panel(f"Erro ao contatar o serviço de geolocalização: {e}", "Erro de Rede", "error")
+        logging.error(f"Erro de geolocalização para o IP {ip}: {e}")
+        return
+    except (LookupError, DNSLookupError) as e:
+        print_panel(str(e), "Geolocalização", "warning")
+        input("\nPressione Enter para continuar...")
+        return
+
+    render_geolocation(result)
+    input("\nPressione Enter para continuar...")
+
+@requires('requests', 'sqlite3', 'rich.progress')
+def bulk_geolocate_ips() -> None:
+    """Geolocaliza os IPs de um arquivo, gravando os resultados em JSONL ou CSV."""
+    clear_console()
+    source = console.input("[info]Arquivo com os IPs (um por linha): [/info]").strip()
+    if not os.path.isfile(source):
+        console.print("[error]Arquivo não encontrado.[/error]")
+        time.sleep(1.5)
+        return
+    output = console.input("[info]Arquivo de saída (.jsonl ou .csv) [geo.jsonl]: [/info]").strip() or "geo.jsonl"
+    ips = list(read_ip_list([source]))
+    fmt = 'csv' if output.lower().endswith('.csv') else 'jsonl'
+
+    with open(output, 'w', newline='') as f, rich_progress.Progress(
+        rich_progress.TextColumn("{task.description}"),
+        rich_progress.BarColumn(),
+        rich_progress.MofNCompleteColumn(),
+        rich_progress.TimeRemainingColumn(),
+        console=get_console()
+    ) as progress:
+        task = progress.add_task("Geolocalizando...", total=len(set(ips)))
+        write = geo_result_writer(f, fmt)
+
+        def on_result(result: Dict[str, Any]) -> None:
+            write(result)
+            progress.advance(task)
+        try:
+            stats = geolocate_bulk(ips, on_result)
+        except KeyboardInterrupt:
+            stats = None
+    if stats is None:
+        print_panel(f"Interrompido; os resultados parciais estão em {output}.", "Cancelado", "warning")
+    else:
+        render_geo_bulk_stats(stats, output)
+    input("\nPressione Enter para continuar...")
+
+@requires('requests', 'sqlite3', 'rich.progress')
+def enrich_log_file() -> None:
+    """Anexa a geolocalização dos IPs às linhas de um arquivo de log."""
+    clear_console()
+    source = console.input("[info]Arquivo de log (ex.: /var/log/auth.log): [/info]").strip()
+    if not os.path.isfile(source):
+        console.print("[error]Arquivo não encontrado.[/error]")
+        time.sleep(1.5)
+        return
+    default_output = os.path.basename(source) + ".geo"
+    output = console.input(f"[info]Arquivo de saída [{default_output}]: [/info]").strip() or default_output
+
+    try:
+        with open(output, 'wb') as f, rich_progress.Progress(
+            rich_progress.TextColumn("{task.description}"),
+            rich_progress.BarColumn(),
+            rich_progress.DownloadColumn(),
+            rich_progress.TransferSpeedColumn(),
+            rich_progress.TimeRemainingColumn(),
+            console=get_console()
+        ) as progress:
+            task = progress.add_task("Enriquecendo...", total=os.path.getsize(source))
+            stats = enrich_log([source], f, on_progress=lambda size: progress.advance(task, size))
+    except KeyboardInterrupt:
+        print_panel(f"Interrompido; as linhas já processadas estão em {output}.", "Cancelado", "warning")
+        input("\nPressione Enter para continuar...")
+        return
+    except OSError as e:
+        print_panel(f"Erro ao processar o log: {e}", "Erro", "error")
+        input("\nPressione Enter para continuar...")
+        return
+    render_enrich_stats(stats, output)
+    input("\nPressione Enter para continuar...")
+
+def show_disk_usage() -> None:
+    """Exibe o uso de disco do sistema em uma tabela."""
+    clear_console()
+    try:
+        render_disk_usage(collect_disk_usage())
+    except (subprocess.CalledProcessError, OSError) as e:
+        print_panel(f"Não foi possível obter o uso de disco: {e}", "Erro", "error")
+    input("\nPressione Enter para continuar...")
+
+@requires('psutil')
+def show_memory_usage() -> None:
+    """Exibe o uso de memória e swap do sistema, com a opção de acompanhar ao vivo."""
+    clear_console()
+    try:
+        render_memory_usage(collect_memory_usage())
+    except Exception as e:
+        print_panel(f"Não foi possível obter o uso de memória: {e}", "Erro", "error")
+        input("\nPressione Enter para continuar...")
+        return
+    choice = console.input("\n[info]Enter para voltar ou 'a' para acompanhar ao vivo: [/info]").strip().lower()
+    if choice != 'a':
+        return
+    if not rich_live.available():
+        console.print(f"[error]Dependência ausente. {install_hint(['rich'])}[/error]")
+        time.sleep(1.5)
+        return
+    with rich_live.Live(console=get_console(), auto_refresh=False) as live:
+        monitor_memory(live_redraw_on_change(
+            live, render_memory_dashboard,
+            lambda sampler: memory_dashboard_rows(sampler, memory_sparkline_width(sampler.history))))
+    input("\nPressione Enter para continuar...")
+
+def _download_stream(stream, title: str, path: str,
+                     p_bar: Optional["rich_progress.Progress"] = None) -> Dict[str, Any]:
+    """
+    Função auxiliar para baixar um stream do YouTube, com barra de progresso
+    opcional. Retorna um dicionário com o resultado do download.
+    """
+    result = {"title": title, "path": path, "success": False, "error": None}
+    if p_bar is not None:
+        task = p_bar.add_task(f"[info]Baixando '{title}'...", total=stream.filesize)
+
+        def on_progress(stream, chunk, bytes_remaining):
+            p_bar.update(task, completed=stream.filesize - bytes_remaining)
+
+    try:
+        if p_bar is not None:
+            yt = stream._monostate
+            yt.register_on_progress_callback(on_progress)
+        temp_path = path + ".temp"
+        stream.download(output_path=os.path.dirname(path), filename=os.path.basename(temp_path))
+        if path.endswith('.mp3'):
+            convert = ['ffmpeg', '-i', temp_path, '-vn', '-acodec', 'mp3', path]
+            converted = (run_command(convert, "Convertendo para MP3...") if p_bar is not None
+                         else run_capture(convert)["success"])
+            if not converted:
+                raise RuntimeError("Falha na conversão para MP3")
+            os.remove(temp_path)
+        else:
+            os.rename(temp_path, path)
+        if p_bar is not None:
+            p_bar.update(task, completed=stream.filesize)
+        result["success"] = True
+    except Exception as e:
+        logging.error(f"Falha no download de '{title}': {e}")
+        result["error"] = str(e)
+        if p_bar is not None:
+            p_bar.print(f"[error]Erro ao baixar '{title}': {e}[/error]")
+    return result
+
+@requires('pytube', 'pytube.exceptions', 'rich.progress')
+def handle_youtube_download() -> None:
+    """Gerencia o download de vídeos ou áudios do YouTube."""
+    clear_console()
+    if not (check_directory_writable(VIDEO_DOWNLOAD_DIR) and check_directory_writable(AUDIO_DOWNLOAD_DIR)):
+        print_panel("Erro: Diretórios de download não são graváveis.", "Erro", "error")
+        return
+
+    url = console.input("[info]Insira a URL do vídeo ou playlist do YouTube: [/info]").strip()
+    if not url:
+        return
+
+    try:
+        playlist_title, urls = resolve_youtube_urls(url)
+        if playlist_title is not None:
+            console.print(f"[warning]Playlist encontrada:[/] [bold]{playlist_title}[/]")
+
+        choice = console.input("[bold]O que deseja baixar? (1) [success]Vídeo[/success] (2) [header]Áudio (MP3)[/header]: [/bold]").strip()
+        if choice not in ('1', '2'):
+            console.print("[error]Opção inválida.[/error]")
+            return
+
+        with rich_progress.Progress(
+            rich_progress.TextColumn("[progress.description]{task.description}"),
+            rich_progress.BarColumn(),
+            "[progress.percentage]{task.percentage:>3.0f}%",
+            rich_progress.TimeRemainingColumn(),
+            console=get_console()
+        ) as progress:
+            download_youtube(urls, audio=choice == '2', progress=progress)
+
+        print_panel("Downloads concluídos!", "Sucesso", "success")
+    except pytube_exceptions.PytubeError as e:
+        print_panel(f"Erro do Pytube: {e}", "Erro", "error")
+    except Exception as e:
+        print_panel(f"Ocorreu um erro inesperado: {e}", "Erro", "error")
+
+    input("\nPressione Enter para continuar...")
+
+@requires('requests', 'rich.live')
+def temporary_email() -> None:
+    """Gera um e-mail temporário e verifica a caixa de entrada."""
+    clear_console()
+    console.print("[warning]Aviso: E-mails temporários são públicos e não devem ser usados para dados sensíveis.[/warning]")
+    try:
+        email = generate_temp_email()
 
         print_panel(f"Seu e-mail temporário é: [success]{email}[/success]\n"
                     "Digite 'q' para sair ou aguarde novos e-mails...",
                     "E-mail Temporário", "success")
 
-        displayed_ids = set()
-        with Live(console=console, screen=False, auto_refresh=False) as live:
-            while True:
-                user_input = console.input("")
-                if user_input.lower() == 'q':
-                    console.print("[warning]Retornando ao menu principal...[/warning]")
-                    break
+        displayed_ids = set()
+        with rich_live.Live(console=get_console(), screen=False, auto_refresh=False) as live:
+            while True:
+                user_input = console.input("")
+                if user_input.lower() == 'q':
+                    console.print("[warning]Retornando ao menu principal...[/warning]")
+                    break
+
+                try:
+                    inbox = fetch_inbox(email)
+                    for mail in inbox:
+                        if mail['id'] not in displayed_ids:
+                            print_panel(f"Novo E-mail de: {mail['from']}\nAssunto: {mail['subject']}",
+                                        "Novo E-mail!", "warning")
+                            displayed_ids.add(mail['id'])
+
+                    live.update(render_inbox(email, inbox), refresh=True)
+                    time.sleep(5)
+
+                except requests.RequestException:
+                    time.sleep(10)
+
+    except requests.RequestException as e:
+        print_panel(f"Não foi possível conectar à API de e-mail: {e}", "Erro de Rede", "error")
+    except Exception as e:
+        print_panel(f"Ocorreu um erro: {e}", "Erro", "error")
+
+    time.sleep(1)
+
+@requires('rich.progress')
+def update_script() -> None:
+    """Atualiza o script a partir de um repositório Git."""
+    clear_console()
+    branch = get_current_branch() or 'main'
+    print_panel(f"Tentando atualizar o script via Git (branch: {branch})...", "Atualização", "warning")
+
+    if all(run_command(cmd, msg) for cmd, msg in script_update_commands(branch)):
+        print_panel("Script atualizado com sucesso!\nPor favor, reinicie o script para aplicar as mudanças.",
+                    "Sucesso", "success")
+        sys.exit(0)
+    else:
+        print_panel("A atualização via Git “‘falhou. Verifique se você clonou o repositório "
+                    "e se o Git está configurado corretamente.", "Falha", "error")
+    input("\nPressione Enter para continuar...")
+
+@requires('psutil')
+def show_system_info() -> None:
+    """Exibe informações detalhadas do sistema."""
+    clear_console()
+    render_system_info(collect_system_info())
+    input("\nPressione Enter para continuar...")
+
+@requires('psutil')
+def check_network_status() -> None:
+    """Verifica o status da conexão de rede."""
+    clear_console()
+    console.print("[info]Verificando status da rede...[/info]")
+    try:
+        render_network_status(collect_network_status())
+    except Exception as e:
+        print_panel(f"Erro ao verificar rede: {e}", "Erro", "error")
+    input("\nPressione Enter para continuar...")
+
+def clean_temp_files() -> None:
+    """Remove arquivos temporários do sistema."""
+    clear_console()
+    console.print("[warning]Limpando arquivos temporários...[/warning]")
+    try:
+        render_temp_cleanup(remove_temp_files())
+    except Exception as e:
+        print_panel(f"Erro ao limpar arquivos temporários: {e}", "Erro", "error")
+    input("\nPressione Enter para continuar...")
+
+# --- Benchmarks ---
+
+# Quando definida, o script encerra logo após desenhar o primeiro quadro do menu.
+STARTUP_PROBE_ENV = 'PYTOOLS_STARTUP_PROBE'
+
+
+def _parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """Extrai (módulo, self_us, cumulativo_us) das linhas de módulos de topo do -X importtime."""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        except ValueError:
+            continue
+        if name.startswith('  '):  # Importações aninhadas (indentadas) são contadas no pai
+            continue
+        entries.append((name.strip(), int(self_us), int(cumulative_us)))
+    return entries
+
+
+def benchmark_startup(runs: int = 10, max_ms: Optional[float] = None) -> int:
+    """
+    Mede o tempo entre a execução do script e o primeiro quadro do menu,
+    detalha o custo de importação (-X importtime) e verifica se algum módulo
+    pesado voltou a ser importado na inicialização.
+    Retorna o código de saída (0 = ok, 1 = regressão detectada).
+    """
+    script = os.path.abspath(__file__)
+    env = {**os.environ, STARTUP_PROBE_ENV: '1', 'TERM': 'dumb'}
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, script], env=env, stdin=subprocess.DEVNULL,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    median_ms = timings[len(timings) // 2]
+
+    # Caminho não interativo: um subcomando com --json não deve importar o Rich
+    cli_command = [sys.executable, script, 'disk', '--json']
+    cli_timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cli_command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL, check=False)
+        cli_timings.append((time.perf_counter() - start) * 1000)
+    cli_timings.sort()
+    cli_probe = subprocess.run([sys.executable, '-X', 'importtime'] + cli_command[1:], stdin=subprocess.DEVNULL,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=False)
+    cli_leaked = sorted(name for name, _, _ in _parse_importtime(cli_probe.stderr) if name.startswith('rich'))
+
+    probe = subprocess.run([sys.executable, '-X', 'importtime', script], env=env, stdin=subprocess.DEVNULL,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=False)
+    startup_imports = _parse_importtime(probe.stderr)
+    leaked = sorted(name for name, _, _ in startup_imports if name in LAZY_MODULES)
+
+    # Os módulos do menu são importados antes para contar apenas o custo incremental dos adiados
+    deferred_code = f"import rich.console, rich.table, rich.panel; import {', '.join(LAZY_MODULES)}"
+    deferred = subprocess.run([sys.executable, '-X', 'importtime', '-c', deferred_code],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=False)
+    deferred_us = sum(cumulative for name, _, cumulative in _parse_importtime(deferred.stderr)
+                      if name in LAZY_MODULES)
+
+    table = rich_table.Table(title="Inicialização até o Primeiro Quadro do Menu", header_style="header")
+    table.add_column("Métrica", style="highlight")
+    table.add_column("Valor", justify="right")
+    table.add_row("Execuções", str(runs))
+    table.add_row("Mínimo", f"{timings[0]:.1f} ms")
+    table.add_row("Mediana", f"{median_ms:.1f} ms")
+    table.add_row("Máximo", f"{timings[-1]:.1f} ms")
+    table.add_row("Importações adiadas (economia)", f"{deferred_us / 1000:.1f} ms")
+    table.add_row("CLI 'disk --json' (mediana)", f"{cli_timings[len(cli_timings) // 2]:.1f} ms")
+    console.print(table)
+
+    breakdown = rich_table.Table(title="Importações na Inicialização (-X importtime)", header_style="header")
+    breakdown.add_column("Módulo", style="highlight")
+    breakdown.add_column("Próprio (ms)", justify="right")
+    breakdown.add_column("Cumulativo (ms)", justify="right")
+    for name, self_us, cumulative_us in sorted(startup_imports, key=lambda e: e[2], reverse=True)[:15]:
+        breakdown.add_row(name, f"{self_us / 1000:.1f}", f"{cumulative_us / 1000:.1f}")
+    console.print(breakdown)
+
+    failed = False
+    if leaked:
+        print_panel(f"Módulos pesados importados na inicialização: {', '.join(leaked)}", "Regressão", "error")
+        failed = True
+    if cli_leaked:
+        print_panel(f"O Rich foi importado no modo --json: {', '.join(cli_leaked)}", "Regressão", "error")
+        failed = True
+    if max_ms is not None and median_ms > max_ms:
+        print_panel(f"Mediana de {median_ms:.1f} ms excede o limite de {max_ms:.1f} ms.", "Regressão", "error")
+        failed = True
+    if not failed:
+        print_panel("Nenhuma regressão de inicialização detectada.", "Concluído", "success")
+    return 1 if failed else 0
+
+def _rate_row(table, label: str, count: int, elapsed: float, baseline: Optional[float] = None) -> float:
+    """Adiciona uma linha de vazão (req/s e latência média) a uma tabela de benchmark."""
+    rate = count / elapsed if elapsed > 0 else float('inf')
+    speedup = f"{rate / baseline:.1f}x" if baseline else "1.0x"
+    table.add_row(label, str(count), f"{rate:,.1f}", f"{elapsed / count * 1000:.2f} ms", speedup)
+    return rate
+
+def _own_rss() -> int:
+    """RSS atual deste processo em bytes (de /proc/self/status; 0 se indisponível)."""
+    try:
+        with open('/proc/self/status') as f:
+            match = re.search(r'VmRSS:\s*(\d+)', f.read())
+    except OSError:
+        return 0
+    return int(match.group(1)) * 1024 if match else 0
+
+def _cpu_cost_us(action: Callable[[], Any], runs: int) -> float:
+    """Tempo médio de CPU (µs) de `action` em `runs` execuções, após uma de aquecimento."""
+    action()
+    start = time.process_time()
+    for _ in range(runs):
+        action()
+    return (time.process_time() - start) / runs * 1e6
+
+
+def benchmark_daemon(argv: List[str], requests_count: int = 1000, cold_runs: int = 10) -> int:
+    """
+    Compara a vazão (req/s) de um subcomando executado a frio (um processo por
+    chamada) com a do daemon aquecido, via cliente Python e via socket direto.
+    """
+    import tempfile
+    script = os.path.abspath(__file__)
+    with tempfile.TemporaryDirectory() as tmp:
+        socket_path = os.path.join(tmp, 'bench.sock')
+        daemon = subprocess.Popen([sys.executable, script, 'serve', '--socket', socket_path],
+                                  stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            deadline = time.monotonic() + 15
+            while not (os.path.exists(socket_path) and _socket_in_use(socket_path)):
+                if time.monotonic() > deadline or daemon.poll() is not None:
+                    print_panel("O daemon não iniciou a tempo.", "Erro", "error")
+                    return 1
+                time.sleep(0.05)
+
+            table = rich_table.Table(title=f"Vazão de '{' '.join(argv)}': Frio x Daemon", header_style="header")
+            table.add_column("Modo", style="highlight")
+            table.add_column("Requisições", justify="right")
+            table.add_column("req/s", justify="right")
+            table.add_column("Latência média", justify="right")
+            table.add_column("Ganho", justify="right")
+
+            start = time.perf_counter()
+            for _ in range(cold_runs):
+                subprocess.run([sys.executable, script] + argv + ['--json'], stdin=subprocess.DEVNULL,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+            baseline = _rate_row(table, "Execução a frio (processo + --json)", cold_runs, time.perf_counter() - start)
+
+            start = time.perf_counter()
+            for _ in range(cold_runs):
+                subprocess.run([sys.executable, script, 'client', '--socket', socket_path] + argv,
+                               stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                               check=False)
+            _rate_row(table, "Cliente Python (pytools.py client)", cold_runs, time.perf_counter() - start, baseline)
+
+            start = time.perf_counter()
+            for _ in range(requests_count):
+                daemon_request(argv, socket_path)
+            _rate_row(table, "Socket (conexão por requisição)", requests_count, time.perf_counter() - start, baseline)
+
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+                conn.connect(socket_path)
+                start = time.perf_counter()
+                for _ in range(requests_count):
+                    daemon_request(argv, socket_path, conn=conn)
+                _rate_row(table, "Socket (conexão persistente)", requests_count, time.perf_counter() - start,
+                          baseline)
+            console.print(table)
+        finally:
+            daemon.terminate()
+            daemon.wait(timeout=10)
+    return 0
+
+def serve_fake_dns(port: int, latency_ms: float) -> int:
+    """
+    Servidor DNS UDP local para benchmarks: responde A com um endereço derivado
+    do nome (TTL 300), AAAA sem registros e nomes "nx*" com NXDOMAIN (ambos com
+    SOA de TTL 60), após `latency_ms`. Imprime "127.0.0.1:porta" para dns_servers.
+    """
+    import asyncio
+    import zlib
+
+    def answer(query: bytes) -> bytes:
+        end = _skip_dns_name(query, 12)
+        qname, (qtype, _) = query[12:end], struct.unpack_from('!HH', query, end)
+        question = query[12:end + 4]
+        soa = b'\xc0\x0c' + struct.pack('!HHIH', 6, 1, 60, 22) + b'\0\0' + struct.pack('!IIIII', 1, 3600, 600, 86400, 60)
+        if qname[1:3] == b'nx':
+            return query[:2] + struct.pack('!HHHHH', 0x8183, 1, 0, 1, 0) + question + soa
+        if qtype != 1:
+            return query[:2] + struct.pack('!HHHHH', 0x8180, 1, 0, 1, 0) + question + soa
+        rdata = struct.pack('!I', (10 << 24) | zlib.crc32(qname) & 0xffffff)
+        record = b'\xc0\x0c' + struct.pack('!HHIH', 1, 1, 300, 4) + rdata
+        return query[:2] + struct.pack('!HHHHH', 0x8180, 1, 1, 0, 0) + question + record
+
+    class FakeDNS(asyncio.DatagramProtocol):
+        def connection_made(self, transport) -> None:
+            self.transport = transport
+
+        def datagram_received(self, data: bytes, source) -> None:
+            try:
+                reply = answer(data)
+            except (struct.error, IndexError):
+                return
+            asyncio.get_running_loop().call_later(latency_ms / 1000, self.transport.sendto, reply, source)
+
+    async def run() -> None:
+        transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(FakeDNS, local_addr=('127.0.0.1', port))
+        print(f"127.0.0.1:{transport.get_extra_info('sockname')[1]}", flush=True)
+        await asyncio.Event().wait()
+
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(run())
+    return 0
+
+def benchmark_dns(names: int = 5000, latency_ms: float = 20.0, serial: int = 100) -> int:
+    """
+    Resolve nomes sintéticos (10% inexistentes) contra um servidor DNS local com
+    latência simulada: em série, em paralelo com o cache vazio, de novo com o
+    cache em memória e com apenas o cache em disco (novo processo simulado).
+    """
+    global _ip_cache
+    import tempfile
+    server = subprocess.Popen([sys.executable, os.path.abspath(__file__), 'bench', 'dns-server', '--port', '0',
+                               '--latency-ms', str(latency_ms)],
+                              stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    address = server.stdout.readline().strip()
+    if not address:
+        print_panel("O servidor DNS de teste não iniciou.", "Erro", "error")
+        server.wait()
+        return 1
+    saved = {key: CONFIG[key] for key in ('dns_servers', 'dns_concurrency', 'dns_disk_cache')}
+    saved_cache = _ip_cache
+    targets = [f"{'nx' if index % 10 == 0 else 'host'}{index}.bench.test" for index in range(names)]
+    table = rich_table.Table(title=f"Resolução DNS: {names:,} nomes x (A, AAAA), servidor local de {latency_ms:.0f} ms, "
+                                   f"{saved['dns_concurrency']} consultas simultâneas", header_style="header")
+    table.add_column("Modo", style="highlight")
+    for header in ("Consultas", "Pacotes", "Tempo", "consultas/s", "Ganho"):
+        table.add_column(header, justify="right")
+    baseline = None
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            _ip_cache = IPCache(os.path.join(tmp, 'bench.sqlite3'), CONFIG['ip_cache_ttl'], names * 4)
+            CONFIG.update(dns_servers=[address], dns_disk_cache=True)
+            runs = [("Em série, cache vazio", targets[-serial:], 1, False),
+                    ("Paralelo, cache vazio", targets[:-serial], saved['dns_concurrency'], False),
+                    ("Cache em memória", targets, saved['dns_concurrency'], False),
+                    ("Cache em disco (memória vazia)", targets, saved['dns_concurrency'], True)]
+            for label, batch, concurrency, cold_memory in runs:
+                CONFIG['dns_concurrency'] = concurrency
+                if cold_memory:
+                    with _dns_memory_lock:
+                        _dns_memory.clear()
+                stats = resolve_names(batch)["stats"]
+                rate = stats["lookups"] / stats["elapsed_s"] if stats["elapsed_s"] else float('inf')
+                baseline = baseline or rate
+                table.add_row(label, f"{stats['lookups']:,}", f"{stats['queries']:,}", f"{stats['elapsed_s']:.2f} s",
+                              f"{rate:,.0f}", f"{rate / baseline:,.1f}x")
+            _ip_cache = saved_cache
+    finally:
+        CONFIG.update(saved)
+        _ip_cache = saved_cache
+        with _dns_memory_lock:
+            _dns_memory.clear()
+        server.terminate()
+        server.wait(timeout=10)
+    console.print(table)
+    return 0
+
+def make_fake_geo_server(latency: float = 0.0, fail_rate: float = 0.0, port: int = 0):
+    """
+    Cria um servidor HTTP local que imita a API do ipinfo (/<ip>/json,
+    keep-alive). `latency` simula o tempo de resposta (s) e `fail_rate` a
+    fração de respostas 429 (com Retry-After: 0). IPs 13.x.x.x recebem 404 e
+    /_stats/ informa quantas requisições foram atendidas.
+    Retorna (servidor, URL no formato de geo_api_url).
+    """
+    import http.server
+    served = [0]
+    served_lock = threading.Lock()
+
+    class FakeGeoHandler(http.server.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # Cabeçalhos e corpo saem em escritas separadas: sem isto, o keep-alive esbarra no ACK atrasado
+        disable_nagle_algorithm = True
+
+        def do_GET(self) -> None:
+            if latency:
+                time.sleep(latency)
+            ip = self.path.strip('/').split('/')[0]
+            if ip == '_stats':  # Contador de requisições, usado nos benchmarks
+                status, body = 200, json.dumps({"requests": served[0]}).encode()
+            elif fail_rate and random.random() < fail_rate:
+                status, body = 429, b'{"error": "rate limit"}'
+            elif ip.startswith('13.'):  # Faixa que simula IPs sem dados (erro definitivo)
+                status, body = 404, b'{"error": "not found"}'
+            else:
+                octets = ip.split('.')
+                status = 200
+                body = json.dumps({"ip": ip, "city": f"Cidade {octets[-1]}", "region": "Teste", "country": "BR",
+                                   "loc": f"-23.{octets[-1]},-46.{octets[0]}", "org": "AS64500 Rede de Teste",
+                                   "timezone": "America/Sao_Paulo"}).encode()
+            if ip != '_stats':
+                with served_lock:
+                    served[0] += 1
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            if status == 429:
+                self.send_header('Retry-After', '0')
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args) -> None:
+            pass
+
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', port), FakeGeoHandler)
+    server.daemon_threads = True
+    return server, f"http://127.0.0.1:{server.server_address[1]}/{{ip}}/json"
+
+def serve_fake_geo(port: int, latency_ms: float, fail_rate: float) -> int:
+    """Executa o servidor que imita o ipinfo até Ctrl+C, imprimindo a URL para `geo_api_url`."""
+    server, url = make_fake_geo_server(latency_ms / 1000, fail_rate, port)
+    print(url, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
 
-                check_url = f"{api_url}?action=getMessages&login={login}&domain={domain}"
-                try:
-                    res = requests.get(check_url)
-                    res.raise_for_status()
-                    inbox = res.json()
-
-                    table = Table(title=f"Caixa de Entrada de [bold]{email}[/bold]")
-                    table.add_column("ID", style="dim")
-                    table.add_column("De")
-                    table.add_column("Assunto")
-                    table.add_column("Data")
-
-                    if not inbox:
-                        table.add_row("-", "Caixa de entrada vazia", "-", "-")
-                    
-                    for mail in inbox:
-                        table.add_row(str(mail['id']), mail['from'], mail['subject'], mail['date'])
-                        if mail['id'] not in displayed_ids:
-                            print_panel(f"Novo E-mail de: {mail['from']}\nAssunto: {mail['subject']}",
-                                        "Novo E-mail!", "warning")
-                            displayed_ids.add(mail['id'])
+def benchmark_geo_bulk(count: int = 5000, latency_ms: float = 20.0, concurrency: int = 16,
+                       fail_rate: float = 0.0, sequential: int = 200) -> int:
+    """
+    Mede a vazão da geolocalização em massa contra um servidor local que imita
+    o ipinfo: uma requisição nova por IP (sem sessão, em série), o modo em massa
+    com cache vazio e o mesmo lote novamente (tudo do cache).
+    """
+    global _ip_cache
+    import tempfile
+    # O servidor roda em outro processo para não disputar o GIL com o cliente medido
+    server, url = _start_geo_server_process(latency_ms, fail_rate)
+    if not url:
+        print_panel("O servidor de teste não iniciou.", "Erro", "error")
+        server.wait()
+        return 1
+    saved = {key: CONFIG[key] for key in ('geo_api_url', 'geo_rate_limit', 'geo_backoff')}
+    saved_cache = _ip_cache
+    # Lista sintética com ~20% de linhas repetidas
+    rng = random.Random(42)
+    unique_ips = [f"11.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(count)]
+    ips = unique_ips + [rng.choice(unique_ips) for _ in range(count // 5)]
+    rng.shuffle(ips)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            CONFIG.update(geo_api_url=url, geo_rate_limit=0, geo_backoff=0.01)
+            _ip_cache = IPCache(os.path.join(tmp, 'bench.sqlite3'), CONFIG['ip_cache_ttl'], count * 2)
 
-                    live.update(table, refresh=True)
-                    time.sleep(5)
-                
-                except requests.RequestException:
-                    time.sleep(10)
+            table = rich_table.Table(title=f"Geolocalização em Massa ({len(ips)} linhas, {count} IPs únicos, "
+                                           f"latência {latency_ms:.0f} ms)", header_style="header")
+            table.add_column("Modo", style="highlight")
+            table.add_column("IPs", justify="right")
+            table.add_column("IPs/s", justify="right")
+            table.add_column("Tempo médio", justify="right")
+            table.add_column("Ganho", justify="right")
 
-    except requests.RequestException as e:
-        print_panel(f"Não foi possível conectar à API de e-mail: {e}", "Erro de Rede", "error")
-    except Exception as e:
-        print_panel(f"Ocorreu um erro: {e}", "Erro", "error")
-    
-    time.sleep(1)
+            sample = unique_ips[:sequential]
+            start = time.perf_counter()
+            for ip in sample:
+                requests.get(url.format(ip=ip), timeout=10).json()
+            baseline = _rate_row(table, "Série, requests.get por IP", len(sample), time.perf_counter() - start)
 
-def update_script() -> None:
-    """Atualiza o script a partir de um repositório Git."""
-    clear_console()
-    def get_current_branch() -> Optional[str]:
-        try:
-            result = subprocess.run(['git', 'rev-parse', '--abbrev-ref', 'HEAD'], capture_output=True, text=True, check=True)
-            return result.stdout.strip()
-        except subprocess.CalledProcessError:
-            return None
+            for label in (f"Em massa, {concurrency} conexões (cache vazio)", "Em massa, mesmo lote (cache)"):
+                results = []
+                stats = geolocate_bulk(ips, results.append, concurrency)
+                _rate_row(table, label, stats["unique"], stats["elapsed_s"], baseline)
+                if stats["errors"] or len(results) != count:
+                    print_panel(f"{stats['errors']} erros, {len(results)} resultados de {count}.", "Aviso", "warning")
+            console.print(table)
 
-    branch = get_current_branch() or 'main'
-    print_panel(f"Tentando atualizar o script via Git (branch: {branch})...", "Atualização", "warning")
-    
-    commands = [
-        (['git', 'fetch', 'origin'], "Buscando atualizações remotas..."),
-        (['git', 'reset', '--hard', f'origin/{branch}'], f"Resetando para a versão remota ({branch})..."),
-    ]
+            # Várias threads pedindo ao mesmo tempo os mesmos IPs fora do cache, duas vezes:
+            # a coalescência limita a 1 requisição por IP e o cache negativo evita repetir os 404
+            def served() -> int:
+                return requests.get(url.format(ip='_stats'), timeout=10).json()["requests"]
 
-    if all(run_command(cmd, msg) for cmd, msg in commands):
-        print_panel("Script atualizado com sucesso!\nPor favor, reinicie o script para aplicar as mudanças.",
-                    "Sucesso", "success")
-        sys.exit(0)
+            hot = [f"12.0.0.{i}" for i in range(50)] + [f"13.0.0.{i}" for i in range(50)]
+            for attempt in ("1ª rodada", "2ª rodada"):
+                before = served()
+
+                def lookup(ip: str) -> None:
+                    try:
+                        fetch_geolocation(ip, mode='online')
+                    except (requests.RequestException, LookupError):
+                        pass
+                with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                    list(pool.map(lookup, hot * 10))
+                console.print(f"[info]{attempt}: {len(hot) * 10} consultas simultâneas a {len(hot)} IPs "
+                              f"(metade com 404) → {served() - before} requisições ao servidor.[/info]")
+    finally:
+        CONFIG.update(saved)
+        _ip_cache = saved_cache
+        server.terminate()
+        server.wait(timeout=10)
+    return 0
+
+def synthetic_access_log(lines: int, networks: int = 3000, seed: int = 11) -> List[str]:
+    """
+    IPs de clientes de um log de acesso sintético: redes /24 (e algumas /48
+    IPv6) com popularidade de cauda longa (Zipf) e poucos hosts ativos por rede.
+    """
+    rng = random.Random(seed)
+    pool = []
+    for _ in range(networks):
+        if rng.random() < 0.1:
+            base = (0x2001 << 112) | (rng.getrandbits(32) << 80)
+            hosts = [str(ipaddress.IPv6Address(base | rng.getrandbits(64))) for _ in range(rng.randint(1, 20))]
+        else:
+            base = rng.randrange(1, 223) << 24 | rng.getrandbits(16) << 8
+            if bogon_info(str(ipaddress.IPv4Address(base))):
+                continue  # Redes privadas/reservadas são resolvidas sem cache
+            hosts = [str(ipaddress.IPv4Address(base | rng.randrange(1, 255))) for _ in range(rng.randint(1, 40))]
+        pool.append(hosts)
+    weights = [1 / (rank + 1) ** 1.1 for rank in range(len(pool))]
+    return [rng.choice(hosts) for hosts in rng.choices(pool, weights, k=lines)]
+
+def benchmark_geo_prefix(lines: int = 100000, log_path: Optional[str] = None) -> int:
+    """
+    Reproduz um log de acesso (real ou sintético) contra o cache exato e o
+    cache por prefixo, contando acertos e as consultas que iriam para a API.
+    """
+    global _ip_cache
+    import tempfile
+    if log_path:
+        ips = [ip for ip in read_ip_list([log_path]) if validate_ip(ip) and bogon_info(ip) is None]
     else:
-        print_panel("A atualização via Git “‘falhou. Verifique se você clonou o repositório "
-                    "e se o Git está configurado corretamente.", "Falha", "error")
-    input("\nPressione Enter para continuar...")
+        ips = synthetic_access_log(lines)
+    if not ips:
+        print_panel(f"Nenhum IP público em {log_path or 'log sintético'}.", "Erro", "error")
+        return 1
+    saved_cache, saved_prefix = _ip_cache, CONFIG['geo_prefix_cache']
+    table = rich_table.Table(title=f"Taxa de Acerto do Cache ({len(ips):,} linhas, {len(set(ips)):,} IPs únicos)",
+                             header_style="header")
+    for header in ("Cache", "Acertos", "Taxa de acerto", "Consultas à API", "Tempo", "µs/linha"):
+        table.add_column(header, justify="right" if header != "Cache" else "left",
+                         style="highlight" if header == "Cache" else None)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for label, prefix in (("Por IP (exato)", False),
+                                  (f"Por prefixo (/{CONFIG['geo_prefix_v4']}, /{CONFIG['geo_prefix_v6']})", True)):
+                CONFIG['geo_prefix_cache'] = prefix
+                _ip_cache = IPCache(os.path.join(tmp, f"{prefix}.sqlite3"), CONFIG['ip_cache_ttl'], len(ips) + 1)
+                hits = 0
+                start = time.perf_counter()
+                for ip in ips:
+                    if lookup_local(ip, 'online') is not None:
+                        hits += 1
+                    else:
+                        store_geolocation(ip, {"ip": ip, "country": "BR", "org": "AS64500 Rede de Teste"})
+                elapsed = time.perf_counter() - start
+                table.add_row(label, f"{hits:,}", f"{hits / len(ips):.1%}", f"{len(ips) - hits:,}",
+                              f"{elapsed:.1f} s", f"{elapsed / len(ips) * 1e6:.0f}")
+    finally:
+        _ip_cache, CONFIG['geo_prefix_cache'] = saved_cache, saved_prefix
+    console.print(table)
+    return 0
 
-def show_system_info() -> None:
-    """Exibe informações detalhadas do sistema."""
-    clear_console()
-    table = Table(title="Informações do Sistema", show_header=False)
-    table.add_column("Campo", style="warning")
-    table.add_column("Valor")
-    table.add_row("Versão do Script", SCRIPT_VERSION)
-    table.add_row("Sistema Operacional", platform.system())
-    table.add_row("Versão do Sistema", platform.release())
-    table.add_row("Versão do Python", sys.version.split()[0])
-    table.add_row("Diretório Atual", os.getcwd())
-    table.add_row("Tema Atual", CONFIG['theme'])
-    table.add_row("Memória Total", f"{psutil.virtual_memory().total / (1024**3):.2f} GB")
+def benchmark_geo_enrich(lines: int = 1000000) -> int:
+    """
+    Enriquece logs sintéticos no formato do nginx (1/10 do tamanho e o tamanho
+    pedido) com o cache já aquecido, via `geo-enrich` em um processo separado,
+    e compara linhas/s e a memória máxima (que deve ficar estável).
+    """
+    import tempfile
+    if not hasattr(os, 'wait4'):
+        print_panel("Este benchmark requer os.wait4 (Linux/Unix).", "Erro", "error")
+        return 1
+    table = rich_table.Table(title="Enriquecimento de Logs (cache aquecido)", header_style="header")
+    for header in ("Linhas", "Tamanho", "Tempo", "linhas/s", "MB/s", "RSS máximo"):
+        table.add_column(header, justify="right")
+    with tempfile.TemporaryDirectory() as tmp:
+        ips = synthetic_access_log(lines)
+        cache = IPCache(os.path.join(tmp, 'ip_cache.sqlite3'), CONFIG['ip_cache_ttl'], len(ips) + 1)
+        for ip in set(ips):
+            cache.put(ip, {"ip": ip, "country": "BR", "city": "São Paulo", "org": "AS64500 Rede de Teste"})
+        for count in (max(1, lines // 10), lines):
+            log = os.path.join(tmp, f'access-{count}.log')
+            with open(log, 'w') as f:
+                for i, ip in enumerate(ips[:count]):
+                    f.write(f'{ip} - - [16/Oct/2026:10:{i // 60 % 60:02d}:{i % 60:02d} +0000] '
+                            f'"GET /pagina/{i % 500} HTTP/1.1" 200 {512 + i % 4096} "-" "Mozilla/5.0"\n')
+            # O cache fica no diretório de trabalho do processo filho (ip_cache_db relativo)
+            process = subprocess.Popen([sys.executable, os.path.abspath(__file__), 'geo-enrich', log,
+                                        '-o', os.devnull], cwd=tmp, stdin=subprocess.DEVNULL,
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+            err = process.stderr.read()
+            _, status, usage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+            try:
+                stats = json.loads(err.strip().splitlines()[-1])
+            except (ValueError, IndexError):
+                print_panel(f"geo-enrich falhou:\n{rich_markup_escape(err[-2000:])}", "Erro", "error")
+                return 1
+            # ru_maxrss está em KB no Linux e em bytes no macOS
+            rss = usage.ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+            table.add_row(f"{stats['lines']:,}", format_bytes(stats['bytes']), f"{stats['elapsed_s']:.1f} s",
+                          f"{stats['lines_per_s']:,}", f"{stats['mb_per_s']}", format_bytes(rss))
     console.print(table)
-    input("\nPressione Enter para continuar...")
+    return 0
 
-def check_network_status() -> None:
-    """Verifica o status da conexão de rede."""
-    clear_console()
-    console.print("[info]Verificando status da rede...[/info]")
+def _start_geo_server_process(latency_ms: float, fail_rate: float = 0.0):
+    """Inicia o servidor que imita o ipinfo em outro processo e retorna (processo, URL) ou (processo, '')."""
+    server = subprocess.Popen([sys.executable, os.path.abspath(__file__), 'bench', 'geo-server', '--port', '0',
+                               '--latency-ms', str(latency_ms), '--fail-rate', str(fail_rate)],
+                              stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    return server, server.stdout.readline().strip()
+
+def benchmark_ping(hosts: int = 256, count: int = 4, interval: float = 0.2) -> int:
+    """
+    Pinga endereços de loopback (127.0.0.0/8) ao mesmo tempo com o motor nativo
+    (ICMP e TCP) e, se o comando ping existir, com um processo por host.
+    """
+    import shutil
+    targets = [str(ipaddress.IPv4Address((127 << 24) + 1 + index)) for index in range(hosts)]
+    table = rich_table.Table(title=f"Ping de {hosts} hosts ({count} pacotes, intervalo {interval} s)",
+                             header_style="header")
+    table.add_column("Modo", style="highlight")
+    for header in ("Respostas", "Tempo", "CPU", "RTT médio"):
+        table.add_column(header, justify="right")
+
+    def measure(label: str, run: Callable[[], List[Dict[str, Any]]]) -> None:
+        cpu_start = sum(os.times()[:4])
+        start = time.perf_counter()
+        results = run()
+        elapsed = time.perf_counter() - start
+        cpu = sum(os.times()[:4]) - cpu_start
+        received = sum(result["received"] or 0 for result in results)
+        rtts = [result["rtt_avg_ms"] for result in results if result["rtt_avg_ms"] is not None]
+        table.add_row(label, f"{received}/{hosts * count}", f"{elapsed:.2f} s", f"{cpu:.2f} s",
+                      f"{sum(rtts) / len(rtts):.3f} ms" if rtts else "-")
+
+    # Sem accept(): o kernel completa os handshakes na fila do listen
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(('0.0.0.0', 0))
+    listener.listen(4096)
+    port = listener.getsockname()[1]
     try:
-        # Tenta conectar a um servidor confiável
-        socket.create_connection(("8.8.8.8", 53), timeout=5)
-        console.print("[success]Conexão de rede ativa![/success]")
-        
-        # Obtém informações de interfaces de rede
-        table = Table(title="Interfaces de Rede", header_style="header")
-        table.add_column("Interface", style="highlight")
-        table.add_column("Endereço IP")
-        table.add_column("Status")
-        
-        for interface, addrs in psutil.net_if_addrs().items():
-            for addr in addrs:
-                if addr.family == socket.AF_INET:
-                    status = psutil.net_if_stats()[interface].isup
-                    table.add_row(interface, addr.address, "Ativa" if status else "Inativa", style="success" if status else "error")
-        
+        for method in ('icmp', 'tcp'):
+            if method == 'icmp' and not open_icmp_socket(socket.AF_INET):
+                table.add_row("Nativo ICMP", "[warning]sem permissão[/warning]", "-", "-", "-")
+                continue
+            measure(f"Nativo {method.upper()} (asyncio)",
+                    lambda: collect_ping(targets, count, interval, method=method, port=port)["hosts"])
+    finally:
+        listener.close()
+    if shutil.which('ping'):
+        workers = min(hosts, 64)
+
+        def system_ping(host: str) -> Dict[str, Any]:
+            output = run_capture(['ping', '-n', '-c', str(count), '-i', str(interval), host],
+                                 timeout=count * interval + 10)["stdout"]
+            return parse_ping_output(output)
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            measure(f"ping do sistema ({workers} processos por vez)", lambda: list(pool.map(system_ping, targets)))
+    else:
+        table.add_row("ping do sistema", "[warning]comando ausente[/warning]", "-", "-", "-")
+    console.print(table)
+    return 0
+
+def benchmark_latency_histogram(samples: int = 1000000) -> int:
+    """
+    Mede o custo de registrar amostras no histograma de latência, o custo dos
+    percentis conforme as amostras crescem e o erro contra os percentis exatos.
+    """
+    import math
+    rng = random.Random(11)
+    values = [rng.lognormvariate(3.0, 0.6) for _ in range(samples)]  # ms, mediana ~20
+    tracker = LatencyTracker({"host": "bench"})
+    table = rich_table.Table(title=f"Histograma de Latência ({HIST_BUCKETS} buckets, "
+                                   f"{format_bytes(tracker.overall.counts.itemsize * HIST_BUCKETS)} por histograma)",
+                             header_style="header")
+    for header in ("Amostras", "Registro (µs/amostra)", "p50/p90/p99 (µs)", "Erro máx. vs exato"):
+        table.add_column(header, justify="right")
+    checkpoints = sorted({min(samples, 10 ** exponent) for exponent in range(3, 8)})
+    recorded = 0
+    for checkpoint in checkpoints:
+        start = time.perf_counter()
+        for value in values[recorded:checkpoint]:
+            tracker.record(value, 0.0)
+        record_us = (time.perf_counter() - start) / (checkpoint - recorded) * 1e6
+        recorded = checkpoint
+        start = time.perf_counter()
+        for _ in range(100):
+            estimated = tracker.overall.percentiles((0.5, 0.9, 0.99))
+        percentile_us = (time.perf_counter() - start) / 100 * 1e6
+        exact = sorted(values[:checkpoint])
+        truth = [exact[max(0, math.ceil(fraction * checkpoint) - 1)] for fraction in (0.5, 0.9, 0.99)]
+        errors = [abs(estimate - value) / value for estimate, value in zip(estimated, truth)]
+        table.add_row(f"{checkpoint:,}", f"{record_us:.2f}", f"{percentile_us:.0f}", f"{max(errors):.2%}")
+    console.print(table)
+    return 0
+
+def benchmark_disk_usage(runs: int = 200) -> int:
+    """
+    Compara o df em subprocesso com o coletor em processo (tabela lida de
+    /proc/self/mounts ou do psutil.disk_partitions) e confere se os tamanhos
+    batem com os do df. Retorna 1 se algum sistema de arquivos divergir.
+    """
+    def partitions() -> List[Tuple[str, str, str, str]]:
+        return [(part.device, part.mountpoint, part.fstype, part.opts) for part in psutil.disk_partitions(all=True)]
+
+    paths = [("df -kP (subprocesso)", collect_disk_usage_df)]
+    if read_mount_table() is not None:
+        paths.append(("tabela de montagens + statvfs", collect_disk_usage))
+    if psutil.available():
+        import_probe = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import psutil'],
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=False)
+        import_ms = max((cumulative for name, _, cumulative in _parse_importtime(import_probe.stderr)
+                         if name == 'psutil'), default=0) / 1000
+        paths.append(("psutil.disk_partitions + statvfs", lambda: collect_disk_usage(mounts=partitions())))
+
+    table = rich_table.Table(title=f"Uso de Disco: df x statvfs ({runs} coletas)", header_style="header")
+    for header in ("Caminho", "Mediana (ms)", "p90 (ms)", "Ganho"):
+        table.add_column(header, justify="right" if header != "Caminho" else "left")
+    baseline = None
+    for label, collect in paths:
+        collect()  # aquece o cache de páginas e as importações
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            collect()
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        median = timings[len(timings) // 2]
+        baseline = baseline or median
+        table.add_row(label, f"{median:.3f}", f"{timings[int(len(timings) * 0.9)]:.3f}", f"{baseline / median:.1f}x")
+    if psutil.available():
+        table.caption = f"Importar o psutil custa {import_ms:.1f} ms uma vez por processo."
+    console.print(table)
+
+    # Os tamanhos totais não mudam entre as coletas; usado/disponível podem mudar
+    df_totals = {record["mountpoint"]: record["total_bytes"] // 1024 for record in collect_disk_usage_df()}
+    own_totals = {record["mountpoint"]: record["total_bytes"] // 1024 for record in collect_disk_usage()}
+    mismatched = sorted(mountpoint for mountpoint in df_totals.keys() | own_totals.keys()
+                        if df_totals.get(mountpoint) != own_totals.get(mountpoint))
+    if mismatched:
+        print_panel(f"Divergências com o df: {', '.join(mismatched)}", "Paridade", "error")
+        return 1
+    print_panel(f"{len(own_totals)} sistemas de arquivos iguais aos do df.", "Paridade", "success")
+    return 0
+
+def benchmark_disk_io(samples: int = 1000) -> int:
+    """
+    Custo de CPU de cada amostra do monitor de E/S (leitura dos contadores,
+    cálculo das taxas e desenho da tabela) e a fração de CPU a 1 Hz; se o
+    iostat existir, compara com uma execução dele por amostra. Depois roda o
+    monitor por `samples` amostras seguidas e confere que a memória (RSS)
+    não cresce. Retorna 1 se crescer mais de 1 MB.
+    """
+    import shutil
+
+    previous = psutil.disk_io_counters(perdisk=True)
+    current = psutil.disk_io_counters(perdisk=True)
+    rates = disk_io_rates(previous, current, 1.0)
+    update = {"started": time.time(), "interval_s": 1.0, "devices": rates}
+    with open(os.devnull, 'w') as null:
+        hidden = rich_console.Console(file=null, width=100, force_terminal=True,
+                                      theme=rich_theme.Theme(THEMES.get(CONFIG['theme'], THEMES['dark'])))
+        stages = [("psutil.disk_io_counters(perdisk=True)", lambda: psutil.disk_io_counters(perdisk=True)),
+                  ("taxas (disk_io_rates)", lambda: disk_io_rates(previous, current, 1.0)),
+                  ("tabela Rich", lambda: hidden.print(render_disk_io(update)))]
+        # O desenho custa milissegundos: poucas repetições bastam
+        costs = [(label, _cpu_cost_us(action, samples if index < 2 else min(samples, 200)))
+                 for index, (label, action) in enumerate(stages)]
+    table = rich_table.Table(title=f"Monitor de E/S: custo por amostra ({len(current)} dispositivos, "
+                                   f"{samples:,} amostras)", header_style="header")
+    for header in ("Etapa", "CPU (µs)", "CPU a 1 Hz"):
+        table.add_column(header, justify="right" if header != "Etapa" else "left")
+    for label, cost in costs:
+        table.add_row(label, f"{cost:,.0f}", f"{cost / 1e4:.4f}%")
+    total = sum(cost for _, cost in costs)
+    table.add_row("[bold]amostra com mudança (redesenha)[/bold]", f"{total:,.0f}", f"{total / 1e4:.4f}%")
+    idle = costs[0][1] + costs[1][1]
+    table.add_row("[bold]amostra sem mudança (discos ociosos)[/bold]", f"{idle:,.0f}", f"{idle / 1e4:.4f}%")
+    if shutil.which('iostat'):
+        runs = min(samples, 50)
+        start = time.perf_counter()
+        for _ in range(runs):
+            subprocess.run(['iostat', '-dx'], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+        cost = (time.perf_counter() - start) / runs * 1e6
+        table.add_row("iostat -dx (um processo por amostra, tempo real)", f"{cost:,.0f}", f"{cost / 1e4:.4f}%")
+    console.print(table)
+
+    counted = 0
+
+    def count(_: Dict[str, Any]) -> None:
+        nonlocal counted
+        counted += 1
+
+    monitor_disk_io(count, interval=0.001, duration=0.05)
+    before = _own_rss()
+    with console.status(f"[warning]Rodando o monitor por {samples:,} amostras...[/warning]"):
+        monitor_disk_io(count, interval=0.001, duration=samples / 1000)
+    growth = _own_rss() - before
+    message = f"RSS variou {format_bytes(max(growth, 0))} em {counted:,} amostras."
+    if growth > 1024 * 1024:
+        print_panel(message, "Memória", "error")
+        return 1
+    print_panel(message, "Memória", "success")
+    return 0
+
+def benchmark_memory_monitor(samples: int = 20000, history: int = 120) -> int:
+    """
+    Custo de CPU de cada etapa de uma amostra do monitor de memória (leitura,
+    linhas do painel, desenho da tabela), quantos quadros o "redesenhar só
+    quando muda" evita em uma execução curta, e o RSS antes e depois de
+    `samples` amostras seguidas nos anéis. Retorna 1 se o RSS crescer mais de 1 MB.
+    """
+    import types
+
+    sampler = MemorySampler(history)
+    for _ in range(history):
+        sampler.sample()
+    width = 60
+    with open(os.devnull, 'w') as null:
+        hidden = rich_console.Console(file=null, width=140, force_terminal=True,
+                                      theme=rich_theme.Theme(THEMES.get(CONFIG['theme'], THEMES['dark'])))
+        costs = [("amostra (psutil + /proc/vmstat + anéis)", _cpu_cost_us(sampler.sample, 2000)),
+                 ("linhas do painel (comparação)", _cpu_cost_us(lambda: memory_dashboard_rows(sampler, width), 2000)),
+                 ("tabela Rich", _cpu_cost_us(lambda: hidden.print(render_memory_dashboard(sampler)), 100))]
+    table = rich_table.Table(title=f"Monitor de Memória: custo por amostra ({len(MEMORY_METRICS)} métricas, "
+                                   f"histórico de {history})", header_style="header")
+    for header in ("Etapa", "CPU (µs)", "CPU a 1 Hz"):
+        table.add_column(header, justify="right" if header != "Etapa" else "left")
+    for label, cost in costs:
+        table.add_row(label, f"{cost:,.0f}", f"{cost / 1e4:.4f}%")
+    unchanged = costs[0][1] + costs[1][1]
+    table.add_row("[bold]amostra sem mudança visível[/bold]", f"{unchanged:,.0f}", f"{unchanged / 1e4:.4f}%")
+    table.add_row("[bold]amostra com redesenho[/bold]", f"{unchanged + costs[2][1]:,.0f}",
+                  f"{(unchanged + costs[2][1]) / 1e4:.4f}%")
+
+    # Execução curta com um Live de mentira e histórico pequeno (cheio em 1 s): conta quantas
+    # amostras, depois de o histórico encher, mudaram o que estaria na tela
+    short = 10
+    redraws = updates = 0
+
+    def redraw(renderable: Any, refresh: bool = False) -> None:
+        nonlocal redraws
+        redraws += updates > short
+
+    on_change = live_redraw_on_change(types.SimpleNamespace(update=redraw), render_memory_dashboard,
+                                      lambda current: memory_dashboard_rows(current, short))
+
+    def on_update(current: MemorySampler) -> None:
+        nonlocal updates
+        updates += 1
+        on_change(current)
+
+    with console.status("[warning]Rodando o monitor por 10 s (10 amostras/s)...[/warning]"):
+        monitor_memory(on_update, interval=0.1, history=short, duration=10)
+    full = updates - short
+    table.caption = (f"Com o histórico cheio ({short} amostras): {redraws} redesenhos em {full} amostras, "
+                     f"{1 - redraws / full:.0%} dos quadros evitados")
+    console.print(table)
+
+    before = _own_rss()
+    with console.status(f"[warning]{samples:,} amostras seguidas...[/warning]"):
+        for _ in range(samples):
+            sampler.sample()
+            memory_dashboard_rows(sampler, width)
+    growth = _own_rss() - before
+    message = (f"RSS variou {format_bytes(max(growth, 0))} em {samples:,} amostras; "
+               f"anéis: {len(MEMORY_METRICS)} × {history} × 8 B = {format_bytes(len(MEMORY_METRICS) * history * 8)}.")
+    if growth > 1024 * 1024:
+        print_panel(message, "Memória", "error")
+        return 1
+    print_panel(message, "Memória", "success")
+    return 0
+
+def make_synthetic_tree(root: str, files: int, per_dir: int = 100, fanout: int = 10, seed: int = 21) -> List[str]:
+    """
+    Cria em `root` uma árvore com `files` arquivos esparsos (tamanho aparente
+    variado, sem ocupar o disco), `per_dir` por diretório folha e `fanout`
+    subdiretórios por nível. Retorna os caminhos das folhas.
+    """
+    rng = random.Random(seed)
+    leaves = max(1, files // per_dir)
+    depth = 1
+    while fanout ** depth < leaves:
+        depth += 1
+    leaf_paths = []
+    for leaf in range(leaves):
+        digits = []
+        for _ in range(depth):
+            leaf, digit = divmod(leaf, fanout)
+            digits.append(f"d{digit}")
+        path = os.path.join(root, *reversed(digits))
+        os.makedirs(path)
+        leaf_paths.append(path)
+        for index in range(per_dir):
+            name = os.path.join(path, f"f{index}")
+            os.mknod(name, 0o644 | stat.S_IFREG)
+            os.truncate(name, rng.randrange(0, 1 << 16))
+    return leaf_paths
+
+def benchmark_dirsize(files: int = 1000000, per_dir: int = 100, fanout: int = 10,
+                      workers: Optional[int] = None, drop_caches: bool = False) -> int:
+    """
+    Cria uma árvore sintética com `files` arquivos (`per_dir` por diretório
+    folha, `fanout` subdiretórios por nível) e compara o du com a varredura
+    em série, em paralelo e com o cache: sem mudanças e depois de criar um
+    arquivo em 1% das folhas. Com `drop_caches` (root), o cache de páginas do
+    kernel é esvaziado antes das varreduras sem cache. Retorna 1 se algum
+    total divergir do du.
+    """
+    import shutil
+    import tempfile
+    workers = workers or CONFIG['dirscan_workers']
+    leaves = max(1, files // per_dir)
+    base = tempfile.mkdtemp(prefix='pytools-dirsize-')
+    root = os.path.join(base, 'tree')
+    rng = random.Random(21)
+
+    def drop() -> None:
+        if drop_caches:
+            os.sync()
+            with open('/proc/sys/vm/drop_caches', 'w') as f:
+                f.write('3')
+
+    try:
+        with console.status(f"[warning]Criando {leaves * per_dir:,} arquivos em {leaves:,} diretórios...[/warning]"):
+            start = time.perf_counter()
+            leaf_paths = make_synthetic_tree(root, files, per_dir, fanout)
+            created_s = time.perf_counter() - start
+
+        def du() -> Tuple[Optional[float], Optional[int], Optional[int]]:
+            if not shutil.which('du'):
+                return None, None, None
+            start = time.perf_counter()
+            disk = subprocess.run(['du', '-s', '-l', '-x', '-B1', root], capture_output=True, text=True, check=True)
+            elapsed = time.perf_counter() - start
+            apparent = subprocess.run(['du', '-s', '-l', '-x', '-b', root], capture_output=True, text=True, check=True)
+            return elapsed, int(disk.stdout.split()[0]), int(apparent.stdout.split()[0])
+
+        drop()
+        du_s, du_disk, du_bytes = du()
+        cache = DirSizeCache(os.path.join(base, 'dir_cache.sqlite3'))
+        runs = []
+        try:
+            for label, scan_workers, scan_cache, cold in (("Em série", 1, None, True),
+                                                          (f"{workers} threads", workers, None, True),
+                                                          ("Idem, gravando o cache", workers, cache, False),
+                                                          ("Cache, sem mudanças", workers, cache, False),
+                                                          ("Cache, 1% das folhas mudou", workers, cache, False)):
+                if label.startswith("Cache, 1%"):
+                    for path in rng.sample(leaf_paths, max(1, leaves // 100)):
+                        os.mknod(os.path.join(path, 'novo'), 0o644 | stat.S_IFREG)
+                if cold:
+                    drop()
+                tree = DirectoryScanner(scan_workers, scan_cache).scan(root)
+                runs.append((label, tree["nodes"][tree["root"]], tree["stats"]))
+        finally:
+            cache.close()
+    finally:
+        with console.status("[warning]Removendo a árvore sintética...[/warning]"):
+            shutil.rmtree(base, ignore_errors=True)
+
+    table = rich_table.Table(title=f"Tamanho de Diretórios: {leaves * per_dir:,} arquivos em {leaves:,} folhas "
+                                   f"(criados em {created_s:.0f} s)", header_style="header")
+    for header in ("Varredura", "Tempo (s)", "Lidos", "Do cache", "Arquivos/s", "Ganho"):
+        table.add_column(header, justify="right" if header != "Varredura" else "left")
+    baseline = du_s or runs[0][2]["elapsed_s"]
+    if du_s is not None:
+        table.add_row("du -s" + (" (disco frio)" if drop_caches else ""), f"{du_s:.2f}", "-", "-",
+                      f"{runs[0][1].files / du_s:,.0f}", "1.0x")
+    for label, node, stats in runs:
+        elapsed = max(stats["elapsed_s"], 1e-6)
+        table.add_row(label, f"{elapsed:.2f}", f"{stats['dirs_scanned']:,}", f"{stats['dirs_cached']:,}",
+                      f"{node.files / elapsed:,.0f}", f"{baseline / elapsed:.1f}x")
+    console.print(table)
+
+    # Antes da alteração todas as varreduras devem bater com o du; a última conta os arquivos novos
+    expected = (du_disk, du_bytes, runs[0][1].files)
+    mismatched = [label for label, node, _ in runs[:-1]
+                  if (du_disk is not None and (node.disk_bytes, node.bytes) != (du_disk, du_bytes))
+                  or node.files != expected[2]]
+    if runs[-1][1].files != expected[2] + max(1, leaves // 100):
+        mismatched.append(runs[-1][0])
+    if mismatched:
+        print_panel(f"Totais divergentes: {', '.join(mismatched)}", "Paridade", "error")
+        return 1
+    print_panel("Todas as varreduras batem com o du" if du_disk is not None else "Todas as varreduras batem entre si",
+                "Paridade", "success")
+    return 0
+
+# Referência para o benchmark dos maiores arquivos: guarda todos os caminhos e ordena no fim
+LARGEST_BASELINE_CODE = """
+import json, os, sys
+entries = []
+for directory, _, names in os.walk(sys.argv[1]):
+    for name in names:
+        path = os.path.join(directory, name)
+        entries.append((os.lstat(path).st_size, path))
+entries.sort(reverse=True)
+print(json.dumps([size for size, _ in entries[:int(sys.argv[2])]]))
+"""
+
+# Executa um script Python e informa o pico de memória do próprio processo (VmHWM, zerado no exec);
+# o ru_maxrss do wait4 herdaria o RSS do processo pai, que é copiado no fork
+PEAK_RSS_WRAPPER = """
+import runpy, sys
+sys.argv = sys.argv[1:]
+try:
+    runpy.run_path(sys.argv[0], run_name='__main__')
+finally:
+    with open('/proc/self/status') as f:
+        sys.stderr.write(next(line for line in f if line.startswith('VmHWM')))
+"""
+
+def benchmark_largest(files: int = 1000000, count: int = 20) -> int:
+    """
+    Procura os `count` maiores arquivos em árvores sintéticas de 1/10 do
+    tamanho e do tamanho pedido, cada execução em um processo separado, e
+    compara tempo e memória máxima (RSS) do heap de tamanho fixo com a lista
+    completa ordenada no fim. Retorna 1 se os tamanhos encontrados divergirem.
+    """
+    import shutil
+    import tempfile
+    if not os.path.exists('/proc/self/status'):
+        print_panel("Este benchmark requer o /proc do Linux.", "Erro", "error")
+        return 1
+
+    def measure(script: str, *arguments: str) -> Tuple[float, int, str]:
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-c', PEAK_RSS_WRAPPER, script, *arguments],
+                                stdin=subprocess.DEVNULL, capture_output=True, text=True, check=False)
+        peak = re.search(r'VmHWM:\s*(\d+)', result.stderr)
+        return time.perf_counter() - start, int(peak.group(1)) * 1024 if peak else 0, result.stdout
+
+    per_dir = 100
+    base = tempfile.mkdtemp(prefix='pytools-largest-')
+    baseline = os.path.join(base, 'baseline.py')
+    table = rich_table.Table(title=f"{count} Maiores Arquivos: heap x lista completa", header_style="header")
+    for header in ("Arquivos", "Método", "Tempo (s)", "Arquivos/s", "RSS máximo"):
+        table.add_column(header, justify="right" if header != "Método" else "left")
+    mismatched = []
+    try:
+        with open(baseline, 'w') as f:
+            f.write(LARGEST_BASELINE_CODE)
+        tree = os.path.join(base, 'tree')
+        with console.status(f"[warning]Criando {files:,} arquivos...[/warning]"):
+            leaves = make_synthetic_tree(tree, files, per_dir)
+        # A subárvore d0 tem 1/10 dos arquivos quando as folhas são uma potência de 10 (ex.: 1.000.000)
+        subtree = os.path.join(tree, 'd0')
+        partial = sum(leaf.startswith(subtree + os.sep) for leaf in leaves) * per_dir
+        for root, total in ((subtree, partial), (tree, len(leaves) * per_dir)):
+            elapsed, rss, output = measure(os.path.abspath(__file__), 'largest', root, '-n', str(count), '--json')
+            heap_sizes = [json.loads(line)["size_bytes"] for line in output.splitlines() if line.strip()]
+            table.add_row(f"{total:,}", "heap (largest)", f"{elapsed:.2f}", f"{total / elapsed:,.0f}", format_bytes(rss))
+            elapsed, rss, output = measure(baseline, root, str(count))
+            table.add_row("", "lista completa + sort", f"{elapsed:.2f}", f"{total / elapsed:,.0f}", format_bytes(rss))
+            if heap_sizes != json.loads(output or '[]'):
+                mismatched.append(f"{total:,}")
+    finally:
+        with console.status("[warning]Removendo a árvore sintética...[/warning]"):
+            shutil.rmtree(base, ignore_errors=True)
+    console.print(table)
+    if mismatched:
+        print_panel(f"Tamanhos divergentes da lista completa em: {', '.join(mismatched)}", "Paridade", "error")
+        return 1
+    return 0
+
+def benchmark_dupes(groups: int = 32, copies: int = 3, file_mb: int = 8, small_files: int = 20000,
+                    workers: Optional[int] = None, drop_caches: bool = False) -> int:
+    """
+    Cria um conjunto sintético com `groups` grupos de `copies` cópias
+    idênticas, arquivos do mesmo tamanho que diferem no início (descartados
+    pelo hash parcial), arquivos que diferem só no meio (descartados apenas
+    pelo hash completo) e `small_files` arquivos pequenos. Compara os bytes
+    lidos e o tempo da busca em etapas com o hash completo de tudo e a vazão
+    do hash completo com a leitura sequencial crua dos mesmos arquivos. Com
+    `drop_caches` (root), cada medição parte do disco frio. Retorna 1 se os
+    grupos encontrados divergirem dos criados.
+    """
+    import hashlib
+    import shutil
+    import tempfile
+    size = file_mb * 1024 * 1024
+    base = tempfile.mkdtemp(prefix='pytools-dupes-')
+    rng = random.Random(23)
+
+    def drop() -> None:
+        if drop_caches:
+            os.sync()
+            with open('/proc/sys/vm/drop_caches', 'w') as f:
+                f.write('3')
+
+    def read_all(paths: List[str], digest_name: Optional[str]) -> Tuple[float, int]:
+        buffer = bytearray(1024 * 1024)
+        view, total = memoryview(buffer), 0
+        start = time.perf_counter()
+        for path in paths:
+            digest = hashlib.new(digest_name) if digest_name else None
+            with open(path, 'rb', buffering=0) as f:
+                while True:
+                    read = f.readinto(buffer)
+                    if not read:
+                        break
+                    total += read
+                    if digest:
+                        digest.update(view[:read])
+        return time.perf_counter() - start, total
+
+    def rate(amount: int, elapsed: float) -> str:
+        return f"{amount / elapsed / 1e6:,.0f}" if elapsed else "-"
+
+    try:
+        with console.status(f"[warning]Criando {groups * (copies + 2) + small_files:,} arquivos...[/warning]"):
+            for group in range(groups):
+                # Tamanhos distintos por grupo: cada grupo só concorre consigo mesmo na etapa 1
+                original = os.path.join(base, f'dup{group}', 'copy0')
+                os.makedirs(os.path.dirname(original))
+                with open(original, 'wb') as f:
+                    f.write(rng.randbytes(size + group))
+                for copy in range(1, copies):
+                    shutil.copyfile(original, os.path.join(base, f'dup{group}', f'copy{copy}'))
+            os.makedirs(os.path.join(base, 'head'))
+            os.makedirs(os.path.join(base, 'middle'))
+            edge = rng.randbytes(PARTIAL_HASH_BLOCK)
+            for number in range(groups):
+                with open(os.path.join(base, 'head', str(number)), 'wb') as f:
+                    f.write(rng.randbytes(size + groups))
+                with open(os.path.join(base, 'middle', str(number)), 'wb') as f:
+                    f.write(edge + rng.randbytes(size + groups + 1 - 2 * PARTIAL_HASH_BLOCK) + edge)
+            for number in range(small_files):
+                directory = os.path.join(base, 'small', str(number // 1000))
+                if number % 1000 == 0:
+                    os.makedirs(directory)
+                with open(os.path.join(directory, str(number)), 'wb') as f:
+                    f.write(rng.randbytes(rng.randint(1, 64 * 1024)))
+        everything = [os.path.join(directory, name) for directory, _, names in os.walk(base) for name in names]
+
+        drop()
+        with console.status("[warning]Procurando duplicatas...[/warning]"):
+            start = time.perf_counter()
+            result = find_duplicates([base], min_size=1, one_filesystem=True, keep='first', workers=workers)
+            staged_s = time.perf_counter() - start
+        survivors = [os.path.join(base, f'dup{group}', f'copy{copy}') for group in range(groups)
+                     for copy in range(copies)] + [os.path.join(base, 'middle', str(number)) for number in range(groups)]
+        drop()
+        with console.status("[warning]Leitura sequencial dos arquivos com hash completo...[/warning]"):
+            raw_s, raw_bytes = read_all(survivors, None)
+        drop()
+        with console.status(f"[warning]Hash completo de todos os {len(everything):,} arquivos...[/warning]"):
+            naive_s, naive_bytes = read_all(everything, CONFIG['dupes_hash'])
+    finally:
+        with console.status("[warning]Removendo os arquivos sintéticos...[/warning]"):
+            shutil.rmtree(base, ignore_errors=True)
+
+    read_bytes = result["partial_bytes"] + result["full_bytes"]
+    table = rich_table.Table(title=f"Duplicatas: {groups} grupos x {copies} cópias de {file_mb} MB, "
+                                   f"{len(everything):,} arquivos ({CONFIG['dupes_hash']}"
+                                   f"{', disco frio' if drop_caches else ', cache de páginas'})",
+                             header_style="header")
+    for header in ("Etapa", "Arquivos", "Bytes lidos", "Tempo (s)", "MB/s"):
+        table.add_column(header, justify="right" if header != "Etapa" else "left")
+    table.add_row("1. tamanho", f"{result['files']:,}", "0", f"{result['size_s']:.2f}", "-")
+    table.add_row("2. primeiro/último bloco", f"{result['size_candidates']:,}", format_bytes(result["partial_bytes"]),
+                  f"{result['partial_s']:.2f}", rate(result["partial_bytes"], result["partial_s"]))
+    table.add_row("3. hash completo (readinto)", f"{result['full_hashed']:,}", format_bytes(result["full_bytes"]),
+                  f"{result['full_s']:.2f}", rate(result["full_bytes"], result["full_s"]))
+    table.add_row("[bold]busca em etapas[/bold]", f"{result['files']:,}", format_bytes(read_bytes),
+                  f"{staged_s:.2f}", rate(read_bytes, staged_s))
+    table.add_row("leitura crua (mesmos da etapa 3)", f"{len(survivors):,}", format_bytes(raw_bytes),
+                  f"{raw_s:.2f}", rate(raw_bytes, raw_s))
+    table.add_row("hash completo de tudo", f"{len(everything):,}", format_bytes(naive_bytes),
+                  f"{naive_s:.2f}", rate(naive_bytes, naive_s))
+    console.print(table)
+    console.print(f"[info]Lidos {read_bytes / naive_bytes:.1%} dos bytes do hash ingênuo; "
+                  f"hash completo a {result['full_bytes'] / result['full_s'] / raw_bytes * raw_s:.0%} "
+                  f"da leitura crua.[/info]")
+    found = sorted(len(group["duplicates"]) + 1 for group in result["groups"])
+    if found != [copies] * groups:
+        print_panel(f"Esperados {groups} grupos de {copies} cópias; encontrados: {found}", "Paridade", "error")
+        return 1
+    return 0
+
+def benchmark_geo_offline(ranges: int = 500000, lookups: int = 200000, latency_ms: float = 20.0,
+                          http_lookups: int = 200) -> int:
+    """
+    Compila uma base sintética de intervalos e compara consultas/s da base
+    offline (mmap + busca binária) com o caminho HTTP (servidor local, sem cache).
+    """
+    import tempfile
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'ranges.csv')
+        starts = sorted(rng.sample(range(1 << 24, 224 << 24), ranges))
+        with open(source, 'w') as f:
+            f.write("start,end,country,asn,org\n")
+            for i, start in enumerate(starts):
+                end = min(start + rng.randint(0, 4095), starts[i + 1] - 1 if i + 1 < len(starts) else start + 4095)
+                f.write(f"{ipaddress.IPv4Address(start)},{ipaddress.IPv4Address(end)},"
+                        f"{rng.choice(('BR', 'US', 'DE', 'JP', 'PT'))},{64500 + i % 1000},Rede {i % 1000}\n")
+        compiled = compile_geo_database(source, os.path.join(tmp, 'ranges.bin'))
+        db = OfflineGeoDB(compiled["database"])
+        probes = [str(ipaddress.IPv4Address(rng.randrange(1 << 24, 224 << 24))) for _ in range(lookups)]
+
+        table = rich_table.Table(title=f"Geolocalização Offline x HTTP ({ranges:,} intervalos, "
+                                       f"{format_bytes(compiled['bytes'])}, compilada em {compiled['elapsed_s']:.1f} s)",
+                                 header_style="header")
+        table.add_column("Modo", style="highlight")
+        table.add_column("Consultas", justify="right")
+        table.add_column("consultas/s", justify="right")
+        table.add_column("Latência média", justify="right")
+        table.add_column("Ganho", justify="right")
+
+        server, url = _start_geo_server_process(latency_ms)
+        try:
+            if not url:
+                print_panel("O servidor de teste não iniciou.", "Erro", "error")
+                return 1
+            saved_url = CONFIG['geo_api_url']
+            CONFIG['geo_api_url'] = url
+            try:
+                start = time.perf_counter()
+                for ip in probes[:http_lookups]:
+                    request_geolocation(ip)
+                baseline = _rate_row(table, f"HTTP (sessão keep-alive, {latency_ms:.0f} ms)", http_lookups,
+                                     time.perf_counter() - start)
+            finally:
+                CONFIG['geo_api_url'] = saved_url
+        finally:
+            server.terminate()
+            server.wait(timeout=10)
+
+        start = time.perf_counter()
+        found = sum(1 for ip in probes if db.lookup(ip) is not None)
+        _rate_row(table, "Base offline (mmap + bisect)", lookups, time.perf_counter() - start, baseline)
         console.print(table)
-    except socket.error:
-        print_panel("Sem conexão de rede. Verifique sua internet.", "Erro de Rede", "error")
+        console.print(f"[info]{found / lookups:.0%} dos IPs sorteados caíram em algum intervalo.[/info]")
+    return 0
+
+# --- Linha de Comando (não interativa) ---
+
+def emit_json(data: Any) -> None:
+    """Escreve um resultado em JSON (uma linha) na saída padrão."""
+    sys.stdout.write(json.dumps(data, ensure_ascii=False, default=str) + "\n")
+
+def execute_command(args) -> Tuple[int, Any]:
+    """
+    Executa o coletor de um subcomando já interpretado.
+    Retorna (código de saída, resultado); em caso de erro, o resultado é
+    {"success": False, "error": ...}.
+    """
+    missing = [LAZY_MODULES[name]._package for name in args.modules if not LAZY_MODULES[name].available()]
+    try:
+        if missing:
+            raise ImportError(f"Dependência ausente. {install_hint(sorted(set(missing)))}")
+        with command_budget(getattr(args, 'timeout', None)):
+            result = args.collect(args)
     except Exception as e:
-        print_panel(f"Erro ao verificar rede: {e}", "Erro", "error")
-    input("\nPressione Enter para continuar...")
+        logging.error(f"Erro no subcomando '{args.command}': {e}")
+        return 1, {"success": False, "error": str(e)}
+    return (0 if args.ok(result) else 1), result
 
-def clean_temp_files() -> None:
-    """Remove arquivos temporários do sistema."""
-    clear_console()
-    temp_dirs = [os.path.join(os.getenv('TEMP', '/tmp') if os.name == 'nt' else '/tmp')]
-    console.print("[warning]Limpando arquivos temporários...[/warning]")
-    
-    total_size = 0
-    file_count = 0
-    
-    for temp_dir in temp_dirs:
+def run_cli(args) -> int:
+    """
+    Executa um subcomando sem menu, logo ou pausas e retorna o código de saída.
+    Com --json, o Rich nem chega a ser importado.
+    """
+    try:
+        exit_code, result = execute_command(args)
+    except KeyboardInterrupt:
+        # Ctrl+C ou SIGTERM de um supervisor: os processos filhos já foram encerrados
+        logging.warning(f"Subcomando '{args.command}' cancelado")
+        exit_code, result = 130, {"success": False, "exit_reason": "cancelled", "error": "Cancelado."}
+    if args.json or not rich_console.available():
+        # Sem o Rich, a saída cai para o mesmo JSON do --json em vez de quebrar
+        emit_json(result)
+    elif isinstance(result, dict) and "error" in result and result.get("success") is False:
+        print_panel(result["error"], "Erro", "error")
+    else:
+        args.render(result)
+    return exit_code
+
+# --- Daemon (Socket Unix) ---
+
+# Subcomandos que não fazem sentido dentro do daemon
+DAEMON_EXCLUDED_COMMANDS = {'serve', 'client', 'bench'}
+
+
+class DaemonState:
+    """Estado aquecido mantido pelo daemon entre as requisições."""
+
+    def __init__(self) -> None:
+        self.started = time.time()
+        self.requests = 0
+        self.errors = 0
+        self.lock = threading.Lock()
+        self.process = psutil.Process() if psutil.available() else None
+
+    def status(self) -> Dict[str, Any]:
+        """Retorna estatísticas do próprio daemon."""
+        status = {"pid": os.getpid(), "uptime_s": round(time.time() - self.started, 1),
+                  "requests": self.requests, "errors": self.errors}
+        if self.process is not None:
+            status["rss_bytes"] = self.process.memory_info().rss
+        return status
+
+    def warm_up(self) -> None:
+        """Pré-carrega módulos, sessão HTTP e o banco do cache de IPs antes da primeira requisição."""
+        for name in ('requests', 'psutil'):
+            LAZY_MODULES[name].available()
+        if requests.loaded:
+            get_http_session()
+        if psutil.loaded:
+            psutil.virtual_memory()
+        if sqlite3.available():
+            get_ip_cache().stats()
+        if CONFIG['geo_mode'] != 'online':
+            get_offline_db()
+
+
+def handle_daemon_request(state: DaemonState, request: Dict[str, Any]) -> Dict[str, Any]:
+    """Processa uma requisição {"argv": [...]} e retorna {"exit_code": ..., "result": ...}."""
+    argv = request.get("argv")
+    if not isinstance(argv, list) or not argv or not all(isinstance(arg, str) for arg in argv):
+        return {"exit_code": 2, "result": {"success": False, "error": "Requisição inválida: informe 'argv'."}}
+    if argv == ['daemon-status']:
+        return {"exit_code": 0, "result": state.status()}
+    if argv[0] in DAEMON_EXCLUDED_COMMANDS:
+        return {"exit_code": 2, "result": {"success": False, "error": f"Comando '{argv[0]}' indisponível no daemon."}}
+    try:
+        args = parse_args(argv)
+    except SystemExit:
+        return {"exit_code": 2, "result": {"success": False, "error": f"Argumentos inválidos: {' '.join(argv)}"}}
+    if not args.command or getattr(args, 'handler', None):
+        return {"exit_code": 2, "result": {"success": False, "error": "Informe um subcomando de coleta."}}
+    exit_code, result = execute_command(args)
+    with state.lock:
+        state.requests += 1
+        state.errors += exit_code != 0
+    return {"exit_code": exit_code, "result": result}
+
+
+def _socket_in_use(path: str) -> bool:
+    """Verifica se há um daemon respondendo no socket informado."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
         try:
-            for root, _, files in os.walk(temp_dir):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    try:
-                        total_size += os.path.getsize(file_path)
-                        os.remove(file_path)
-                        file_count += 1
-                    except (OSError, PermissionError):
-                        continue
-            print_panel(f"Removidos {file_count} arquivos, liberando {(total_size / (1024**2)):.2f} MB.",
-                        "Limpeza Concluída", "success")
-        except Exception as e:
-            print_panel(f"Erro ao limpar arquivos temporários: {e}", "Erro", "error")
-    
-    input("\nPressione Enter para continuar...")
+            probe.connect(path)
+            return True
+        except OSError:
+            return False
+
+
+def serve_daemon(socket_path: str) -> int:
+    """
+    Inicia o daemon: mantém configuração, módulos, sessão HTTP e cache aquecidos
+    e atende requisições JSON (uma por linha) em um socket Unix.
+    """
+    import socketserver
+
+    if not hasattr(socket, 'AF_UNIX'):
+        print("Sockets Unix não são suportados nesta plataforma.", file=sys.stderr)
+        return 1
+    if os.path.exists(socket_path):
+        if _socket_in_use(socket_path):
+            print(f"Já existe um daemon ativo em {socket_path}.", file=sys.stderr)
+            return 1
+        os.unlink(socket_path)  # Socket órfão de uma execução anterior
+    os.makedirs(os.path.dirname(socket_path) or '.', mode=0o700, exist_ok=True)
+
+    state = DaemonState()
+    state.warm_up()
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            # Uma conexão pode enviar várias requisições (uma por linha)
+            for line in self.rfile:
+                if not line.strip():
+                    continue
+                try:
+                    response = handle_daemon_request(state, json.loads(line))
+                except ValueError:
+                    response = {"exit_code": 2, "result": {"success": False, "error": "JSON inválido."}}
+                self.wfile.write(json.dumps(response, ensure_ascii=False, default=str).encode() + b"\n")
+                self.wfile.flush()
+
+    class Server(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+
+    old_umask = os.umask(0o177)  # Socket acessível apenas pelo dono
+    try:
+        server = Server(socket_path, Handler)
+    finally:
+        os.umask(old_umask)
+
+    def shutdown(signum, frame):
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    logging.info(f"Daemon iniciado em {socket_path} (PID {os.getpid()})")
+    print(f"PyTools daemon ouvindo em {socket_path} (PID {os.getpid()})", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        logging.info("Daemon encerrado")
+    return 0
+
+
+def daemon_request(argv: List[str], socket_path: str, timeout: float = 30.0,
+                   conn: Optional[socket.socket] = None) -> Dict[str, Any]:
+    """
+    Envia um subcomando ao daemon e retorna a resposta {"exit_code", "result"}.
+    Se `conn` for informado, reutiliza a conexão já aberta.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        conn.settimeout(timeout)
+        conn.connect(socket_path)
+    try:
+        conn.sendall(json.dumps({"argv": argv}).encode() + b"\n")
+        buffer = b""
+        while not buffer.endswith(b"\n"):
+            chunk = conn.recv(65536)
+            if not chunk:
+                raise ConnectionError("O daemon encerrou a conexão.")
+            buffer += chunk
+        return json.loads(buffer)
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def run_ping_monitor(args) -> int:
+    """Monitora a latência dos hosts: painel ao vivo ou, com --json, um objeto JSON por atualização."""
+    hosts = args.hosts + (list(read_ip_list(args.file)) if args.file else [])
+    options = dict(interval=args.interval, refresh=args.refresh, duration=args.duration, window=args.window,
+                   method=args.method, port=args.port, timeout=args.wait)
+
+    def emit(snapshots: List[Dict[str, Any]]) -> None:
+        emit_json({"time": round(time.time(), 3), "targets": snapshots})
+        sys.stdout.flush()
+
+    try:
+        if args.json:
+            final = monitor_latency(hosts, emit, **options)
+            emit(final)
+        else:
+            if not rich_live.available():
+                sys.stderr.write(f"Dependência ausente. {install_hint(['rich'])}\n")
+                return 1
+            started = time.monotonic()
+            with rich_live.Live(render_latency_monitor([], started), console=get_console(),
+                                auto_refresh=False) as live:
+                final = monitor_latency(hosts, lambda snaps: live.update(render_latency_monitor(snaps, started),
+                                                                         refresh=True), **options)
+                live.update(render_latency_monitor(final, started), refresh=True)
+    except ValueError as e:
+        sys.stderr.write(f"Erro: {e}\n")
+        return 1
+    return 0 if all(snap.get("received") for snap in final) else 1
+
+def run_geo_bulk(args) -> int:
+    """Geolocaliza IPs de arquivos ou da entrada padrão, gravando JSONL/CSV à medida que as respostas chegam."""
+    missing = [LAZY_MODULES[name]._package for name in ('requests', 'sqlite3') if not LAZY_MODULES[name].available()]
+    if missing:
+        sys.stderr.write(f"Dependência ausente. {install_hint(missing)}\n")
+        return 1
+    try:
+        with (open(args.output, 'w', newline='') if args.output else contextlib.nullcontext(sys.stdout)) as out:
+            stats = geolocate_bulk(read_ip_list(args.files), geo_result_writer(out, args.format),
+                                   args.concurrency, args.rate, args.mode)
+    except OSError as e:
+        sys.stderr.write(f"Erro: {e}\n")
+        return 1
+    except KeyboardInterrupt:
+        return 130
+    sys.stderr.write(json.dumps(stats) + "\n")
+    return 0 if not stats["errors"] else 1
+
+def run_geo_enrich(args) -> int:
+    """Anexa a geolocalização dos IPs às linhas de logs, lendo e gravando em fluxo."""
+    missing = [LAZY_MODULES[name]._package for name in ('requests', 'sqlite3') if not LAZY_MODULES[name].available()]
+    if missing:
+        sys.stderr.write(f"Dependência ausente. {install_hint(missing)}\n")
+        return 1
+    fields = tuple(field.strip() for field in args.fields.split(',') if field.strip())
+    try:
+        with (open(args.output, 'wb') if args.output else contextlib.nullcontext(sys.stdout.buffer)) as out:
+            stats = enrich_log(args.files, out, args.format, fields, args.mode, args.concurrency, args.rate)
+    except OSError as e:
+        sys.stderr.write(f"Erro: {e}\n")
+        return 1
+    except KeyboardInterrupt:
+        return 130
+    sys.stderr.write(json.dumps(stats) + "\n")
+    return 0
+
+def run_geo_import(args) -> int:
+    """Compila um CSV de intervalos de IP na base offline de geolocalização."""
+    try:
+        stats = compile_geo_database(args.csv, args.output or CONFIG['geo_offline_db'])
+    except (OSError, ValueError) as e:
+        sys.stderr.write(f"Erro: {e}\n")
+        return 1
+    emit_json(stats)
+    return 0
+
+def run_dirsize(args) -> int:
+    """Tamanho de um diretório e dos maiores subdiretórios; com -i, navegação interativa."""
+    if not args.no_cache and not sqlite3.available():
+        sys.stderr.write(f"Dependência ausente. {install_hint([sqlite3._package])}\n")
+        return 1
+    options = dict(workers=args.workers, use_cache=not args.no_cache, one_filesystem=not args.cross_mounts)
+    try:
+        if args.json:
+            emit_json(collect_directory_sizes(args.path, args.top, args.workers, not args.no_cache, args.cross_mounts))
+            return 0
+        with get_console().status(format_scan_progress(args.path, {"dirs_scanned": 0, "dirs_cached": 0})) as status:
+            tree = scan_directory_tree(args.path, **options,
+                                       on_progress=lambda stats: status.update(format_scan_progress(args.path, stats)))
+    except OSError as e:
+        sys.stderr.write(f"Erro: {e}\n")
+        return 1
+    except KeyboardInterrupt:
+        return 130
+    if args.interactive:
+        browse_directory_tree(tree, args.top)
+    else:
+        render_directory_sizes(directory_summary(tree, tree["root"], args.top))
+    return 0
+
+def run_largest(args) -> int:
+    """Lista os maiores arquivos; com --json, um objeto por linha (JSONL) e o resumo na saída de erro."""
+    extensions = [ext for value in args.ext for ext in re.split(r'[\s,]+', value) if ext]
+    options = dict(count=args.top, one_filesystem=not args.cross_mounts, extensions=extensions,
+                   older_than_days=args.older_than, newer_than_days=args.newer_than, min_size=args.min_size)
+    try:
+        if args.json:
+            result = find_largest_files(args.paths, **options)
+            for entry in result.pop("largest"):
+                emit_json(entry)
+            sys.stderr.write(json.dumps(result) + "\n")
+            return 0
+        with get_console().status("[warning]Procurando os maiores arquivos...[/warning]") as status:
+            result = find_largest_files(args.paths, **options,
+                                        on_progress=lambda stats: status.update(format_search_progress(stats)))
+    except OSError as e:
+        sys.stderr.write(f"Erro: {e}\n")
+        return 1
+    except KeyboardInterrupt:
+        return 130
+    render_largest_files(result)
+    return 0
+
+def run_dupes(args) -> int:
+    """Procura duplicatas e, com --action, cria links físicos ou remove as cópias (--dry-run só simula)."""
+    options = dict(action=args.action, dry_run=args.dry_run, min_size=args.min_size, keep=args.keep,
+                   one_filesystem=not args.cross_mounts, workers=args.workers)
+    try:
+        if args.json:
+            result = collect_duplicates(args.paths, **options)
+            emit_json(result)
+            return 0 if result.get("success", True) else 1
+        with get_console().status("[warning]Procurando duplicatas...[/warning]") as status:
+            result = collect_duplicates(args.paths, **options,
+                                        on_progress=lambda text: status.update(f"[warning]{text}[/warning]"))
+    except (OSError, ValueError) as e:
+        sys.stderr.write(f"Erro: {e}\n")
+        return 1
+    except KeyboardInterrupt:
+        return 130
+    render_duplicates(result, args.top)
+    return 0 if result.get("success", True) else 1
+
+def run_disk_io_monitor(args) -> int:
+    """Monitora a E/S dos discos: painel ao vivo ou, com --json, um objeto JSON por intervalo."""
+    missing = [module._package for module in (psutil, rich_live) if not (args.json and module is rich_live)
+               and not module.available()]
+    if missing:
+        sys.stderr.write(f"Dependência ausente. {install_hint(missing)}\n")
+        return 1
+    options = dict(interval=args.interval, duration=args.duration, devices=args.device, all_devices=args.all)
+
+    def emit(update: Dict[str, Any]) -> None:
+        emit_json(update)
+        sys.stdout.flush()
+
+    try:
+        if args.json:
+            monitor_disk_io(emit, **options)
+        else:
+            with rich_live.Live(render_disk_io(None), console=get_console(), auto_refresh=False) as live:
+                monitor_disk_io(live_redraw_on_change(live, render_disk_io, lambda update: update["devices"]),
+                                **options)
+    except ValueError as e:
+        sys.stderr.write(f"Erro: {e}\n")
+        return 1
+    return 0
+
+def run_memory_monitor(args) -> int:
+    """Monitora a memória: painel ao vivo com histórico ou, com --json, um objeto JSON por amostra."""
+    missing = [module._package for module in (psutil, rich_live) if not (args.json and module is rich_live)
+               and not module.available()]
+    if missing:
+        sys.stderr.write(f"Dependência ausente. {install_hint(missing)}\n")
+        return 1
+    options = dict(interval=args.interval, history=args.history, duration=args.duration)
+
+    def emit(sampler: MemorySampler) -> None:
+        emit_json(sampler.snapshot())
+        sys.stdout.flush()
+
+    try:
+        if args.json:
+            monitor_memory(emit, **options)
+        else:
+            with rich_live.Live(console=get_console(), auto_refresh=False) as live:
+                monitor_memory(live_redraw_on_change(
+                    live, render_memory_dashboard,
+                    lambda sampler: memory_dashboard_rows(sampler, memory_sparkline_width(sampler.history))),
+                    **options)
+    except ValueError as e:
+        sys.stderr.write(f"Erro: {e}\n")
+        return 1
+    return 0
+
+def run_client(args) -> int:
+    """Cliente leve: repassa o subcomando ao daemon e imprime o resultado em JSON."""
+    try:
+        response = daemon_request(args.argv, args.socket, args.timeout)
+    except (OSError, ValueError) as e:
+        emit_json({"success": False, "error": f"Daemon indisponível em {args.socket}: {e}"})
+        return 1
+    emit_json(response["result"])
+    return response["exit_code"]
 
 # --- Menu Principal e Execução ---
 
@@ -587,7 +7259,7 @@ def display_main_menu(menu_options: List[Dict[str, Any]]) -> None:
     console.print(f"[info]Version {SCRIPT_VERSION}[/info]", justify="center")
     console.print(CREDITS, justify="center")
     
-    menu_table = Table(show_header=False, box=None)
+    menu_table = rich_table.Table(show_header=False, box=None)
     menu_table.add_column(style="info")
     menu_table.add_column()
     
@@ -599,7 +7271,10 @@ def display_main_menu(menu_options: List[Dict[str, Any]]) -> None:
 
 def main() -> None:
     """Função principal que executa o loop do menu."""
-    
+    if not rich_console.available():
+        print(f"Erro de importação. {install_hint(['rich', 'requests', 'pytube', 'pyyaml', 'psutil'])}")
+        sys.exit(1)
+
     menu_options = [
         {"title": "Atualizar o sistema", "func": update_system},
         {"title": "Pingar um website ou IP", "func": ping_host},
@@ -612,10 +7287,21 @@ def main() -> None:
         {"title": "Informações do Sistema", "func": show_system_info},
         {"title": "Verificar Status da Rede", "func": check_network_status},
         {"title": "Limpar Arquivos Temporários", "func": clean_temp_files},
+        {"title": "Geolocalizar IPs em Massa (arquivo)", "func": bulk_geolocate_ips},
+        {"title": "Enriquecer Log com Geolocalização", "func": enrich_log_file},
+        {"title": "Monitorar Latência (contínuo)", "func": monitor_latency_hosts},
+        {"title": "Resolver Nomes (DNS)", "func": resolve_dns_names},
+        {"title": "Traçar Rota (Traceroute)", "func": perform_traceroute},
+        {"title": "Analisar Uso de Diretórios", "func": analyze_directory_usage},
+        {"title": "Encontrar Maiores Arquivos", "func": show_largest_files},
+        {"title": "Encontrar Arquivos Duplicados", "func": show_duplicate_files},
+        {"title": "Monitorar E/S de Disco", "func": monitor_disk_io_devices},
     ]
     
     while True:
         display_main_menu(menu_options)
+        if os.environ.get(STARTUP_PROBE_ENV):
+            return
         try:
             choice_str = console.input("\n[bold]Escolha uma opção: [/bold]").strip()
             if not choice_str.isdigit():
@@ -642,5 +7328,302 @@ def main() -> None:
             print_panel(f"Ocorreu um erro crítico: {e}", "Erro Fatal", "error")
             time.sleep(3)
 
+def parse_args(argv: Optional[List[str]] = None):
+    """Interpreta os argumentos de linha de comando (menu, subcomandos, daemon e benchmarks)."""
+    return build_parser().parse_args(argv)
+
+@functools.lru_cache(maxsize=None)
+def build_parser():
+    """Monta o parser de argumentos uma única vez (o daemon o reutiliza a cada requisição)."""
+    import argparse
+    parser = argparse.ArgumentParser(description="PyTools: suíte de ferramentas de utilidade.")
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--json', action='store_true', help="Saída em JSON, sem interface Rich.")
+    common.add_argument('--timeout', type=float, default=None,
+                        help="Orçamento total (s) para os comandos externos do subcomando.")
+    subparsers = parser.add_subparsers(dest='command', metavar='COMANDO')
+
+    def add_command(name: str, help_text: str, collect: Callable, render: Callable,
+                    modules: Tuple[str, ...] = (), ok: Optional[Callable] = None):
+        sub = subparsers.add_parser(name, help=help_text, parents=[common])
+        sub.set_defaults(collect=collect, render=render, modules=modules,
+                         ok=ok or (lambda result: not isinstance(result, dict) or result.get("success", True)))
+        return sub
+
+    sub = add_command('update', "Atualiza os pacotes do sistema.", lambda a: collect_system_update(a.force),
+                      render_system_update)
+    sub.add_argument('--force', action='store_true',
+                     help="Executa todas as etapas, mesmo as que parecem não ter trabalho a fazer.")
+    sub = add_command('ping', "Pinga websites ou IPs ao mesmo tempo (ICMP ou TCP).",
+                      lambda a: collect_ping(a.hosts + (list(read_ip_list(a.file)) if a.file else []), a.count, a.interval,
+                                             a.wait, a.method, a.port), render_ping)
+    sub.add_argument('hosts', nargs='*')
+    sub.add_argument('-f', '--file', action='append', default=[],
+                     help="Arquivo com um host por linha ('-': entrada padrão); pode se repetir.")
+    sub.add_argument('-c', '--count', type=int, default=4, help="Número de pacotes por host (padrão: 4).")
+    sub.add_argument('-i', '--interval', type=float, default=1.0, help="Intervalo (s) entre pacotes (padrão: 1).")
+    sub.add_argument('-W', '--wait', type=float, default=None,
+                     help=f"Espera (s) por cada resposta (padrão: {CONFIG['ping_timeout']}).")
+    sub.add_argument('--method', choices=PING_METHODS, default=None,
+                     help=f"ICMP, conexão TCP ou auto (padrão: {CONFIG['ping_method']}).")
+    sub.add_argument('--port', type=int, default=None,
+                     help=f"Porta do modo TCP (padrão: {CONFIG['ping_tcp_port']}).")
+    sub = add_command('geo', "Geolocaliza um IP ou domínio.", lambda a: collect_geolocation(a.ip, a.mode),
+                      render_geolocation, ('requests', 'sqlite3'))
+    sub.add_argument('ip')
+    sub.add_argument('--mode', choices=GEO_MODES, default=None, help="Fonte dos dados (padrão: geo_mode).")
+    sub = add_command('traceroute', "Traça a rota até um host (todas as sondas de uma vez).",
+                      lambda a: collect_traceroute(a.host, a.max_hops, a.queries, a.wait, a.method, a.port),
+                      render_traceroute, ok=lambda r: r.get("success", False))
+    sub.add_argument('host')
+    sub.add_argument('-m', '--max-hops', type=int, default=None,
+                     help=f"Número máximo de saltos (padrão: {CONFIG['traceroute_max_hops']}).")
+    sub.add_argument('-q', '--queries', type=int, default=None,
+                     help=f"Sondas por salto (padrão: {CONFIG['traceroute_queries']}).")
+    sub.add_argument('-w', '--wait', type=float, default=None,
+                     help=f"Espera (s) pelas respostas (padrão: {CONFIG['traceroute_timeout']}).")
+    sub.add_argument('--method', choices=TRACEROUTE_METHODS, default=None,
+                     help=f"udp, tcp (SYN), system (comando traceroute) ou auto (padrão: {CONFIG['traceroute_method']}).")
+    sub.add_argument('--port', type=int, default=None,
+                     help=f"Porta inicial (UDP, padrão {TRACE_BASE_PORT}) ou de destino (TCP).")
+    sub = add_command('dns', "Resolve nomes (A/AAAA) em paralelo, com cache por TTL.",
+                      lambda a: collect_dns(a.names + (list(read_ip_list(a.file)) if a.file else []),
+                                            ('A', 'AAAA') if a.type == 'both' else (a.type,)),
+                      render_dns, ('sqlite3',))
+    sub.add_argument('names', nargs='*')
+    sub.add_argument('-f', '--file', action='append', default=[],
+                     help="Arquivo com um nome por linha ('-': entrada padrão); pode se repetir.")
+    sub.add_argument('-t', '--type', choices=('A', 'AAAA', 'both'), default='both',
+                     help="Tipo de registro (padrão: both).")
+    sub = add_command('disk', "Exibe o uso de disco (bytes e inodes).", lambda a: collect_disk_usage(a.all),
+                      render_disk_usage)
+    sub.add_argument('-a', '--all', action='store_true',
+                     help="Inclui sistemas sem blocos (proc, sysfs...) e montagens bind repetidas.")
+    add_command('mem', "Exibe o uso de memória e swap.", lambda a: collect_memory_usage(), render_memory_usage,
+                ('psutil',))
+    sub = add_command('youtube', "Baixa um vídeo ou playlist do YouTube.",
+                      lambda a: collect_youtube_download(a.url, a.audio), render_youtube_download, ('pytube',))
+    sub.add_argument('url')
+    sub.add_argument('--audio', action='store_true', help="Baixa apenas o áudio (MP3).")
+    sub = add_command('email', "Gera um e-mail temporário ou lista a caixa de entrada de um existente.",
+                      lambda a: collect_temp_email(a.address), render_temp_email, ('requests',))
+    sub.add_argument('address', nargs='?')
+    add_command('self-update', "Atualiza este script via Git.", lambda a: collect_script_update(),
+                lambda r: render_steps(r, "Script atualizado com sucesso!", "A atualização via Git falhou."))
+    add_command('sysinfo', "Exibe informações do sistema.", lambda a: collect_system_info(), render_system_info,
+                ('psutil',))
+    add_command('net', "Verifica o status da rede.", lambda a: collect_network_status(), render_network_status,
+                ('psutil',), ok=lambda r: r["online"])
+    sub = add_command('clean-temp', "Remove arquivos temporários.", lambda a: remove_temp_files(a.dry_run),
+                      render_temp_cleanup)
+    sub.add_argument('--dry-run', action='store_true', help="Apenas contabiliza, sem remover.")
+
+    sub = subparsers.add_parser('ping-monitor', help="Monitora continuamente a latência (p50/p90/p99 e perda).")
+    sub.add_argument('hosts', nargs='*')
+    sub.add_argument('-f', '--file', action='append', default=[],
+                     help="Arquivo com um host por linha ('-': entrada padrão); pode se repetir.")
+    sub.add_argument('-i', '--interval', type=float, default=1.0, help="Intervalo (s) entre sondas (padrão: 1).")
+    sub.add_argument('--refresh', type=float, default=1.0, help="Intervalo (s) entre atualizações (padrão: 1).")
+    sub.add_argument('--window', type=float, default=60.0, help="Janela (s) dos percentis recentes (padrão: 60).")
+    sub.add_argument('--duration', type=float, default=None, help="Encerra após este tempo (s); padrão: Ctrl+C.")
+    sub.add_argument('-W', '--wait', type=float, default=None,
+                     help=f"Espera (s) por cada resposta (padrão: {CONFIG['ping_timeout']}).")
+    sub.add_argument('--method', choices=PING_METHODS, default=None,
+                     help=f"ICMP, conexão TCP ou auto (padrão: {CONFIG['ping_method']}).")
+    sub.add_argument('--port', type=int, default=None,
+                     help=f"Porta do modo TCP (padrão: {CONFIG['ping_tcp_port']}).")
+    sub.add_argument('--json', action='store_true', help="Um objeto JSON por atualização, sem painel.")
+    sub.set_defaults(handler=run_ping_monitor)
+    sub = subparsers.add_parser('disk-io', help="Monitora a E/S de cada disco (vazão, IOPS, espera e ocupação).")
+    sub.add_argument('-i', '--interval', type=float, default=None,
+                     help=f"Intervalo (s) entre amostras (padrão: {CONFIG['diskio_interval']}).")
+    sub.add_argument('--duration', type=float, default=None, help="Encerra após este tempo (s); padrão: Ctrl+C.")
+    sub.add_argument('-d', '--device', action='append', default=[],
+                     help="Só este dispositivo (ex.: -d sda); pode se repetir.")
+    sub.add_argument('-a', '--all', action='store_true', help="Inclui partições e dispositivos sem E/S.")
+    sub.add_argument('--json', action='store_true', help="Um objeto JSON por intervalo, sem painel.")
+    sub.set_defaults(handler=run_disk_io_monitor)
+    sub = subparsers.add_parser('mem-monitor', help="Acompanha a memória ao vivo, com histórico e sparklines.")
+    sub.add_argument('-i', '--interval', type=float, default=None,
+                     help=f"Intervalo (s) entre amostras (padrão: {CONFIG['mem_interval']}).")
+    sub.add_argument('--history', type=int, default=None,
+                     help=f"Amostras guardadas por métrica (padrão: {CONFIG['mem_history']}).")
+    sub.add_argument('--duration', type=float, default=None, help="Encerra após este tempo (s); padrão: Ctrl+C.")
+    sub.add_argument('--json', action='store_true', help="Um objeto JSON por amostra, sem painel.")
+    sub.set_defaults(handler=run_memory_monitor)
+    sub = subparsers.add_parser('dirsize', help="Tamanho de um diretório e dos maiores subdiretórios (como o ncdu).",
+                                description="Tamanho de um diretório e dos maiores subdiretórios (como o ncdu). "
+                                            "Diretórios inalterados vêm do cache; os totais que os incluem aparecem "
+                                            "com ≈, pois arquivos que só mudaram de tamanho não são detectados.")
+    sub.add_argument('path', nargs='?', default='.', help="Diretório a analisar (padrão: o atual).")
+    sub.add_argument('-n', '--top', type=int, default=20, help="Subdiretórios exibidos (padrão: 20).")
+    sub.add_argument('-i', '--interactive', action='store_true', help="Navega pela árvore após a varredura.")
+    sub.add_argument('-j', '--workers', type=int, default=None,
+                     help=f"Threads da varredura (padrão: {CONFIG['dirscan_workers']}).")
+    sub.add_argument('--no-cache', action='store_true',
+                     help="Relê todos os diretórios, sem ler nem gravar o cache. Com o cache, tamanhos marcados "
+                          "com ≈ podem não incluir arquivos que cresceram ou encolheram sem mudar o diretório.")
+    sub.add_argument('--cross-mounts', action='store_true', help="Entra em outros sistemas de arquivos montados.")
+    sub.add_argument('--json', action='store_true', help="Saída em JSON, sem interface Rich.")
+    sub.set_defaults(handler=run_dirsize)
+    sub = subparsers.add_parser('largest', help="Lista os maiores arquivos (heap de tamanho fixo, memória constante).")
+    sub.add_argument('paths', nargs='*', help="Diretórios a percorrer (padrão: todos os pontos de montagem reais).")
+    sub.add_argument('-n', '--top', type=int, default=20, help="Quantos arquivos listar (padrão: 20).")
+    sub.add_argument('-e', '--ext', action='append', default=[],
+                     help="Só estas extensões (ex.: -e .log,.gz); pode se repetir.")
+    sub.add_argument('--older-than', type=float, default=None, metavar='DIAS',
+                     help="Só arquivos modificados há mais de DIAS dias.")
+    sub.add_argument('--newer-than', type=float, default=None, metavar='DIAS',
+                     help="Só arquivos modificados nos últimos DIAS dias.")
+    sub.add_argument('--min-size', type=parse_size, default=0, help="Tamanho mínimo (ex.: 100M, 1.5G).")
+    sub.add_argument('--cross-mounts', action='store_true', help="Entra em outros sistemas de arquivos montados.")
+    sub.add_argument('--json', action='store_true', help="Um objeto JSON por arquivo (JSONL); resumo na saída de erro.")
+    sub.set_defaults(handler=run_largest)
+    sub = subparsers.add_parser('dupes', help="Encontra arquivos duplicados (tamanho → hash parcial → hash completo).")
+    sub.add_argument('paths', nargs='*', help="Diretórios a percorrer (padrão: os diretórios de download).")
+    sub.add_argument('--action', choices=DUPLICATE_ACTIONS, default='report',
+                     help="report: só lista; hardlink: troca as cópias por links físicos; delete: remove as cópias.")
+    sub.add_argument('--dry-run', action='store_true', help="Mostra o que a ação faria, sem alterar nada.")
+    sub.add_argument('--keep', choices=DUPLICATE_KEEP, default='oldest',
+                     help="Arquivo mantido em cada grupo (padrão: oldest, o de modificação mais antiga).")
+    sub.add_argument('--min-size', type=parse_size, default=1, help="Ignora arquivos menores (ex.: 1M; padrão: 1).")
+    sub.add_argument('-j', '--workers', type=int, default=None,
+                     help="Processos do hash completo (padrão: dupes_workers ou o número de núcleos).")
+    sub.add_argument('-n', '--top', type=int, default=20, help="Grupos exibidos (padrão: 20).")
+    sub.add_argument('--cross-mounts', action='store_true', help="Entra em outros sistemas de arquivos montados.")
+    sub.add_argument('--json', action='store_true', help="Saída em JSON, sem interface Rich.")
+    sub.set_defaults(handler=run_dupes)
+    sub = subparsers.add_parser('geo-bulk', help="Geolocaliza IPs de arquivos ou da entrada padrão (JSONL/CSV).")
+    sub.add_argument('files', nargs='*', help="Arquivos com um IP por linha ('-' ou nenhum: entrada padrão).")
+    sub.add_argument('--format', choices=('jsonl', 'csv'), default='jsonl', help="Formato da saída (padrão: jsonl).")
+    sub.add_argument('-o', '--output', help="Arquivo de saída (padrão: saída padrão).")
+    sub.add_argument('--concurrency', type=int, default=None,
+                     help=f"Consultas simultâneas (padrão: {CONFIG['geo_concurrency']}).")
+    sub.add_argument('--rate', type=float, default=None,
+                     help=f"Limite de requisições por segundo, 0 = sem limite (padrão: {CONFIG['geo_rate_limit']}).")
+    sub.add_argument('--mode', choices=GEO_MODES, default=None, help="Fonte dos dados (padrão: geo_mode).")
+    sub.set_defaults(handler=run_geo_bulk)
+    sub = subparsers.add_parser('geo-enrich', help="Anexa a geolocalização dos IPs às linhas de logs.")
+    sub.add_argument('files', nargs='*', help="Logs a processar ('-' ou nenhum: entrada padrão).")
+    sub.add_argument('--format', choices=('text', 'jsonl'), default='text',
+                     help="text: anota o fim de cada linha; jsonl: {\"line\", \"geo\"} (padrão: text).")
+    sub.add_argument('-o', '--output', help="Arquivo de saída (padrão: saída padrão).")
+    sub.add_argument('--fields', default=",".join(ENRICH_FIELDS),
+                     help=f"Campos anexados (padrão: {','.join(ENRICH_FIELDS)}).")
+    sub.add_argument('--concurrency', type=int, default=None, help="Consultas simultâneas.")
+    sub.add_argument('--rate', type=float, default=None, help="Limite de requisições por segundo.")
+    sub.add_argument('--mode', choices=GEO_MODES, default=None, help="Fonte dos dados (padrão: geo_mode).")
+    sub.set_defaults(handler=run_geo_enrich)
+    sub = subparsers.add_parser('geo-import', help="Compila um CSV de intervalos de IP na base offline.")
+    sub.add_argument('csv', help="CSV/TSV com início, fim, país, ASN e organização (com ou sem cabeçalho).")
+    sub.add_argument('-o', '--output', help=f"Arquivo da base (padrão: {CONFIG['geo_offline_db']}).")
+    sub.set_defaults(handler=run_geo_import)
+
+    sub = subparsers.add_parser('serve', help="Inicia o daemon que atende subcomandos via socket Unix.")
+    sub.add_argument('--socket', default=CONFIG['daemon_socket'], help="Caminho do socket Unix.")
+    sub.set_defaults(handler=lambda a: serve_daemon(a.socket))
+    sub = subparsers.add_parser('client', help="Envia um subcomando ao daemon e imprime o JSON retornado.")
+    sub.add_argument('--socket', default=CONFIG['daemon_socket'], help="Caminho do socket Unix.")
+    sub.add_argument('--timeout', type=float, default=30.0, help="Tempo limite da requisição (s).")
+    sub.add_argument('argv', nargs=argparse.REMAINDER, help="Subcomando e argumentos (ex.: mem, geo 1.2.3.4).")
+    sub.set_defaults(handler=run_client)
+
+    bench = subparsers.add_parser('bench', help="Executa benchmarks de desempenho.")
+    bench_targets = bench.add_subparsers(dest='target', metavar='ALVO', required=True)
+    sub = bench_targets.add_parser('startup', help="Tempo até o primeiro quadro do menu e -X importtime.")
+    sub.add_argument('--runs', type=int, default=10, help="Número de execuções.")
+    sub.add_argument('--max-ms', type=float, default=None,
+                     help="Falha (código 1) se a mediana de inicialização exceder este limite.")
+    sub.set_defaults(handler=lambda a: benchmark_startup(a.runs, a.max_ms))
+    sub = bench_targets.add_parser('daemon', help="Vazão (req/s) do daemon contra a execução a frio.")
+    sub.add_argument('--requests', type=int, default=1000, help="Requisições enviadas ao daemon.")
+    sub.add_argument('--cold-runs', type=int, default=10, help="Execuções a frio (um processo cada).")
+    sub.add_argument('argv', nargs='*', default=['mem'], help="Subcomando medido (padrão: mem).")
+    sub.set_defaults(handler=lambda a: benchmark_daemon(a.argv, a.requests, a.cold_runs))
+    sub = bench_targets.add_parser('ping', help="Ping nativo de muitos hosts de loopback x um processo por host.")
+    sub.add_argument('--hosts', type=int, default=256, help="Número de hosts (127.0.0.1 em diante).")
+    sub.add_argument('--count', type=int, default=4, help="Pacotes por host.")
+    sub.add_argument('--interval', type=float, default=0.2, help="Intervalo (s) entre pacotes.")
+    sub.set_defaults(handler=lambda a: benchmark_ping(a.hosts, a.count, a.interval))
+    sub = bench_targets.add_parser('latency-hist', help="Custo e precisão do histograma do monitor de latência.")
+    sub.add_argument('--samples', type=int, default=1000000, help="Número de amostras.")
+    sub.set_defaults(handler=lambda a: benchmark_latency_histogram(a.samples))
+    sub = bench_targets.add_parser('disk', help="Coletor de disco em processo (statvfs) contra o df.")
+    sub.add_argument('--runs', type=int, default=200, help="Coletas por caminho.")
+    sub.set_defaults(handler=lambda a: benchmark_disk_usage(a.runs))
+    sub = bench_targets.add_parser('disk-io', help="Custo por amostra e memória do monitor de E/S de disco.")
+    sub.add_argument('--samples', type=int, default=1000, help="Amostras medidas.")
+    sub.set_defaults(handler=lambda a: benchmark_disk_io(a.samples))
+    sub = bench_targets.add_parser('mem-monitor', help="Custo por amostra, redesenhos e memória do monitor de memória.")
+    sub.add_argument('--samples', type=int, default=20000, help="Amostras da verificação de memória.")
+    sub.add_argument('--history', type=int, default=120, help="Amostras guardadas por métrica.")
+    sub.set_defaults(handler=lambda a: benchmark_memory_monitor(a.samples, a.history))
+    sub = bench_targets.add_parser('dirsize', help="Varredura de diretórios (série, paralela, cache) contra o du.")
+    sub.add_argument('--files', type=int, default=1000000, help="Arquivos na árvore sintética.")
+    sub.add_argument('--per-dir', type=int, default=100, help="Arquivos por diretório folha.")
+    sub.add_argument('--fanout', type=int, default=10, help="Subdiretórios por nível.")
+    sub.add_argument('-j', '--workers', type=int, default=None, help="Threads das varreduras paralelas.")
+    sub.add_argument('--drop-caches', action='store_true',
+                     help="Esvazia o cache de páginas antes das varreduras sem cache (requer root).")
+    sub.set_defaults(handler=lambda a: benchmark_dirsize(a.files, a.per_dir, a.fanout, a.workers, a.drop_caches))
+    sub = bench_targets.add_parser('largest', help="Memória e tempo do top-K de arquivos contra a lista completa.")
+    sub.add_argument('--files', type=int, default=1000000, help="Arquivos na maior árvore sintética.")
+    sub.add_argument('--top', type=int, default=20, help="Quantos arquivos procurar.")
+    sub.set_defaults(handler=lambda a: benchmark_largest(a.files, a.top))
+    sub = bench_targets.add_parser('dupes', help="Busca de duplicatas em etapas contra o hash completo de tudo.")
+    sub.add_argument('--groups', type=int, default=32, help="Grupos de arquivos idênticos.")
+    sub.add_argument('--copies', type=int, default=3, help="Cópias por grupo.")
+    sub.add_argument('--file-mb', type=int, default=8, help="Tamanho (MB) dos arquivos grandes.")
+    sub.add_argument('--small-files', type=int, default=20000, help="Arquivos pequenos (até 64 KB).")
+    sub.add_argument('-j', '--workers', type=int, default=None, help="Processos do hash completo.")
+    sub.add_argument('--drop-caches', action='store_true',
+                     help="Esvazia o cache de páginas antes de cada medição (requer root).")
+    sub.set_defaults(handler=lambda a: benchmark_dupes(a.groups, a.copies, a.file_mb, a.small_files, a.workers,
+                                                       a.drop_caches))
+    sub = bench_targets.add_parser('geo-bulk', help="Vazão da geolocalização em massa contra um servidor local.")
+    sub.add_argument('--ips', type=int, default=5000, help="IPs únicos na lista sintética.")
+    sub.add_argument('--latency-ms', type=float, default=20.0, help="Latência simulada do servidor (ms).")
+    sub.add_argument('--concurrency', type=int, default=16, help="Consultas simultâneas.")
+    sub.add_argument('--fail-rate', type=float, default=0.0, help="Fração de respostas 429 (testa as novas tentativas).")
+    sub.set_defaults(handler=lambda a: benchmark_geo_bulk(a.ips, a.latency_ms, a.concurrency, a.fail_rate))
+    sub = bench_targets.add_parser('geo-offline', help="Consultas/s da base offline contra o caminho HTTP.")
+    sub.add_argument('--ranges', type=int, default=500000, help="Intervalos na base sintética.")
+    sub.add_argument('--lookups', type=int, default=200000, help="Consultas na base offline.")
+    sub.add_argument('--latency-ms', type=float, default=20.0, help="Latência simulada do servidor HTTP (ms).")
+    sub.set_defaults(handler=lambda a: benchmark_geo_offline(a.ranges, a.lookups, a.latency_ms))
+    sub = bench_targets.add_parser('geo-prefix', help="Taxa de acerto do cache exato x por prefixo em um log.")
+    sub.add_argument('--lines', type=int, default=100000, help="Linhas do log sintético.")
+    sub.add_argument('--log', help="Log real (IP na primeira coluna) em vez do sintético.")
+    sub.set_defaults(handler=lambda a: benchmark_geo_prefix(a.lines, a.log))
+    sub = bench_targets.add_parser('geo-enrich', help="Linhas/s e memória do enriquecimento de logs.")
+    sub.add_argument('--lines', type=int, default=1000000, help="Linhas do maior log sintético.")
+    sub.set_defaults(handler=lambda a: benchmark_geo_enrich(a.lines))
+    sub = bench_targets.add_parser('dns', help="Consultas/s do resolvedor DNS (série, paralelo e cache).")
+    sub.add_argument('--names', type=int, default=5000, help="Número de nomes sintéticos.")
+    sub.add_argument('--latency-ms', type=float, default=20.0, help="Latência simulada do servidor (ms).")
+    sub.set_defaults(handler=lambda a: benchmark_dns(a.names, a.latency_ms))
+    sub = bench_targets.add_parser('dns-server', help="Servidor DNS local de teste (use o endereço em dns_servers).")
+    sub.add_argument('--port', type=int, default=5353, help="Porta UDP (0 = qualquer porta livre).")
+    sub.add_argument('--latency-ms', type=float, default=20.0, help="Latência simulada (ms).")
+    sub.set_defaults(handler=lambda a: serve_fake_dns(a.port, a.latency_ms))
+    sub = bench_targets.add_parser('geo-server', help="Servidor local que imita o ipinfo (use a URL em geo_api_url).")
+    sub.add_argument('--port', type=int, default=8765, help="Porta (0 = qualquer porta livre).")
+    sub.add_argument('--latency-ms', type=float, default=20.0, help="Latência simulada (ms).")
+    sub.add_argument('--fail-rate', type=float, default=0.0, help="Fração de respostas 429.")
+    sub.set_defaults(handler=lambda a: serve_fake_geo(a.port, a.latency_ms, a.fail_rate))
+    return parser
+
+def _interrupt_on_sigterm(signum, frame) -> None:
+    """Converte SIGTERM em KeyboardInterrupt para que os comandos filhos sejam encerrados."""
+    raise KeyboardInterrupt
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if hasattr(signal, 'SIGTERM'):
+        signal.signal(signal.SIGTERM, _interrupt_on_sigterm)
+    args = parse_args()
+    if getattr(args, 'handler', None):
+        sys.exit(args.handler(args))
+    if args.command:
+        sys.exit(run_cli(args))
+    main()
@@ -0,0 +1,115 @@
+import pytools
+
+SIMULATED_UPGRADE = """\
+Reading package lists...
+Building dependency tree...
+Calculating upgrade...
+The following packages have been kept back:
+  linux-image-generic
+The following NEW packages will be installed:
+  linux-image-6.8.0-50-generic
+The following packages will be upgraded:
+  linux-image-generic openssl
+2 upgraded, 1 newly installed, 0 to remove and 0 not upgraded.
+Inst linux-image-6.8.0-50-generic (6.8.0-50.51 Ubuntu:24.04/noble-updates [amd64])
+Inst linux-image-generic [6.8.0-49.49] (6.8.0-50.50 Ubuntu:24.04/noble-updates [amd64])
+Inst openssl [3.0.13-0ubuntu3.3] (3.0.13-0ubuntu3.4 Ubuntu:24.04/noble-updates [amd64])
+Conf linux-image-6.8.0-50-generic (6.8.0-50.51 Ubuntu:24.04/noble-updates [amd64])
+Conf linux-image-generic (6.8.0-50.50 Ubuntu:24.04/noble-updates [amd64])
+Conf openssl (3.0.13-0ubuntu3.4 Ubuntu:24.04/noble-updates [amd64])
+"""
+
+KEPT_BACK_ONLY = """\
+Reading package lists...
+Calculating upgrade...
+The following packages have been kept back:
+  linux-image-generic
+0 upgraded, 0 newly installed, 0 to remove and 1 not upgraded.
+"""
+
+
+def fake_apt(monkeypatch, stdout, success=True):
+    """Substitui o run_capture por uma simulação com saída fixa; retorna os comandos recebidos."""
+    commands = []
+
+    def run_capture(command, timeout=None, line_filter=None):
+        commands.append(command)
+        return {"success": success, "stdout": stdout, "stderr": ""}
+
+    monkeypatch.setattr(pytools, 'run_capture', run_capture)
+    return commands
+
+
+def test_only_inst_and_remv_lines_count():
+    assert pytools.count_apt_changes(SIMULATED_UPGRADE) == 3
+    assert pytools.count_apt_changes(KEPT_BACK_ONLY) == 0
+    assert pytools.count_apt_changes("Remv oldpkg [1.0]\nConf other (2.0)\n") == 1
+
+
+def test_upgrade_is_simulated_with_apt_semantics(monkeypatch):
+    commands = fake_apt(monkeypatch, SIMULATED_UPGRADE)
+    assert pytools.simulate_apt('upgrade') == 3
+    assert pytools.skip_without_changes('upgrade') is None
+    command = commands[0]
+    # Como o `apt upgrade` que a etapa executa, a simulação aceita dependências novas
+    assert command[0] == 'apt-get' and command[-1] == 'upgrade' and '-s' in command
+    assert 'APT::Get::Upgrade-Allow-New=true' in command
+
+
+def test_no_changes_skips_and_failures_run(monkeypatch):
+    commands = fake_apt(monkeypatch, KEPT_BACK_ONLY)
+    assert pytools.skip_without_changes('autoremove') == "simulação: nenhum pacote para autoremove"
+    assert 'APT::Get::Upgrade-Allow-New=true' not in commands[0]
+    fake_apt(monkeypatch, "", success=False)
+    assert pytools.simulate_apt('upgrade') is None
+    assert pytools.skip_without_changes('upgrade') is None
+
+
+def test_apt_progress_consumes_status_lines(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(pytools.time, 'monotonic', lambda: now[0])
+    progress = pytools.AptProgress()
+    rest = progress.feed('stdout', [
+        "dlstatus:1:12.5:Baixando openssl",
+        "Get:1 http://archive.ubuntu.com/ubuntu noble-updates/main amd64 openssl",
+        "pmstatus:openssl:20:Preparing to configure openssl",
+    ])
+    assert rest == ["Get:1 http://archive.ubuntu.com/ubuntu noble-updates/main amd64 openssl"]
+    assert progress.phase == "instalando" and progress.percent == 20.0 and not progress.done
+    assert progress.rate() is None
+    now[0] += 2
+    rest = progress.feed('stdout', [
+        "pmstatus:openssl:amd64:50:Installed openssl:amd64",   # ':' da arquitetura no nome
+        "pmerror:libfoo:60:subprocess installed post-installation script returned error exit status 1",
+        "pmconffile:/etc/foo.conf:70:'/etc/foo.conf' '/etc/foo.conf.dpkg-new' 1 1",
+        "Progress: [ 85%]",
+        "Setting up openssl (3.0.13) ...",
+    ])
+    assert rest == ["Setting up openssl (3.0.13) ..."]
+    assert progress.percent == 85.0 and progress.done == {"openssl:amd64"}
+    assert progress.errors == ["libfoo: subprocess installed post-installation script returned error exit status 1"]
+    assert progress.conffiles == ["/etc/foo.conf"]
+    now[0] += 2
+    progress.feed('stdout', ["pmstatus:zlib1g:100:Removed zlib1g"])
+    assert progress.done == {"openssl:amd64", "zlib1g"} and progress.rate() == 0.5
+    assert progress.summary()["packages"] == 2 and progress.summary()["packages_per_s"] == 0.5
+
+
+def test_apt_progress_leaves_stderr_alone():
+    progress = pytools.AptProgress()
+    lines = ["pmstatus:openssl:50:Installed openssl", "W: Some index files failed to download."]
+    assert progress.feed('stderr', lines) == lines and progress.percent is None
+
+
+def test_download_phase_and_percent_cap():
+    progress = pytools.AptProgress()
+    assert progress.feed('stdout', ["dlstatus:3:140:Baixando tudo"]) == []
+    assert progress.phase == "baixando" and progress.percent == 100.0 and progress.rate() is None
+
+
+def test_every_apt_step_reports_machine_status(monkeypatch):
+    monkeypatch.setattr(pytools, 'IS_TERMUX', False)
+    monkeypatch.setattr(pytools.os, 'geteuid', lambda: 0)
+    steps = {step.name: step for step in pytools.system_update_steps()}
+    for name in ('update', 'upgrade', 'autoremove', 'autoclean'):
+        assert steps[name].command[-2:] == pytools.APT_STATUS_OPTIONS, name
@@ -0,0 +1,59 @@
+import pytools
+
+
+def test_cap_counts_utf8_bytes():
+    capture = pytools.OutputCapture(head_lines=5, tail_lines=1000, max_bytes=4096)
+    line = "ação ✓ 漢字" * 20  # 260 caracteres, 500 bytes em UTF-8
+    capture.add_lines([line] * 100)
+    kept = capture.head + list(capture.tail)
+    used = sum(len(text.encode()) + 1 for text in kept)
+    assert used <= 4096
+    assert capture.head_bytes + capture.tail_bytes == used
+    assert capture.total_bytes == 100 * (len(line.encode()) + 1)
+    assert capture.dropped_bytes == capture.total_bytes - used
+    assert capture.dropped_lines == 100 - len(kept)
+
+
+def test_long_line_is_truncated_on_a_character_boundary():
+    capture = pytools.OutputCapture(max_bytes=64)
+    capture.add_lines(["é" * 100])
+    assert capture.head == ["é" * 15]
+    assert capture.head_bytes == 31
+    assert capture.total_bytes == capture.head_bytes + capture.dropped_bytes
+
+
+def test_empty_batch_is_ignored(tmp_path):
+    capture = pytools.OutputCapture(spill_path=str(tmp_path / 'out.gz'))
+    capture.add_lines([])
+    capture.close()
+    assert capture.total_lines == 0 and capture.spill_path is None
+
+
+def test_carriage_return_keeps_the_last_segment():
+    splitter = pytools.LineSplitter()
+    assert splitter.feed(b"10%\r50%\r100%\ndone\r\n") == ["100%", "done"]
+    assert splitter.feed(b"baixando 1%\rbaixando 2%") == []
+    assert splitter.flush() == ["baixando 2%"]
+
+
+def test_utf8_sequence_split_across_reads():
+    splitter = pytools.LineSplitter()
+    data = "ação ✓\n".encode()
+    assert splitter.feed(data[:2]) == []   # "a" e o primeiro byte de "ç"
+    assert splitter.feed(data[2:]) == ["ação ✓"]
+    assert splitter.flush() == []
+
+
+def test_partial_line_is_capped(monkeypatch):
+    monkeypatch.setattr(pytools, 'MAX_PARTIAL_LINE', 10)
+    splitter = pytools.LineSplitter()
+    assert splitter.feed(b"x" * 8) == []
+    assert splitter.feed(b"y" * 5) == ["x" * 8 + "y" * 5]
+    assert splitter.feed(b"z\n") == ["z"]
+
+
+def test_flush_returns_the_unterminated_line():
+    splitter = pytools.LineSplitter()
+    assert splitter.feed(b"one\ntwo") == ["one"]
+    assert splitter.flush() == ["two"] and splitter.flush() == []
+    assert splitter.feed(b"\xe2\x9c") == [] and splitter.flush() == ["�"]   # UTF-8 incompleto no fim
@@ -0,0 +1,51 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytools
+
+# Executa o script como `python pytools.py ...` e informa, no stderr, se o Rich foi importado
+RUNNER = ("import atexit, runpy, sys\n"
+          "atexit.register(lambda: sys.stderr.write('rich importado: %s\\n' % ('rich' in sys.modules)))\n"
+          "sys.argv = sys.argv[1:]\n"
+          "runpy.run_path(sys.argv[0], run_name='__main__')\n")
+
+
+def run_cli(tmp_path, *argv, env=None):
+    """Executa um subcomando em um processo novo (cwd em tmp_path, para o log); retorna (código, stdout, stderr)."""
+    process = subprocess.run([sys.executable, '-c', RUNNER, os.path.abspath(pytools.__file__), *argv],
+                             cwd=tmp_path, env={**os.environ, **(env or {})}, stdin=subprocess.DEVNULL,
+                             capture_output=True, text=True, timeout=60)
+    return process.returncode, process.stdout, process.stderr
+
+
+def single_json_line(stdout):
+    lines = stdout.splitlines()
+    assert len(lines) == 1, stdout
+    return json.loads(lines[0])
+
+
+def test_disk_json(tmp_path):
+    code, stdout, stderr = run_cli(tmp_path, 'disk', '--json')
+    records = single_json_line(stdout)
+    assert code == 0 and isinstance(records, list) and records
+    assert {"mountpoint", "total_bytes", "percent"} <= set(records[0])
+    assert "rich importado: False" in stderr
+
+
+def test_clean_temp_dry_run_json(tmp_path):
+    code, stdout, stderr = run_cli(tmp_path, 'clean-temp', '--dry-run', '--json')
+    result = single_json_line(stdout)
+    assert code == 0 and result["dry_run"] is True
+    assert "rich importado: False" in stderr
+
+
+def test_missing_dependency_is_a_json_error(tmp_path):
+    shadow = tmp_path / 'shadow'
+    shadow.mkdir()
+    (shadow / 'requests.py').write_text("raise ImportError('requests indisponível')\n")
+    code, stdout, _ = run_cli(tmp_path, 'geo', '8.8.8.8', '--json', env={'PYTHONPATH': str(shadow)})
+    result = single_json_line(stdout)
+    assert code == 1 and result["success"] is False
+    assert "pip install requests" in result["error"]
@@ -0,0 +1,85 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+import pytools
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    """Daemon real em um processo separado, ouvindo em um socket dentro de tmp_path."""
+    socket_path = str(tmp_path / 'run' / 'd.sock')
+    process = subprocess.Popen([sys.executable, os.path.abspath(pytools.__file__), 'serve', '--socket', socket_path],
+                               cwd=tmp_path, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 15
+    while not (os.path.exists(socket_path) and pytools._socket_in_use(socket_path)):
+        assert process.poll() is None and time.monotonic() < deadline, "o daemon não iniciou"
+        time.sleep(0.05)
+    yield socket_path
+    process.terminate()
+    process.wait(timeout=10)
+    assert not os.path.exists(socket_path)
+
+
+def test_invalid_requests_are_rejected():
+    state = pytools.DaemonState()
+    for request in ({}, {"argv": []}, {"argv": "sysinfo"}, {"argv": ["sysinfo", 1]}):
+        assert pytools.handle_daemon_request(state, request)["exit_code"] == 2
+    for argv in (['serve'], ['client', 'sysinfo'], ['bench', 'startup'], ['no-such-command']):
+        response = pytools.handle_daemon_request(state, {"argv": argv})
+        assert response["exit_code"] == 2 and response["result"]["success"] is False
+    assert state.requests == 0
+
+
+def test_status_and_commands_over_the_socket(daemon):
+    assert os.stat(daemon).st_mode & 0o077 == 0
+    status = pytools.daemon_request(['daemon-status'], daemon)
+    assert status["exit_code"] == 0 and status["result"]["pid"] != os.getpid()
+    response = pytools.daemon_request(['clean-temp', '--dry-run'], daemon)
+    assert response["exit_code"] == 0 and response["result"]["dry_run"] is True
+    assert pytools.daemon_request(['daemon-status'], daemon)["result"]["requests"] == 1
+
+
+def test_one_connection_carries_several_requests(daemon):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.settimeout(10)
+        conn.connect(daemon)
+        conn.sendall(b'not json\n\n' + json.dumps({"argv": ['daemon-status']}).encode() + b'\n')
+        reader = conn.makefile('rb')
+        first, second = json.loads(reader.readline()), json.loads(reader.readline())
+        assert first == {"exit_code": 2, "result": {"success": False, "error": "JSON inválido."}}
+        assert second["exit_code"] == 0 and "uptime_s" in second["result"]
+        assert pytools.daemon_request(['daemon-status'], daemon, conn=conn)["exit_code"] == 0
+
+
+def test_clean_temp_keeps_the_daemon_socket(tmp_path, monkeypatch):
+    keep = tmp_path / 'pytools.sock'
+    keep.write_bytes(b'')
+    (tmp_path / 'junk').write_bytes(b'x' * 10)
+    monkeypatch.setitem(pytools.CONFIG, 'daemon_socket', str(keep))
+    monkeypatch.setattr(pytools.os, 'walk', lambda top: [(str(tmp_path), [], ['pytools.sock', 'junk'])])
+    result = pytools.remove_temp_files()
+    assert result["files"] == 1 and result["bytes"] == 10
+    assert keep.exists() and not (tmp_path / 'junk').exists()
+
+
+def test_default_socket_is_private_without_xdg_runtime_dir(tmp_path, monkeypatch):
+    monkeypatch.delenv('XDG_RUNTIME_DIR', raising=False)
+    monkeypatch.setenv('HOME', str(tmp_path))
+    monkeypatch.chdir(tmp_path)
+    path = pytools.load_config()['daemon_socket']
+    assert os.path.dirname(path) == str(tmp_path / '.cache' / 'pytools')
+
+
+def test_cli_falls_back_to_json_without_rich(monkeypatch, capsys):
+    monkeypatch.setattr(pytools.rich_console, 'available', lambda: False)
+    args = pytools.parse_args(['clean-temp', '--dry-run'])
+    monkeypatch.setattr(args, 'collect', lambda a: {"success": False, "error": "falhou"})
+    assert pytools.run_cli(args) == 1
+    assert json.loads(capsys.readouterr().out) == {"success": False, "error": "falhou"}
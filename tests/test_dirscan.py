@@ -0,0 +1,113 @@
+import os
+import sqlite3
+
+import pytest
+
+import pytools
+
+
+def totals(tree):
+    """(bytes, disco, arquivos, subdiretórios) de cada diretório da árvore, sem as marcas de cache."""
+    return {path: (node.bytes, node.disk_bytes, node.files, node.dirs) for path, node in tree["nodes"].items()}
+
+
+def scan(root, cache=None, one_filesystem=True):
+    return pytools.DirectoryScanner(4, cache, one_filesystem).scan(str(root))
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / 'root'
+    (root / 'a' / 'b').mkdir(parents=True)
+    (root / 'c').mkdir()
+    (root / 'top.txt').write_bytes(b'x' * 10)
+    (root / 'a' / 'one').write_bytes(b'x' * 100)
+    (root / 'a' / 'b' / 'two').write_bytes(b'x' * 200)
+    (root / 'c' / 'three').write_bytes(b'x' * 50)
+    odd = os.path.join(os.fsencode(root), b'd\xff')  # Nome que não é UTF-8 válido
+    os.mkdir(odd)
+    with open(os.path.join(odd, b'f\xfe'), 'wb') as f:
+        f.write(b'x' * 7)
+    cache = pytools.DirSizeCache(str(tmp_path / 'dirs.sqlite3'))
+    yield root, cache
+    cache.close()
+
+
+def test_rescan_reuses_the_cache_and_matches_a_fresh_scan(tree):
+    root, cache = tree
+    first = scan(root, cache)
+    assert first["stats"]["dirs_scanned"] == 5 and first["stats"]["dirs_cached"] == 0
+    assert first["nodes"][str(root)].files == 5 and not first["nodes"][str(root)].approximate
+    second = scan(root, cache)
+    assert second["stats"]["dirs_scanned"] == 0 and second["stats"]["dirs_cached"] == 5
+    assert totals(second) == totals(first) == totals(scan(root))
+    assert second["nodes"][str(root)].approximate
+
+
+def test_changed_directories_are_rescanned_and_stale_rows_deleted(tree):
+    root, cache = tree
+    scan(root, cache)
+    (root / 'a' / 'b' / 'new').write_bytes(b'x' * 1000)   # Muda o mtime de a/b
+    os.remove(root / 'c' / 'three')
+    os.rmdir(root / 'c')                                  # Muda o mtime da raiz
+    rescanned = scan(root, cache)
+    assert totals(rescanned) == totals(scan(root))
+    nodes = rescanned["nodes"]
+    assert not nodes[str(root / 'a' / 'b')].cached and not nodes[str(root)].cached
+    assert nodes[str(root / 'a')].cached and nodes[str(root / 'a')].approximate
+    assert not nodes[str(root / 'a' / 'b')].approximate
+    assert str(root / 'c') not in cache.load(str(root))
+
+
+def test_a_replaced_directory_with_the_same_mtime_is_rescanned(tree):
+    root, cache = tree
+    scan(root, cache)
+    old = root / 'a' / 'b'
+    mtime = old.stat().st_mtime_ns
+    new = root / 'a' / 'b.new'
+    new.mkdir()
+    (new / 'other').write_bytes(b'x' * 3000)
+    os.utime(new, ns=(mtime, mtime))
+    os.remove(old / 'two')
+    os.rmdir(old)
+    os.rename(new, old)                                   # Mesmo nome e mtime, outro inode
+    rescanned = scan(root, cache)
+    assert not rescanned["nodes"][str(old)].cached
+    assert rescanned["nodes"][str(old)].bytes == old.stat().st_size + 3000
+    assert totals(rescanned) == totals(scan(root))
+
+
+def test_non_utf8_names_round_trip_as_blobs(tree):
+    root, cache = tree
+    scan(root, cache)
+    odd = os.path.join(str(root), os.fsdecode(b'd\xff'))
+    kinds = dict(sqlite3.connect(cache.path).execute("SELECT path, typeof(path) FROM dir_cache"))
+    assert kinds[os.fsencode(odd)] == 'blob'
+    assert os.fsdecode(b'd\xff') in cache.load(str(root))[str(root)][6]
+    cached = scan(root, cache)["nodes"][odd]
+    assert cached.cached and cached.files == 1 and cached.bytes >= 7
+
+
+def find_mount_under_small_dir():
+    """Um ponto de montagem cujo diretório pai é pequeno e de outro sistema de arquivos."""
+    for _, mountpoint, _, _ in pytools.read_mount_table() or []:
+        parent = os.path.dirname(mountpoint)
+        if mountpoint == '/' or parent == '/':
+            continue
+        try:
+            if os.stat(mountpoint).st_dev != os.stat(parent).st_dev and len(os.listdir(parent)) < 200:
+                return parent, mountpoint
+        except OSError:
+            continue
+    return None
+
+
+def test_one_filesystem_skips_mount_points():
+    found = find_mount_under_small_dir()
+    if found is None:
+        pytest.skip("nenhum ponto de montagem adequado neste sistema")
+    parent, mountpoint = found
+    inside = scan(parent)
+    assert mountpoint not in inside["nodes"] and inside["stats"]["skipped_mounts"] >= 1
+    across = scan(parent, one_filesystem=False)
+    assert mountpoint in across["nodes"] and across["stats"]["skipped_mounts"] == 0
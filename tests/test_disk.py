@@ -0,0 +1,77 @@
+import collections
+import types
+
+import pytools
+
+MOUNTS = """\
+/dev/sda1 / ext4 rw,relatime 0 0
+proc /proc proc rw,nosuid 0 0
+/dev/sdb1 /mnt/my\\040disk ext4 ro,relatime 0 0
+/dev/sda1 /srv/bind\\011tab ext4 rw,relatime 0 0
+/dev/sdc1 /mnt/back\\134slash vfat rw 0 0
+short line
+"""
+
+
+def fake_statvfs(table):
+    """os.statvfs sobre {ponto de montagem: (fsid, blocos, somente leitura)}, blocos de 4 KiB."""
+    def statvfs(path):
+        if path not in table:
+            raise PermissionError(path)
+        fsid, blocks, read_only = table[path]
+        return types.SimpleNamespace(f_frsize=4096, f_blocks=blocks, f_bfree=blocks // 2, f_bavail=blocks // 4,
+                                     f_files=blocks and 1000, f_ffree=blocks and 600, f_favail=blocks and 500,
+                                     f_flag=1 if read_only else 0, f_fsid=fsid)
+    return statvfs
+
+
+def test_mount_table_unescapes_octal_sequences(tmp_path, monkeypatch):
+    mounts = tmp_path / 'mounts'
+    mounts.write_text(MOUNTS)
+    monkeypatch.setattr(pytools, 'PROC_MOUNTS', str(mounts))
+    assert pytools.read_mount_table() == [
+        ('/dev/sda1', '/', 'ext4', 'rw,relatime'),
+        ('proc', '/proc', 'proc', 'rw,nosuid'),
+        ('/dev/sdb1', '/mnt/my disk', 'ext4', 'ro,relatime'),
+        ('/dev/sda1', '/srv/bind\ttab', 'ext4', 'rw,relatime'),
+        ('/dev/sdc1', '/mnt/back\\slash', 'vfat', 'rw'),
+    ]
+
+
+def test_bind_mounts_count_once_and_empty_filesystems_are_hidden(monkeypatch):
+    mounts = [('/dev/sda1', '/srv/data', 'ext4', 'rw'), ('/dev/sda1', '/', 'ext4', 'rw'),
+              ('proc', '/proc', 'proc', 'rw'), ('/dev/sdb1', '/mnt/ro', 'ext4', 'ro'),
+              ('/dev/sdc1', '/mnt/gone', 'ext4', 'rw')]
+    monkeypatch.setattr(pytools.os, 'statvfs', fake_statvfs({
+        '/': (1, 1000, False), '/srv/data': (1, 1000, False), '/proc': (2, 0, False), '/mnt/ro': (3, 100, True)}))
+    records = pytools.collect_disk_usage(mounts=mounts)
+    assert [record["mountpoint"] for record in records] == ['/', '/mnt/ro']  # Bind: fica o caminho mais curto
+    root, readonly = records
+    assert root["total_bytes"] == 1000 * 4096 and root["used_bytes"] == 500 * 4096
+    assert root["available_bytes"] == 250 * 4096 and root["percent"] == 67.0
+    assert root["inodes_used"] == 400 and root["inodes_percent"] == 45.0
+    assert readonly["read_only"] and not root["read_only"]
+    everything = pytools.collect_disk_usage(all_filesystems=True, mounts=mounts)
+    assert [record["mountpoint"] for record in everything] == ['/srv/data', '/', '/proc', '/mnt/ro']
+    assert everything[2]["inodes_percent"] is None
+
+
+def test_without_statvfs_falls_back_to_psutil(monkeypatch):
+    Partition = collections.namedtuple('Partition', 'device mountpoint fstype opts')
+    Usage = collections.namedtuple('Usage', 'total used free percent')
+
+    def disk_usage(path):
+        if path != 'C:\\':
+            raise OSError("unidade sem mídia")
+        return Usage(100, 40, 60, 40.0)
+
+    monkeypatch.delattr(pytools.os, 'statvfs', raising=False)
+    fake = types.SimpleNamespace(
+        available=lambda: True, disk_usage=disk_usage,
+        disk_partitions=lambda all=False: [Partition('C:\\', 'C:\\', 'NTFS', 'rw,fixed'),
+                                           Partition('D:\\', 'D:\\', '', 'cdrom')])
+    monkeypatch.setattr(pytools, 'psutil', fake)
+    assert pytools.collect_disk_usage() == [{
+        "filesystem": 'C:\\', "fstype": 'NTFS', "total_bytes": 100, "used_bytes": 40, "available_bytes": 60,
+        "percent": 40.0, "inodes_total": None, "inodes_used": None, "inodes_free": None, "inodes_percent": None,
+        "read_only": False, "mountpoint": 'C:\\'}]
@@ -0,0 +1,36 @@
+import collections
+
+import pytools
+
+Counters = collections.namedtuple('Counters', 'read_count write_count read_bytes write_bytes read_time write_time '
+                                              'busy_time')
+# Como no macOS/Windows: sem busy_time
+Basic = collections.namedtuple('Basic', 'read_count write_count read_bytes write_bytes read_time write_time')
+
+
+def test_rates_over_the_interval():
+    previous = {'sda': Counters(100, 50, 1_000_000, 500_000, 400, 900, 1000)}
+    current = {'sda': Counters(140, 70, 3_000_000, 1_500_000, 600, 1100, 2500)}
+    rate, = pytools.disk_io_rates(previous, current, 2.0)
+    assert rate == {"device": 'sda', "read_bytes_per_s": 1_000_000.0, "write_bytes_per_s": 500_000.0,
+                    "read_iops": 20.0, "write_iops": 10.0, "read_await_ms": 5.0, "write_await_ms": 10.0,
+                    "util_percent": 75.0}
+
+
+def test_idle_device_and_missing_busy_time():
+    previous = {'disk0': Basic(10, 10, 100, 100, 5, 5)}
+    current = {'disk0': Basic(10, 12, 100, 8292, 5, 9)}
+    rate, = pytools.disk_io_rates(previous, current, 1.0)
+    assert rate["read_iops"] == 0.0 and rate["read_await_ms"] is None
+    assert rate["write_iops"] == 2.0 and rate["write_await_ms"] == 2.0 and rate["util_percent"] is None
+
+
+def test_devices_that_come_go_or_reset_are_left_out():
+    previous = {'sda': Counters(1, 1, 512, 512, 1, 1, 1), 'sdb': Counters(5, 5, 4096, 4096, 10, 10, 10),
+                'sdc': Counters(2**32 - 10, 0, 0, 0, 0, 0, 0)}
+    current = {'sda': Counters(2, 1, 1024, 512, 2, 1, 2),            # sdb sumiu (ex.: pendrive removido)
+               'sdc': Counters(3, 0, 0, 0, 0, 0, 0),                 # Contador voltou: disco reconectado
+               'sdd': Counters(9, 9, 9, 9, 9, 9, 9)}                 # Novo: ainda sem leitura anterior
+    rates = pytools.disk_io_rates(previous, current, 1.0)
+    assert [rate["device"] for rate in rates] == ['sda']
+    assert rates[0]["read_bytes_per_s"] == 512.0 and rates[0]["util_percent"] == 0.1
@@ -0,0 +1,116 @@
+import asyncio
+import os
+import socket
+import struct
+import threading
+
+import pytest
+
+import pytools
+
+
+def reply(query: bytes, address: str, qname: bytes = None, qtype: int = None) -> bytes:
+    """Resposta A (TTL 300) à consulta; qname/qtype permitem ecoar uma pergunta diferente."""
+    end = pytools._skip_dns_name(query, 12)
+    question = (qname or query[12:end]) + struct.pack('!HH', qtype or struct.unpack_from('!H', query, end)[0], 1)
+    record = b'\xc0\x0c' + struct.pack('!HHIH', 1, 1, 300, 4) + socket.inet_aton(address)
+    return query[:2] + struct.pack('!HHHHH', 0x8180, 1, 1, 0, 0) + question + record
+
+
+@pytest.fixture
+def dns_server(monkeypatch):
+    """Servidor UDP que envia uma resposta forjada (pergunta trocada) antes da verdadeira."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(('127.0.0.1', 0))
+    ports = []
+
+    def serve() -> None:
+        while True:
+            try:
+                query, source = sock.recvfrom(2048)
+            except OSError:
+                return
+            ports.append(source[1])
+            sock.sendto(reply(query, '10.6.6.6', qname=b'\x06forged\x04test\x00'), source)
+            sock.sendto(reply(query, '10.6.6.7', qtype=28), source)
+            sock.sendto(reply(query, '10.0.0.1'), source)
+
+    threading.Thread(target=serve, daemon=True).start()
+    monkeypatch.setitem(pytools.CONFIG, 'dns_disk_cache', False)
+    monkeypatch.setattr(pytools, '_dns_memory', {})
+    monkeypatch.setattr(pytools, 'read_hosts_file', lambda: {})
+    yield f"127.0.0.1:{sock.getsockname()[1]}", ports
+    sock.close()
+
+
+def resolve(server: str, names):
+    async def run():
+        resolver = pytools.DNSResolver([server], timeout=1.0, attempts=1)
+        try:
+            return await asyncio.gather(*(resolver.resolve(name) for name in names))
+        finally:
+            resolver.close()
+    return asyncio.run(run())
+
+
+def test_reply_must_echo_the_question():
+    question = pytools.dns_question('host.test', 'A')
+    query = pytools.build_dns_query(1234, 'host.test', 'A')
+    good = reply(query, '10.0.0.1')
+    assert pytools.dns_reply_matches(good, 1234, question)
+    assert pytools.dns_reply_matches(good.replace(b'host', b'HoSt'), 1234, question)
+    assert not pytools.dns_reply_matches(good, 4321, question)
+    assert not pytools.dns_reply_matches(query, 1234, question)  # Sem o bit QR
+    assert not pytools.dns_reply_matches(reply(query, '10.0.0.1', qtype=28), 1234, question)
+    assert not pytools.dns_reply_matches(reply(query, '10.0.0.1', qname=b'\x04evil\x04test\x00'), 1234, question)
+
+
+def test_forged_answers_are_ignored(dns_server):
+    server, _ = dns_server
+    results = resolve(server, ['host1.test', 'host2.test'])
+    for result in results:
+        assert result["status"] == 'ok' and result["source"] == 'dns'
+        assert result["addresses"] == ['10.0.0.1'] and result["ttl"] == 300
+
+
+def test_each_query_uses_its_own_source_port(dns_server):
+    server, ports = dns_server
+    resolve(server, [f"host{index}.test" for index in range(8)])
+    assert len(ports) == 8 and len(set(ports)) == 8
+
+
+def test_disk_cache_is_read_and_written_off_the_loop_thread(dns_server, tmp_path, monkeypatch):
+    server, ports = dns_server
+    cache = pytools.IPCache(str(tmp_path / 'cache.sqlite3'), 3600, 10000)
+    threads = []
+    for method in ('get_dns', 'put_dns_many'):
+        original = getattr(cache, method)
+
+        def recorded(*args, _original=original):
+            threads.append(threading.current_thread())
+            return _original(*args)
+
+        monkeypatch.setattr(cache, method, recorded)
+    monkeypatch.setattr(pytools, '_ip_cache', cache)
+    monkeypatch.setitem(pytools.CONFIG, 'dns_disk_cache', True)
+
+    assert resolve(server, ['host1.test'])[0]["source"] == 'dns'
+    pytools._dns_memory.clear()  # Força a segunda consulta a vir do disco
+    result = resolve(server, ['host1.test'])[0]
+    assert result["source"] == 'cache' and result["addresses"] == ['10.0.0.1']
+    assert len(ports) == 1 and len(threads) == 3
+    assert all(thread is not threading.main_thread() for thread in threads)
+
+
+def test_hosts_file_is_reread_when_it_changes(tmp_path, monkeypatch):
+    hosts = tmp_path / 'hosts'
+    hosts.write_text("10.1.1.1 app.test # comentário\n::1 app.test\n")
+    monkeypatch.setattr(pytools, 'hosts_file_path', lambda: str(hosts))
+    assert pytools.read_hosts_file()[('A', 'app.test')] == ['10.1.1.1']
+    assert pytools.read_hosts_file()[('AAAA', 'app.test')] == ['::1']
+    hosts.write_text("10.2.2.2 app.test\n")
+    stat = hosts.stat()
+    os.utime(hosts, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert pytools.read_hosts_file() == {('A', 'app.test'): ['10.2.2.2']}
+    hosts.unlink()
+    assert pytools.read_hosts_file() == {}
@@ -0,0 +1,142 @@
+import hashlib
+import os
+import types
+
+import pytest
+
+import pytools
+
+CONTENT = b'duplicado ' * 5000   # Acima de 2 x 16 KB: passa pelo hash completo
+
+
+@pytest.fixture
+def dupes(tmp_path):
+    """Raiz com um original (o mais antigo, que é mantido) e uma cópia; retorna (raiz, original, cópia)."""
+    root = tmp_path / 'root'
+    root.mkdir()
+    keep, copy = root / 'original', root / 'copy'
+    keep.write_bytes(CONTENT)
+    copy.write_bytes(CONTENT)
+    os.utime(keep, ns=(10 ** 18, 10 ** 18))
+    return root, keep, copy
+
+
+def scan(root):
+    return pytools.find_duplicates([str(root)], workers=2)
+
+
+def apply(root, action, dry_run=False):
+    outcomes = pytools.apply_duplicate_action(scan(root), action, dry_run)
+    assert len(outcomes) == 1
+    return outcomes[0]
+
+
+def test_chunked_full_hash_matches_hashlib(tmp_path, monkeypatch):
+    monkeypatch.setattr(pytools, 'FULL_HASH_CHUNK', 4096)
+    data = tmp_path / 'data'
+    data.write_bytes(os.urandom(3 * 4096 + 17))
+    assert pytools.full_file_hash(str(data), 'sha256') == (str(data), hashlib.sha256(data.read_bytes()).hexdigest(), None)
+    path, digest, error = pytools.full_file_hash(str(tmp_path / 'missing'), 'sha256')
+    assert digest is None and error
+
+
+def test_dry_run_leaves_files_untouched(dupes):
+    root, keep, copy = dupes
+    before = copy.stat()
+    for action in ('hardlink', 'delete'):
+        outcome = apply(root, action, dry_run=True)
+        assert outcome["status"] == 'planned' and outcome["freed_bytes"] == len(CONTENT)
+    after = copy.stat()
+    assert (after.st_ino, after.st_nlink, after.st_mtime_ns) == (before.st_ino, 1, before.st_mtime_ns)
+
+
+def test_hardlink_and_delete(dupes):
+    root, keep, copy = dupes
+    outcome = apply(root, 'hardlink')
+    assert outcome["status"] == 'done' and outcome["paths"] == [str(copy)] and outcome["keep"] == str(keep)
+    assert copy.stat().st_ino == keep.stat().st_ino and keep.stat().st_nlink == 2
+    assert scan(root)["groups"] == []    # Links do mesmo inode não são duplicatas
+    other = root / 'other'
+    other.write_bytes(CONTENT)
+    outcome = apply(root, 'delete')
+    assert outcome["status"] == 'done' and not other.exists() and keep.read_bytes() == CONTENT
+
+
+def test_hardlinks_outside_the_search_free_nothing(dupes, tmp_path):
+    root, keep, copy = dupes
+    os.link(copy, tmp_path / 'outside')    # Mais um nome para a cópia, fora da raiz
+    outcome = apply(root, 'hardlink')
+    assert outcome["status"] == 'done' and outcome["freed_bytes"] == 0
+    assert copy.stat().st_ino == keep.stat().st_ino
+
+
+def test_every_name_inside_the_search_frees_the_space(dupes):
+    root, keep, copy = dupes
+    inside = root / 'copy-link'
+    os.link(copy, inside)                  # Dois nomes para a cópia, ambos dentro da busca
+    outcome = apply(root, 'hardlink')
+    assert outcome["freed_bytes"] == len(CONTENT) and sorted(outcome["paths"]) == sorted([str(copy), str(inside)])
+    assert copy.stat().st_ino == inside.stat().st_ino == keep.stat().st_ino
+
+
+def swap_in_place(path):
+    """Troca o arquivo por outro de mesmo tamanho e mtime, mas com outro conteúdo e inode."""
+    before = path.stat()
+    replacement = path.parent / 'replacement'
+    replacement.write_bytes(b'x' * before.st_size)
+    os.utime(replacement, ns=(before.st_atime_ns, before.st_mtime_ns))
+    os.replace(replacement, path)
+
+
+@pytest.mark.parametrize('change', ['size', 'mtime', 'inode', 'keep', 'keep-inode'])
+def test_files_changed_since_the_hash_are_skipped(dupes, change):
+    root, keep, copy = dupes
+    result = scan(root)
+    if change == 'size':
+        copy.write_bytes(CONTENT + b'!')
+    elif change == 'mtime':
+        os.utime(copy, ns=(10 ** 18 + 1, 10 ** 18 + 1))
+    elif change == 'inode':
+        swap_in_place(copy)
+    elif change == 'keep':
+        os.utime(keep, ns=(10 ** 18 + 1, 10 ** 18 + 1))
+    else:
+        swap_in_place(keep)
+    ino = copy.stat().st_ino
+    outcome, = pytools.apply_duplicate_action(result, 'delete', dry_run=False)
+    assert outcome["status"] == 'skipped' and outcome["error"] == "alterado desde a verificação"
+    assert outcome["freed_bytes"] == 0 and copy.exists() and copy.stat().st_ino == ino
+
+
+def test_hardlink_across_filesystems_is_skipped(dupes, monkeypatch):
+    root, keep, copy = dupes
+    result = scan(root)
+    real_stat = os.stat
+
+    def stat(path, *args, **kwargs):
+        info = real_stat(path, *args, **kwargs)
+        if os.fspath(path) != str(keep):
+            return info
+        return types.SimpleNamespace(st_dev=info.st_dev + 1, st_ino=info.st_ino, st_size=info.st_size,
+                                     st_mtime_ns=info.st_mtime_ns, st_nlink=info.st_nlink)
+
+    monkeypatch.setattr(pytools.os, 'stat', stat)
+    outcome, = pytools.apply_duplicate_action(result, 'hardlink', dry_run=False)
+    monkeypatch.undo()
+    assert outcome["status"] == 'skipped' and outcome["error"] == "outro sistema de arquivos"
+    assert copy.stat().st_nlink == 1 and keep.stat().st_nlink == 1
+
+
+def test_temporary_link_is_removed_when_replace_fails(dupes, monkeypatch):
+    root, keep, copy = dupes
+    result = scan(root)
+
+    def replace(source, destination):
+        raise PermissionError("sem permissão")
+
+    monkeypatch.setattr(pytools.os, 'replace', replace)
+    outcome, = pytools.apply_duplicate_action(result, 'hardlink', dry_run=False)
+    monkeypatch.undo()
+    assert outcome["status"] == 'error' and outcome["freed_bytes"] == 0 and "sem permissão" in outcome["error"]
+    assert sorted(os.listdir(root)) == ['copy', 'original']
+    assert keep.stat().st_nlink == 1 and copy.read_bytes() == CONTENT
@@ -0,0 +1,85 @@
+import io
+import json
+import os
+
+import pytest
+
+import pytools
+
+
+@pytest.fixture
+def small_blocks(monkeypatch):
+    """Um bloco por linha, para exercitar o que atravessa as fronteiras de bloco."""
+    monkeypatch.setattr(pytools, 'ENRICH_BLOCK_SIZE', 1)
+
+
+def enrich(tmp_path, content: bytes, **options):
+    log = tmp_path / 'access.log'
+    log.write_bytes(content)
+    out = io.BytesIO()
+    stats = pytools.enrich_log([str(log)], out, **options)
+    return out.getvalue(), stats
+
+
+def test_lines_without_ips_are_copied_byte_for_byte(tmp_path):
+    content = b"plain\r\nvertical\x0btab\x1csep\rcarriage\nlast line without newline"
+    output, stats = enrich(tmp_path, content)
+    assert output == content and stats["lines"] == 3
+
+
+def test_annotations_keep_the_original_line_ending(tmp_path):
+    content = b"crlf 10.0.0.1\r\nlf 127.0.0.1\nnone 10.0.0.2\x0b tail"
+    output, stats = enrich(tmp_path, content)
+    assert output == (b"crlf 10.0.0.1 [geo 10.0.0.1 privado]\r\n"
+                      b"lf 127.0.0.1 [geo 127.0.0.1 loopback]\n"
+                      b"none 10.0.0.2\x0b tail [geo 10.0.0.2 privado]")
+    assert stats["lines_with_ips"] == 3
+
+
+def test_jsonl_line_excludes_the_terminator(tmp_path):
+    output, _ = enrich(tmp_path, b"a 10.0.0.1\r\n", fmt='jsonl')
+    assert json.loads(output) == {"line": "a 10.0.0.1", "geo": {"10.0.0.1": {"bogon": "privado"}}}
+
+
+def test_memo_evicts_the_least_recently_used_ip(tmp_path, monkeypatch, small_blocks):
+    monkeypatch.setattr(pytools, 'ENRICH_MEMO_MAX', 2)
+    content = b"10.0.0.1\n10.0.0.2\n10.0.0.1\n10.0.0.3\n10.0.0.1\n"
+    output, stats = enrich(tmp_path, content)
+    # 10.0.0.1 é reaproveitado a cada linha; só 10.0.0.2 sai do memo quando 10.0.0.3 entra
+    assert stats["unique_resolved"] == 3
+    assert output.count(b"[geo 10.0.0.1 privado]") == 3
+
+
+def test_one_rate_limiter_and_pool_per_call(tmp_path, monkeypatch, small_blocks):
+    created = []
+
+    class CountingLimiter(pytools.RateLimiter):
+        def __init__(self, *args, **kwargs):
+            created.append(self)
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(pytools, 'RateLimiter', CountingLimiter)
+    _, stats = enrich(tmp_path, b"".join(b"10.0.0.%d\n" % index for index in range(1, 6)))
+    assert stats["unique_resolved"] == 5 and len(created) == 1
+
+
+def test_log_truncated_between_blocks_ends_the_read(tmp_path, monkeypatch):
+    monkeypatch.setattr(pytools, 'ENRICH_BLOCK_SIZE', 64)
+    log = tmp_path / 'access.log'
+    content = b"".join(b"line %04d from 10.0.0.1\n" % index for index in range(1000))
+    log.write_bytes(content)
+    blocks = pytools.iter_line_blocks(str(log))
+    first = next(blocks)
+    assert first.endswith(b"\n") and content.startswith(first)
+    os.truncate(log, 0)    # Como o logrotate com copytruncate: sem SIGBUS, a leitura só termina
+    read = first + b"".join(blocks)
+    assert content.startswith(read) and len(read) < len(content)
+
+
+def test_blocks_end_on_line_boundaries(tmp_path, monkeypatch):
+    monkeypatch.setattr(pytools, 'ENRICH_BLOCK_SIZE', 7)
+    log = tmp_path / 'access.log'
+    content = b"a\nlonger line than a block\n\nlast"
+    log.write_bytes(content)
+    blocks = list(pytools.iter_line_blocks(str(log)))
+    assert b"".join(blocks) == content and all(block.endswith(b"\n") for block in blocks[:-1])
@@ -0,0 +1,271 @@
+import io
+import json
+import os
+import socket
+import threading
+import time
+
+import pytest
+import requests
+
+import pytools
+
+
+@pytest.fixture
+def geo_server(tmp_path, monkeypatch):
+    """Servidor local que imita o ipinfo, com cache vazio e configuração de teste."""
+    servers = []
+
+    def start(latency: float = 0.0, fail_rate: float = 0.0):
+        server, url = pytools.make_fake_geo_server(latency, fail_rate)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        monkeypatch.setitem(pytools.CONFIG, 'geo_api_url', url)
+        return url
+
+    for key, value in (('geo_rate_limit', 0), ('geo_backoff', 0.01), ('geo_retries', 3), ('geo_mode', 'online'),
+                       ('geo_prefix_cache', False), ('geo_negative_ttl', 600), ('geo_error_ttl', 30)):
+        monkeypatch.setitem(pytools.CONFIG, key, value)
+    monkeypatch.setattr(pytools, '_ip_cache', pytools.IPCache(str(tmp_path / 'cache.sqlite3'), 3600, 10000))
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def served(url: str) -> int:
+    return requests.get(url.format(ip='_stats'), timeout=10).json()["requests"]
+
+
+def test_bulk_deduplicates_and_answers_repeats_from_cache(geo_server):
+    url = geo_server(latency=0.01)
+    ips = [f"11.0.0.{i}" for i in range(40)] * 3
+    results = []
+    stats = pytools.geolocate_bulk(ips, results.append, concurrency=8)
+    assert stats["total"] == 120 and stats["unique"] == 40
+    assert stats["fetched"] == 40 and stats["errors"] == 0
+    assert sorted(r["ip"] for r in results) == sorted(set(ips))
+    assert all(r["data"]["city"] == f"Cidade {r['ip'].split('.')[-1]}" for r in results)
+    assert served(url) == 40
+
+    results.clear()
+    stats = pytools.geolocate_bulk(ips, results.append, concurrency=8)
+    assert stats["cache_hits"] == 40 and stats["fetched"] == 0
+    assert all(r["cached"] for r in results)
+    assert served(url) == 40
+
+
+def test_bulk_reports_invalid_bogon_and_not_found(geo_server):
+    url = geo_server()
+    results = []
+    stats = pytools.geolocate_bulk(['nao-e-ip', '10.1.2.3', '13.0.0.1', '11.0.0.1'], results.append)
+    by_ip = {r["ip"]: r for r in results}
+    assert stats["invalid"] == 1 and stats["bogons"] == 1 and stats["fetched"] == 1 and stats["errors"] == 1
+    assert by_ip['10.1.2.3']["data"]["bogon"] is True
+    assert "404" in by_ip['13.0.0.1']["error"]
+    # O 404 entra no cache negativo: a segunda rodada não chega ao servidor
+    before = served(url)
+    results.clear()
+    pytools.geolocate_bulk(['13.0.0.1'], results.append)
+    assert results[0]["cached"] is True and "error" in results[0]
+    assert served(url) == before
+
+
+def test_rate_limited_requests_are_retried(geo_server):
+    url = geo_server(fail_rate=0.5)
+    pytools.CONFIG['geo_retries'] = 20
+    results = []
+    stats = pytools.geolocate_bulk([f"11.0.1.{i}" for i in range(20)], results.append, concurrency=4)
+    assert stats["errors"] == 0 and stats["fetched"] == 20
+    assert served(url) > 20
+
+
+def test_persistent_429_gives_up_after_retries(geo_server, monkeypatch):
+    url = geo_server(fail_rate=1.0)
+    sleeps = []
+    monkeypatch.setattr(pytools.time, 'sleep', sleeps.append)
+    with pytest.raises(requests.HTTPError) as error:
+        pytools.request_geolocation('11.0.2.1')
+    assert error.value.response.status_code == 429
+    assert served(url) == pytools.CONFIG['geo_retries'] + 1
+    # Retry-After: 0 prevalece sobre a espera exponencial
+    assert sleeps == [0.0] * pytools.CONFIG['geo_retries']
+
+
+def test_connection_errors_back_off_exponentially(geo_server, monkeypatch):
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    monkeypatch.setitem(pytools.CONFIG, 'geo_api_url', f"http://127.0.0.1:{port}/{{ip}}/json")
+    monkeypatch.setitem(pytools.CONFIG, 'geo_backoff', 1.0)
+    sleeps = []
+    monkeypatch.setattr(pytools.time, 'sleep', sleeps.append)
+    with pytest.raises(requests.ConnectionError):
+        pytools.request_geolocation('11.0.3.1')
+    assert len(sleeps) == pytools.CONFIG['geo_retries']
+    for attempt, delay in enumerate(sleeps):
+        assert 2 ** attempt <= delay <= 2 ** attempt + 1
+
+
+class RecordingStream(io.StringIO):
+    """Guarda o conteúdo visível a cada flush, para verificar a gravação incremental."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.flushed = []
+
+    def flush(self) -> None:
+        super().flush()
+        self.flushed.append(self.getvalue())
+
+
+def test_jsonl_writer_streams_each_result(geo_server):
+    geo_server()
+    stream = RecordingStream()
+    write = pytools.geo_result_writer(stream, 'jsonl')
+    stats = pytools.geolocate_bulk(['11.0.4.1', '11.0.4.2', 'x'], write)
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == len(stream.flushed) == 3 and stats["invalid"] == 1
+    assert [stream.flushed[i].count('\n') for i in range(3)] == [1, 2, 3]
+    records = {r["ip"]: r for r in map(json.loads, lines)}
+    assert records['11.0.4.2']["data"]["country"] == "BR"
+    assert records['x']["error"] == "IP inválido"
+
+
+def test_csv_writer_streams_rows(geo_server):
+    import csv
+    geo_server()
+    stream = RecordingStream()
+    write = pytools.geo_result_writer(stream, 'csv')
+    pytools.geolocate_bulk(['11.0.5.1', '13.0.5.1'], write)
+    rows = list(csv.DictReader(io.StringIO(stream.getvalue())))
+    assert len(stream.flushed) == 2
+    assert {row["ip"] for row in rows} == {'11.0.5.1', '13.0.5.1'}
+    by_ip = {row["ip"]: row for row in rows}
+    assert by_ip['11.0.5.1']["city"] == "Cidade 1" and by_ip['11.0.5.1']["error"] == ""
+    assert "404" in by_ip['13.0.5.1']["error"] and by_ip['13.0.5.1']["city"] == ""
+
+
+def naive_owner(ranges, point):
+    """
+    Intervalo em vigor no ponto: o de maior início e, com o mesmo início, o
+    mais estreito; entre intervalos idênticos, o último do arquivo.
+    """
+    owner = None
+    for start, end, meta in ranges:
+        if start <= point <= end and (owner is None or (start, -end) >= owner[0]):
+            owner = (start, -end), meta
+    return owner and owner[1]
+
+
+def test_flatten_ranges_matches_the_innermost_range():
+    import random
+    rng = random.Random(3)
+    for _ in range(200):
+        ranges = []
+        for meta in range(rng.randint(1, 8)):
+            start = rng.randint(0, 60)
+            ranges.append((start, start + rng.randint(0, 30), meta))
+        flat, _ = pytools.flatten_ranges(list(ranges))
+        assert all(a[1] < b[0] for a, b in zip(flat, flat[1:]))
+        lookup = {point: meta for start, end, meta in flat for point in range(start, end + 1)}
+        for point in range(100):
+            assert lookup.get(point) == naive_owner(ranges, point), (ranges, point)
+
+
+def test_compiled_database_resolves_nested_ranges(tmp_path):
+    source = tmp_path / 'ranges.csv'
+    source.write_text("start,end,country,asn,org\n"
+                      "1.0.0.0,1.0.255.255,US,100,Externa\n"
+                      "1.0.16.0,1.0.16.255,BR,200,Interna\n"
+                      "1.0.200.0,1.1.0.255,DE,300,Sobreposta\n")
+    stats = pytools.compile_geo_database(str(source), str(tmp_path / 'ranges.bin'))
+    assert stats["overlapping_rows"] == 2 and stats["ipv4_ranges"] == 4
+    db = pytools.OfflineGeoDB(str(tmp_path / 'ranges.bin'))
+    assert db.lookup('1.0.16.7')["country"] == 'BR'
+    assert db.lookup('1.0.17.1')["country"] == 'US'
+    assert db.lookup('1.0.0.1')["country"] == 'US'
+    assert db.lookup('1.0.200.1')["country"] == 'DE'
+    assert db.lookup('1.1.0.1')["country"] == 'DE'
+    assert db.lookup('1.1.1.1') is None
+
+
+def test_offline_db_file_is_checked_at_most_once_per_interval(tmp_path, monkeypatch):
+    source = tmp_path / 'ranges.csv'
+    source.write_text("1.0.0.0,1.0.0.255,BR,100,Rede\n")
+    target = tmp_path / 'ranges.bin'
+    pytools.compile_geo_database(str(source), str(target))
+    monkeypatch.setitem(pytools.CONFIG, 'geo_offline_db', str(target))
+    monkeypatch.setattr(pytools, '_offline_db', None)
+    monkeypatch.setattr(pytools, '_offline_db_checked', (None, 0.0))
+    stats = []
+    real_stat = os.stat
+    monkeypatch.setattr(pytools.os, 'stat', lambda path, *args, **kwargs: (stats.append(path),
+                                                                             real_stat(path, *args, **kwargs))[1])
+    for _ in range(100):
+        assert pytools.lookup_offline('1.0.0.1', 'offline')["country"] == 'BR'
+    assert len(stats) == 1
+
+    os.remove(target)
+    clock = pytools.time.monotonic() + pytools.OFFLINE_DB_CHECK_INTERVAL
+    monkeypatch.setattr(pytools.time, 'monotonic', lambda: clock)
+    with pytest.raises(LookupError):
+        pytools.lookup_offline('1.0.0.1', 'offline')
+    assert len(stats) == 2
+
+
+def test_prefix_followers_outside_the_leader_network_fetch_their_own(tmp_path, monkeypatch):
+    monkeypatch.setitem(pytools.CONFIG, 'geo_prefix_cache', True)
+    monkeypatch.setitem(pytools.CONFIG, 'geo_mode', 'online')
+    monkeypatch.setattr(pytools, '_ip_cache', pytools.IPCache(str(tmp_path / 'cache.sqlite3'), 3600, 10000))
+    requested = []
+
+    def request_geolocation(ip, limiter=None):
+        requested.append(ip)
+        time.sleep(0.3)
+        return {"ip": ip, "hostname": f"h{ip}", "city": f"C{ip}", "network": "8.8.8.0/28"}
+
+    monkeypatch.setattr(pytools, 'request_geolocation', request_geolocation)
+    results = {}
+
+    def fetch(ip):
+        results[ip] = pytools.fetch_geolocation(ip)
+
+    leader = threading.Thread(target=fetch, args=('8.8.8.4',))
+    leader.start()
+    time.sleep(0.1)
+    followers = [threading.Thread(target=fetch, args=(ip,)) for ip in ('8.8.8.5', '8.8.8.200', '8.8.8.4')]
+    for thread in followers:
+        thread.start()
+    for thread in [leader] + followers:
+        thread.join()
+    # 8.8.8.200 está no mesmo /24, mas fora da rede /28 que a resposta declara
+    assert sorted(requested) == ['8.8.8.200', '8.8.8.4']
+    assert results['8.8.8.5'] == ({"ip": '8.8.8.5', "city": "C8.8.8.4", "network": "8.8.8.0/28",
+                                   "prefix": "8.8.8.0/28"}, False)
+    assert results['8.8.8.200'][0]["city"] == "C8.8.8.200" and results['8.8.8.200'][1] is False
+    assert results['8.8.8.4'][0]["hostname"] == "h8.8.8.4" and results['8.8.8.4'][1] is False
+
+
+def test_prefix_followers_do_not_inherit_the_leader_error(geo_server):
+    url = geo_server(latency=0.3)
+    pytools.CONFIG['geo_prefix_cache'] = True
+    errors = {}
+
+    def fetch(ip):
+        try:
+            pytools.fetch_geolocation(ip)
+        except Exception as e:
+            errors[ip] = str(e)
+
+    ips = [f"13.0.0.{i}" for i in range(1, 6)]
+    threads = [threading.Thread(target=fetch, args=(ip,)) for ip in ips]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.02)
+    for thread in threads:
+        thread.join()
+    # O 404 do líder não é repassado aos vizinhos: cada um faz a própria requisição e recebe o próprio erro
+    assert served(url) == 5
+    assert sorted(errors) == ips and all(f"/{ip}/" in errors[ip] for ip in ips)
+    assert all(pytools._ip_cache.get(ip) for ip in ips)
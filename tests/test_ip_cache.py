@@ -0,0 +1,90 @@
+import ipaddress
+import json
+import sqlite3
+
+import pytest
+
+import pytools
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Relógio controlado pelo teste para o time.time() do cache."""
+    now = [1000.0]
+    monkeypatch.setattr(pytools.time, 'time', lambda: now[0])
+    return now
+
+
+def open_cache(tmp_path, ttl=None, max_entries=10000, legacy_json=None):
+    return pytools.IPCache(str(tmp_path / 'cache.sqlite3'), ttl, max_entries, legacy_json)
+
+
+def test_legacy_json_is_migrated_once(tmp_path):
+    legacy = tmp_path / 'ip_cache.json'
+    legacy.write_text(json.dumps({"1.1.1.1": {"city": "A"}, "2.2.2.2": {"city": "B"}, "3.3.3.3": "lixo"}))
+    cache = open_cache(tmp_path, ttl=3600, legacy_json=str(legacy))
+    assert cache.get("1.1.1.1") == {"city": "A"} and cache.get("2.2.2.2") == {"city": "B"}
+    assert cache.get("3.3.3.3") is None and cache.stats()["entries"] == 2
+    # O arquivo fica intacto, mas não é importado de novo (nem por outra instância)
+    legacy.write_text(json.dumps({"4.4.4.4": {"city": "D"}}))
+    again = open_cache(tmp_path, ttl=3600, legacy_json=str(legacy))
+    assert again.get("4.4.4.4") is None and again.stats()["entries"] == 2
+
+
+def test_corrupt_legacy_json_is_ignored(tmp_path):
+    legacy = tmp_path / 'ip_cache.json'
+    legacy.write_text("{")
+    cache = open_cache(tmp_path, legacy_json=str(legacy))
+    assert cache.stats()["entries"] == 0
+
+
+def test_entries_expire_after_their_ttl(tmp_path, clock):
+    cache = open_cache(tmp_path, ttl=100)
+    cache.put("1.1.1.1", {"city": "A"})
+    cache.put("2.2.2.2", {"_error": "404"}, ttl=30)  # Entrada negativa, com validade própria
+    clock[0] += 29
+    assert cache.get("2.2.2.2") == {"_error": "404"}
+    clock[0] += 1
+    assert cache.get("2.2.2.2") is None and cache.get("1.1.1.1") == {"city": "A"}
+    assert cache.stats()["expired"] == 1
+    clock[0] += 70
+    assert cache.get("1.1.1.1") is None and cache.stats()["expired"] == 2
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    cache = open_cache(tmp_path, max_entries=10)
+    for index in range(10):
+        cache.put(f"10.0.0.{index}", {"n": index})
+        clock[0] += 1
+    clock[0] += cache.TOUCH_INTERVAL + 1
+    assert cache.get("10.0.0.0") == {"n": 0}  # Leitura renova o acesso da mais antiga
+    cache.put("10.0.0.10", {"n": 10})
+    # Acima do limite, o excesso é descartado em lote até (1 - EVICT_SLACK) * max_entries
+    kept = {row[0] for row in sqlite3.connect(cache.path).execute("SELECT ip FROM ip_cache")}
+    assert kept == {"10.0.0.0"} | {f"10.0.0.{index}" for index in range(3, 11)}
+
+
+def test_expired_entries_are_purged_before_lru(tmp_path, clock):
+    cache = open_cache(tmp_path, ttl=1000, max_entries=5)
+    cache.put("10.0.0.1", {"n": 1}, ttl=10)
+    for index in range(2, 6):
+        cache.put(f"10.0.0.{index}", {"n": index})
+    clock[0] += 10
+    cache.put("10.0.0.6", {"n": 6})
+    # A expirada abre espaço: nenhuma entrada válida é descartada
+    kept = {row[0] for row in sqlite3.connect(cache.path).execute("SELECT ip FROM ip_cache")}
+    assert kept == {f"10.0.0.{index}" for index in range(2, 7)}
+
+
+def test_longest_cached_prefix_wins(tmp_path, clock):
+    cache = open_cache(tmp_path, ttl=100)
+    cache.put_prefix(ipaddress.ip_network("10.1.0.0/16"), {"city": "Wide", "hostname": "a.example"})
+    cache.put_prefix(ipaddress.ip_network("10.1.2.0/24"), {"city": "Narrow"}, ttl=10)
+    assert cache.get_prefix("10.1.2.5") == {"city": "Narrow", "ip": "10.1.2.5", "prefix": "10.1.2.0/24"}
+    assert cache.get_prefix("10.1.9.9") == {"city": "Wide", "ip": "10.1.9.9", "prefix": "10.1.0.0/16"}
+    assert cache.get_prefix("10.2.0.1") is None
+    clock[0] += 10
+    assert cache.get_prefix("10.1.2.5")["prefix"] == "10.1.0.0/16"
+    cache.put_prefix(ipaddress.ip_network("2001:db8::/48"), {"city": "V6"})
+    assert cache.get_prefix("2001:db8::1")["prefix"] == "2001:db8::/48"
+    assert cache.stats()["prefix_entries"] == 3
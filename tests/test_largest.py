@@ -0,0 +1,49 @@
+import os
+import random
+import time
+
+import pytools
+
+DAY = 86400
+
+
+def largest(root, **options):
+    result = pytools.find_largest_files([str(root)], **options)
+    return [(os.path.relpath(item["path"], root), item["size_bytes"]) for item in result["largest"]]
+
+
+def test_heap_keeps_exactly_the_top_k(tmp_path):
+    sizes = random.Random(7).sample(range(1, 5000), 60)
+    for index, size in enumerate(sizes):
+        folder = tmp_path / f"d{index % 4}" / f"e{index % 3}"
+        folder.mkdir(parents=True, exist_ok=True)
+        (folder / f"f{index}").write_bytes(b'x' * size)
+    found = largest(tmp_path, count=7)
+    assert [size for _, size in found] == sorted(sizes, reverse=True)[:7]
+    assert all(os.path.getsize(tmp_path / path) == size for path, size in found)
+    result = pytools.find_largest_files([str(tmp_path)], count=100)
+    assert result["files"] == result["matched"] == 60 and len(result["largest"]) == 60
+
+
+def test_hard_links_are_listed_once(tmp_path):
+    (tmp_path / 'big').write_bytes(b'x' * 300)
+    os.link(tmp_path / 'big', tmp_path / 'big-link')
+    (tmp_path / 'small').write_bytes(b'x' * 10)
+    found = largest(tmp_path, count=3)
+    assert [size for _, size in found] == [300, 10] and found[0][0] in ('big', 'big-link')
+
+
+def test_extension_age_and_size_filters(tmp_path):
+    now = time.time()
+    files = {'old.LOG': (500, 40), 'new.log': (400, 1), 'mid.log': (300, 10), 'old.txt': (900, 40),
+             'tiny.log': (5, 40), 'noext': (800, 1)}
+    for name, (size, age_days) in files.items():
+        (tmp_path / name).write_bytes(b'x' * size)
+        os.utime(tmp_path / name, (now - age_days * DAY, now - age_days * DAY))
+    assert [name for name, _ in largest(tmp_path, extensions=['log'])] == ['old.LOG', 'new.log', 'mid.log',
+                                                                          'tiny.log']
+    assert [name for name, _ in largest(tmp_path, extensions=['.log', 'txt'], older_than_days=30)] == [
+        'old.txt', 'old.LOG', 'tiny.log']
+    assert [name for name, _ in largest(tmp_path, newer_than_days=5)] == ['noext', 'new.log']
+    assert [name for name, _ in largest(tmp_path, older_than_days=5, newer_than_days=30)] == ['mid.log']
+    assert [name for name, _ in largest(tmp_path, min_size=450)] == ['old.txt', 'noext', 'old.LOG']
@@ -0,0 +1,39 @@
+import pytest
+
+import pytools
+
+
+def test_window_covers_only_recent_probes_at_long_intervals():
+    tracker = pytools.LatencyTracker({"host": "exemplo"}, window=60, slots=6)
+    for now in range(0, 301, 30):
+        # Só as sondas antigas se perdem: a janela recente não pode vê-las
+        tracker.record(None if now < 240 else 10.0, float(now))
+    snapshot = tracker.snapshot(300.0)
+    assert snapshot["window_s"] == 60
+    # Fatias de 10 s: a de 240 s termina em 250 s, dentro da janela (240, 300]
+    assert tracker.recent_sent == 3 and tracker.recent.total == 3
+    assert snapshot["window_loss_percent"] == 0
+    # Percentis vêm do bucket do histograma (erro < 1/64)
+    assert snapshot["window_p50_ms"] == snapshot["window_p99_ms"] == pytest.approx(10.0, rel=1 / 64)
+    assert snapshot["sent"] == 11 and snapshot["loss_percent"] == round(100 * 8 / 11, 2)
+
+
+def test_window_empties_after_a_pause():
+    tracker = pytools.LatencyTracker({"host": "exemplo"}, window=60, slots=6)
+    for now in range(10):
+        tracker.record(5.0, float(now))
+    snapshot = tracker.snapshot(200.0)
+    assert tracker.recent_sent == 0 and tracker.recent.total == 0
+    assert snapshot["window_loss_percent"] is None and snapshot["window_p50_ms"] is None
+    assert snapshot["p50_ms"] == pytest.approx(5.0, rel=1 / 64)
+    tracker.record(None, 201.0)
+    assert tracker.snapshot(201.0)["window_loss_percent"] == 100.0
+
+
+def test_slots_are_aligned_to_the_clock():
+    tracker = pytools.LatencyTracker({"host": "exemplo"}, window=60, slots=6)
+    tracker.record(1.0, 65.0)
+    tracker.record(1.0, 69.9)
+    tracker.record(1.0, 70.0)
+    assert [slot["end"] for slot in tracker.slots] == [70.0, 80.0]
+    assert [slot["sent"] for slot in tracker.slots] == [2, 1]
@@ -0,0 +1,50 @@
+import sys
+
+import pytest
+
+import pytools
+
+
+@pytest.fixture
+def probe_module(tmp_path, monkeypatch):
+    """Módulo novo em tmp_path, ainda não importado; retorna o nome."""
+    (tmp_path / 'pytools_lazy_probe.py').write_text("VALUE = 42\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, 'pytools_lazy_probe', raising=False)
+    yield 'pytools_lazy_probe'
+    sys.modules.pop('pytools_lazy_probe', None)
+
+
+def test_module_is_imported_on_first_attribute_access(probe_module):
+    lazy = pytools.LazyModule(probe_module)
+    assert not lazy.loaded and probe_module not in sys.modules and "pendente" in repr(lazy)
+    assert lazy.VALUE == 42
+    assert lazy.loaded and probe_module in sys.modules and "carregado" in repr(lazy)
+
+
+def test_available_reports_without_raising():
+    lazy = pytools.LazyModule('pytools_no_such_module', 'pytools-extra')
+    assert lazy.available() is False and not lazy.loaded
+    with pytest.raises(ImportError, match="pip install pytools-extra"):
+        lazy.anything
+
+
+def test_requires_shows_the_install_hint_instead_of_raising(monkeypatch, probe_module):
+    shown, called = [], []
+    monkeypatch.setattr(pytools, 'IS_TERMUX', False)
+    monkeypatch.setitem(pytools.LAZY_MODULES, 'missing', pytools.LazyModule('pytools_no_such_module', 'extra-pkg'))
+    monkeypatch.setitem(pytools.LAZY_MODULES, 'probe', pytools.LazyModule(probe_module))
+    monkeypatch.setattr(pytools, 'print_panel', lambda message, title, style: shown.append((message, title, style)))
+    monkeypatch.setattr('builtins.input', lambda prompt='': '')
+
+    @pytools.requires('probe', 'missing')
+    def action():
+        called.append(True)
+        return "ok"
+
+    assert action.required_modules == ('probe', 'missing') and probe_module not in sys.modules
+    assert action() is None and not called
+    assert shown == [("Dependência ausente para esta ação. Instale com: pip install extra-pkg",
+                      "Erro de Importação", "error")]
+    monkeypatch.setitem(pytools.LAZY_MODULES, 'missing', pytools.LAZY_MODULES['probe'])
+    assert action() == "ok" and called == [True]
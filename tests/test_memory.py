@@ -0,0 +1,46 @@
+import builtins
+
+import pytools
+
+
+def test_ring_buffer_wraps_around():
+    ring = pytools.RingBuffer(4)
+    assert len(ring) == 0
+    for value in (5.0, 1.0, 3.0):
+        ring.append(value)
+    assert ring.ordered() == [5.0, 1.0, 3.0] and ring.last() == 3.0
+    assert ring.stats() == (1.0, 3.0, 5.0)   # Só as amostras guardadas, sem os zeros iniciais
+    for value in (7.0, 9.0, 2.0):
+        ring.append(value)
+    assert len(ring) == 4 and ring.ordered() == [3.0, 7.0, 9.0, 2.0] and ring.last() == 2.0
+    assert ring.stats() == (2.0, 5.25, 9.0)
+
+
+class FakeLive:
+    def __init__(self):
+        self.drawn = []
+
+    def update(self, renderable, refresh=False):
+        self.drawn.append(renderable)
+
+
+def test_live_redraws_only_when_the_key_changes():
+    live = FakeLive()
+    update = pytools.live_redraw_on_change(live, lambda value: f"tabela {value['shown']}",
+                                           key=lambda value: value['shown'])
+    for value in ({'shown': 1, 'raw': 0.1}, {'shown': 1, 'raw': 0.2}, {'shown': 2, 'raw': 0.3},
+                  {'shown': 2, 'raw': 0.4}, {'shown': 1, 'raw': 0.5}):
+        update(value)
+    assert live.drawn == ["tabela 1", "tabela 2", "tabela 1"]
+
+
+def test_own_rss_is_zero_without_proc(monkeypatch):
+    real_open = builtins.open
+
+    def open_without_proc(path, *args, **kwargs):
+        if str(path).startswith('/proc/'):
+            raise FileNotFoundError(path)
+        return real_open(path, *args, **kwargs)
+
+    monkeypatch.setattr(builtins, 'open', open_without_proc)
+    assert pytools._own_rss() == 0
@@ -0,0 +1,106 @@
+import asyncio
+import socket
+
+import pytest
+
+import pytools
+
+
+def run_engine(coro_factory, **options):
+    """Executa uma corrotina com um PingEngine novo, fechando-o no fim."""
+    async def main():
+        engine = pytools.PingEngine(**options)
+        try:
+            return await coro_factory(engine)
+        finally:
+            engine.close()
+    return asyncio.run(main())
+
+
+@pytest.fixture
+def icmp_available():
+    opened = pytools.open_icmp_socket(socket.AF_INET)
+    if not opened:
+        pytest.skip("sem permissão para ICMP")
+    opened[0].close()
+
+
+@pytest.fixture
+def listener():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        sock.listen(16)
+        yield sock.getsockname()[1]
+
+
+def test_icmp_ping_loopback_addresses(icmp_available):
+    results = run_engine(lambda engine: engine.run(['127.0.0.1', '127.0.0.2', '127.0.0.3'], 3, 0.01),
+                         method='icmp', timeout=1.0)
+    assert [r["address"] for r in results] == ['127.0.0.1', '127.0.0.2', '127.0.0.3']
+    for result in results:
+        assert result["method"] == 'icmp'
+        assert result["transmitted"] == result["received"] == 3 and result["loss_percent"] == 0
+        assert 0 <= result["rtt_min_ms"] <= result["rtt_avg_ms"] <= result["rtt_max_ms"] < 1000
+
+
+class RedirectedSocket:
+    """Envia os ecos a outro endereço, para simular uma resposta vinda do host errado."""
+
+    def __init__(self, sock: socket.socket, target: str) -> None:
+        self.sock = sock
+        self.target = target
+
+    def sendto(self, packet: bytes, address) -> int:
+        return self.sock.sendto(packet, (self.target, 0))
+
+    def __getattr__(self, name):
+        return getattr(self.sock, name)
+
+
+def test_icmp_reply_from_other_source_is_ignored(icmp_available):
+    async def probe(engine):
+        sock, raw = engine.icmp_socket(socket.AF_INET)
+        engine.sockets[socket.AF_INET] = RedirectedSocket(sock, '127.0.0.2'), raw
+        try:
+            return await engine.probe_icmp(socket.AF_INET, '127.0.0.3')
+        finally:
+            engine.sockets[socket.AF_INET] = sock, raw
+    assert run_engine(probe, method='icmp', timeout=0.3) is None
+
+
+def test_tcp_ping_open_and_refused_ports(listener):
+    with socket.socket() as closed:
+        closed.bind(('127.0.0.1', 0))
+        refused = closed.getsockname()[1]
+    # Conexão aceita e conexão recusada (RST) provam que o host respondeu
+    for port in (listener, refused):
+        rtt = run_engine(lambda engine: engine.probe_tcp(socket.AF_INET, '127.0.0.1'), method='tcp', port=port)
+        assert rtt is not None and 0 <= rtt < 1000
+
+
+def test_tcp_ping_summary(listener):
+    results = run_engine(lambda engine: engine.run(['127.0.0.1', '127.0.0.4'], 2, 0.01), method='tcp',
+                         port=listener)
+    assert [r["method"] for r in results] == ['tcp', 'tcp']
+    assert results[0]["received"] == 2 and results[0]["loss_percent"] == 0
+    # Nada escuta em 127.0.0.4 nesta porta: o RST ainda conta como resposta
+    assert results[1]["received"] == 2
+
+
+def test_tcp_timeout_counts_as_loss(listener, monkeypatch):
+    async def never_connects(*args, **kwargs):
+        await asyncio.sleep(10)
+
+    async def ping(engine):
+        monkeypatch.setattr(engine.loop, 'create_connection', never_connects)
+        return await engine.run(['127.0.0.1'], 2, 0.01)
+    results = run_engine(ping, method='tcp', port=listener, timeout=0.1)
+    assert results[0]["transmitted"] == 2 and results[0]["received"] == 0
+    assert results[0]["loss_percent"] == 100.0 and results[0]["rtt_avg_ms"] is None
+
+
+def test_icmp_without_permission_reports_error(monkeypatch):
+    monkeypatch.setattr(pytools, 'open_icmp_socket', lambda family: None)
+    results = run_engine(lambda engine: engine.run(['127.0.0.1'], 1, 0.01), method='icmp')
+    assert results[0]["method"] is None and "ICMP" in results[0]["error"]
+    assert results[0]["transmitted"] == 0
@@ -0,0 +1,101 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+import pytools
+
+pytestmark = pytest.mark.skipif(not os.path.isdir('/proc'), reason="requer /proc (grupos de processos POSIX)")
+
+
+def alive(pid: int) -> bool:
+    """O processo existe e não é um zumbi (no contêiner ninguém os recolhe)."""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            return f.read().rsplit(')', 1)[1].split()[0] != 'Z'
+    except FileNotFoundError:
+        return False
+
+
+def run(command, timeout=None):
+    """Executa com execute_process e retorna (resultado, linhas de stdout)."""
+    lines = []
+    result = pytools.execute_process(command, lambda stream, batch: lines.extend(batch), timeout)
+    return result, lines
+
+
+def test_timeout_kills_the_whole_process_group():
+    start = time.monotonic()
+    result, lines = run(['sh', '-c', 'sleep 30 & echo $!; sleep 30 & echo $!; wait'], timeout=0.5)
+    assert result.reason == 'timeout' and not result
+    assert result.timeout == 0.5 and time.monotonic() - start < 5
+    pids = [int(line) for line in lines]
+    assert len(pids) == 2
+    deadline = time.monotonic() + 2
+    while any(alive(pid) for pid in pids) and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert not any(alive(pid) for pid in pids)
+    assert result.to_dict()["exit_reason"] == 'timeout'
+
+
+def test_children_ignoring_sigterm_get_sigkill(monkeypatch):
+    monkeypatch.setitem(pytools.CONFIG, 'command_kill_grace', 0.2)
+    result, lines = run(['sh', '-c', "trap '' TERM; sleep 30 & echo $!; wait"], timeout=0.3)
+    assert result.reason == 'timeout'
+    pid = int(lines[0])
+    deadline = time.monotonic() + 2
+    while alive(pid) and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert not alive(pid)
+
+
+def test_exit_reasons():
+    assert run(['true'])[0].reason == 'exit' and run(['true'])[0]
+    failed = run(['sh', '-c', 'exit 3'])[0]
+    assert failed.reason == 'exit' and failed.returncode == 3 and not failed
+    killed = run(['sh', '-c', 'kill -KILL $$'])[0]
+    assert killed.reason == 'signal' and killed.signal == 'SIGKILL'
+    assert run(['pytools-no-such-command'])[0].reason == 'not_found'
+
+
+def test_budget_bounds_every_command():
+    with pytools.command_budget(0.3):
+        result = run(['sleep', '30'], timeout=60)[0]
+    assert result.reason == 'timeout' and result.timeout <= 0.3
+
+
+def test_run_capture_reports_the_exit_reason():
+    result = pytools.run_capture(['sh', '-c', 'echo antes\nsleep 30'], timeout=0.3)
+    assert result["exit_reason"] == 'timeout' and result["success"] is False
+    assert result["stdout"] == "antes\n" and "tempo limite" in result["stderr"]
+    blocked = pytools.run_capture(['sh', '-c', 'sleep 30 & sleep 30'])
+    assert blocked["exit_reason"] == 'blocked'
+
+
+def test_stream_process_delivers_interleaved_streams_as_they_arrive():
+    script = ("import sys, time\n"
+              "for i in range(3):\n"
+              "    print(f'out {i}', flush=True); time.sleep(0.05)\n"
+              "    print(f'err {i}', file=sys.stderr, flush=True); time.sleep(0.05)\n"
+              "sys.stdout.write('sem quebra')\n")
+    process = subprocess.Popen([sys.executable, '-c', script], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    received = []
+    assert pytools.stream_process(process, lambda stream, lines: received.extend((stream, line) for line in lines),
+                                  timeout=10)
+    process.wait()
+    # Cada linha chega na ordem em que foi escrita, sem esperar o fim do outro fluxo
+    assert received == [('stdout', 'out 0'), ('stderr', 'err 0'), ('stdout', 'out 1'), ('stderr', 'err 1'),
+                        ('stdout', 'out 2'), ('stderr', 'err 2'), ('stdout', 'sem quebra')]
+
+
+def test_stream_process_stops_at_the_timeout():
+    process = subprocess.Popen(['sleep', '5'], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        start = time.monotonic()
+        assert not pytools.stream_process(process, lambda stream, lines: None, timeout=0.3)
+        assert time.monotonic() - start < 2
+    finally:
+        process.kill()
+        process.wait()
@@ -0,0 +1,146 @@
+import os
+import signal
+import threading
+import time
+
+import pytest
+
+import pytools
+from test_process import alive
+
+
+def run_command_step(step, pids=None):
+    """run_step das etapas de comando, anotando os PIDs que o comando imprime."""
+    def on_lines(stream, lines):
+        if pids is not None and stream == 'stdout':
+            pids.extend(int(line) for line in lines if line.isdigit())
+    result = pytools.execute_process(step.command, on_lines)
+    return bool(result), result.to_dict()
+
+
+def by_name(results):
+    return {result["name"]: result for result in results}
+
+
+def interval(result):
+    """(início, fim) da etapa; os dois campos são arredondados a 1 ms, daí a folga."""
+    return result["start_s"], result["start_s"] + result["duration_s"] - 0.002
+
+
+def test_dependencies_run_in_order():
+    steps = [pytools.Step('c', "", ['true'], deps=('a', 'b')),
+             pytools.Step('a', "", ['sleep', '0.2']),
+             pytools.Step('b', "", ['sleep', '0.2'])]
+    results = pytools.run_step_graph(steps, run_command_step, max_workers=4)
+    assert [result["name"] for result in results] == ['c', 'a', 'b']
+    outcome = by_name(results)
+    assert all(result["status"] == 'ok' for result in results)
+    # a e b rodam juntos; c só começa depois de ambos
+    assert interval(outcome['a'])[0] < interval(outcome['b'])[1]
+    assert interval(outcome['c'])[0] >= max(interval(outcome['a'])[1], interval(outcome['b'])[1])
+
+
+def test_shared_lock_serializes_steps():
+    steps = [pytools.Step(name, "", ['sleep', '0.2'], locks=('dpkg',)) for name in ('a', 'b', 'c')]
+    results = sorted((interval(result) for result in pytools.run_step_graph(steps, run_command_step)))
+    for (_, end), (start, _) in zip(results, results[1:]):
+        assert start >= end
+
+
+def test_failure_blocks_dependents(tmp_path):
+    marker = tmp_path / 'ran'
+    steps = [pytools.Step('broken', "", ['false']),
+             pytools.Step('child', "", ['touch', str(marker)], deps=('broken',)),
+             pytools.Step('grandchild', "", ['touch', str(marker)], deps=('child',)),
+             pytools.Step('sibling', "", ['true'])]
+    outcome = by_name(pytools.run_step_graph(steps, run_command_step))
+    assert outcome['broken']["status"] == 'failed' and outcome['broken']["returncode"] == 1
+    assert outcome['child']["status"] == outcome['grandchild']["status"] == 'blocked'
+    assert outcome['sibling']["status"] == 'ok'
+    assert not marker.exists()
+
+
+def test_unchanged_inputs_are_skipped(tmp_path):
+    state_file = str(tmp_path / 'state.json')
+    runs = []
+
+    def run_step(step):
+        runs.append(step.name)
+        return step.name != 'bad', {}
+
+    def graph():
+        return [pytools.Step('good', "", func=dict, inputs=lambda: 'v1'),
+                pytools.Step('bad', "", func=dict, inputs=lambda: 'v1'),
+                pytools.Step('plain', "", func=dict)]
+
+    pytools.run_step_graph(graph(), run_step, state_file)
+    outcome = by_name(pytools.run_step_graph(graph(), run_step, state_file))
+    assert outcome['good']["status"] == 'skipped' and outcome['good']["reason"] == "entradas inalteradas"
+    # Só execuções bem-sucedidas gravam a impressão digital; sem `inputs`, sempre roda
+    assert sorted(runs) == ['bad', 'bad', 'good', 'plain', 'plain']
+    assert pytools.load_step_state(state_file) == {'good': 'v1'}
+
+
+def test_skip_check_runs_only_when_the_step_is_ready():
+    order = []
+    steps = [pytools.Step('first', "", func=lambda: order.append('first') or {}),
+             pytools.Step('second', "", func=dict, deps=('first',),
+                          skip=lambda: order.append('skip?') or "nada a fazer")]
+    outcome = by_name(pytools.run_step_graph(steps, lambda step: (True, step.func())))
+    assert order == ['first', 'skip?']
+    assert outcome['second']["status"] == 'skipped' and outcome['second']["reason"] == "nada a fazer"
+
+
+def test_workers_inherit_the_command_budget():
+    seen = []
+    steps = [pytools.Step('slow', "", ['sleep', '5'],
+                          skip=lambda: seen.append(pytools.effective_timeout()) or None)]
+    start = time.monotonic()
+    with pytools.command_budget(1):
+        outcome, = pytools.run_step_graph(steps, lambda step: (pytools.run_capture(step.command)["success"], {}))
+    # Sem o orçamento, o worker esperaria os 5 s do sleep (e a simulação do `skip` não teria limite)
+    assert outcome["status"] == 'failed' and time.monotonic() - start < 3
+    assert seen and seen[0] is not None and seen[0] <= 1
+
+
+def test_cycles_and_unknown_dependencies():
+    with pytest.raises(ValueError):
+        pytools.run_step_graph([pytools.Step('a', "", ['true'], deps=('nope',))], run_command_step)
+    steps = [pytools.Step('a', "", ['true'], deps=('b',)), pytools.Step('b', "", ['true'], deps=('a',))]
+    assert {result["status"] for result in pytools.run_step_graph(steps, run_command_step)} == {'blocked'}
+
+
+@pytest.mark.skipif(not os.path.isdir('/proc'), reason="requer /proc (grupos de processos POSIX)")
+def test_interrupt_kills_running_steps(tmp_path):
+    pids = []
+    marker = tmp_path / 'ran'
+    steps = [pytools.Step('slow1', "", ['sh', '-c', 'sleep 30 & echo $!; wait']),
+             pytools.Step('slow2', "", ['sh', '-c', 'sleep 30 & echo $!; wait']),
+             pytools.Step('after', "", ['touch', str(marker)], deps=('slow1',))]
+
+    def interrupt() -> None:
+        deadline = time.monotonic() + 10
+        while len(pids) < 2 and time.monotonic() < deadline:
+            time.sleep(0.02)
+        os.kill(os.getpid(), signal.SIGINT)
+
+    threading.Thread(target=interrupt, daemon=True).start()
+    start = time.monotonic()
+    with pytest.raises(KeyboardInterrupt):
+        pytools.run_step_graph(steps, lambda step: run_command_step(step, pids))
+    assert time.monotonic() - start < 10 and len(pids) == 2
+    deadline = time.monotonic() + 2
+    while any(alive(pid) for pid in pids) and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert not any(alive(pid) for pid in pids)
+    assert not marker.exists()
+
+
+def test_update_graph_serializes_apt_locks(monkeypatch):
+    monkeypatch.setattr(pytools, 'IS_TERMUX', False)
+    monkeypatch.setattr(pytools.os, 'geteuid', lambda: 0, raising=False)
+    steps = {step.name: step for step in pytools.system_update_steps()}
+    # autoremove e autoclean disputam /var/cache/apt/archives; upgrade e autoremove, o dpkg
+    assert set(steps['autoremove'].locks) & set(steps['autoclean'].locks)
+    assert set(steps['upgrade'].locks) & set(steps['autoremove'].locks)
+    assert 'upgrade' in steps['autoremove'].deps
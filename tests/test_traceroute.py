@@ -0,0 +1,104 @@
+import errno
+import os
+import platform
+import socket
+
+import pytest
+
+import pytools
+
+linux_only = pytest.mark.skipif(platform.system() != 'Linux', reason="IP_RECVERR só existe no Linux")
+
+SYSTEM_OUTPUT = """\
+traceroute to example.com (93.184.215.14), 5 hops max, 60 byte packets
+ 1  192.168.0.1  0.512 ms  0.431 ms  0.402 ms
+ 2  * * *
+ 3  93.184.215.14  10.1 ms !H  *  11.0 ms
+"""
+
+
+def trace(method, **options):
+    return pytools.collect_traceroute('127.0.0.1', max_hops=5, queries=2, timeout=2, method=method, **options)
+
+
+def assert_single_hop(result):
+    assert result["success"] and result["address"] == '127.0.0.1'
+    hop, = result["hops"]
+    assert hop["ttl"] == 1 and [probe["address"] for probe in hop["probes"] if probe] == ['127.0.0.1'] * 2
+
+
+@pytest.fixture
+def listener():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        sock.listen(16)
+        yield sock.getsockname()[1]
+
+
+@linux_only
+def test_udp_loopback_is_a_single_hop():
+    assert_single_hop(trace('udp'))
+
+
+@linux_only
+def test_tcp_loopback_is_a_single_hop(listener):
+    assert_single_hop(trace('tcp', port=listener))
+
+
+@linux_only
+def test_a_probe_that_cannot_be_sent_is_lost(monkeypatch):
+    refused = []
+
+    class FlakySocket(socket.socket):
+        def sendto(self, *args):
+            if not refused:   # Só a primeira sonda falha; a outra do mesmo TTL segue
+                refused.append(self)
+                raise OSError(errno.ENOBUFS, os.strerror(errno.ENOBUFS))
+            return super().sendto(*args)
+
+    monkeypatch.setattr(pytools.socket, 'socket', FlakySocket)
+    result = trace('udp')
+    assert refused and result["success"]
+    assert result["hops"] == [{"ttl": 1, "probes": [None, result["hops"][0]["probes"][1]]}]
+    assert result["hops"][0]["probes"][1]["address"] == '127.0.0.1'
+
+
+def test_parse_traceroute_line_forms():
+    assert pytools.parse_traceroute_line(" 2  * * *") == {"ttl": 2, "probes": [None, None, None]}
+    assert pytools.parse_traceroute_line(" 3  10.0.0.1  1.5 ms !H  *  10.0.0.2  2.25 ms") == {
+        "ttl": 3, "probes": [{"address": '10.0.0.1', "rtt_ms": 1.5, "note": '!H'}, None,
+                             {"address": '10.0.0.2', "rtt_ms": 2.25}]}
+    assert pytools.parse_traceroute_line("traceroute to x (1.2.3.4), 30 hops max") is None
+
+
+def fake_traceroute(tmp_path, monkeypatch, output):
+    """Põe no PATH um `traceroute` que só imprime `output`."""
+    script = tmp_path / 'traceroute'
+    script.write_text(f"#!/bin/sh\nprintf '%s' '{output}'\n")
+    script.chmod(0o755)
+    monkeypatch.setenv('PATH', str(tmp_path))
+
+
+def test_system_method_parses_each_hop(tmp_path, monkeypatch):
+    fake_traceroute(tmp_path, monkeypatch, SYSTEM_OUTPUT)
+    hops = []
+    result = pytools.collect_traceroute('example.com', method='system', on_hop=hops.append)
+    assert result["address"] == '93.184.215.14' and hops == result["hops"] and len(hops) == 3
+    assert not result["success"]   # O último salto respondeu com !H
+    assert hops[2]["probes"][0]["note"] == '!H'
+
+
+def test_system_method_without_traceroute_raises(tmp_path, monkeypatch):
+    monkeypatch.setenv('PATH', str(tmp_path))
+    with pytest.raises(OSError, match="não encontrado"):
+        pytools.collect_traceroute('127.0.0.1', method='system')
+
+
+def test_auto_falls_back_to_the_system_command(tmp_path, monkeypatch):
+    async def unavailable(self, family, address):
+        raise PermissionError("sem IP_RECVERR")
+
+    monkeypatch.setattr(pytools.Traceroute, 'trace', unavailable)
+    fake_traceroute(tmp_path, monkeypatch, SYSTEM_OUTPUT.replace("!H  ", ""))
+    result = pytools.collect_traceroute('93.184.215.14', method='auto')
+    assert result["method"] == 'system' and result["success"] and len(result["hops"]) == 3